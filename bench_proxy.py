@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+代理链路测速（bench-proxy）
+
+对比直连与经代理的 HTTP/HTTPS 请求，测量：
+- 建连耗时（TCP 连接；HTTPS 含 TLS 握手；经代理的 HTTPS 含 CONNECT）
+- 首字节时间 TTFB（请求发出到收到响应头）
+- 单请求吞吐量和整体吞吐量
+
+按负载大小 × 并发数组合运行，输出 p50/p95/p99 分位数表。
+
+使用方法:
+    python bench_proxy.py                                  # 使用 HTTP_PROXY/注册表代理和默认测速地址
+    python bench_proxy.py --sizes 16K,1M --concurrency 1,8 --requests 20
+    python bench_proxy.py --url "https://example.com/file?bytes={size}" --proxy 127.0.0.1:7897
+    python bench_proxy.py --offline                        # 本地替身源站 + 替身代理（无需网络）
+"""
+
+import argparse
+import http.client
+import json
+import os
+import ssl
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from proxy_probe import parse_proxy_server
+
+DEFAULT_URL = "https://speed.cloudflare.com/__down?bytes={size}"
+DEFAULT_SIZES = "16K,1M"
+DEFAULT_CONCURRENCY = "1,4"
+DEFAULT_REQUESTS = 10
+DEFAULT_TIMEOUT = 30
+READ_CHUNK = 65536
+PERCENTILES = (50, 95, 99)
+
+
+class Sample:
+    """单次请求的测量结果（毫秒 / 字节）"""
+
+    def __init__(self):
+        self.connect_ms = None
+        self.ttfb_ms = None
+        self.total_ms = None
+        self.bytes = 0
+        self.status = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+    @property
+    def throughput(self):
+        """字节/秒（按响应头之后的传输时间计算）"""
+        if not self.ok or not self.bytes:
+            return None
+        transfer_ms = max(self.total_ms - self.ttfb_ms, 0.001)
+        return self.bytes / transfer_ms * 1000
+
+
+def parse_size(text):
+    """'16K' / '1M' / '512' → 字节数"""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(n):
+    for unit, factor in (("G", 1024 ** 3), ("M", 1024 ** 2), ("K", 1024)):
+        if n >= factor and n % factor == 0:
+            return f"{n // factor}{unit}"
+    return str(n)
+
+
+def percentile(values, p):
+    """线性插值分位数；空列表返回 None"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _open_connection(url, proxy, tunnel, timeout, ssl_context):
+    """按直连/代理/隧道构造 http.client 连接，返回 (conn, 请求路径)"""
+    https = url.scheme == "https"
+    port = url.port or (443 if https else 80)
+    path = url.path or "/"
+    if url.query:
+        path += "?" + url.query
+    if proxy is None:
+        if https:
+            return http.client.HTTPSConnection(url.hostname, port, timeout=timeout, context=ssl_context), path
+        return http.client.HTTPConnection(url.hostname, port, timeout=timeout), path
+    proxy_host, proxy_port = proxy
+    if https:
+        conn = http.client.HTTPSConnection(proxy_host, proxy_port, timeout=timeout, context=ssl_context)
+        conn.set_tunnel(url.hostname, port)
+        return conn, path
+    conn = http.client.HTTPConnection(proxy_host, proxy_port, timeout=timeout)
+    if tunnel:
+        conn.set_tunnel(url.hostname, port)
+        return conn, path
+    return conn, url.geturl()   # 普通 HTTP 代理：绝对 URI
+
+
+def fetch(url, proxy=None, tunnel=False, timeout=DEFAULT_TIMEOUT, ssl_context=None):
+    """执行一次 GET（不复用连接，以便测量建连成本），返回 Sample"""
+    sample = Sample()
+    parsed = urlsplit(url)
+    conn, target = _open_connection(parsed, proxy, tunnel, timeout, ssl_context)
+    try:
+        start = time.perf_counter()
+        conn.connect()
+        connected = time.perf_counter()
+        sample.connect_ms = (connected - start) * 1000
+        conn.request("GET", target, headers={"Connection": "close"})
+        resp = conn.getresponse()
+        sample.ttfb_ms = (time.perf_counter() - connected) * 1000
+        sample.status = resp.status
+        while True:
+            data = resp.read(READ_CHUNK)
+            if not data:
+                break
+            sample.bytes += len(data)
+        sample.total_ms = (time.perf_counter() - connected) * 1000
+    except (OSError, http.client.HTTPException) as e:
+        sample.error = str(e) or e.__class__.__name__
+    finally:
+        conn.close()
+    return sample
+
+
+def run_case(url, proxy, tunnel, concurrency, requests, timeout, ssl_context):
+    """以给定并发执行 requests 次请求，返回 (样本列表, 总耗时秒)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(
+            lambda _: fetch(url, proxy, tunnel, timeout, ssl_context), range(requests)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall_seconds):
+    """汇总样本：成功数、各指标分位数、整体吞吐量"""
+    ok = [s for s in samples if s.ok]
+    summary = {"requests": len(samples), "ok": len(ok),
+               "errors": sorted({s.error or f"HTTP {s.status}" for s in samples if not s.ok})}
+    for metric in ("connect_ms", "ttfb_ms", "total_ms"):
+        summary[metric] = {f"p{p}": percentile([getattr(s, metric) for s in ok], p) for p in PERCENTILES}
+    summary["throughput"] = {f"p{p}": percentile([s.throughput for s in ok], p) for p in PERCENTILES}
+    total_bytes = sum(s.bytes for s in ok)
+    summary["aggregate_throughput"] = total_bytes / wall_seconds if wall_seconds > 0 else None
+    return summary
+
+
+def run_benchmark(url_template, sizes, concurrency_levels, requests, proxy=None,
+                  tunnel=False, timeout=DEFAULT_TIMEOUT, insecure=False, include_direct=True):
+    """
+    运行全部组合，返回结果列表：
+    [{"path": "direct"/"proxy", "size": 16384, "concurrency": 4, "summary": {...}}]
+    """
+    ssl_context = ssl.create_default_context()
+    if insecure:
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+    paths = []
+    if include_direct:
+        paths.append(("direct", None))
+    if proxy:
+        paths.append(("proxy", proxy))
+
+    results = []
+    for size in sizes:
+        url = url_template.format(size=size)
+        for concurrency in concurrency_levels:
+            for name, via in paths:
+                samples, wall = run_case(url, via, tunnel, concurrency, requests, timeout, ssl_context)
+                results.append({"path": name, "size": size, "concurrency": concurrency,
+                                "summary": summarize(samples, wall)})
+    return results
+
+
+def _fmt_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def _fmt_rate(value):
+    return "-" if value is None else f"{value / 1024 / 1024:.2f}"
+
+
+def format_table(results):
+    """渲染分位数表（耗时单位 ms，吞吐量单位 MB/s）"""
+    header = (f"{'path':<7}{'size':>6}{'conc':>5}{'ok':>7}"
+              f"{'conn p50':>10}{'conn p95':>10}{'ttfb p50':>10}{'ttfb p95':>10}{'ttfb p99':>10}"
+              f"{'MB/s p50':>10}{'MB/s agg':>10}")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        s = r["summary"]
+        lines.append(
+            f"{r['path']:<7}{format_size(r['size']):>6}{r['concurrency']:>5}"
+            f"{s['ok']:>4}/{s['requests']:<2}"
+            f"{_fmt_ms(s['connect_ms']['p50']):>10}{_fmt_ms(s['connect_ms']['p95']):>10}"
+            f"{_fmt_ms(s['ttfb_ms']['p50']):>10}{_fmt_ms(s['ttfb_ms']['p95']):>10}"
+            f"{_fmt_ms(s['ttfb_ms']['p99']):>10}"
+            f"{_fmt_rate(s['throughput']['p50']):>10}{_fmt_rate(s['aggregate_throughput']):>10}")
+        for error in s["errors"][:3]:
+            lines.append(f"        ! {error}")
+    return "\n".join(lines)
+
+
+def detect_proxy():
+    """HTTPS_PROXY / HTTP_PROXY 环境变量优先，其次注册表 ProxyServer"""
+    for name in ("HTTPS_PROXY", "https_proxy", "HTTP_PROXY", "http_proxy"):
+        endpoints = parse_proxy_server(os.environ.get(name, ""))
+        if endpoints:
+            return endpoints[0]
+    try:
+        import winreg
+        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
+            endpoints = parse_proxy_server(winreg.QueryValueEx(key, "ProxyServer")[0])
+            if endpoints:
+                return endpoints[0]
+    except (ImportError, OSError):
+        pass
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench-proxy", description="对比直连与经代理的 HTTP/HTTPS 请求性能")
+    parser.add_argument("--url", default=DEFAULT_URL, help="测速地址模板，{size} 替换为负载字节数")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="负载大小列表，如 16K,1M")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="并发数列表，如 1,4")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="每个组合的请求次数")
+    parser.add_argument("--proxy", help="代理 host:port（默认取环境变量或注册表）")
+    parser.add_argument("--no-direct", action="store_true", help="只测代理链路（直连被墙时使用）")
+    parser.add_argument("--tunnel", action="store_true", help="HTTP 请求也走 CONNECT 隧道")
+    parser.add_argument("--insecure", action="store_true", help="HTTPS 跳过证书验证（MITM 代理）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--offline", action="store_true", help="使用本地替身源站和替身代理")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    servers = []
+    if args.offline:
+        from standin_servers import StandinOrigin, StandinProxy
+        origin, proxy_server = StandinOrigin().start(), StandinProxy().start()
+        servers = [origin, proxy_server]
+        url_template = f"http://{origin.host}:{origin.port}/bytes/{{size}}"
+        proxy = proxy_server.address
+    else:
+        url_template = args.url
+        proxy = parse_proxy_server(args.proxy)[0] if args.proxy else detect_proxy()
+
+    if proxy is None:
+        print("[WARN] 未检测到代理，只测试直连", file=sys.stderr)
+    try:
+        results = run_benchmark(url_template, sizes, levels, args.requests, proxy=proxy,
+                                tunnel=args.tunnel, timeout=args.timeout, insecure=args.insecure,
+                                include_direct=not args.no_direct)
+    finally:
+        for server in servers:
+            server.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(f"URL:   {url_template}")
+        print(f"Proxy: {'%s:%s' % proxy if proxy else '(none)'}")
+        print()
+        print(format_table(results))
+    return 0 if all(r["summary"]["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
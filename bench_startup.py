@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Shell 启动耗时测量与回归门禁（bench-startup）
+
+多次启动 Shell（pwsh -NoLogo -Command exit，会加载 Profile），测量：
+- wall：从启动进程到进程退出的总耗时
+- 分段耗时：Profile 的计时标记（profile_builder.py，设置 PROFILE_TIMING_LOG 时记录）
+  host 为进程启动到 Profile 开始执行，其余为 Profile 各段（ssl / utf8 / helpers / proxy / integrations）
+
+两种模式：
+- cold：每次启动前删除启动缓存（代理状态缓存、代理存活缓存），走完整的读-比较-写路径
+- warm：先启动一次预热（不计入），之后缓存都已就绪
+
+输出各指标的 p50 / p95，并按 setup.py 中的 STARTUP_BUDGET_MS 检查 p95，超出时退出码为 1。
+每次启动的记录可用 --record 保存为 JSON Lines，之后用 --replay 离线重新汇总和检查。
+
+使用方法:
+    python bench_startup.py                           # pwsh，cold/warm 各 10 次
+    python bench_startup.py --shell powershell --runs 20
+    python bench_startup.py --budget warm.wall=400 --budget warm.proxy=30
+    python bench_startup.py --record runs.jsonl       # 保存每次启动的记录
+    python bench_startup.py --replay runs.jsonl       # 离线汇总已保存的记录
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from bench_proxy import percentile
+from profile_builder import TIMING_ENV
+from runner import run
+
+DEFAULT_SHELL = "pwsh"
+DEFAULT_RUNS = 10
+DEFAULT_TIMEOUT = 60
+MODES = ("cold", "warm")
+PERCENTILES = (50, 95)
+
+
+class StartupRun:
+    """一次启动的测量结果（毫秒）；sections 为空表示 Profile 未开启计时或启动失败"""
+
+    def __init__(self, mode, wall_ms, sections=None, error=None):
+        self.mode = mode
+        self.wall_ms = wall_ms
+        self.sections = dict(sections or {})
+        self.error = error
+
+    def to_dict(self):
+        return {"mode": self.mode, "wall_ms": self.wall_ms, "sections": self.sections, "error": self.error}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["mode"], data.get("wall_ms"), data.get("sections"), data.get("error"))
+
+
+def parse_timing_line(line):
+    """'<PID> host=12.5 ssl=0.3 ...' → {"host": 12.5, "ssl": 0.3, ...}；格式不对返回 None"""
+    parts = line.split()
+    if not parts or not parts[0].isdigit():
+        return None
+    sections = {}
+    for part in parts[1:]:
+        name, sep, value = part.partition("=")
+        if not sep:
+            return None
+        try:
+            sections[name] = float(value)
+        except ValueError:
+            return None
+    return sections
+
+
+def parse_timing_log(text):
+    """解析计时日志（每次启动一行），跳过无法识别的行"""
+    return [s for s in map(parse_timing_line, text.splitlines()) if s is not None]
+
+
+def shell_command(shell):
+    """启动并立即退出的命令（加载 Profile）"""
+    if Path(shell).stem.lower() in ("pwsh", "powershell"):
+        return [shell, "-NoLogo", "-NonInteractive", "-Command", "exit"]
+    return [shell, "-l", "-c", "exit"]
+
+
+def clear_startup_caches():
+    """删除 Profile 启动时使用的缓存文件（cold 模式）"""
+    from proxy_gate import CACHE_PATH
+    from startup_cache import STATE_PATH
+    for path in (CACHE_PATH, STATE_PATH):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def launch_shell(command, env, timeout=DEFAULT_TIMEOUT):
+    """启动一次 Shell，返回 (耗时毫秒, 错误信息或 None)"""
+    result = run(command, env=env, timeout=timeout)
+    if result.not_found:
+        return None, f"找不到 {command[0]}"
+    if not result.ok:
+        return result.duration * 1000, "超时" if result.timed_out else f"退出码 {result.returncode}"
+    return result.duration * 1000, None
+
+
+def run_bench(command, runs=DEFAULT_RUNS, modes=MODES, launch=launch_shell, clear=clear_startup_caches,
+              log_path=None):
+    """
+    按模式各启动 runs 次，返回 StartupRun 列表。
+
+    参数：
+        command  : list     - shell_command() 的结果
+        launch   : callable - launch(command, env) -> (wall_ms, error)，测试时可替换
+        clear    : callable - cold 模式每次启动前调用
+        log_path : Path     - 计时日志文件，默认临时目录
+    """
+    log_path = Path(log_path or Path(tempfile.gettempdir()) / "profile_timing.log")
+    env = dict(os.environ, **{TIMING_ENV: str(log_path)})
+    results = []
+    for mode in modes:
+        if mode == "warm":
+            launch(command, env)                      # 预热，不计入
+        for _ in range(runs):
+            if mode == "cold":
+                clear()
+            try:
+                log_path.unlink()
+            except OSError:
+                pass
+            wall_ms, error = launch(command, env)
+            try:
+                timings = parse_timing_log(log_path.read_text(encoding="utf-8", errors="replace"))
+            except OSError:
+                timings = []
+            results.append(StartupRun(mode, wall_ms, timings[-1] if timings else None, error))
+    return results
+
+
+def summarize(runs):
+    """按模式汇总：{mode: {"runs": n, "errors": n, "metrics": {指标: {"p50": .., "p95": ..}}}}"""
+    summary = {}
+    for mode in dict.fromkeys(r.mode for r in runs):
+        ok = [r for r in runs if r.mode == mode and r.error is None and r.wall_ms is not None]
+        metrics = {"wall": [r.wall_ms for r in ok]}
+        for r in ok:
+            for name, ms in r.sections.items():
+                metrics.setdefault(name, []).append(ms)
+        summary[mode] = {
+            "runs": sum(1 for r in runs if r.mode == mode),
+            "errors": sum(1 for r in runs if r.mode == mode) - len(ok),
+            "metrics": {name: {f"p{p}": percentile(values, p) for p in PERCENTILES}
+                        for name, values in metrics.items()},
+        }
+    return summary
+
+
+def parse_budget(items):
+    """['warm.wall=400', 'cold.proxy=60'] → {"warm": {"wall": 400.0}, "cold": {"proxy": 60.0}}"""
+    budget = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        mode, dot, metric = key.partition(".")
+        if not sep or not dot or mode not in MODES:
+            raise ValueError(f"预算格式应为 <cold|warm>.<指标>=<毫秒>: {item}")
+        budget.setdefault(mode, {})[metric] = float(value)
+    return budget
+
+
+def check_budget(summary, budget):
+    """按 p95 检查预算，返回超出项的说明列表（为空表示通过）；有失败的启动也算不通过"""
+    problems = []
+    for mode, data in summary.items():
+        if data["errors"]:
+            problems.append(f"{mode}: {data['errors']}/{data['runs']} 次启动失败")
+        timed = len(data["metrics"]) > 1         # 除 wall 外还有分段数据
+        for metric, limit in budget.get(mode, {}).items():
+            p95 = data["metrics"].get(metric, {}).get("p95")
+            if p95 is None:
+                # 有分段数据但缺这一段：段已关闭或渲染为空，不检查
+                if metric == "wall" or not timed:
+                    problems.append(f"{mode}.{metric}: 没有数据（Profile 未开启计时？）")
+            elif p95 > limit:
+                problems.append(f"{mode}.{metric}: p95 {p95:.1f}ms > 预算 {limit:.0f}ms")
+    return problems
+
+
+def format_report(summary, budget=None):
+    """渲染分位数表（毫秒），带预算的指标在末列显示预算值"""
+    budget = budget or {}
+    header = f"{'mode':<6}{'metric':<14}{'p50':>9}{'p95':>9}{'budget':>9}"
+    lines = [header, "-" * len(header)]
+    for mode, data in summary.items():
+        for metric, values in data["metrics"].items():
+            limit = budget.get(mode, {}).get(metric)
+            lines.append(f"{mode:<6}{metric:<14}"
+                         + "".join("-".rjust(9) if values[f"p{p}"] is None else f"{values[f'p{p}']:>9.1f}"
+                                   for p in PERCENTILES)
+                         + ("" if limit is None else f"{limit:>9.0f}"))
+        lines.append(f"{mode:<6}{'(runs)':<14}{data['runs'] - data['errors']:>7}/{data['runs']}")
+    return "\n".join(lines)
+
+
+def load_runs(path):
+    with open(path, encoding="utf-8") as f:
+        return [StartupRun.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def save_runs(runs, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in runs:
+            f.write(json.dumps(r.to_dict(), ensure_ascii=False) + "\n")
+
+
+def default_budget():
+    """setup.py 顶部配置的启动预算"""
+    import setup
+    return {mode: dict(limits) for mode, limits in setup.STARTUP_BUDGET_MS.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench-startup", description="测量 Shell 启动耗时并检查预算")
+    parser.add_argument("--shell", default=DEFAULT_SHELL, help="要启动的 Shell（pwsh / powershell）")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="每种模式的启动次数")
+    parser.add_argument("--mode", default=",".join(MODES), help="cold,warm 或其中之一")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODE.METRIC=MS",
+                        help="覆盖预算（p95），如 warm.wall=400")
+    parser.add_argument("--no-budget", action="store_true", help="只测量，不检查预算")
+    parser.add_argument("--record", help="把每次启动的记录保存为 JSON Lines")
+    parser.add_argument("--replay", help="不启动 Shell，汇总已保存的记录")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        budget = {} if args.no_budget else default_budget()
+        for mode, limits in parse_budget(args.budget).items():
+            budget.setdefault(mode, {}).update(limits)
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+
+    if args.replay:
+        runs = load_runs(args.replay)
+    else:
+        modes = [m for m in args.mode.split(",") if m in MODES]
+        runs = run_bench(shell_command(args.shell), runs=args.runs, modes=modes)
+        if args.record:
+            save_runs(runs, args.record)
+
+    summary = summarize(runs)
+    problems = check_budget(summary, budget)
+    if args.json:
+        print(json.dumps({"summary": summary, "budget": budget, "problems": problems},
+                         indent=2, ensure_ascii=False))
+    else:
+        print(format_report(summary, budget))
+        for problem in problems:
+            print(f"[FAIL] {problem}")
+        if not problems:
+            print("[OK] 启动耗时在预算内")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -47,12 +47,14 @@ Write-Host "`n[3] 用户级环境变量 (对新进程生效)" -ForegroundColor Y
 $userHttpProxy = [Environment]::GetEnvironmentVariable("HTTP_PROXY", "User")
 $userHttpsProxy = [Environment]::GetEnvironmentVariable("HTTPS_PROXY", "User")
 $userAllProxy = [Environment]::GetEnvironmentVariable("ALL_PROXY", "User")
+$userNoProxy = [Environment]::GetEnvironmentVariable("NO_PROXY", "User")
 
 if ($userHttpProxy) {
     Write-Host "    ✓ 已设置" -ForegroundColor Green
     Write-Host "       HTTP_PROXY  = $userHttpProxy" -ForegroundColor Gray
     Write-Host "       HTTPS_PROXY = $userHttpsProxy" -ForegroundColor Gray
     Write-Host "       ALL_PROXY   = $userAllProxy" -ForegroundColor Gray
+    Write-Host "       NO_PROXY    = $userNoProxy" -ForegroundColor Gray
 } else {
     Write-Host "    ✗ 未设置" -ForegroundColor Yellow
 }
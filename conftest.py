@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+pytest 配置
+
+test_setup.py 是在真实 Windows 机器上运行的验证脚本（python test_setup.py），其中的 test_* 检查
+读取本机注册表、Profile 和外部程序并返回 bool，不是单元测试；不让 pytest 收集（也避免导入时改写 stdout）。
+"""
+
+collect_ignore = ["test_setup.py"]
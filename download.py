@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""
+发布文件下载：多镜像竞速 + 传输中途故障转移 + 内容哈希校验
+
+原来 install_powershell7 / setup_nerd_font 只从 github.com 下载，超时 180 / 120 秒，
+GitHub 慢或传输到一半卡住时整个运行就停在那里。
+
+- 竞速：同时向前 race_width 个镜像发请求，race_seconds 内收到字节最多（含建连时间）的胜出，
+  其余连接关闭；胜者已收到的数据直接写入文件，不浪费
+- 故障转移：传输中最近 window 秒的速率低于 min_rate，或读取超时、连接断开时，
+  改用下一个镜像，用 Range 从已下载的位置续传。续传时多取 OVERLAP 字节与已有数据比对，
+  不一致（镜像内容不同）或镜像不支持 Range 时从头下载
+- 校验：哈希在写入文件的同一遍中增量计算（不再重读文件）；给出 sha256 时完成后比对，
+  不一致则换下一个镜像从头下载，最终仍不一致抛出 DownloadError。期望值来自 GitHub Release API
+  的资产 digest（asset_sha256）或配置中固定的值
+- 缓存：给出 cache（journal.BlobStore）时以校验过的 SHA-256 为键：命中则从缓存复制（复制时同样校验，
+  损坏的缓存删除后照常下载），下载并校验通过后硬链接存入；prune_cache 按最近使用时间控制总大小
+- 没有期望哈希时只用第一个地址（官方地址）：无法校验的内容不能来自第三方镜像
+- 只剩一个镜像时不再因为慢而放弃（慢总比失败好），读取超时仍会重连续传
+- 读取：readinto 读入整个下载共用的预分配缓冲区（不为每块分配 bytes），块大小按实测速率取约
+  READ_SECONDS 秒的数据量（MIN_CHUNK ~ MAX_CHUNK）；进度由 ProgressReporter 限频输出（速度、剩余时间）
+
+镜像按制品配置（setup.py 的 DOWNLOAD_MIRRORS），URL 模板中的 {url} 为官方下载地址。
+
+使用方法:
+    from download import download
+    result = download(["https://github.com/.../x.zip", "https://mirror.example/.../x.zip"], "x.zip",
+                      sha256="ab12...")
+    print(result.url, result.sha256)
+
+    release = github_release("PowerShell/PowerShell")
+    digest = asset_sha256(release, "PowerShell-7.5.0-win-x64.zip")
+"""
+
+import collections
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from http_client import get_client
+
+RACE_WIDTH = 3                 # 同时竞速的镜像数
+RACE_SECONDS = 2.0             # 竞速时长（秒）
+MIN_RATE = 64 * 1024           # 速率下限（字节/秒），低于它时换镜像
+RATE_WINDOW = 3.0              # 计算速率的滑动窗口（秒）
+READ_TIMEOUT = 15              # 建连与单次读取超时（秒），超过视为卡住
+CHUNK = 64 * 1024              # 竞速阶段每次读取的上限；也是传输阶段的初始块大小
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 1024 * 1024
+READ_SECONDS = 0.1             # 每次 readinto 的目标耗时：块大小 ≈ 实测速率 × READ_SECONDS
+OVERLAP = 64 * 1024            # 续传时与已有数据比对的字节数
+GITHUB_API = "https://api.github.com"
+CACHE_DIR = Path(os.environ.get("DOWNLOAD_CACHE") or Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir())
+                 / "windows_env_setup" / "downloads")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    """所有镜像都失败，或内容哈希不符"""
+
+
+class DownloadResult:
+    """下载结果：url 为最终完成传输的镜像，mirrors 为依次使用过的镜像"""
+
+    def __init__(self, path, url, mirrors, size, sha256, duration, cached=False):
+        self.path = path
+        self.url = url
+        self.mirrors = mirrors
+        self.size = size
+        self.sha256 = sha256
+        self.duration = duration
+        self.cached = cached      # 取自本地缓存（url 为 None，mirrors 为空）
+
+    def __repr__(self):
+        return (f"DownloadResult(url={self.url!r}, size={self.size}, mirrors={len(self.mirrors)}, "
+                f"cached={self.cached})")
+
+
+def mirror_urls(url, templates):
+    """官方地址 + 镜像模板 → 去重后的 URL 列表（模板 "{url}" 即官方地址本身）"""
+    return list(dict.fromkeys(template.format(url=url) for template in templates))
+
+
+_releases = {}
+
+
+def github_release(repo, tag=None, client=None):
+    """GitHub Release 信息（tag 为 None 时取最新稳定版）；同一次运行内只请求一次"""
+    key = (repo, tag)
+    if key not in _releases:
+        path = f"releases/tags/{tag}" if tag else "releases/latest"
+        _releases[key] = (client or get_client()).get_json(f"{GITHUB_API}/repos/{repo}/{path}", timeout=10)
+    return _releases[key]
+
+
+def asset_sha256(release, name):
+    """Release 中资产 name 的 SHA-256（API 的 digest 字段，形如 "sha256:ab12..."）；没有时返回 None"""
+    for asset in release.get("assets", []):
+        if asset.get("name") == name:
+            algorithm, _, value = (asset.get("digest") or "").partition(":")
+            return value.lower() if algorithm == "sha256" and value else None
+    return None
+
+
+class _Racer(threading.Thread):
+    """竞速阶段的一个镜像：建连后持续读取，直到 stop 被设置或读完"""
+
+    def __init__(self, url, open_url, stop, clock):
+        super().__init__(name="download-race", daemon=True)
+        self.url = url
+        self.open_url = open_url
+        self.stop = stop
+        self.clock = clock
+        self.response = None
+        self.chunks = []
+        self.received = 0
+        self.done = False
+        self.error = None
+        self.started = clock()
+
+    def run(self):
+        try:
+            self.response = self.open_url(self.url, 0)
+            if self.stop.is_set():
+                # 竞速结束后才连上：收到 0 字节不可能胜出，主线程关闭落选者时还没有 response，这里自行关闭
+                self.close()
+                return
+            while not self.stop.is_set():
+                data = self.response.read1(CHUNK)
+                if not data:
+                    self.done = True
+                    return
+                self.chunks.append(data)
+                self.received += len(data)
+        except Exception as e:
+            self.error = e
+
+    def rate(self, now):
+        return self.received / max(now - self.started, 1e-6)
+
+    def close(self):
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+
+
+class _Output:
+    """目标文件（写入 .part，完成后改名）+ 增量哈希 + 最近 OVERLAP 字节"""
+
+    def __init__(self, dest):
+        self.dest = Path(dest)
+        self.part = self.dest.with_name(self.dest.name + ".part")
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.part, "wb")
+        self.restart()
+
+    def restart(self):
+        self.file.seek(0)
+        self.file.truncate()
+        self.hasher = hashlib.sha256()
+        self.written = 0
+        self.tail = b""
+
+    def write(self, data):
+        """data 可以是 bytes 或共用缓冲区的 memoryview（写入后即被覆盖，这里不保留引用）"""
+        self.file.write(data)
+        self.hasher.update(data)
+        self.written += len(data)
+        if len(data) >= OVERLAP:
+            self.tail = bytes(data[-OVERLAP:])
+        else:
+            self.tail = (self.tail + data)[-OVERLAP:]
+
+    def finish(self):
+        self.file.close()
+        os.replace(self.part, self.dest)
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.unlink(self.part)
+        except OSError:
+            pass
+
+
+def _content_range_start(response):
+    """206 响应的起始偏移；不是 206 返回 None"""
+    if getattr(response, "status", 200) != 206:
+        return None
+    value = response.headers.get("Content-Range", "")
+    try:
+        return int(value.split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _read_exact(response, size):
+    data = b""
+    while len(data) < size:
+        chunk = response.read1(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def download(urls, dest, sha256=None, client=None, cache=None, min_rate=MIN_RATE, race_width=RACE_WIDTH,
+             race_seconds=RACE_SECONDS, window=RATE_WINDOW, timeout=READ_TIMEOUT, progress=None,
+             clock=time.monotonic):
+    """
+    从多个镜像下载同一文件到 dest，返回 DownloadResult；全部失败抛出 DownloadError。
+
+    参数：
+        urls     : list     - 镜像 URL（按偏好顺序，竞速前 race_width 个；第一个应为官方地址）
+        sha256   : str      - 期望的内容哈希（十六进制）。None 时无法验证镜像给出的内容，
+                              只从 urls[0] 下载，不竞速也不切换到其他镜像
+        client   : HttpClient - 默认使用本次运行共享的客户端（http_client.get_client）
+        cache    : BlobStore  - 按 SHA-256 寻址的本地缓存；只在给出 sha256 时使用
+        progress : callable(done, total) - 进度回调，total 未知时为 None
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        raise ValueError("没有可用的下载地址")
+    expected = sha256.lower() if sha256 else None
+    if not expected:
+        urls = urls[:1]                        # 第三方镜像的内容只有在能校验哈希时才可信
+    start_time = clock()
+    errors = []
+    buffer = memoryview(bytearray(MAX_CHUNK))   # 传输阶段共用，续传、换镜像都不重新分配
+    if expected and cache is not None:
+        size = _from_cache(cache, expected, dest, buffer)
+        if size is not None:
+            if progress:
+                progress(size, size)
+            return DownloadResult(Path(dest), None, [], size, expected, clock() - start_time, cached=True)
+    client = client or get_client()
+
+    def open_url(url, offset):
+        # 镜像之间的故障转移由这里负责，客户端不再重试
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        return client.get(url, headers=headers, timeout=timeout, retries=0)
+
+    # ---------- 竞速 ----------
+    stop = threading.Event()
+    racers = [_Racer(url, open_url, stop, clock) for url in urls[:race_width]]
+    for racer in racers:
+        racer.start()
+    deadline = clock() + race_seconds
+    while True:
+        now = clock()
+        if any(r.done for r in racers) or not any(r.is_alive() for r in racers):
+            break
+        # 竞速时间到且已有镜像开始传输；都还没连上时最多再等 timeout 秒
+        if now >= deadline and any(r.received for r in racers) or now >= deadline + timeout:
+            break
+        time.sleep(0.02)
+    stop.set()
+    now = clock()
+    errors += [f"{r.url}: {r.error}" for r in racers if r.error is not None]
+    ranked = sorted((r for r in racers if r.error is None), key=lambda r: (r.done, r.rate(now)), reverse=True)
+    winner = ranked[0] if ranked and ranked[0].received else None
+    if winner is not None:
+        winner.join(timeout)               # 等它结束当前这次读取，chunks 不再变化
+    for racer in ranked:
+        if racer is not winner:
+            racer.close()                  # 落选者的读取线程在超时后自行结束
+    # 竞速出错的镜像不再尝试；未参加竞速的排在落选者之后
+    queue = [r.url for r in ranked if r is not winner] + urls[race_width:]
+
+    out = _Output(dest)
+    total = None
+    used = []
+    try:
+        if winner is not None:
+            response, url = winner.response, winner.url
+            for chunk in winner.chunks:
+                out.write(chunk)
+            exhausted = winner.done
+        else:
+            response, url, exhausted = None, None, False
+
+        while True:
+            if response is None:
+                if not queue:
+                    raise DownloadError("所有镜像均下载失败: " + "; ".join(errors))
+                url = queue.pop(0)
+                try:
+                    response = _resume(open_url, url, out)
+                except Exception as e:
+                    errors.append(f"{url}: {e}")
+                    response = None
+                    continue
+                exhausted = False
+            used.append(url)
+            total = _total_size(response) or total
+
+            outcome = "done" if exhausted else _pump(response, out, buffer, total, min_rate if queue else 0,
+                                                     window, progress, clock)
+            if outcome == "done":
+                if total is not None and out.written != total:
+                    outcome = f"长度不符（{out.written} / {total} 字节）"
+                elif expected and out.hasher.hexdigest() != expected:
+                    outcome = f"SHA-256 不符: {out.hasher.hexdigest()}"
+                    out.restart()
+                else:
+                    break
+            errors.append(f"{url}: {outcome}")
+            try:
+                response.close()
+            except Exception:
+                pass
+            response = None
+            if outcome.startswith(("读取失败", "长度不符")) and not queue and used.count(url) < 3:
+                queue.append(url)              # 最后一个镜像超时或断开：重连续传
+        digest = out.hasher.hexdigest()
+        out.finish()
+        if expected and cache is not None:
+            try:
+                cache.put_file(out.dest, digest)
+            except OSError:
+                pass                           # 缓存写不进去不影响本次下载
+    except BaseException:
+        out.discard()
+        if response is not None:
+            response.close()
+        raise
+    response.close()
+    if progress:
+        progress(out.written, total)
+    return DownloadResult(out.dest, url, list(dict.fromkeys(used)), out.written, digest, clock() - start_time)
+
+
+def _from_cache(cache, digest, dest, buffer):
+    """缓存中有该内容时复制到 dest（同一遍读取中校验哈希），返回字节数；没有或已损坏返回 None"""
+    source = cache.path(digest)
+    if not source.is_file():
+        return None
+    out = _Output(dest)
+    try:
+        with open(source, "rb") as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                out.write(buffer[:n])
+    except OSError:
+        out.discard()
+        return None
+    if out.hasher.hexdigest() != digest:
+        out.discard()
+        cache.remove(digest)                   # 缓存文件损坏：删除后照常下载
+        return None
+    out.finish()
+    try:
+        os.utime(source)                       # 记录最近使用时间，prune_cache 据此淘汰
+    except OSError:
+        pass
+    return out.written
+
+
+def prune_cache(cache, max_bytes=CACHE_MAX_BYTES):
+    """把缓存控制在 max_bytes 以内：从最久未使用的开始删除。返回删除的个数"""
+    entries = []
+    for digest, size in cache.digests().items():
+        try:
+            entries.append((cache.path(digest).stat().st_mtime, digest, size))
+        except OSError:
+            pass
+    entries.sort()
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, digest, size in entries:
+        if total <= max_bytes:
+            break
+        cache.remove(digest)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _total_size(response):
+    """完整文件大小：206 取 Content-Range 的总长，200 取 Content-Length"""
+    if getattr(response, "status", 200) == 206:
+        try:
+            return int(response.headers.get("Content-Range", "").rsplit("/", 1)[1])
+        except (IndexError, ValueError):
+            return None
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def _resume(open_url, url, out):
+    """从 out 已写入的位置续传（多取 OVERLAP 字节比对）；无法续传时从头开始"""
+    if out.written == 0:
+        return open_url(url, 0)
+    offset = out.written - len(out.tail)
+    response = open_url(url, offset)
+    if _content_range_start(response) == offset and _read_exact(response, len(out.tail)) == out.tail:
+        return response
+    # 不支持 Range（200 全文）或内容与已下载部分不一致：从头下载
+    response.close()
+    out.restart()
+    return open_url(url, 0)
+
+
+def _pump(response, out, buffer, total, min_rate, window, progress, clock):
+    """
+    读取直到结束。返回 "done"，或失败原因（速率低于下限 / 读取失败）。
+    min_rate 为 0 时不检查速率。
+
+    readinto 会阻塞到读满 chunk 字节（完全没有数据时由 socket 超时打断），所以块大小按上一次的
+    实测速率取约 READ_SECONDS 秒的数据量；检查速率时另以 min_rate × window / 4 为上限，
+    速率跌破下限后一次读取不会拖得比检查窗口长太多。
+    """
+    started = clock()
+    samples = collections.deque([(started, 0)])
+    received = 0
+    cap = len(buffer)
+    if min_rate:
+        cap = max(MIN_CHUNK, min(cap, int(min_rate * window / 4)))
+    chunk = min(CHUNK, cap)
+    while True:
+        read_start = clock()
+        try:
+            n = response.readinto(buffer[:chunk])
+        except Exception as e:
+            return f"读取失败: {e}"
+        if not n:
+            return "done"
+        out.write(buffer[:n])
+        received += n
+        now = clock()
+        rate = n / max(now - read_start, 1e-6)
+        chunk = int(min(max(rate * READ_SECONDS, MIN_CHUNK), cap))
+        samples.append((now, received))
+        while len(samples) > 2 and samples[1][0] <= now - window:
+            samples.popleft()
+        if progress:
+            progress(out.written, total)
+        if min_rate and now - started >= window:
+            then, before = samples[0]
+            rate = (received - before) / max(now - then, 1e-6)
+            if rate < min_rate:
+                return f"速率 {rate / 1024:.0f} KB/s 低于下限 {min_rate / 1024:.0f} KB/s"
+
+
+def _format_size(n):
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 \
+        else f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    """
+    限频的下载进度输出（作为 download 的 progress 回调）：百分比、已下载量、速度、剩余时间。
+
+    控制台中同一行每 interval 秒最多刷新一次；输出被重定向（日志）时改为每 log_interval 秒一行。
+    速度为指数滑动平均，换镜像从头下载（done 变小）时重新计算。
+
+    使用方法:
+        reporter = ProgressReporter()
+        download(urls, dest, progress=reporter)
+        reporter.finish()
+    """
+
+    def __init__(self, prefix="    ", interval=0.25, log_interval=5.0, stream=None, clock=time.monotonic):
+        self.prefix = prefix
+        self.stream = stream or sys.stdout
+        self.tty = getattr(self.stream, "isatty", lambda: False)()
+        self.interval = interval if self.tty else log_interval
+        self.clock = clock
+        self.started = clock()
+        self.speed = None
+        self.done = 0
+        self.total = None
+        self._last = (self.started, 0)        # 上次计算速度的 (时间, 字节数)
+        self._shown = None                    # 上次输出的时间
+        self._width = 0
+
+    def __call__(self, done, total):
+        now = self.clock()
+        last_time, last_done = self._last
+        if done < last_done:
+            self._last, self.speed = (now, done), None
+        elif now - last_time >= 0.2:
+            rate = (done - last_done) / (now - last_time)
+            self.speed = rate if self.speed is None else 0.3 * rate + 0.7 * self.speed
+            self._last = (now, done)
+        self.done, self.total = done, total
+        if self._shown is None or now - self._shown >= self.interval:
+            self._shown = now
+            self._show()
+
+    def line(self):
+        parts = []
+        if self.total:
+            parts.append(f"{self.done * 100 // self.total:3d}%")
+            parts.append(f"{_format_size(self.done)} / {_format_size(self.total)}")
+        else:
+            parts.append(_format_size(self.done))
+        if self.speed:
+            parts.append(f"{_format_size(self.speed)}/s")
+            if self.total and self.total > self.done:
+                parts.append(f"剩余 {_format_eta((self.total - self.done) / self.speed)}")
+        return self.prefix + "进度: " + "  ".join(parts)
+
+    def _show(self, end=""):
+        text = self.line()
+        if self.tty:
+            # 覆盖上一次的内容：不足的部分用空格补齐
+            self.stream.write("\r" + text.ljust(self._width) + end)
+            self._width = len(text)
+        else:
+            self.stream.write(text + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        """输出最终进度（平均速度）并换行"""
+        elapsed = self.clock() - self.started
+        if elapsed > 0 and self.done:
+            self.speed = self.done / elapsed
+        self._show(end="\n")
@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+"""
+整个运行共用的 HTTP 客户端：按主机保持 keep-alive 连接池 + 代理感知 + 统一超时与重试
+
+原来 get_latest_powershell_version、install_powershell7、setup_nerd_font 每次请求都
+build_opener(ProxyHandler()) 新建 opener，每个请求都要经代理重新 TCP 建连 + TLS 握手。
+
+- 连接池：按 (协议, 主机, 端口, 代理) 保留空闲连接，响应体读完后连接放回池中，下一个请求直接复用
+- 代理：HTTPS_PROXY / HTTP_PROXY 环境变量优先；未设置时读注册表 ProxyEnable + ProxyServer，
+  例外列表取 NO_PROXY，未设置时由 ProxyOverride 转换（规则同 no_proxy.py）。
+  HTTPS 经代理走 CONNECT 隧道，HTTP 经代理用绝对 URI
+- 超时：建连与单次读取统一使用 timeout（默认 DEFAULT_TIMEOUT 秒），可按请求覆盖
+- 重试：幂等请求（GET/HEAD）遇到连接错误或 429/5xx 时指数退避重试（尊重 Retry-After）；
+  复用的空闲连接已被服务端关闭时立即换新连接重发，不计入重试次数
+- 重定向：自动跟随 301/302/303/307/308（最多 MAX_REDIRECTS 次）
+- 计时：每个响应带 timing（建连 / 首字节 / 总耗时、是否复用连接、重试与重定向次数），
+  响应结束时依次调用 client.listeners 中的回调，供追踪与下载统计使用
+
+使用方法:
+    from http_client import get_client
+    client = get_client()
+    data = client.get_json("https://api.github.com/repos/PowerShell/PowerShell/releases/latest")
+    with client.get(url) as resp:
+        body = resp.read()
+    print(resp.timing)
+"""
+
+import http.client
+import ipaddress
+import json
+import os
+import ssl
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from no_proxy import translate_proxy_override
+from proxy_probe import parse_proxy_server
+
+DEFAULT_TIMEOUT = 15           # 建连与单次读取超时（秒）
+RETRIES = 2                    # 幂等请求的最大重试次数
+BACKOFF = 0.5                  # 首次重试前等待（秒），之后每次翻倍
+MAX_BACKOFF = 8.0
+MAX_REDIRECTS = 5
+POOL_SIZE = 4                  # 每个主机最多保留的空闲连接数
+DRAIN_LIMIT = 64 * 1024        # 重定向 / 重试前读完不超过这么大的响应体以复用连接，更大的直接断开
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+USER_AGENT = "windows_env_setup"
+
+# 复用的空闲连接在发送或读取响应头时出现这些错误，说明服务端已关闭它
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                 ConnectionAbortedError, BrokenPipeError)
+
+
+class HttpError(Exception):
+    """响应状态码 >= 400（重试用尽后）"""
+
+    def __init__(self, status, reason, url):
+        super().__init__(f"HTTP {status} {reason}: {url}")
+        self.status = status
+        self.reason = reason
+        self.url = url
+
+
+# ---------- 代理 ----------
+
+def _endpoint(value):
+    """
+    代理设置 → 用于本客户端请求的 HTTP 代理 (host, port)；没有可用的 HTTP 代理时返回 None。
+
+    支持 (host, port)、"host:port"、"http://host:port" 及注册表 ProxyServer 的分协议写法
+    "http=a:1;https=b:2;socks=c:3"：请求几乎都是 HTTPS，优先取 https=，其次不分协议的项，最后 http=。
+    socks= 项和 socks5:// 地址是 SOCKS 代理，不能发送 HTTP CONNECT，跳过。
+    """
+    if isinstance(value, tuple):
+        return value
+    found = {}
+    for part in (value or "").split(";"):
+        kind, sep, address = part.strip().rpartition("=") if "=" in part else ("", "", part.strip())
+        kind = kind.strip().lower()
+        scheme = address.split("://", 1)[0].lower() if "://" in address else ""
+        if kind.startswith("socks") or scheme.startswith("socks"):
+            continue
+        endpoints = parse_proxy_server(address)
+        if endpoints and kind in ("https", "", "http"):
+            found.setdefault(kind, endpoints[0])
+    for kind in ("https", "", "http"):
+        if kind in found:
+            return found[kind]
+    return None
+
+
+def detect_proxy(environ=None, registry=None):
+    """
+    探测代理，返回 (endpoint, no_proxy)：endpoint 为 (host, port) 或 None（直连），
+    no_proxy 为例外条目列表。
+
+    HTTPS_PROXY / HTTP_PROXY 环境变量优先；都未设置（或只有 SOCKS 地址）时读注册表 Internet Settings
+    （ProxyEnable=1 时取 ProxyServer 中的 HTTP 代理，规则见 _endpoint，例外列表由 ProxyOverride 转换）。
+    """
+    environ = os.environ if environ is None else environ
+    no_proxy = [e.strip() for e in (environ.get("NO_PROXY") or environ.get("no_proxy") or "").split(",")
+                if e.strip()]
+    for name in ("HTTPS_PROXY", "https_proxy", "HTTP_PROXY", "http_proxy"):
+        endpoint = _endpoint(environ.get(name))
+        if endpoint:
+            return endpoint, no_proxy
+    try:
+        from registry import HKCU, INTERNET_SETTINGS_KEY, get_registry
+        values = (registry or get_registry()).values(HKCU, INTERNET_SETTINGS_KEY)
+    except (ImportError, OSError):
+        return None, no_proxy
+    endpoint = _endpoint(values.get("ProxyServer")) if values.get("ProxyEnable") else None
+    if endpoint and not no_proxy:
+        no_proxy = translate_proxy_override(values.get("ProxyOverride", ""))
+    return endpoint, no_proxy
+
+
+def bypass_proxy(host, no_proxy):
+    """host 是否匹配例外列表（主机名、.后缀、IP、CIDR、*）"""
+    host = host.lower().strip("[]")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    for entry in no_proxy:
+        entry = entry.lower().strip()
+        if entry == "*":
+            return True
+        if address is not None and "/" in entry:
+            try:
+                if address in ipaddress.ip_network(entry, strict=False):
+                    return True
+            except ValueError:
+                pass
+            continue
+        suffix = entry if entry.startswith(".") else "." + entry
+        if host == entry.lstrip(".") or host.endswith(suffix):
+            return True
+    return False
+
+
+# ---------- 计时与响应 ----------
+
+class Timing:
+    """
+    一次请求的计时（秒）：
+        connect   - 建连耗时总和（含代理 CONNECT 与 TLS 握手），全部复用连接时为 0
+        ttfb      - 从开始请求到收到最终响应头（含重试等待与重定向）
+        total     - 从开始请求到响应体读完或关闭
+        reused    - 最终响应是否走的复用连接
+        attempts  - 实际发送次数（含重试与重定向）
+        redirects - 跟随的重定向次数
+    """
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.status = None
+        self.connect = 0.0
+        self.ttfb = None
+        self.total = None
+        self.reused = False
+        self.attempts = 0
+        self.redirects = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def to_dict(self):
+        return {k: v for k, v in vars(self).items() if k != "started"}
+
+    def __repr__(self):
+        ttfb = f"{self.ttfb * 1000:.0f}ms" if self.ttfb is not None else "-"
+        total = f"{self.total * 1000:.0f}ms" if self.total is not None else "-"
+        return (f"Timing({self.method} {self.url} status={self.status} connect={self.connect * 1000:.0f}ms "
+                f"ttfb={ttfb} total={total} reused={self.reused})")
+
+
+class Response:
+    """
+    响应：status / reason / headers / url（重定向后的最终地址）/ timing。
+    读完响应体后连接自动放回连接池；未读完就 close() 时断开连接（剩余数据无法复用）。
+    """
+
+    def __init__(self, client, key, conn, raw, url, timing):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._raw = raw
+        self._released = False
+        self.final = False               # 重定向与重试的中间响应不计时、不通知 listeners
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.url = url
+        self.timing = timing
+
+    def read(self, amt=None):
+        data = self._raw.read(amt)
+        self._count(len(data), not data and amt != 0)
+        return data
+
+    def read1(self, n=-1):
+        data = self._raw.read1(n)
+        self._count(len(data), not data and n != 0)
+        return data
+
+    def readinto(self, buffer):
+        n = self._raw.readinto(buffer)
+        self._count(n, not n and len(buffer) > 0)
+        return n
+
+    def _count(self, n, eof):
+        if self.final:
+            self.timing.bytes += n
+        if eof or self._raw.isclosed():
+            self._release(reuse=True)
+
+    def json(self):
+        return json.loads(self.read().decode("utf-8"))
+
+    def _drain(self):
+        """丢弃小响应体以复用连接（重定向 / 重试前）"""
+        length = self._raw.length
+        if length is not None and length <= DRAIN_LIMIT:
+            try:
+                self.read()
+                return
+            except (OSError, http.client.HTTPException):
+                pass
+        self.close()
+
+    def _release(self, reuse):
+        if self._released:
+            return
+        self._released = True
+        if reuse and self._raw.isclosed() and not self._raw.will_close:
+            self._client._put(self._key, self._conn)
+        else:
+            self._raw.close()
+            self._conn.close()
+        if self.final:
+            self.timing.total = time.monotonic() - self.timing.started
+            self._client._notify(self.timing)
+
+    def close(self):
+        self._release(reuse=self._raw.isclosed())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"Response({self.status} {self.url})"
+
+
+# ---------- 客户端 ----------
+
+class HttpClient:
+    """
+    带连接池的 HTTP/1.1 客户端（线程安全：连接从池中取出后只被一个线程使用）。
+
+    参数：
+        proxy    : "auto" - 自动探测（detect_proxy）；None 直连；"host:port" 或 (host, port) 指定代理
+        no_proxy : list   - 例外列表；proxy="auto" 时默认取探测结果
+        timeout  : float  - 建连与单次读取超时（秒）
+        retries  : int    - 幂等请求的最大重试次数
+        backoff  : float  - 首次重试前等待（秒），之后每次翻倍，不超过 MAX_BACKOFF
+    """
+
+    def __init__(self, proxy="auto", no_proxy=None, timeout=DEFAULT_TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+                 pool_size=POOL_SIZE, sleep=time.sleep):
+        if proxy == "auto":
+            proxy, detected = detect_proxy()
+            no_proxy = detected if no_proxy is None else no_proxy
+        self.proxy = _endpoint(proxy) if proxy else None
+        self.no_proxy = list(no_proxy or [])
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.sleep = sleep
+        self.listeners = []           # callable(Timing)：每个响应结束（读完或关闭）时调用
+        self._pools = {}              # (scheme, host, port, proxy) → [空闲连接]
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    # ----- 连接池 -----
+
+    def proxy_for(self, url):
+        """该 URL 使用的代理 (host, port)；直连返回 None"""
+        host = urlsplit(url).hostname or ""
+        if self.proxy is None or bypass_proxy(host, self.no_proxy):
+            return None
+        return self.proxy
+
+    def _context(self):
+        with self._lock:
+            if self._ssl_context is None:          # 加载系统证书较慢，整个运行只做一次
+                self._ssl_context = ssl.create_default_context()
+            return self._ssl_context
+
+    def _new_connection(self, key, timeout):
+        scheme, host, port, proxy = key
+        if proxy is None:
+            if scheme == "https":
+                return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context())
+            return http.client.HTTPConnection(host, port, timeout=timeout)
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(proxy[0], proxy[1], timeout=timeout, context=self._context())
+            conn.set_tunnel(host, port)
+            return conn
+        return http.client.HTTPConnection(proxy[0], proxy[1], timeout=timeout)
+
+    def _get(self, key):
+        with self._lock:
+            idle = self._pools.get(key)
+            return idle.pop() if idle else None
+
+    def _put(self, key, conn):
+        with self._lock:
+            idle = self._pools.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def idle_connections(self):
+        """当前池中的空闲连接数"""
+        with self._lock:
+            return sum(len(idle) for idle in self._pools.values())
+
+    def close(self):
+        """关闭全部空闲连接"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+    def _notify(self, timing):
+        for listener in list(self.listeners):
+            try:
+                listener(timing)
+            except Exception:
+                pass
+
+    # ----- 请求 -----
+
+    def _send(self, method, url, headers, body, timeout, timing):
+        """发送一次请求（复用的连接已失效时换新连接重发一次），返回 Response"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"不支持的 URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        proxy = self.proxy_for(url)
+        key = (parts.scheme, parts.hostname, port, proxy)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        if proxy is not None and parts.scheme == "http":
+            target = url.split("#", 1)[0]           # 普通 HTTP 代理：绝对 URI
+        while True:
+            conn = self._get(key)
+            reused = conn is not None
+            timing.attempts += 1
+            try:
+                if reused:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                else:
+                    conn = self._new_connection(key, timeout)
+                    connect_start = time.monotonic()
+                    conn.connect()
+                    timing.connect += time.monotonic() - connect_start
+                conn.request(method, target, body=body, headers=headers)
+                raw = conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue                          # 服务端已关闭空闲连接：换新连接重发
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            timing.reused = reused
+            return Response(self, key, conn, raw, url, timing)
+
+    def request(self, method, url, headers=None, body=None, timeout=None, retries=None, check=True,
+                redirects=MAX_REDIRECTS):
+        """
+        发送请求，返回 Response（调用方负责读完或关闭）。
+
+        参数：
+            timeout : float - 覆盖客户端的默认超时
+            retries : int   - 覆盖客户端的重试次数；非幂等方法不重试
+            check   : bool  - 状态码 >= 400 时抛出 HttpError
+        连接错误在重试用尽后原样抛出（OSError / http.client.HTTPException）。
+        """
+        method = method.upper()
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        if method not in IDEMPOTENT:
+            retries = 0
+        sent = {"User-Agent": USER_AGENT}
+        sent.update(headers or {})
+        timing = Timing(method, url)
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, url, sent, body, timeout, timing)
+            except (OSError, http.client.HTTPException):
+                if attempt >= retries:
+                    raise
+                self.sleep(self._delay(attempt, None))
+                attempt += 1
+                continue
+            timing.status = response.status
+            if response.status in REDIRECT_STATUS and redirects > timing.redirects \
+                    and response.headers.get("Location"):
+                location = urljoin(url, response.headers["Location"])
+                response._drain()
+                if response.status == 303 or (response.status in (301, 302) and method not in ("GET", "HEAD")):
+                    method, body = "GET", None
+                    sent.pop("Content-Type", None)
+                if urlsplit(location).hostname != urlsplit(url).hostname:
+                    sent.pop("Authorization", None)
+                url = location
+                timing.redirects += 1
+                continue
+            if response.status in RETRY_STATUS and attempt < retries:
+                delay = self._delay(attempt, response.headers.get("Retry-After"))
+                response._drain()
+                self.sleep(delay)
+                attempt += 1
+                continue
+            timing.ttfb = time.monotonic() - timing.started
+            timing.url = url
+            response.final = True
+            if response._raw.isclosed():            # 无响应体（HEAD、204、Content-Length: 0）
+                response._release(reuse=True)
+            if check and response.status >= 400:
+                response._drain()
+                raise HttpError(response.status, response.reason, url)
+            return response
+
+    def _delay(self, attempt, retry_after):
+        delay = min(self.backoff * 2 ** attempt, MAX_BACKOFF)
+        if retry_after and retry_after.strip().isdigit():
+            delay = min(max(delay, int(retry_after)), MAX_BACKOFF)
+        return delay
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        """GET 并解析 JSON 响应体"""
+        headers = {"Accept": "application/json"}
+        headers.update(kwargs.pop("headers", None) or {})
+        with self.get(url, headers=headers, **kwargs) as response:
+            return response.json()
+
+
+# ---------- 每次运行共享的实例 ----------
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """返回本次运行共享的 HttpClient（首次调用时探测代理并创建，连接池在各步骤间共用）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
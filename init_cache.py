@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+重量级 Shell 集成（starship / zoxide / conda / fnm）的初始化脚本缓存
+
+这些工具的标准用法是在 Profile 里每次启动都运行一次 `<tool> init powershell` 再执行其输出，
+仅启动工具进程就要几十到上千毫秒（conda 约 1.3 秒）。这里改为：
+1. 缓存：把 init 输出保存到磁盘，Profile 直接 dot-source 缓存文件，不启动工具；
+   只有工具可执行文件的路径、大小或修改时间变化（升级/换位置）时才重新生成
+2. 延迟加载：conda / fnm 只在首次调用（conda、fnm、node、npm、npx）时初始化
+
+    工具       方式                       init 命令
+    starship   缓存，启动时加载           starship init powershell --print-full-init
+    zoxide     缓存，启动时加载           zoxide init powershell
+    conda      缓存，首次调用 conda 时加载 conda shell.powershell hook
+    fnm        首次调用时实时运行         fnm env --use-on-cd --shell powershell
+
+fnm 不缓存：`fnm env` 的输出包含每个会话独立的 multishell 目录，复用会让多个终端共享同一版本链接。
+
+缓存戳格式为 "路径|字节数|LastWriteTimeUtc.Ticks"，与 Profile 中 Get-InitCache 的计算方式一致
+（比较时不区分大小写，同 PowerShell 的 -ne）。Git Bash 中没有不启动子进程就能取文件大小的办法，
+__init_cache 用缓存首行记录的路径加 `-nt`（可执行文件比缓存新）判断；setup.py 每次运行时
+还会按完整缓存戳预先刷新两种 Shell 的缓存。
+
+缓存目录：%LOCALAPPDATA%\\windows_env_setup\\init
+
+使用方法:
+    python init_cache.py            # 检测工具、刷新缓存并输出生成的 PowerShell 片段
+    python init_cache.py --bash     # 输出 Git Bash 片段
+"""
+
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from runner import run
+
+CACHE_DIR = Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()) / "windows_env_setup" / "init"
+
+# .NET DateTime.Ticks（100ns，自 0001-01-01 起）与 Unix 纪元之间的差值
+_EPOCH_TICKS = 621355968000000000
+
+FRESH = "fresh"               # 缓存戳一致，未重新生成
+REGENERATED = "regenerated"   # 已重新运行 init 命令写入缓存
+FAILED = "failed"             # init 命令失败或无输出
+
+BASH_BLOCK_START = "# >>> windows_env_setup shell integrations >>>"
+BASH_BLOCK_END = "# <<< windows_env_setup shell integrations <<<"
+
+
+class Integration:
+    """
+    一个需要在 Profile 中初始化的工具。
+
+    参数：
+        name            : str   - 工具名（缓存文件名）
+        commands        : tuple - 用 which 查找的命令名
+        powershell_args : tuple - 生成 PowerShell 初始化脚本的参数
+        bash_args       : tuple - 生成 Bash 初始化脚本的参数
+        triggers        : tuple - 延迟加载的触发命令；为空表示启动时加载
+        cached          : bool  - False 时每次初始化都实时运行（输出与会话相关）
+        search          : tuple - PATH 中找不到时依次尝试的路径（可含环境变量和 ~）
+    """
+
+    def __init__(self, name, commands, powershell_args, bash_args, triggers=(), cached=True, search=()):
+        self.name = name
+        self.commands = tuple(commands)
+        self.powershell_args = tuple(powershell_args)
+        self.bash_args = tuple(bash_args)
+        self.triggers = tuple(triggers)
+        self.cached = cached
+        self.search = tuple(search)
+
+    @property
+    def lazy(self):
+        return bool(self.triggers)
+
+    def args(self, shell):
+        return self.powershell_args if shell == "powershell" else self.bash_args
+
+
+INTEGRATIONS = [
+    Integration("starship", ["starship"],
+                ["init", "powershell", "--print-full-init"], ["init", "bash", "--print-full-init"]),
+    Integration("zoxide", ["zoxide"], ["init", "powershell"], ["init", "bash"]),
+    Integration("conda", ["conda"], ["shell.powershell", "hook"], ["shell.bash", "hook"],
+                triggers=["conda"],
+                search=[r"~\miniconda3\Scripts\conda.exe", r"~\anaconda3\Scripts\conda.exe",
+                        r"%LOCALAPPDATA%\miniconda3\Scripts\conda.exe",
+                        r"%ProgramData%\miniconda3\Scripts\conda.exe"]),
+    Integration("fnm", ["fnm"], ["env", "--use-on-cd", "--shell", "powershell"],
+                ["env", "--use-on-cd", "--shell", "bash"],
+                triggers=["fnm", "node", "npm", "npx"], cached=False),
+]
+
+
+def find_executable(integration, which=shutil.which):
+    """查找工具可执行文件：先查 PATH（conda 在 PATH 中常是 conda.bat，取同目录的 conda.exe 更快）"""
+    for command in integration.commands:
+        path = which(command)
+        if path:
+            exe = Path(path).with_suffix(".exe")
+            return str(exe) if exe.is_file() else path
+    for candidate in integration.search:
+        path = Path(os.path.expandvars(os.path.expanduser(candidate)))
+        if path.is_file():
+            return str(path)
+    return None
+
+
+def detect(integrations=INTEGRATIONS, which=shutil.which):
+    """返回已安装工具的 [(Integration, 可执行文件路径)]"""
+    detected = []
+    for integration in integrations:
+        exe = find_executable(integration, which)
+        if exe:
+            detected.append((integration, exe))
+    return detected
+
+
+def binary_stamp(path):
+    """可执行文件的缓存戳："路径|字节数|LastWriteTimeUtc.Ticks"，文件不存在返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}|{st.st_size}|{st.st_mtime_ns // 100 + _EPOCH_TICKS}"
+
+
+def msys_path(path):
+    r"""Windows 路径 → Git Bash 路径（C:\Users\a → /c/Users/a）"""
+    path = str(path).replace("\\", "/")
+    if len(path) >= 2 and path[1] == ":":
+        path = f"/{path[0].lower()}{path[2:]}"
+    return path
+
+
+def cache_paths(integration, shell, cache_dir=CACHE_DIR):
+    """返回 (缓存文件, 缓存戳文件)"""
+    cache = Path(cache_dir) / f"{integration.name}.{'ps1' if shell == 'powershell' else 'sh'}"
+    return cache, Path(f"{cache}.stamp")
+
+
+def refresh_cache(integration, exe, shell, cache_dir=CACHE_DIR, run=run):
+    """
+    缓存戳变化（或缓存缺失）时重新运行 init 命令写入缓存。
+
+    参数：
+        integration : Integration
+        exe         : str      - 可执行文件路径
+        shell       : str      - "powershell" 或 "bash"
+        run         : callable - run(args) -> CommandResult（测试时可替换）
+
+    返回 FRESH / REGENERATED / FAILED。
+    """
+    cache, stamp_path = cache_paths(integration, shell, cache_dir)
+    stamp = binary_stamp(exe)
+    if stamp is None:
+        return FAILED
+    try:
+        if cache.is_file() and stamp_path.read_text(encoding="utf-8").lower() == stamp.lower():
+            return FRESH
+    except OSError:
+        pass
+    result = run([exe, *integration.args(shell)])
+    if not result.ok or not result.stdout.strip():
+        return FAILED
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    if shell == "powershell":
+        # 带 BOM：Windows PowerShell 5.x 按 ANSI 解码无 BOM 的脚本
+        cache.write_text(result.stdout, encoding="utf-8-sig")
+    else:
+        # 首行记录可执行文件路径，Bash 中 __init_cache 据此判断路径是否变化
+        with open(cache, "w", encoding="utf-8", newline="\n") as f:
+            f.write(f"# {msys_path(exe)}\n" + result.stdout.replace("\r", ""))
+    stamp_path.write_text(stamp, encoding="utf-8")
+    return REGENERATED
+
+
+def _ps_quote(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _ps_array(args):
+    return "@(" + ",".join(_ps_quote(a) for a in args) + ")"
+
+
+_PS_HELPER = r'''# ========== Shell 集成（init 输出缓存，工具升级后自动重新生成；源码见 init_cache.py）==========
+function Get-InitCache($Name, $Exe, [string[]]$InitArgs) {{
+    $cache = Join-Path {cache_dir} "$Name.ps1"
+    $item = Get-Item -LiteralPath $Exe -ErrorAction SilentlyContinue
+    if (-not $item) {{ return }}
+    $stamp = "$Exe|$($item.Length)|$($item.LastWriteTimeUtc.Ticks)"
+    $old = if (Test-Path "$cache.stamp") {{ [IO.File]::ReadAllText("$cache.stamp") }}
+    if ($old -ne $stamp -or -not (Test-Path $cache)) {{
+        $text = & $Exe @InitArgs | Out-String
+        if (-not $text.Trim()) {{ return }}
+        $null = New-Item -ItemType Directory -Force (Split-Path $cache)
+        [IO.File]::WriteAllText($cache, $text, [Text.UTF8Encoding]::new($true))
+        [IO.File]::WriteAllText("$cache.stamp", $stamp)
+    }}
+    $cache
+}}
+'''
+
+
+def render_powershell(detected, cache_dir=CACHE_DIR):
+    """生成 PowerShell Profile 片段；没有检测到工具时返回空字符串"""
+    if not detected:
+        return ""
+    lines = [_PS_HELPER.format(cache_dir=_ps_quote(cache_dir))]
+    for integration, exe in detected:
+        args = _ps_array(integration.powershell_args)
+        if integration.cached:
+            load = f"if ($initScript = Get-InitCache {integration.name} {_ps_quote(exe)} {args}) {{ . $initScript }}"
+        else:
+            load = f"& {_ps_quote(exe)} {' '.join(map(_ps_quote, integration.powershell_args))} | Out-String | Invoke-Expression"
+        if not integration.lazy:
+            lines.append(load)
+            continue
+        # 延迟加载：先删除全部桩函数，再初始化，最后把本次调用交给真正的命令
+        init = f"Initialize-{integration.name.capitalize()}"
+        stubs = ", ".join(f"Function:\\{t}" for t in integration.triggers)
+        lines.append(f"function {init} {{ Remove-Item {stubs} -ErrorAction SilentlyContinue; {load} }}")
+        for trigger in integration.triggers:
+            lines.append(f"function {trigger} {{ {init}; & {trigger} @args }}")
+    return "\n".join(lines) + "\n"
+
+
+_BASH_HELPER = '''# 源码见 init_cache.py：缓存 init 输出，可执行文件路径变化或比缓存新时重新生成
+__init_cache() {{
+    local cache={cache_dir}/$1.sh exe=$2 first= out
+    shift 2
+    [ -s "$cache" ] && read -r first < "$cache"
+    if [ "$first" != "# $exe" ] || [ "$exe" -nt "$cache" ]; then
+        out=$("$exe" "$@") && [ -n "$out" ] || return
+        mkdir -p {cache_dir} && printf '# %s\\n%s\\n' "$exe" "${{out//$'\\r'/}}" > "$cache" || return
+    fi
+    . "$cache"
+}}
+'''
+
+
+def render_bash(detected, cache_dir=CACHE_DIR):
+    """生成 Git Bash .bash_profile 片段（含首尾标记）；没有检测到工具时返回空字符串"""
+    if not detected:
+        return ""
+    lines = [BASH_BLOCK_START, _BASH_HELPER.format(cache_dir=shlex.quote(msys_path(cache_dir))).rstrip("\n")]
+    for integration, exe in detected:
+        exe = shlex.quote(msys_path(exe))
+        args = " ".join(shlex.quote(a) for a in integration.bash_args)
+        if integration.cached:
+            load = f"__init_cache {integration.name} {exe} {args}"
+        else:
+            load = f"eval \"$({exe} {args} | tr -d '\\r')\""
+        if not integration.lazy:
+            lines.append(load)
+            continue
+        init = f"__init_{integration.name}"
+        lines.append(f"{init}() {{ unset -f {' '.join(integration.triggers)} {init}; {load}; }}")
+        for trigger in integration.triggers:
+            lines.append(f"{trigger}() {{ {init}; {trigger} \"$@\"; }}")
+    lines.append(BASH_BLOCK_END)
+    return "\n".join(lines) + "\n"
+
+
+def replace_bash_block(content, block, start_marker=BASH_BLOCK_START, end_marker=BASH_BLOCK_END):
+    """把 content 中旧的受管理片段替换为 block（block 为空则删除）；没有旧片段时追加到末尾"""
+    start = content.find(start_marker)
+    end = content.find(end_marker, start)
+    if start != -1 and end != -1:
+        end += len(end_marker)
+        if content[end:end + 1] == "\n":
+            end += 1
+        return content[:start] + block + content[end:]
+    if not block:
+        return content
+    return content.rstrip("\n") + "\n\n" + block if content.strip() else block
+
+
+def refresh_all(detected, shells=("powershell", "bash"), cache_dir=CACHE_DIR):
+    """为所有需要缓存的工具刷新缓存，返回 {(工具名, shell): 状态}"""
+    statuses = {}
+    for integration, exe in detected:
+        if not integration.cached:
+            continue
+        for shell in shells:
+            statuses[(integration.name, shell)] = refresh_cache(integration, exe, shell, cache_dir)
+    return statuses
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    shell = "bash" if "--bash" in argv else "powershell"
+    detected = detect()
+    for (name, _), status in refresh_all(detected, shells=(shell,)).items():
+        print(f"# {name}: {status}", file=sys.stderr)
+    print(render_bash(detected) if shell == "bash" else render_powershell(detected), end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+回滚日志：setup.py 每次运行对文件和注册表的修改都先记下修改前的内容，可整体撤销
+
+- 文件：写入前把原文件放入按内容寻址的存储（blobs\\ab\\ab12...，SHA-256），日志只记哈希。
+  同样的内容只存一份（跨多次运行；多个用户把 JOURNAL_STORE 指向同一目录时跨用户）。
+  与存储在同一卷时用硬链接代替复制：新内容写入临时文件后 os.replace 到原路径，
+  原文件的数据留在硬链接里，不需要复制；跨卷或文件系统不支持时才复制
+- 注册表：Registry.flush() 写入前把每个值的旧值（不存在为 null）交给日志
+- 撤销：从指定的运行到最新一次运行，每个文件 / 注册表值取最早记录的旧值，一遍恢复：
+  文件用临时文件 + os.replace 原子写回（不用硬链接，免得之后原地修改文件时改坏存储），
+  原来不存在的文件删除，注册表值经 Registry 每个键一次写入。撤销本身也记为一次运行，可以再撤销
+- 清理：存储超过上限时从最旧的运行开始删除日志，再删除不再被引用的内容
+
+目录（默认 %LOCALAPPDATA%\\windows_env_setup\\journal，环境变量 JOURNAL_STORE 可改）:
+    runs\\20250101-120000-1234.json   每次运行一个日志
+    blobs\\ab\\ab12...                 修改前的文件内容
+
+使用方法:
+    python journal.py list
+    python journal.py undo [<运行 ID>]        # 默认撤销最近一次运行
+    python journal.py prune --max-mb 64
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+STORE_DIR = Path(os.environ.get("JOURNAL_STORE") or Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir())
+                 / "windows_env_setup" / "journal")
+MAX_STORE_BYTES = 64 * 1024 * 1024
+VERSION = 1
+
+
+def atomic_write(path, data):
+    """写入临时文件后 os.replace：原文件的 inode（可能被存储硬链接）不会被原地修改"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobStore:
+    """按内容寻址的文件存储（SHA-256），同一内容只存一份"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.linked = 0          # 本实例以硬链接存入的个数
+        self.copied = 0
+
+    def path(self, digest):
+        return self.blobs / digest[:2] / digest
+
+    def has(self, digest):
+        return self.path(digest).is_file()
+
+    def put_file(self, path, digest=None, link=True):
+        """
+        存入文件，返回哈希；同一卷上用硬链接，否则复制。digest 已知时（如下载时已算出）不再读取文件。
+        link=False 时总是复制：文件之后会被原地改写（不是先写临时文件再替换）时，硬链接会一起被改掉。
+        """
+        digest = digest or _file_digest(path)
+        target = self.path(digest)
+        if target.is_file():
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if not link:
+                raise OSError("copy requested")
+            os.link(path, tmp)
+            self.linked += 1
+        except OSError:                       # 跨卷、FAT32、无权限，或要求复制
+            shutil.copyfile(path, tmp)
+            self.copied += 1
+        os.replace(tmp, target)
+        return digest
+
+    def put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.has(digest):
+            atomic_write(self.path(digest), data)
+            self.copied += 1
+        return digest
+
+    def read(self, digest):
+        return self.path(digest).read_bytes()
+
+    def digests(self):
+        """存储中的全部内容：{哈希: 字节数}"""
+        result = {}
+        if self.blobs.is_dir():
+            for path in self.blobs.glob("*/*"):
+                if not path.name.endswith(".tmp"):
+                    result[path.name] = path.stat().st_size
+        return result
+
+    def remove(self, digest):
+        try:
+            self.path(digest).unlink()
+        except OSError:
+            pass
+
+
+def _reg_value(entry):
+    """注册表 (value, type) → JSON（REG_BINARY 存十六进制）"""
+    if entry is None:
+        return None
+    value, value_type = entry
+    return {"hex": value.hex(), "type": value_type} if isinstance(value, bytes) else {"value": value, "type": value_type}
+
+
+def _reg_entry(item):
+    if item is None:
+        return None
+    return (bytes.fromhex(item["hex"]) if "hex" in item else item["value"]), item["type"]
+
+
+def _encode(text, encoding, newline):
+    if newline is None:
+        newline = os.linesep
+    if newline != "\n":
+        text = text.replace("\n", newline)
+    return text.encode(encoding)
+
+
+def new_run_id(clock=time.time):
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(clock())) + f"-{os.getpid()}"
+
+
+class Journal:
+    """
+    一次运行的修改日志：每个文件 / 注册表值只记第一次修改前的内容。
+    每次记录后立即写回日志文件，运行中途崩溃也能撤销已做的修改。
+    """
+
+    def __init__(self, store=STORE_DIR, run_id=None, description="setup.py", clock=time.time):
+        self.store = BlobStore(store)
+        self.runs = Path(store) / "runs"
+        self.run_id = run_id or new_run_id(clock)
+        suffix = 1
+        while run_id is None and self.path.exists():        # 同一秒内同一进程的多次运行
+            self.run_id = f"{new_run_id(clock)}.{suffix}"
+            suffix += 1
+        self.data = {"version": VERSION, "id": self.run_id, "description": description, "started": clock(),
+                     "files": [], "registry": []}
+        self._files = set()
+        self._values = set()
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self.runs / f"{self.run_id}.json"
+
+    def _save(self):
+        atomic_write(self.path, json.dumps(self.data, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    def record_file(self, path, external=False):
+        """
+        记录文件修改前的内容（不存在记为 null）；同一路径只记第一次。
+        external=True 表示文件将由外部程序（git / npm / scoop）改写，可能原地写入，原内容复制保存不用硬链接。
+        """
+        path = Path(path).absolute()
+        with self._lock:
+            if os.path.normcase(path) in self._files:
+                return
+            before = self.store.put_file(path, link=not external) if path.is_file() else None
+            self._files.add(os.path.normcase(path))
+            self.data["files"].append({"path": str(path), "before": before})
+            self._save()
+
+    def record_registry(self, root, key, befores):
+        """记录注册表值修改前的内容：befores 为 {值名: (value, type) 或 None}"""
+        with self._lock:
+            new = [(name, entry) for name, entry in befores.items()
+                   if (root, key.lower(), name) not in self._values]
+            if not new:
+                return
+            for name, entry in new:
+                self._values.add((root, key.lower(), name))
+                self.data["registry"].append({"root": root, "key": key, "name": name, "before": _reg_value(entry)})
+            self._save()
+
+    def write_bytes(self, path, data):
+        """先记录再原子写入；内容没有变化时不写也不记"""
+        path = Path(path)
+        try:
+            if path.read_bytes() == data:
+                return False
+        except OSError:
+            pass
+        self.record_file(path)
+        atomic_write(path, data)
+        return True
+
+    def write_text(self, path, text, encoding="utf-8", newline=None):
+        """同 Path.write_text；newline 为 None 时按平台换行（与 open(..., "w") 一致）"""
+        return self.write_bytes(path, _encode(text, encoding, newline))
+
+    def append_text(self, path, text, encoding="utf-8", newline=None):
+        """同 open(path, "a")，但整个文件原子重写，原内容作为修改前的内容保存"""
+        try:
+            existing = Path(path).read_bytes()
+        except FileNotFoundError:
+            existing = b""
+        return self.write_bytes(path, existing + _encode(text, encoding, newline))
+
+    def remove(self, path):
+        path = Path(path)
+        if path.exists():
+            self.record_file(path)
+            path.unlink()
+
+
+def load_run(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_runs(store=STORE_DIR):
+    """全部运行日志，按时间从旧到新"""
+    runs = []
+    for path in sorted((Path(store) / "runs").glob("*.json")):
+        try:
+            runs.append(load_run(path))
+        except (OSError, ValueError):
+            continue
+    return sorted(runs, key=lambda r: (r.get("started", 0), r["id"]))
+
+
+def undo(run_id=None, store=STORE_DIR, registry=None, clock=time.time):
+    """
+    撤销 run_id（默认最近一次运行）及其后的全部运行，恢复到该次运行之前的状态。
+    返回记录撤销操作的 Journal（撤销本身也可以再撤销）。
+    """
+    runs = [r for r in list_runs(store) if not r.get("undone")]
+    if not runs:
+        raise ValueError("没有可撤销的运行")
+    ids = [r["id"] for r in runs]
+    if run_id is None:
+        run_id = ids[-1]
+    if run_id not in ids:
+        raise ValueError(f"未找到运行 {run_id}（可用: {', '.join(ids)}）")
+    targets = runs[ids.index(run_id):]
+
+    # 每个文件 / 值取最早一次运行记录的旧值
+    files, values = {}, {}
+    for run in targets:
+        for item in run["files"]:
+            files.setdefault(os.path.normcase(item["path"]), item)
+        for item in run["registry"]:
+            values.setdefault((item["root"], item["key"].lower(), item["name"]), item)
+
+    journal = Journal(store, description=f"undo {run_id}", clock=clock)
+    for item in files.values():
+        if item["before"] is None:
+            journal.remove(item["path"])
+        else:
+            journal.write_bytes(item["path"], journal.store.read(item["before"]))
+    if values:
+        if registry is None:
+            from registry import get_registry
+            registry = get_registry()
+        registry.journal = journal
+        for item in values.values():
+            entry = _reg_entry(item["before"])
+            if entry is None:
+                registry.delete(item["root"], item["key"], item["name"])
+            else:
+                registry.set(item["root"], item["key"], item["name"], *entry)
+        registry.flush()
+
+    for run in targets:
+        run["undone"] = journal.run_id
+        atomic_write(Path(store) / "runs" / f"{run['id']}.json",
+                     json.dumps(run, ensure_ascii=False, indent=1).encode("utf-8"))
+    return journal
+
+
+def prune(max_bytes=MAX_STORE_BYTES, store=STORE_DIR):
+    """
+    把存储控制在 max_bytes 以内：从最旧的运行开始删除日志，直到剩余运行引用的内容不超过上限，
+    然后删除不再被引用的内容。最近一次运行总是保留。返回 (删除的运行数, 删除的内容数)。
+    """
+    blobs = BlobStore(store)
+    sizes = blobs.digests()
+    runs = list_runs(store)
+
+    def referenced(items):
+        return {f["before"] for r in items for f in r["files"] if f["before"]}
+
+    removed_runs = 0
+    while len(runs) > 1 and sum(sizes.get(d, 0) for d in referenced(runs)) > max_bytes:
+        oldest = runs.pop(0)
+        try:
+            (Path(store) / "runs" / f"{oldest['id']}.json").unlink()
+        except OSError:
+            pass
+        removed_runs += 1
+    keep = referenced(runs)
+    orphans = [d for d in sizes if d not in keep]
+    for digest in orphans:
+        blobs.remove(digest)
+    return removed_runs, len(orphans)
+
+
+# ---------- 每次运行共享的实例 ----------
+_journal = None
+
+
+def start(store=STORE_DIR, description="setup.py"):
+    """开始记录本次运行（setup.py 启动时调用）"""
+    global _journal
+    _journal = Journal(store, description=description)
+    return _journal
+
+
+def get_journal():
+    """本次运行的 Journal（未调用 start 时按默认存储创建）"""
+    if _journal is None:
+        start()
+    return _journal
+
+
+def write_text(path, text, encoding="utf-8", newline=None):
+    """经本次运行的日志写入文本文件（先备份原内容）"""
+    return get_journal().write_text(path, text, encoding=encoding, newline=newline)
+
+
+def append_text(path, text, encoding="utf-8", newline=None):
+    return get_journal().append_text(path, text, encoding=encoding, newline=newline)
+
+
+def write_bytes(path, data):
+    return get_journal().write_bytes(path, data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="setup.py 修改记录：查看、撤销、清理")
+    parser.add_argument("--store", default=STORE_DIR, help=f"存储目录（默认 {STORE_DIR}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出运行记录")
+    undo_parser = sub.add_parser("undo", help="撤销某次运行及其后的全部运行")
+    undo_parser.add_argument("run_id", nargs="?", help="运行 ID（默认最近一次）")
+    prune_parser = sub.add_parser("prune", help="把存储控制在指定大小以内")
+    prune_parser.add_argument("--max-mb", type=float, default=MAX_STORE_BYTES / 1024 / 1024)
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for run in list_runs(args.store):
+            state = f"（已由 {run['undone']} 撤销）" if run.get("undone") else ""
+            print(f"{run['id']}  {run['description']}  {len(run['files'])} 个文件, "
+                  f"{len(run['registry'])} 个注册表值{state}")
+        return 0
+    if args.command == "undo":
+        start_time = time.perf_counter()
+        try:
+            journal = undo(args.run_id, args.store)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"已恢复 {len(journal.data['files'])} 个文件、{len(journal.data['registry'])} 个注册表值"
+              f"（{(time.perf_counter() - start_time) * 1000:.0f} ms，记录为 {journal.run_id}）")
+        return 0
+    runs, blobs = prune(int(args.max_mb * 1024 * 1024), args.store)
+    print(f"已删除 {runs} 个运行记录、{blobs} 份内容")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+把注册表 ProxyOverride（代理例外列表）转换为 NO_PROXY
+
+Windows 的例外列表在 Internet Settings 的 ProxyOverride 值中，分号分隔，支持 <local> 和通配符：
+    localhost;127.*;10.*;192.168.*;*.corp.example.com;<local>
+
+curl/git、Python、Node 都读取 NO_PROXY（逗号分隔），但都不认识 Windows 的写法，转换规则：
+    <local>           → localhost,127.0.0.1,::1（"不含点的主机名"语义没有对应写法）
+    *.corp.com        → .corp.com            （前导点 = 匹配所有子域名）
+    10.* / 192.168.*  → 10.0.0.0/8 / 192.168.0.0/16（CIDR，curl 7.86+ / requests / Go 支持）
+    host:port / http://host → host           （NO_PROXY 不区分端口和协议，IPv6 去掉方括号）
+    *（单独）          → *                    （全部直连）
+中间或末尾带通配符的主机名（如 intranet*、*corp*）无法表达，会被跳过。
+
+回环地址（localhost,127.0.0.1,::1）总是包含在结果中：本地代理转发本机请求没有意义。
+Profile 中的 ConvertTo-NoProxy 使用同样的规则，两者输出应完全一致。
+
+使用方法:
+    python no_proxy.py                               # 转换当前注册表中的 ProxyOverride
+    python no_proxy.py "localhost;10.*;*.corp.com"   # 转换给定的列表
+"""
+
+import re
+import sys
+
+LOOPBACK = ["localhost", "127.0.0.1", "::1"]
+
+_IP_PATTERN = re.compile(r"^\d{1,3}(\.(\d{1,3}|\*)){0,3}$")
+_HOST_PORT = re.compile(r"^([^:]+):\d+$")
+_BRACKETED = re.compile(r"^\[([^\]]+)\](:\d+)?$")
+
+
+def translate_entry(pattern):
+    """转换单个例外项，返回 NO_PROXY 条目列表；无法表达时返回空列表"""
+    entry = re.sub(r"^[a-z][a-z0-9+.-]*://", "", pattern.strip().lower())
+    match = _BRACKETED.match(entry) or _HOST_PORT.match(entry)
+    if match:
+        entry = match.group(1)
+    if not entry:
+        return []
+    if entry == "<local>":
+        return list(LOOPBACK)
+    if entry == "*":
+        return ["*"]
+    if _IP_PATTERN.match(entry):
+        octets = entry.split(".")
+        if "*" not in octets:
+            return [entry]
+        cut = octets.index("*")
+        if any(o != "*" for o in octets[cut:]):
+            return []          # 10.*.0.1 之类
+        prefix = octets[:cut]
+        return [".".join(prefix + ["0"] * (4 - cut)) + f"/{8 * cut}"]
+    if entry.startswith("*.") and "*" not in entry[2:]:
+        return [entry[1:]]
+    if "*" in entry:
+        return []
+    return [entry]
+
+
+def translate_proxy_override(override):
+    """ProxyOverride 字符串 → 去重后的 NO_PROXY 条目列表（回环地址在前，其余保持原顺序）"""
+    entries = list(LOOPBACK)
+    for pattern in re.split(r"[;,\s]+", override or ""):
+        for entry in translate_entry(pattern):
+            if entry not in entries:
+                entries.append(entry)
+    return entries
+
+
+def no_proxy_value(override):
+    """ProxyOverride 字符串 → NO_PROXY 环境变量值"""
+    return ",".join(translate_proxy_override(override))
+
+
+def read_proxy_override():
+    """读取注册表 ProxyOverride，读不到返回空字符串"""
+    try:
+        import winreg
+        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
+            return winreg.QueryValueEx(key, "ProxyOverride")[0] or ""
+    except (ImportError, OSError):
+        return ""
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    override = argv[0] if argv else read_proxy_override()
+    print(no_proxy_value(override))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+PowerShell Profile 构建流水线
+
+Profile 由若干命名段（setup.py 中的 SSL / UTF-8 / 代理辅助函数 / 代理启动逻辑）拼装而成：
+1. 按清单（manifest）开关选择段，检查段之间的依赖
+2. 用配置参数渲染每段模板（str.format，模板中的花括号写成 {{ }}）
+3. 精简：去掉整行注释、行尾注释、<# #> 帮助块和空行（保留缩进，字符串内的 # 不受影响）
+4. 按输入参数缓存渲染结果（同一次运行写 PS5/PS7 两个 Profile 只渲染一次）
+5. 检查预算：输出字节数和启动时执行的顶层语句数，超出则构建失败（BudgetExceeded）
+
+计时模式（timing=True）：在每段之后插入秒表标记。只有设置了环境变量 PROFILE_TIMING_LOG 时才计时，
+每次启动向该文件追加一行（bench_startup.py 解析）：
+    <PID> host=<进程启动到 Profile 开始的毫秒数> ssl=<毫秒> utf8=<毫秒> ...
+未设置时每段只多一次变量判断。
+
+使用方法:
+    python profile_builder.py                    # 构建并输出大小/语句数（超出预算时退出码为 1）
+    python profile_builder.py --disable ssl      # 关闭某个段
+    python profile_builder.py --out profile.ps1  # 写出构建结果
+    python profile_builder.py --no-minify        # 保留注释（调试用）
+"""
+
+import argparse
+import re
+import sys
+
+
+TIMING_ENV = "PROFILE_TIMING_LOG"
+
+# 计时标记：$__pl 为日志行，$__pt 为秒表（未开启计时时为 $null，标记只做一次判断）
+_TIMING_START = (
+    "if ($env:" + TIMING_ENV + ") { $__pl = \"$PID host=$(([DateTime]::Now - "
+    "[Diagnostics.Process]::GetCurrentProcess().StartTime).TotalMilliseconds)\"; "
+    "$__pt = [Diagnostics.Stopwatch]::StartNew() }\n")
+_TIMING_LAP = "if ($__pt) {{ $__pl += \" {name}=$($__pt.Elapsed.TotalMilliseconds)\"; $__pt.Restart() }}\n"
+_TIMING_END = ("if ($__pt) { [IO.File]::AppendAllText($env:" + TIMING_ENV + ", \"$__pl`n\"); "
+               "Remove-Variable __pt, __pl }\n")
+
+
+class BudgetExceeded(Exception):
+    """构建结果超出启动成本预算"""
+
+
+class Section:
+    """
+    Profile 中的一个命名段。
+
+    参数：
+        name     : str   - 段名（清单中的键）
+        template : str   - str.format 模板
+        requires : tuple - 依赖的其他段名（依赖段被关闭时构建失败）
+    """
+
+    def __init__(self, name, template, requires=()):
+        self.name = name
+        self.template = template
+        self.requires = tuple(requires)
+
+    def key(self):
+        return (self.name, self.template, self.requires)
+
+
+class Budget:
+    """启动成本预算：None 表示不限制"""
+
+    def __init__(self, max_bytes=None, max_statements=None):
+        self.max_bytes = max_bytes
+        self.max_statements = max_statements
+
+    def check(self, result):
+        problems = []
+        if self.max_bytes is not None and result.bytes > self.max_bytes:
+            problems.append(f"{result.bytes} 字节 > 预算 {self.max_bytes}")
+        if self.max_statements is not None and result.statements > self.max_statements:
+            problems.append(f"{result.statements} 条启动语句 > 预算 {self.max_statements}")
+        if problems:
+            raise BudgetExceeded(f"Profile 超出预算（段: {', '.join(result.sections)}）：" + "；".join(problems))
+
+
+class BuildResult:
+    """构建结果：text 为最终内容，bytes 为 UTF-8 字节数，statements 为顶层语句数"""
+
+    def __init__(self, text, sections):
+        self.text = text
+        self.sections = sections
+        self.bytes = len(text.encode("utf-8"))
+        self.statements = count_statements(text)
+
+
+def _strip_trailing_comment(line):
+    """去掉行尾注释：引号外、前面是空白（或行首）的 # 起到行尾"""
+    quote = None
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if quote:
+            if c == "`" and quote == '"':
+                i += 2
+                continue
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "#" and (i == 0 or line[i - 1].isspace()):
+            return line[:i].rstrip()
+        i += 1
+    return line.rstrip()
+
+
+def minify(text):
+    """去掉注释、<# #> 帮助块和空行；here-string（@" "@）原样保留；#requires 保留"""
+    out = []
+    in_help = False
+    here_end = None
+    for line in text.splitlines():
+        if here_end:
+            out.append(line)
+            if line.startswith(here_end):
+                here_end = None
+            continue
+        stripped = line.strip()
+        if in_help:
+            if stripped.endswith("#>"):
+                in_help = False
+            continue
+        if stripped.startswith("<#"):
+            in_help = not stripped.endswith("#>")
+            continue
+        if stripped.lower().startswith("#requires"):
+            out.append(stripped)
+            continue
+        line = _strip_trailing_comment(line)
+        if not line.strip():
+            continue
+        out.append(line)
+        if line.endswith(('@"', "@'")):
+            here_end = line[-1] + "@"
+    return "\n".join(out) + "\n"
+
+
+_CONTINUATION_KEYWORDS = ("else", "elseif", "catch", "finally")
+
+
+def count_statements(text):
+    """
+    统计启动时执行的顶层语句数：function / if / try 等整个块算一条，
+    同一行用分号分隔的算多条，以 | ` , 结尾的续行不重复计数。
+    """
+    count = 0
+    depth = 0
+    continued = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        first_word = re.match(r"[A-Za-z]*", stripped).group(0).lower()
+        if depth == 0 and not continued and first_word not in _CONTINUATION_KEYWORDS:
+            count += 1
+        quote = None
+        i = 0
+        while i < len(stripped):
+            c = stripped[i]
+            if quote:
+                if c == "`" and quote == '"':
+                    i += 1
+                elif c == quote:
+                    quote = None
+            elif c in "'\"":
+                quote = c
+            elif c == "#" and (i == 0 or stripped[i - 1].isspace()):
+                break
+            elif c in "({[":
+                depth += 1
+            elif c in ")}]":
+                depth = max(depth - 1, 0)
+            elif c == ";" and depth == 0 and stripped[i + 1:].strip():
+                count += 1
+            i += 1
+        continued = stripped.endswith(("|", "`", ","))
+    return count
+
+
+def select_sections(sections, manifest=None):
+    """按清单选择段（清单中未出现的段默认开启），检查未知段名和依赖"""
+    manifest = dict(manifest or {})
+    names = {s.name for s in sections}
+    unknown = set(manifest) - names
+    if unknown:
+        raise ValueError(f"未知的 Profile 段: {', '.join(sorted(unknown))}")
+    selected = [s for s in sections if manifest.get(s.name, True)]
+    enabled = {s.name for s in selected}
+    for section in selected:
+        missing = [r for r in section.requires if r not in enabled]
+        if missing:
+            raise ValueError(f"Profile 段 {section.name} 依赖 {', '.join(missing)}，但后者已关闭")
+    return selected
+
+
+_cache = {}
+
+
+def build_profile(sections, manifest=None, params=None, minified=True, header=None, budget=None,
+                  timing=False):
+    """
+    构建 Profile，返回 BuildResult；超出 budget 时抛 BudgetExceeded。
+
+    参数：
+        sections : list[Section] - 全部段（按输出顺序）
+        manifest : dict          - 段名 → 是否启用
+        params   : dict          - 模板参数
+        minified : bool          - 是否去掉注释和空行
+        header   : str           - 输出开头的一行注释（精简后也保留，用于识别受管理的 Profile）
+        budget   : Budget        - 启动成本预算
+        timing   : bool          - 是否插入分段计时标记（计时标记计入预算）
+    """
+    params = dict(params or {})
+    key = (tuple(s.key() for s in sections), tuple(sorted((manifest or {}).items())),
+           tuple(sorted((k, str(v)) for k, v in params.items())), minified, header, timing)
+    result = _cache.get(key)
+    if result is None:
+        selected = select_sections(sections, manifest)
+        rendered = [(s.name, s.template.format(**params).strip("\n")) for s in selected]
+        if timing:
+            # 渲染为空的段（如未检测到任何工具的 integrations）不计时
+            chunks = [_TIMING_START] + [f"{body}\n" + _TIMING_LAP.format(name=name)
+                                        for name, body in rendered if body.strip()] + [_TIMING_END]
+            text = "\n".join(chunks)
+        else:
+            text = "\n".join(body + "\n" for _, body in rendered)
+        if minified:
+            text = minify(text)
+        if header:
+            text = header.rstrip("\n") + "\n" + text
+        result = _cache[key] = BuildResult(text, [s.name for s in selected])
+    if budget is not None:
+        budget.check(result)
+    return result
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def main(argv=None):
+    import setup
+    # 以脚本运行时本文件是 __main__，setup 引用的是 profile_builder 模块，异常类须从后者取
+    from profile_builder import BudgetExceeded
+
+    parser = argparse.ArgumentParser(description="构建 PowerShell Profile 并检查启动成本预算")
+    parser.add_argument("--disable", action="append", default=[], metavar="SECTION",
+                        help=f"关闭某个段（{', '.join(s.name for s in setup.PROFILE_SECTIONS)}）")
+    parser.add_argument("--no-minify", action="store_true", help="保留注释和空行")
+    parser.add_argument("--out", help="把构建结果写入文件")
+    args = parser.parse_args(argv)
+
+    manifest = dict(setup.PROFILE_MANIFEST)
+    manifest.update({name: False for name in args.disable})
+    try:
+        result = setup.build_powershell_profile(manifest=manifest, minified=not args.no_minify)
+    except (BudgetExceeded, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(result.text)
+    print(f"段: {', '.join(result.sections)}")
+    print(f"大小: {result.bytes} 字节（预算 {setup.PROFILE_BUDGET_BYTES}）")
+    print(f"启动语句: {result.statements} 条（预算 {setup.PROFILE_BUDGET_STATEMENTS}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+Profile 启动成本静态分析（PowerShell / Bash）
+
+把生成的 Profile 文本切分为顶层语句，对启动时执行的每条语句（函数定义本身除外）归类：
+    external  启动外部进程（chcp、git、& $exe、Bash 的 $(...) 子 Shell 等）
+    network   网络访问（TcpClient 探测等）
+    registry  注册表读写（Get-ItemProperty、用户级环境变量读写）
+    file      文件读写（[IO.File]、Test-Path、dot-source、重定向到文件等）
+    console   控制台输出（Write-Host）
+    pure      纯进程内操作（变量赋值、函数定义、.NET 属性等）
+
+语句调用 Profile 内定义的函数时，函数体（递归）计入该语句；所有分支都计入，估算值是上界。
+每类操作有一个经验耗时（COST_MS），报告按语句列出类别、估算耗时和具体操作。
+
+有些外部进程只在缓存失效时才启动（Get-InitCache / __init_cache 重新生成 init 缓存），
+它们登记在 ALLOWED_LAUNCHES 中，报告里仍会列出，但不算违规（violations）。
+
+使用方法:
+    python profile_cost.py                     # 分析 setup.py 生成的 PowerShell Profile
+    python profile_cost.py profile.ps1         # 分析指定文件（.sh / .bash_profile 按 Bash 分析）
+    python profile_cost.py --strict ...        # 启动路径中有外部进程时退出码为 1
+"""
+
+import argparse
+import re
+import sys
+
+from profile_builder import minify
+
+EXTERNAL = "external"
+NETWORK = "network"
+REGISTRY = "registry"
+FILE = "file"
+CONSOLE = "console"
+PURE = "pure"
+
+# 严重程度从高到低，语句按其中最重的操作归类
+CATEGORIES = (EXTERNAL, NETWORK, REGISTRY, FILE, CONSOLE, PURE)
+
+# 经验耗时（毫秒）：Windows 上创建进程几十毫秒，注册表/文件操作在毫秒以下
+COST_MS = {
+    EXTERNAL: 40.0,
+    NETWORK: 30.0,
+    REGISTRY: 0.5,
+    FILE: 0.3,
+    CONSOLE: 1.0,
+    PURE: 0.02,
+}
+
+# 只在缓存失效时才启动外部进程的函数
+ALLOWED_LAUNCHES = {
+    "Get-InitCache": "init 缓存失效时重新生成（init_cache.py）",
+    "__init_cache": "init 缓存失效时重新生成（init_cache.py）",
+}
+
+
+class Operation:
+    """一次有成本的操作：via 为调用链上的 Profile 函数名"""
+
+    def __init__(self, category, detail, via=()):
+        self.category = category
+        self.detail = detail
+        self.via = tuple(via)
+
+    @property
+    def allowed(self):
+        return any(name in ALLOWED_LAUNCHES for name in self.via)
+
+    def __repr__(self):
+        chain = " → ".join(self.via)
+        return f"{self.category}: {self.detail}" + (f"（经 {chain}）" if chain else "")
+
+
+class Statement:
+    """一条顶层语句及其分析结果"""
+
+    def __init__(self, line, text, operations, defines=None):
+        self.line = line                 # 起始行号（从 1 开始）
+        self.text = text
+        self.operations = operations
+        self.defines = defines           # 函数定义语句：函数名
+
+    @property
+    def category(self):
+        if self.defines:
+            return PURE
+        found = {op.category for op in self.operations}
+        return next((c for c in CATEGORIES if c in found), PURE)
+
+    @property
+    def cost_ms(self):
+        if self.defines:
+            return COST_MS[PURE]
+        return COST_MS[PURE] + sum(COST_MS[op.category] for op in self.operations)
+
+
+class Report:
+    def __init__(self, shell, statements):
+        self.shell = shell
+        self.statements = statements
+
+    @property
+    def startup(self):
+        """启动时执行的语句（不含函数定义）"""
+        return [s for s in self.statements if not s.defines]
+
+    @property
+    def cost_ms(self):
+        return sum(s.cost_ms for s in self.statements)
+
+    def launches(self):
+        """启动路径中的全部外部进程操作：[(语句, 操作)]"""
+        return [(s, op) for s in self.startup for op in s.operations if op.category == EXTERNAL]
+
+    def violations(self):
+        """不在 ALLOWED_LAUNCHES 中的外部进程操作"""
+        return [(s, op) for s, op in self.launches() if not op.allowed]
+
+    def format(self):
+        lines = [f"{'line':>5}  {'category':<9}{'est ms':>8}  statement"]
+        for s in self.startup:
+            first = s.text.strip().splitlines()[0]
+            lines.append(f"{s.line:>5}  {s.category:<9}{s.cost_ms:>8.2f}  {first[:70]}")
+            for op in s.operations:
+                if op.category != PURE:
+                    mark = "  (缓存失效时)" if op.category == EXTERNAL and op.allowed else ""
+                    lines.append(f"{'':>24}- {op!r}{mark}")
+        functions = sum(1 for s in self.statements if s.defines)
+        lines.append(f"{self.shell}: {len(self.startup)} 条启动语句，{functions} 个函数定义，"
+                     f"估算 {self.cost_ms:.1f}ms")
+        return "\n".join(lines)
+
+
+# ==================== 通用：语句切分 ====================
+
+def _split_statements(code, openers, closers, continuation=("|", "`", ","), keywords=()):
+    """
+    按括号深度把代码切成顶层语句，返回 [(起始行号, 文本)]。
+    openers / closers 为开/闭符号或关键字；以 continuation 结尾的行、以 keywords 开头的行并入上一条。
+    """
+    statements = []
+    depth = 0
+    current = []
+    start = 0
+    for number, line in enumerate(code.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        first = re.match(r"[A-Za-z]*", stripped).group(0)
+        if current and depth == 0 and not current[-1].rstrip().endswith(continuation) \
+                and first not in keywords:
+            statements.append((start, "\n".join(current)))
+            current = []
+        if not current:
+            start = number
+        current.append(line)
+        for token in re.findall(r"\w+|[^\w\s]", stripped):
+            if token in openers:
+                depth += 1
+            elif token in closers:
+                depth = max(depth - 1, 0)
+    if current:
+        statements.append((start, "\n".join(current)))
+    return statements
+
+
+def _analyze(statements, function_pattern, find_operations, find_calls):
+    """对切分好的语句做函数解析和分类"""
+    functions = {}
+    parsed = []
+    for line, code, raw in statements:
+        match = re.match(function_pattern, code.strip())
+        name = match.group(1) if match else None
+        if name:
+            functions[name] = (code, raw)
+        parsed.append((line, code, raw, name))
+
+    memo = {}
+
+    def operations(code, raw, via, seen):
+        ops = [Operation(c, d, via) for c, d in find_operations(code, raw, functions)]
+        for call in find_calls(code, functions):
+            if call in seen:
+                continue
+            if call not in memo:
+                body, body_raw = functions[call]
+                # 去掉函数头，只分析函数体
+                memo[call] = operations(re.sub(function_pattern, "", body.strip(), count=1),
+                                        body_raw, (call,), seen | {call})
+            ops.extend(Operation(op.category, op.detail, via + op.via) for op in memo[call])
+        return ops
+
+    return [Statement(line, raw, [] if name else operations(code, raw, (), frozenset()), name)
+            for line, code, raw, name in parsed]
+
+
+# ==================== PowerShell ====================
+
+_PS_KEYWORDS = {
+    "if", "elseif", "else", "switch", "foreach", "for", "while", "do", "until", "try", "catch", "finally",
+    "return", "break", "continue", "throw", "param", "function", "filter", "begin", "process", "end",
+    "trap", "exit", "in", "class", "enum", "data", "dynamicparam",
+}
+# 常用内置别名（不是外部程序）
+_PS_ALIASES = {"%", "?", "cd", "ls", "dir", "cat", "echo", "select", "where", "sort", "gi", "gci", "gc",
+               "iex", "ni", "ri", "rm", "del", "cp", "mv", "pwd", "cls", "sl", "gp", "sp"}
+
+_PS_RULES = [
+    (NETWORK, r"Net\.Sockets\.\w+"),
+    (NETWORK, r"\b(Invoke-WebRequest|Invoke-RestMethod|Test-NetConnection|Test-Connection|Resolve-DnsName)\b"),
+    (REGISTRY, r"\b(Get|Set|New|Remove)-ItemProperty(Value)?\b"),
+    (REGISTRY, r"\[Environment\]::\w+EnvironmentVariable\([^)]*['\"](User|Machine)['\"]\)"),
+    (REGISTRY, r"Microsoft\.Win32\.Registry\w*"),
+    (FILE, r"\[IO\.(File|FileStream|Directory)\]::\w+"),
+    (FILE, r"\b(Get-Content|Set-Content|Add-Content|Out-File|Test-Path|Get-Item|Get-ChildItem|New-Item|"
+           r"Copy-Item|Move-Item|Import-Module|Import-Clixml|Export-Clixml)\b"),
+    (FILE, r"\bRemove-Item\b(?!\s+Function:)"),
+    (EXTERNAL, r"\b(Start-Process|Start-Job|Invoke-Item)\b"),
+    (CONSOLE, r"\b(Write-Host|Out-Host|Clear-Host|Write-Warning|Write-Information)\b"),
+]
+
+
+def _ps_code(text):
+    """
+    PowerShell 文本 → 代码视图：字符串内容替换为 ''，双引号字符串中的 $(...) 子表达式保留
+    （它们会执行），here-string 同样处理。注释先由 minify 去掉。
+    """
+    out = []
+    i = 0
+    n = len(text)
+
+    def subexpression(j):
+        """text[j:] 以 $( 开头，返回 (子表达式代码, 结束位置)"""
+        depth = 0
+        k = j + 1
+        while k < n:
+            c = text[k]
+            if c in "'\"":
+                end = _string_end(k)
+                k = end
+                continue
+            if c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+                if depth == 0:
+                    return _ps_code(text[j + 2:k]), k + 1
+            k += 1
+        return "", n
+
+    def _string_end(k):
+        quote = text[k]
+        k += 1
+        while k < n:
+            if text[k] == "`" and quote == '"':
+                k += 2
+                continue
+            if text[k] == quote:
+                if k + 1 < n and text[k + 1] == quote:   # '' / "" 转义
+                    k += 2
+                    continue
+                return k + 1
+            k += 1
+        return n
+
+    while i < n:
+        c = text[i]
+        if text.startswith(('@"', "@'"), i) and text[i + 2:i + 3] in ("\n", "\r"):
+            quote = text[i + 1]
+            end = text.find("\n" + quote + "@", i)
+            end = n if end == -1 else end + 3
+            body = text[i:end]
+            subs = [_ps_code(m) for m in re.findall(r"\$\(([^()]*)\)", body)] if quote == '"' else []
+            out.append("(" + "; ".join(subs) + ")" if subs else "''")
+            out.append("\n" * body.count("\n"))
+            i = end
+        elif c == "'":
+            end = _string_end(i)
+            out.append("''" + "\n" * text[i:end].count("\n"))
+            i = end
+        elif c == '"':
+            end = _string_end(i)
+            subs = []
+            j = i + 1
+            while j < end - 1:
+                if text[j] == "`":
+                    j += 2
+                    continue
+                if text.startswith("$(", j):
+                    sub, j = subexpression(j)
+                    subs.append(sub)
+                    continue
+                j += 1
+            out.append("(" + "; ".join(subs) + ")" if subs else "''")
+            out.append("\n" * text[i:end].count("\n"))
+            i = end
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+_PS_COMMAND = re.compile(
+    r"(?:^|[;|{(=&]|\breturn\b|\bthrow\b)[ \t]*(?:&[ \t]*)?([A-Za-z_][\w.\\:-]*)(?![\w.\\:-]*[ \t]*=(?!=))",
+    re.MULTILINE)
+
+
+def _ps_commands(code):
+    """代码视图中处于命令位置的单词"""
+    return [m.group(1) for m in _PS_COMMAND.finditer(code)]
+
+
+def _ps_operations(code, raw, functions):
+    ops = []
+    for category, pattern in _PS_RULES:
+        source = raw if category == REGISTRY else code
+        ops.extend((category, m.group(0)) for m in re.finditer(pattern, source))
+    # & $exe / & '...'：调用运算符后面不是命令名，视为外部程序
+    ops.extend((EXTERNAL, m.group(0).strip()) for m in re.finditer(r"&[ \t]*(\$\w+|'')", code))
+    # dot-source 脚本文件
+    ops.extend((FILE, m.group(0).strip()) for m in re.finditer(r"(?:^|[;{(])[ \t]*\.[ \t]+\$\w+", code,
+                                                                re.MULTILINE))
+    # 重定向到文件（>$null、2>&1 不算）
+    ops.extend((FILE, m.group(0).strip()) for m in re.finditer(r"\d?>>?[ \t]*(?!\$null|&)[^\s>]+", code))
+    for word in _ps_commands(code):
+        lower = word.lower()
+        if lower in _PS_KEYWORDS or lower in _PS_ALIASES or word in functions or word.startswith("$"):
+            continue
+        # Verb-Noun 形式是 cmdlet / 函数；不带连字符的单词（chcp、git、npm.cmd）是外部程序
+        if "-" not in word.strip("-") or word.lower().endswith((".exe", ".cmd", ".bat", ".com")):
+            ops.append((EXTERNAL, word))
+    return ops
+
+
+def _ps_calls(code, functions):
+    return [w for w in _ps_commands(code) if w in functions]
+
+
+def analyze_powershell(text):
+    """分析 PowerShell Profile 文本，返回 Report"""
+    text = minify(text)
+    code = _ps_code(text)
+    raw_lines = text.splitlines()
+    statements = []
+    for line, chunk in _split_statements(code, "({[", ")}]", keywords=("else", "elseif", "catch", "finally")):
+        count = chunk.count("\n") + 1
+        statements.append((line, chunk, "\n".join(raw_lines[line - 1:line - 1 + count])))
+    return Report("powershell", _analyze(statements, r"function\s+(?:global:)?([\w-]+)[^{]*",
+                                         _ps_operations, _ps_calls))
+
+
+# ==================== Bash ====================
+
+_BASH_BUILTINS = {
+    "export", "local", "declare", "typeset", "readonly", "read", "echo", "printf", "test", "[", "[[", "]]",
+    "shift", "return", "unset", "alias", "unalias", "eval", "set", "shopt", "cd", "pwd", "true", "false",
+    ":", "type", "command", "builtin", "hash", "trap", "let", "exit", "getopts", "umask", "complete",
+    "if", "then", "else", "elif", "fi", "for", "while", "until", "do", "done", "case", "esac", "in",
+    "function", "select", "time", "!", "break", "continue",
+}
+
+
+def _bash_code(text):
+    """Bash 文本 → 代码视图：去掉注释，字符串内容替换为 ''（$(...) 与反引号保留为 $(...)）"""
+    out = []
+    for line in text.splitlines():
+        i = 0
+        buf = []
+        while i < len(line):
+            c = line[i]
+            if c == "'":
+                end = line.find("'", i + 1)
+                end = len(line) if end == -1 else end + 1
+                buf.append("''")
+                i = end
+            elif c == '"':
+                j = i + 1
+                subs = []
+                while j < len(line) and line[j] != '"':
+                    if line[j] == "\\":
+                        j += 2
+                        continue
+                    if line.startswith("$(", j):
+                        depth, k = 0, j + 1
+                        while k < len(line):
+                            depth += {"(": 1, ")": -1}.get(line[k], 0)
+                            if depth == 0:
+                                break
+                            k += 1
+                        subs.append("$(" + _bash_code(line[j + 2:k]).strip() + ")")
+                        j = k + 1
+                        continue
+                    if line[j] == "`":
+                        k = line.find("`", j + 1)
+                        k = len(line) if k == -1 else k
+                        subs.append("$(" + line[j + 1:k] + ")")
+                        j = k + 1
+                        continue
+                    j += 1
+                literal = line[i + 1:j]
+                if subs:
+                    buf.append(" ".join(subs))
+                elif re.fullmatch(r"\$\{?\w+\}?", literal):
+                    buf.append(literal)             # "$exe" 保留变量名（可能处于命令位置）
+                else:
+                    buf.append("''")
+                i = j + 1
+            elif c == "#" and (i == 0 or line[i - 1] in " \t;"):
+                break
+            else:
+                buf.append(c)
+                i += 1
+        out.append("".join(buf))
+    return "\n".join(out)
+
+
+_BASH_COMMAND = re.compile(
+    r"(?:^|[;|&(]|\{(?=\s)|\$\(|\b(?:then|else|do|if|elif|while|until)\b|!)[ \t]*"
+    r"((?:\w+=[^\s;|&()]*[ \t]+)*)([^\s;|&(){}<>=]+)(=?)", re.MULTILINE)
+
+
+# case 分支标签（如 "a|b)"），不是命令
+_BASH_CASE_LABEL = re.compile(r"^[ \t]*\(?[^\s;()]+(?:\|[^\s;()]+)*\)", re.MULTILINE)
+
+
+def _bash_commands(code):
+    """代码视图中处于命令位置的单词（跳过前置的 VAR=value、纯赋值语句和 case 分支标签）"""
+    code = _BASH_CASE_LABEL.sub("", code)
+    return [m.group(2) for m in _BASH_COMMAND.finditer(code) if not m.group(3)]
+
+
+def _bash_operations(code, raw, functions):
+    ops = []
+    ops.extend((EXTERNAL, "$(...) 子 Shell") for _ in re.finditer(r"\$\((?!\()", code))
+    ops.extend((FILE, m.group(0).strip()) for m in re.finditer(r"(?<![<>&\d])(<|>>?)[ \t]*(?!&)[^\s;&|)]+",
+                                                                code))
+    for word in _bash_commands(code):
+        if word in (".", "source"):
+            ops.append((FILE, word))
+        elif word in _BASH_BUILTINS or word in functions or word == "''" or word.startswith("$("):
+            continue
+        else:                                       # 外部程序，或 "$exe" 这样的动态命令
+            ops.append((EXTERNAL, word))
+    return ops
+
+
+def _bash_calls(code, functions):
+    return [w for w in _bash_commands(code) if w in functions]
+
+
+def analyze_bash(text):
+    """分析 Bash Profile 文本，返回 Report"""
+    code = _bash_code(text)
+    raw_lines = text.splitlines()
+    statements = []
+    openers = {"{", "(", "if", "do", "case"}
+    closers = {"}", ")", "fi", "done", "esac"}
+    for line, chunk in _split_statements(code, openers, closers, continuation=("|", "\\", "&&", "||")):
+        count = chunk.count("\n") + 1
+        statements.append((line, chunk, "\n".join(raw_lines[line - 1:line - 1 + count])))
+    return Report("bash", _analyze(statements, r"(?:function\s+)?([\w.-]+)\s*\(\)\s*",
+                                   _bash_operations, _bash_calls))
+
+
+def analyze(text, shell="powershell"):
+    return analyze_bash(text) if shell == "bash" else analyze_powershell(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="静态分析 Profile 的启动成本")
+    parser.add_argument("path", nargs="?", help="Profile 文件（默认分析 setup.py 生成的 PowerShell Profile）")
+    parser.add_argument("--bash", action="store_true", help="按 Bash 分析")
+    parser.add_argument("--strict", action="store_true", help="启动路径中有外部进程时退出码为 1")
+    args = parser.parse_args(argv)
+
+    if args.path:
+        with open(args.path, encoding="utf-8-sig") as f:
+            text = f.read()
+        shell = "bash" if args.bash or args.path.endswith((".sh", "bash_profile", "bashrc")) else "powershell"
+    else:
+        import setup
+        text, shell = setup.render_powershell_profile(), "powershell"
+    report = analyze(text, shell)
+    print(report.format())
+    violations = report.violations()
+    for statement, op in violations:
+        print(f"[WARN] 第 {statement.line} 行启动外部进程: {op.detail}")
+    return 1 if args.strict and violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
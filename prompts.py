@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+交互问题的统一入口：无人值守模式（命令行参数 / 应答文件）+ 单一输入复用器
+
+原来每个带超时的提示都新开一个线程调用 input()，超时后线程仍阻塞在 input() 里，
+后续输入会被这些残留线程抢走；check_and_prompt_powershell_upgrade 的 input() 循环则会无限期等待。
+
+- 每个问题有固定的键和默认值（QUESTIONS），应答文件或 --answer 给出的答案直接使用
+- 无人值守（--non-interactive，或标准输入不是终端）时未给出答案的问题立即取默认值，不读控制台
+- 交互模式下整个进程只有一个读取线程，把控制台输入逐行放入队列；提示只从队列取值，
+  超时后不会留下新的阻塞线程，超时前残留的输入在下次提示前丢弃
+
+应答文件（JSON，值可为 "y" / "n" / true / false）:
+    {"powershell7": "n", "scoop": false, "nerd_font": "y"}
+
+使用方法:
+    import prompts
+    prompts.configure(answers={"scoop": "n"}, interactive=False)
+    if prompts.ask("scoop", "是否配置 Scoop？ [y/N]: ", timeout=15) == "y": ...
+"""
+
+import json
+import queue
+import sys
+import threading
+
+YES = "y"
+NO = "n"
+
+# 键 → (说明, 默认值)
+QUESTIONS = {
+    "powershell7": ("未安装时下载安装 PowerShell 7", YES),
+    "scoop": ("配置 Scoop（未安装时自动安装）与 aria2", NO),
+    "nerd_font": ("下载安装 FantasqueSansMono Nerd Font", YES),
+}
+
+_TRUE = ("y", "yes", "true", "1")
+_FALSE = ("n", "no", "false", "0")
+
+
+def parse_answer(value):
+    """'y' / 'no' / True / 0 … → "y" / "n"；无法识别返回 None"""
+    if isinstance(value, bool):
+        return YES if value else NO
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return YES
+    if text in _FALSE:
+        return NO
+    return None
+
+
+def normalize_answers(answers):
+    """校验并规范化答案：{键: "y"/"n"}；未知的键或无法识别的值抛出 ValueError"""
+    result = {}
+    for key, value in answers.items():
+        if key not in QUESTIONS:
+            raise ValueError(f"未知的问题 {key!r}（可用: {', '.join(QUESTIONS)}）")
+        answer = parse_answer(value)
+        if answer is None:
+            raise ValueError(f"{key} 的答案应为 y / n: {value!r}")
+        result[key] = answer
+    return result
+
+
+def load_answers(path):
+    """读取 JSON 应答文件（允许 UTF-8 BOM）"""
+    with open(path, encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"应答文件应为 JSON 对象: {path}")
+    return normalize_answers(data)
+
+
+def parse_answer_items(items):
+    """['scoop=n', 'nerd_font=y'] → {"scoop": "n", "nerd_font": "y"}"""
+    answers = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"答案格式应为 <问题>=<y|n>: {item}")
+        answers[key.strip()] = value
+    return normalize_answers(answers)
+
+
+class ConsoleInput:
+    """单一读取线程：按需启动，把每行输入放入队列（EOF 时放入 None）"""
+
+    def __init__(self, readline=None):
+        self._readline = readline or sys.stdin.readline
+        self._lines = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _pump(self):
+        while True:
+            try:
+                line = self._readline()
+            except Exception:
+                line = ""
+            if not line:
+                self._lines.put(None)
+                return
+            self._lines.put(line.rstrip("\r\n"))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._pump, name="console-input", daemon=True)
+                self._thread.start()
+
+    def discard_pending(self):
+        """丢弃上一个提示超时后才到达的输入（EOF 标记保留）"""
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except queue.Empty:
+                return
+            if line is None:
+                self._lines.put(None)
+                return
+
+    def readline(self, timeout=None):
+        """等待一行输入：超时返回 False，EOF 返回 None"""
+        self._start()
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        if line is None:
+            self._lines.put(None)              # 之后的读取同样立即得到 EOF
+        return line
+
+
+class Prompter:
+    """
+    按键回答问题。
+
+    参数：
+        answers     : dict - {键: "y"/"n"}，优先于交互输入
+        interactive : bool - False 时未给出答案的问题直接取默认值
+        console     : ConsoleInput - 交互输入来源，测试时可替换
+        output      : callable - 输出提示文字，默认 print
+    """
+
+    def __init__(self, answers=None, interactive=True, console=None, output=None):
+        self.answers = normalize_answers(answers or {})
+        self.interactive = interactive
+        self.console = console or ConsoleInput()
+        self.output = output or (lambda text, end="\n": print(text, end=end, flush=True))
+
+    def ask(self, key, prompt_text, timeout=None, default=None):
+        """
+        返回 "y" 或 "n"。
+
+        timeout 为 None 时一直等待（直到 EOF）；无效输入会重新提示。
+        """
+        default = default or QUESTIONS[key][1]
+        if key in self.answers:
+            self.output(f"{prompt_text}{self.answers[key]}（应答）")
+            return self.answers[key]
+        if not self.interactive:
+            self.output(f"{prompt_text}{default}（无人值守，默认）")
+            return default
+
+        self.console.discard_pending()
+        while True:
+            self.output(prompt_text, end="")
+            line = self.console.readline(timeout)
+            if line is False:
+                self.output(f"\n（等待 {timeout}s 无响应，默认 {default}）")
+                return default
+            if line is None:
+                self.output(f"\n（输入已结束，默认 {default}）")
+                return default
+            if not line.strip():
+                return default
+            answer = parse_answer(line)
+            if answer is not None:
+                return answer
+            self.output("  无效输入，请输入 y 或 n")
+
+
+# ---------- 每次运行共享的实例 ----------
+_prompter = None
+
+
+def stdin_is_interactive():
+    try:
+        return sys.stdin is not None and sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def configure(answers=None, interactive=None):
+    """设置本次运行的应答与模式；interactive 为 None 时按标准输入是否为终端判断"""
+    global _prompter
+    if interactive is None:
+        interactive = stdin_is_interactive()
+    _prompter = Prompter(answers, interactive)
+    return _prompter
+
+
+def ask(key, prompt_text, timeout=None, default=None):
+    """用本次运行的 Prompter 回答问题（未调用 configure 时按默认配置创建）"""
+    if _prompter is None:
+        configure()
+    return _prompter.ask(key, prompt_text, timeout=timeout, default=default)
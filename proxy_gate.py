@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+代理存活门控（Profile 中 Set-AutoProxy / Test-ProxyAlive 的 Python 参考实现）
+
+ProxyEnable=1 但代理客户端已崩溃时，如果照常导出 HTTP_PROXY，
+会话里每次 git/pip/npm 调用都要等连接超时。门控逻辑：
+
+1. 系统代理关闭或未配置 ProxyServer        → direct（直连）
+2. 在 BUDGET_MS（几十毫秒）内非阻塞连接代理 → 连上为 proxy，否则为 dead
+3. dead 时当前会话回退直连并标记（用户级环境变量保持不变，代理恢复后新终端自动用回）
+4. 探测结果缓存 CACHE_TTL 秒，多个终端同时启动时只探测一次
+
+缓存文件格式与 Profile 完全一致（一行）：  <endpoint>|<1 或 0>|<unix 时间戳>
+"""
+
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from no_proxy import no_proxy_value
+from proxy_probe import parse_proxy_server
+
+BUDGET_MS = 30                    # 连接预算（毫秒），本机代理通常 <1ms 即可连上
+CACHE_TTL = 15                    # 存活结果缓存（秒）
+CACHE_PATH = Path(tempfile.gettempdir()) / "proxy_alive.txt"
+
+PROXY = "proxy"
+DIRECT = "direct"
+DEAD = "dead"
+
+
+class GateDecision:
+    """门控结果：mode 为 PROXY / DIRECT / DEAD，no_proxy 为由 ProxyOverride 转换的 NO_PROXY 值"""
+
+    def __init__(self, mode, endpoint=None, from_cache=False, no_proxy=None):
+        self.mode = mode
+        self.endpoint = endpoint
+        self.from_cache = from_cache
+        self.no_proxy = no_proxy
+
+    @property
+    def session_env(self):
+        """当前会话应设置的代理环境变量（None 表示清除）"""
+        if self.mode == PROXY:
+            return {
+                "HTTP_PROXY": f"http://{self.endpoint}",
+                "HTTPS_PROXY": f"http://{self.endpoint}",
+                "ALL_PROXY": f"socks5://{self.endpoint}",
+                "NO_PROXY": self.no_proxy,
+            }
+        return {"HTTP_PROXY": None, "HTTPS_PROXY": None, "ALL_PROXY": None, "NO_PROXY": None}
+
+    def __repr__(self):
+        return f"GateDecision({self.mode}, {self.endpoint}, from_cache={self.from_cache})"
+
+
+def check_alive(endpoint, budget_ms=BUDGET_MS):
+    """在 budget_ms 内尝试 TCP 连接 endpoint（host:port），成功返回 True"""
+    endpoints = parse_proxy_server(endpoint)
+    if not endpoints:
+        return False
+    try:
+        with socket.create_connection(endpoints[0], timeout=budget_ms / 1000):
+            return True
+    except OSError:
+        return False
+
+
+class AliveCache:
+    """存活结果的短期缓存（与 Profile 共用同一文件格式）"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def get(self, endpoint, now=None):
+        """缓存命中返回 True/False，未命中或过期返回 None"""
+        now = time.time() if now is None else now
+        try:
+            cached_endpoint, alive, stamp = self.path.read_text(encoding="utf-8").strip().split("|")
+            if cached_endpoint == endpoint and now - int(stamp) < self.ttl:
+                return alive == "1"
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def put(self, endpoint, alive, now=None):
+        now = time.time() if now is None else now
+        try:
+            self.path.write_text(f"{endpoint}|{int(bool(alive))}|{int(now)}", encoding="utf-8")
+        except OSError:
+            pass
+
+
+def decide(proxy_enable, proxy_server, probe=check_alive, cache=None, now=None, proxy_override=""):
+    """
+    根据注册表值决定当前会话的代理模式。
+
+    参数：
+        proxy_enable   : int        - 注册表 ProxyEnable
+        proxy_server   : str        - 注册表 ProxyServer（或已选出的最快端点）
+        probe          : callable   - probe(endpoint) -> bool，默认 check_alive
+        cache          : AliveCache - 为 None 时不使用缓存
+        proxy_override : str        - 注册表 ProxyOverride（与 Profile 的 ConvertTo-NoProxy 一样转换为 NO_PROXY）
+    """
+    if proxy_enable != 1 or not proxy_server:
+        return GateDecision(DIRECT)
+
+    no_proxy = no_proxy_value(proxy_override)
+    if cache is not None:
+        alive = cache.get(proxy_server, now)
+        if alive is not None:
+            return GateDecision(PROXY if alive else DEAD, proxy_server, from_cache=True, no_proxy=no_proxy)
+
+    alive = probe(proxy_server)
+    if cache is not None:
+        cache.put(proxy_server, alive, now)
+    return GateDecision(PROXY if alive else DEAD, proxy_server, no_proxy=no_proxy)
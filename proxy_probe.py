@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+代理存活与延迟探测（socket 级，替代 netstat 解析）
+
+直接连接 ProxyServer 端点，可选发送 HTTP CONNECT 或 SOCKS5 握手，
+分别测量 TCP 连接耗时和握手耗时，并按截止时间判定失败。多个端点并发探测。
+
+与 netstat 相比：
+- 不需要扫描整张连接表，繁忙机器上也只需一次连接
+- 不依赖 netstat 的本地化输出（"LISTENING" / "侦听"）
+- 握手成功才算存活，证明代理确实在应答，而不只是端口被占用
+
+使用方法:
+    from proxy_probe import parse_proxy_server, probe_endpoints
+    results = probe_endpoints(parse_proxy_server("127.0.0.1:7897"), mode="http")
+"""
+
+import asyncio
+import sys
+import time
+
+DEFAULT_CONNECT_TIMEOUT = 0.5     # TCP 连接截止时间（秒）
+DEFAULT_HANDSHAKE_TIMEOUT = 1.5   # 握手截止时间（秒）
+DEFAULT_CONNECT_TARGET = ("www.gstatic.com", 443)   # HTTP CONNECT 握手使用的目标
+
+if sys.platform == "win32" and sys.version_info < (3, 8):
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+
+class ProbeResult:
+    """单个端点的探测结果（耗时单位：毫秒，未完成的阶段为 None）"""
+
+    def __init__(self, host, port, mode=None):
+        self.host = host
+        self.port = port
+        self.mode = mode            # None / "http" / "socks5"
+        self.connect_ms = None
+        self.handshake_ms = None
+        self.status = None          # HTTP CONNECT 返回的状态码
+        self.error = None
+
+    @property
+    def endpoint(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def alive(self):
+        """端口可连接，且（如要求握手）代理做出了合法应答"""
+        if self.connect_ms is None or self.error:
+            return False
+        return self.mode is None or self.handshake_ms is not None
+
+    @property
+    def latency_ms(self):
+        """总延迟：连接 + 握手"""
+        if not self.alive:
+            return None
+        return self.connect_ms + (self.handshake_ms or 0.0)
+
+    def __repr__(self):
+        return (f"ProbeResult({self.endpoint}, mode={self.mode}, alive={self.alive}, "
+                f"connect_ms={self.connect_ms}, handshake_ms={self.handshake_ms}, error={self.error!r})")
+
+
+def parse_proxy_server(value):
+    """
+    解析注册表 ProxyServer 值，返回去重后的 (host, port) 列表。
+
+    支持格式：
+      "127.0.0.1:7897"
+      "http://127.0.0.1:7897"
+      "http=127.0.0.1:7897;https=127.0.0.1:7897;socks=127.0.0.1:7898"
+    """
+    endpoints = []
+    for part in (value or "").split(";"):
+        part = part.strip()
+        if "=" in part:
+            part = part.split("=", 1)[1]
+        if "://" in part:
+            part = part.split("://", 1)[1]
+        part = part.rstrip("/")
+        host, sep, port = part.rpartition(":")
+        if not sep or not port.isdigit():
+            continue
+        endpoint = (host.strip("[]"), int(port))
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+def parse_proxy_modes(value):
+    """
+    按协议解析 ProxyServer 值，返回去重后的 ((host, port), 握手模式) 列表：
+    socks= 项和 socks5:// 等地址用 "socks5" 握手，其余用 "http"（CONNECT）。
+    同一端点出现多次时按第一次出现的协议（混合端口只探测一次）。
+    """
+    modes = []
+    seen = set()
+    for part in (value or "").split(";"):
+        kind = part.split("=", 1)[0].strip().lower() if "=" in part else ""
+        scheme = part.split("://", 1)[0].rpartition("=")[2].strip().lower() if "://" in part else ""
+        mode = "socks5" if kind.startswith("socks") or scheme.startswith("socks") else "http"
+        for endpoint in parse_proxy_server(part):
+            if endpoint not in seen:
+                seen.add(endpoint)
+                modes.append((endpoint, mode))
+    return modes
+
+
+async def _http_connect_handshake(reader, writer, target, result):
+    host, port = target
+    writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    status_line = await reader.readline()
+    parts = status_line.decode("latin-1").split()
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ConnectionError(f"非 HTTP 应答: {status_line[:40]!r}")
+    # 任何合法的 HTTP 状态都说明代理在应答（上游不可达时代理会返回 502 等）
+    result.status = int(parts[1])
+
+
+async def _socks5_handshake(reader, writer):
+    writer.write(b"\x05\x01\x00")          # VER=5, 1 种认证方式: 无认证
+    await writer.drain()
+    reply = await reader.readexactly(2)
+    if reply[0] != 0x05:
+        raise ConnectionError(f"非 SOCKS5 应答: {reply!r}")
+    if reply[1] == 0xFF:
+        raise ConnectionError("SOCKS5 代理拒绝了无认证方式")
+
+
+async def probe(host, port, mode=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                handshake_timeout=DEFAULT_HANDSHAKE_TIMEOUT, target=DEFAULT_CONNECT_TARGET):
+    """
+    探测单个端点。
+
+    参数：
+        mode              : None 只测 TCP 连接；"http" 发送 CONNECT；"socks5" 发送 SOCKS5 问候
+        connect_timeout   : TCP 连接截止时间（秒）
+        handshake_timeout : 握手截止时间（秒）
+        target            : HTTP CONNECT 的目标 (host, port)
+    """
+    result = ProbeResult(host, port, mode)
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), connect_timeout)
+    except asyncio.TimeoutError:
+        result.error = f"连接超时（>{connect_timeout * 1000:.0f}ms）"
+        return result
+    except OSError as e:
+        result.error = f"连接失败: {e.strerror or e}"
+        return result
+    result.connect_ms = (time.perf_counter() - start) * 1000
+
+    try:
+        if mode:
+            start = time.perf_counter()
+            if mode == "http":
+                handshake = _http_connect_handshake(reader, writer, target, result)
+            elif mode == "socks5":
+                handshake = _socks5_handshake(reader, writer)
+            else:
+                raise ValueError(f"未知的握手模式: {mode}")
+            await asyncio.wait_for(handshake, handshake_timeout)
+            result.handshake_ms = (time.perf_counter() - start) * 1000
+    except asyncio.TimeoutError:
+        result.error = f"握手超时（>{handshake_timeout * 1000:.0f}ms）"
+    except (OSError, asyncio.IncompleteReadError) as e:
+        result.error = f"握手失败: {e}"
+    finally:
+        writer.close()
+    return result
+
+
+async def probe_many(endpoints, mode=None, **kwargs):
+    """并发探测多个 (host, port) 端点，按输入顺序返回 ProbeResult 列表"""
+    return await asyncio.gather(*(probe(host, port, mode, **kwargs) for host, port in endpoints))
+
+
+def probe_endpoints(endpoints, mode=None, **kwargs):
+    """probe_many 的同步封装"""
+    return asyncio.run(probe_many(list(endpoints), mode, **kwargs))
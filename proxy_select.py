@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+按延迟自动选择代理端点
+
+并发探测所有候选端点（注册表 ProxyServer + 配置中的候选列表），
+按握手延迟和一小段吞吐量采样排名，把最优端点连同排名写入缓存文件（带 TTL）。
+
+缓存文件 ~/.proxy_select.json 同时被 PowerShell Profile 读取：
+Set-AutoProxy 启动时只读缓存（不探测），Lock-Proxy / Enable-Proxy / Sync-ProxyToTools
+在缓存过期时调用本脚本（--force --sample-url）重新排名并写回同一文件。
+
+使用方法:
+    python proxy_select.py                 # 输出当前最优端点（缓存有效时直接返回）
+    python proxy_select.py --force         # 忽略缓存重新探测
+    python proxy_select.py 127.0.0.1:7897 10.0.0.5:3128 --sample-url http://example.com/
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from proxy_probe import DEFAULT_HANDSHAKE_TIMEOUT, parse_proxy_server, probe_many
+
+CACHE_PATH = Path.home() / ".proxy_select.json"
+DEFAULT_TTL = 600                 # 缓存有效期（秒）
+SAMPLE_BYTES = 64 * 1024          # 吞吐量采样读取的字节数上限
+SAMPLE_TIMEOUT = 3.0              # 吞吐量采样截止时间（秒）
+
+
+class Selection:
+    """选择结果：endpoint 为 None 表示没有存活的候选"""
+
+    def __init__(self, endpoint, ranking, timestamp, from_cache=False):
+        self.endpoint = endpoint
+        self.ranking = ranking          # [{"endpoint", "alive", "latency_ms", "throughput", "score_ms"}]
+        self.timestamp = timestamp
+        self.from_cache = from_cache
+
+
+def normalize_candidates(candidates):
+    """把 "host:port" / ProxyServer 字符串展开为去重的 "host:port" 列表，保持顺序"""
+    result = []
+    for candidate in candidates:
+        for host, port in parse_proxy_server(candidate):
+            endpoint = f"{host}:{port}"
+            if endpoint not in result:
+                result.append(endpoint)
+    return result
+
+
+async def measure_throughput(host, port, sample_url, limit=SAMPLE_BYTES, timeout=SAMPLE_TIMEOUT):
+    """通过代理以绝对 URI 请求 sample_url，读取最多 limit 字节，返回字节/秒；失败返回 None"""
+    url = urlsplit(sample_url)
+    request = (f"GET {sample_url} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+               f"Connection: close\r\n\r\n").encode("ascii")
+
+    async def _fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            await reader.readuntil(b"\r\n\r\n")
+            received = 0
+            while received < limit:
+                data = await reader.read(limit - received)
+                if not data:
+                    break
+                received += len(data)
+            elapsed = time.perf_counter() - start
+            return received / elapsed if received and elapsed > 0 else None
+        finally:
+            writer.close()
+
+    try:
+        return await asyncio.wait_for(_fetch(), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+
+
+def score(entry, sample_bytes=SAMPLE_BYTES):
+    """
+    排名分数（毫秒，越小越好）：握手延迟 + 按采样吞吐量估算的传输 sample_bytes 所需时间。
+    没有吞吐量数据时只比较延迟。
+    """
+    latency = entry["latency_ms"]
+    if entry.get("throughput"):
+        return latency + sample_bytes / entry["throughput"] * 1000
+    return latency
+
+
+async def rank_candidates(candidates, sample_url=None, **probe_kwargs):
+    """并发探测并排名，存活的在前、按分数升序"""
+    endpoints = [parse_proxy_server(c)[0] for c in candidates]
+    probes = await probe_many(endpoints, mode="http", **probe_kwargs)
+    alive = [p for p in probes if p.alive]
+    throughputs = {}
+    if sample_url and alive:
+        values = await asyncio.gather(
+            *(measure_throughput(p.host, p.port, sample_url) for p in alive))
+        throughputs = {p.endpoint: v for p, v in zip(alive, values)}
+
+    ranking = []
+    for p in probes:
+        entry = {
+            "endpoint": p.endpoint,
+            "alive": p.alive,
+            "latency_ms": round(p.latency_ms, 2) if p.alive else None,
+            "throughput": round(throughputs[p.endpoint]) if throughputs.get(p.endpoint) else None,
+            "error": p.error,
+        }
+        entry["score_ms"] = round(score(entry), 2) if p.alive else None
+        ranking.append(entry)
+    ranking.sort(key=lambda e: (not e["alive"], e["score_ms"] or 0.0))
+    return ranking
+
+
+def load_cache(cache_path=CACHE_PATH):
+    try:
+        return json.loads(Path(cache_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache(selection, candidates, ttl, cache_path=CACHE_PATH):
+    data = {
+        "endpoint": selection.endpoint,
+        "timestamp": int(selection.timestamp),
+        "ttl": ttl,
+        "candidates": candidates,
+        "ranking": selection.ranking,
+    }
+    try:
+        Path(cache_path).write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    except OSError:
+        pass
+
+
+def cached_selection(candidates, ttl=DEFAULT_TTL, cache_path=CACHE_PATH, now=None):
+    """缓存未过期、候选集合未变化且有存活端点时返回缓存的 Selection，否则返回 None"""
+    cache = load_cache(cache_path)
+    now = time.time() if now is None else now
+    if not cache or not cache.get("endpoint"):
+        return None
+    if now - cache.get("timestamp", 0) >= cache.get("ttl", ttl):
+        return None
+    if set(cache.get("candidates") or []) != set(candidates):
+        return None
+    return Selection(cache["endpoint"], cache.get("ranking", []), cache["timestamp"], from_cache=True)
+
+
+def select_endpoint(candidates, ttl=DEFAULT_TTL, cache_path=CACHE_PATH, sample_url=None,
+                    force=False, now=None, **probe_kwargs):
+    """
+    选择最快的存活代理端点。
+
+    参数：
+        candidates : list  - 候选端点（"host:port" 或 ProxyServer 格式字符串）
+        ttl        : int   - 缓存有效期（秒），0 表示不使用缓存
+        sample_url : str   - 吞吐量采样 URL（通过代理请求），None 时只按延迟排名
+        force      : bool  - 忽略缓存重新探测
+    """
+    candidates = normalize_candidates(candidates)
+    if not candidates:
+        return Selection(None, [], time.time() if now is None else now)
+    if not force and ttl:
+        selection = cached_selection(candidates, ttl, cache_path, now)
+        if selection:
+            return selection
+
+    ranking = asyncio.run(rank_candidates(candidates, sample_url, **probe_kwargs))
+    winner = ranking[0]["endpoint"] if ranking and ranking[0]["alive"] else None
+    selection = Selection(winner, ranking, time.time() if now is None else now)
+    if ttl and winner:
+        save_cache(selection, candidates, ttl, cache_path)
+    return selection
+
+
+def default_candidates(cache_path=CACHE_PATH):
+    """未指定候选时：注册表 ProxyServer + 上次缓存中的候选列表（由 setup.py / Profile 写入）"""
+    candidates = []
+    try:
+        import winreg
+        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
+            candidates.append(winreg.QueryValueEx(key, "ProxyServer")[0])
+    except (ImportError, OSError):
+        pass
+    cache = load_cache(cache_path) or {}
+    return candidates + list(cache.get("candidates") or [])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按延迟选择最快的代理端点")
+    parser.add_argument("candidates", nargs="*", help="候选端点 host:port（默认：注册表 ProxyServer + 缓存中的候选）")
+    parser.add_argument("--force", action="store_true", help="忽略缓存重新探测")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL, help="缓存有效期（秒）")
+    parser.add_argument("--sample-url", help="吞吐量采样 URL（通过代理请求）")
+    parser.add_argument("--handshake-timeout", type=float, default=DEFAULT_HANDSHAKE_TIMEOUT)
+    parser.add_argument("--json", action="store_true", help="输出完整排名（JSON）")
+    args = parser.parse_args(argv)
+
+    selection = select_endpoint(args.candidates or default_candidates(), ttl=args.ttl, sample_url=args.sample_url,
+                                force=args.force, handshake_timeout=args.handshake_timeout)
+    if args.json:
+        print(json.dumps({"endpoint": selection.endpoint, "from_cache": selection.from_cache,
+                          "ranking": selection.ranking}, indent=2, ensure_ascii=False))
+    elif selection.endpoint:
+        print(selection.endpoint)
+    return 0 if selection.endpoint else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+共享代理状态文件（Profile 中 Publish-ProxyState 的 Python 参考实现 + Git Bash / WSL 读取片段）
+
+Git Bash 和 WSL 的 Shell 读不到 PowerShell 检测出的代理，常见的变通办法是在 bashrc 里调用
+reg.exe query 或 powershell.exe，每次启动多花几秒。改为由 PowerShell 发布、Bash 读取：
+
+1. Set-AutoProxy（启动自动检测）和 Lock-Proxy 把当前决定写入 ~/.proxy_env（KEY=VALUE，LF 换行）：
+       PROXY_MODE=proxy            # proxy / direct / dead（代理无应答，回退直连）/ locked
+       PROXY_ENDPOINT=127.0.0.1:7897
+       HTTP_PROXY=http://127.0.0.1:7897
+       HTTPS_PROXY=http://127.0.0.1:7897
+       ALL_PROXY=socks5://127.0.0.1:7897
+       NO_PROXY=localhost,127.0.0.1,::1
+   内容不变时不写；变化时先写临时文件再替换，读取方不会读到写了一半的文件
+2. ~/.proxy_env.sh 用 read 循环逐行读取（去掉 \\r），只用 Bash 内建命令，不启动任何子进程；
+   同时导出大写和小写变量（curl 等 Linux 工具只认小写 http_proxy）。值为空的变量被清除
+3. Git Bash 的 ~/.bash_profile 和各 WSL 发行版的 ~/.bashrc 中加入 source ~/.proxy_env.sh 的受管理片段；
+   片段同时尝试 Git Bash 路径（/c/Users/...）和 WSL 路径（/mnt/c/Users/...）
+
+WSL2 默认（NAT）网络下 127.0.0.1 指向 WSL 自身：设置 PROXY_WSL_HOST（如 Windows 主机地址）后，
+代理地址中的 127.0.0.1 会被替换；镜像网络模式下无需设置。
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import journal
+from init_cache import msys_path
+
+STATE_PATH = Path.home() / ".proxy_env"
+SNIPPET_PATH = Path.home() / ".proxy_env.sh"
+
+PROXY = "proxy"
+DIRECT = "direct"
+DEAD = "dead"
+LOCKED = "locked"
+
+STATE_KEYS = ("PROXY_MODE", "PROXY_ENDPOINT", "HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "NO_PROXY")
+
+BLOCK_START = "# >>> windows_env_setup proxy >>>"
+BLOCK_END = "# <<< windows_env_setup proxy <<<"
+
+
+def format_state(mode, endpoint=None, no_proxy=""):
+    """代理决定 → 状态文件内容（与 Profile 中 Publish-ProxyState 逐字节一致）"""
+    on = mode in (PROXY, LOCKED) and endpoint
+    http = f"http://{endpoint}" if on else ""
+    socks = f"socks5://{endpoint}" if on else ""
+    values = (mode, endpoint or "", http, http, socks, (no_proxy or "") if on else "")
+    return "".join(f"{key}={value}\n" for key, value in zip(STATE_KEYS, values))
+
+
+def write_state(text, path=STATE_PATH):
+    """原子写入状态文件；内容不变时不写，返回是否写入"""
+    path = Path(path)
+    try:
+        if path.read_bytes() == text.encode("utf-8"):
+            return False
+    except OSError:
+        pass
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode("utf-8"))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def read_state(path=STATE_PATH):
+    """读取状态文件 → dict（兼容 CRLF），读不到返回空 dict"""
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except OSError:
+        return {}
+    state = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        if sep and key in STATE_KEYS:
+            state[key] = value.rstrip("\r")
+    return state
+
+
+def wsl_path(path):
+    r"""Windows 路径 → WSL 路径（C:\Users\a → /mnt/c/Users/a）"""
+    path = str(path).replace("\\", "/")
+    if len(path) >= 2 and path[1] == ":":
+        path = f"/mnt/{path[0].lower()}{path[2:]}"
+    return path
+
+
+def _sh_quote(text):
+    return "'" + str(text).replace("'", "'\\''") + "'"
+
+
+_SNIPPET = r'''# windows_env_setup：读取 PowerShell 发布的代理状态（Set-AutoProxy / Lock-Proxy 写入，源码见 proxy_share.py）
+# Git Bash 与 WSL 共用本文件；只用 Bash 内建命令，不启动子进程
+for __pf in {candidates}; do
+    [ -r "$__pf" ] || continue
+    while IFS='=' read -r __pk __pv || [ -n "$__pk" ]; do
+        __pv=${{__pv%$'\r'}}
+        case $__pk in
+            PROXY_MODE|PROXY_ENDPOINT) printf -v "$__pk" '%s' "$__pv" ;;
+            HTTP_PROXY|HTTPS_PROXY|ALL_PROXY|NO_PROXY)
+                if [ -n "$WSL_DISTRO_NAME" ] && [ -n "$PROXY_WSL_HOST" ] && [ "$__pk" != NO_PROXY ]; then
+                    __pv=${{__pv//127.0.0.1/$PROXY_WSL_HOST}}
+                fi
+                if [ -n "$__pv" ]; then
+                    export "$__pk=$__pv" "${{__pk,,}}=$__pv"
+                else
+                    unset "$__pk" "${{__pk,,}}"
+                fi ;;
+        esac
+    done < "$__pf"
+    break
+done
+unset __pf __pk __pv
+'''
+
+
+def render_snippet(state_path=STATE_PATH):
+    """~/.proxy_env.sh 的内容：依次尝试 Git Bash 路径和 WSL 路径"""
+    candidates = list(dict.fromkeys([msys_path(state_path), wsl_path(state_path)]))
+    return _SNIPPET.format(candidates=" ".join(_sh_quote(c) for c in candidates))
+
+
+def render_source_block(snippet_path=SNIPPET_PATH):
+    """Git Bash .bash_profile / WSL .bashrc 中的受管理片段"""
+    lines = [BLOCK_START]
+    for candidate in dict.fromkeys([msys_path(snippet_path), wsl_path(snippet_path)]):
+        lines.append(f"[ -r {_sh_quote(candidate)} ] && . {_sh_quote(candidate)}")
+    lines.append(BLOCK_END)
+    return "\n".join(lines) + "\n"
+
+
+def install_snippet(path=SNIPPET_PATH, state_path=STATE_PATH):
+    """写入 ~/.proxy_env.sh（LF 换行，Bash 不认 CRLF；经回滚日志写入，可撤销），返回是否有变化"""
+    return journal.write_text(path, render_snippet(state_path), newline="\n")
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+常驻 PowerShell 工作进程
+
+每次运行只启动一个 PowerShell 进程，通过 stdin/stdout 以分帧 JSON 协议收发请求，
+把原本 N 次冷启动（每次约 300-800ms）合并为 1 次。
+
+协议（每帧一行，UTF-8）：
+  请求: {"id": 1, "script": "$PSVersionTable.PSVersion.ToString()"}
+  响应: @@PSW@@{"id": 1, "ok": true, "output": "7.4.1", "error": null}
+
+不带 @@PSW@@ 前缀的输出行会被忽略，脚本里的杂散输出不会破坏分帧。
+单个请求超时或工作进程崩溃时，自动杀掉并重启进程。
+
+使用方法:
+    from ps_worker import get_worker
+    version = get_worker("pwsh").query("$PSVersionTable.PSVersion.ToString()")
+"""
+
+import atexit
+import base64
+import json
+import queue
+import subprocess
+import threading
+
+FRAME_PREFIX = "@@PSW@@"
+DEFAULT_TIMEOUT = 15       # 单个请求超时（秒），包含首次冷启动
+MAX_RESTARTS = 2           # 单个请求因进程退出而重试的次数
+
+# 工作进程主循环：逐行读请求，执行脚本，把全部输出流（*>&1）收集后作为一帧写回
+WORKER_SCRIPT = r'''
+$utf8 = New-Object System.Text.UTF8Encoding $false
+$reader = New-Object System.IO.StreamReader([Console]::OpenStandardInput(), $utf8)
+$writer = New-Object System.IO.StreamWriter([Console]::OpenStandardOutput(), $utf8)
+$writer.AutoFlush = $true
+while ($true) {
+    $line = $reader.ReadLine()
+    if ($null -eq $line) { break }
+    if (-not $line.Trim()) { continue }
+    $req = $line | ConvertFrom-Json
+    $resp = [ordered]@{ id = $req.id; ok = $true; output = ""; error = $null }
+    try {
+        $out = & ([scriptblock]::Create($req.script)) *>&1 | Out-String
+        $resp.output = $out.TrimEnd()
+    } catch {
+        $resp.ok = $false
+        $resp.error = "$_"
+    }
+    $writer.WriteLine("@@PSW@@" + ($resp | ConvertTo-Json -Compress))
+}
+'''
+
+
+class PowerShellWorkerError(Exception):
+    """工作进程执行失败（脚本抛出异常、进程反复崩溃等）"""
+
+
+class PowerShellTimeout(PowerShellWorkerError):
+    """请求在超时时间内未返回"""
+
+
+def build_command(exe):
+    """构造启动工作进程的命令行（-EncodedCommand 避免引号和编码问题，stdin 留给协议使用）"""
+    encoded = base64.b64encode(WORKER_SCRIPT.encode("utf-16-le")).decode("ascii")
+    return [exe, "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+class PowerShellWorker:
+    """
+    单个常驻 PowerShell 进程的客户端。
+
+    参数：
+        exe     : str  - powershell.exe / pwsh 等可执行文件
+        command : list - 完整启动命令（测试时传入替身脚本），默认由 build_command(exe) 生成
+        timeout : int  - 默认单请求超时秒数
+    """
+
+    def __init__(self, exe="powershell.exe", command=None, timeout=DEFAULT_TIMEOUT):
+        self.command = command or build_command(exe)
+        self.timeout = timeout
+        self.restarts = 0
+        self._proc = None
+        self._responses = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    # ---------- 进程管理 ----------
+    def start(self):
+        """启动工作进程（已在运行时直接返回）"""
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        self._proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        self._responses = queue.Queue()
+        reader = threading.Thread(
+            target=self._read_frames, args=(self._proc, self._responses), daemon=True
+        )
+        reader.start()
+
+    def _read_frames(self, proc, responses):
+        """后台线程：解析带前缀的响应帧，进程退出时放入 None 作为结束标记"""
+        for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line.startswith(FRAME_PREFIX):
+                continue
+            try:
+                responses.put(json.loads(line[len(FRAME_PREFIX):]))
+            except ValueError:
+                continue
+        responses.put(None)
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=5)
+        except Exception:
+            pass
+
+    def restart(self):
+        """杀掉当前进程并重新启动"""
+        self._kill()
+        self.restarts += 1
+        self.start()
+
+    def close(self):
+        """关闭 stdin 让工作进程自然退出，超时则强制结束"""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=3)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 请求 ----------
+    def _send(self, scripts):
+        """写入一批请求，返回分配的 id 列表"""
+        ids = []
+        frames = []
+        for script in scripts:
+            self._next_id += 1
+            ids.append(self._next_id)
+            frames.append(json.dumps({"id": self._next_id, "script": script}, ensure_ascii=False))
+        self._proc.stdin.write(("\n".join(frames) + "\n").encode("utf-8"))
+        self._proc.stdin.flush()
+        return ids
+
+    def _collect(self, ids, timeout):
+        """按 id 收集响应；进程退出返回 None，超时抛 PowerShellTimeout"""
+        pending = set(ids)
+        results = {}
+        responses = self._responses
+        while pending:
+            try:
+                resp = responses.get(timeout=timeout)
+            except queue.Empty:
+                raise PowerShellTimeout(f"PowerShell 请求超时（{timeout}s）")
+            if resp is None:
+                return None
+            if resp.get("id") in pending:
+                pending.discard(resp["id"])
+                results[resp["id"]] = resp
+        return [results[i] for i in ids]
+
+    def query_many(self, scripts, timeout=None):
+        """
+        批量执行脚本（一次写入、按序返回），任一脚本失败抛 PowerShellWorkerError。
+
+        超时会重启进程后抛出 PowerShellTimeout；进程意外退出时自动重启并重发，
+        最多重试 MAX_RESTARTS 次。
+        """
+        scripts = list(scripts)
+        if not scripts:
+            return []
+        timeout = timeout or self.timeout
+        with self._lock:
+            for _ in range(MAX_RESTARTS + 1):
+                self.start()
+                try:
+                    ids = self._send(scripts)
+                    responses = self._collect(ids, timeout)
+                except PowerShellTimeout:
+                    self.restart()
+                    raise
+                except OSError:
+                    responses = None  # 管道已断开，视为进程退出
+                if responses is not None:
+                    break
+                self.restart()
+            else:
+                raise PowerShellWorkerError("PowerShell 工作进程反复退出")
+
+        outputs = []
+        for resp in responses:
+            if not resp.get("ok"):
+                raise PowerShellWorkerError(resp.get("error") or "PowerShell 脚本执行失败")
+            outputs.append(resp.get("output") or "")
+        return outputs
+
+    def query(self, script, timeout=None):
+        """执行单个脚本，返回其全部输出（去掉末尾空白）"""
+        return self.query_many([script], timeout=timeout)[0]
+
+
+# ---------- 每次运行共享的工作进程 ----------
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(exe="powershell.exe"):
+    """返回 exe 对应的共享工作进程（按需启动，退出时自动关闭）"""
+    with _workers_lock:
+        worker = _workers.get(exe)
+        if worker is None:
+            worker = _workers[exe] = PowerShellWorker(exe)
+        return worker
+
+
+@atexit.register
+def close_workers():
+    """关闭所有共享工作进程"""
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.close()
+        _workers.clear()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+PowerShell 工作进程替身（用于在 Linux 上测试 ps_worker 协议）
+
+与 ps_worker.WORKER_SCRIPT 使用相同的分帧协议，"script" 按以下指令解释：
+  echo:<文本>    原样返回文本
+  sleep:<秒>     睡眠后返回空输出（用于测试超时）
+  error:<信息>   返回 ok=false
+  noise:<文本>   先输出一行不带前缀的杂散文本，再返回文本
+  pid            返回当前进程 PID（用于确认是否复用同一进程）
+  exit           立即退出（用于测试自动重启）
+"""
+
+import json
+import os
+import sys
+import time
+
+FRAME_PREFIX = "@@PSW@@"
+
+
+def handle(script):
+    """执行单条指令，返回 (ok, output, error)"""
+    cmd, _, arg = script.partition(":")
+    if cmd == "echo":
+        return True, arg, None
+    if cmd == "sleep":
+        time.sleep(float(arg))
+        return True, "", None
+    if cmd == "error":
+        return False, "", arg
+    if cmd == "noise":
+        sys.stdout.buffer.write((arg + "\n").encode("utf-8"))
+        return True, arg, None
+    if cmd == "pid":
+        return True, str(os.getpid()), None
+    if cmd == "exit":
+        sys.exit(3)
+    return False, "", f"unknown command: {script}"
+
+
+def main():
+    for raw in sys.stdin.buffer:
+        line = raw.decode("utf-8").strip()
+        if not line:
+            continue
+        req = json.loads(line)
+        ok, output, error = handle(req["script"])
+        resp = {"id": req["id"], "ok": ok, "output": output, "error": error}
+        sys.stdout.buffer.write((FRAME_PREFIX + json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+        sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
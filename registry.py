@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+注册表访问层：按键缓存读取、按键合并写入、环境变量变更通知每次运行最多广播一次
+
+原来的注册表操作分散在各处、逐个值进行：setup_utf8_env 对每个变量分别查询和写入，
+setup_nerd_font 每个字体一次 SetValueEx，check_system_utf8 与 test_setup.py 又各自读取 CodePage 键。
+
+- 读：首次访问某个键时一次枚举出全部值并缓存，之后同一次运行内的读取不再访问注册表
+- 写：set() / delete() 只记入缓冲区，值与当前值相同时直接跳过；flush() 时每个键只打开一次、
+  集中写入该键的全部变更
+- 回滚：设置了 journal 时，flush() 写入前把每个值的旧值记入回滚日志（journal.py）
+- 通知：写入了环境变量键（HKCU\\Environment 或系统级 Environment）时，flush() 广播
+  WM_SETTINGCHANGE("Environment")，每次运行最多一次，已打开的资源管理器等程序据此刷新环境变量
+
+后端可替换：WinregBackend 访问真实注册表，MemoryBackend 用于测试（非 Windows 也可运行）。
+
+使用方法:
+    from registry import HKCU, ENVIRONMENT_KEY, get_registry
+    reg = get_registry()
+    reg.set(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8", "1")
+    reg.flush()
+"""
+
+import threading
+
+HKCU = "HKCU"
+HKLM = "HKLM"
+
+# 值类型（与 winreg 常量取值一致）
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_DWORD = 4
+
+ENVIRONMENT_KEY = r"Environment"
+SYSTEM_ENVIRONMENT_KEY = r"SYSTEM\CurrentControlSet\Control\Session Manager\Environment"
+INTERNET_SETTINGS_KEY = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+CODEPAGE_KEY = r"SYSTEM\CurrentControlSet\Control\Nls\CodePage"
+USER_FONTS_KEY = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\Fonts"
+
+_ENVIRONMENT_KEYS = {(HKCU, ENVIRONMENT_KEY.lower()), (HKLM, SYSTEM_ENVIRONMENT_KEY.lower())}
+
+_DELETED = object()
+
+
+class MemoryBackend:
+    """内存注册表（测试用），记录读写次数与广播次数"""
+
+    def __init__(self, data=None):
+        # data: {(root, path): {name: value 或 (value, type)}}
+        self.keys = {}
+        for (root, path), values in (data or {}).items():
+            self.keys[(root, path.lower())] = {
+                name: value if isinstance(value, tuple) else (value, _value_type(value))
+                for name, value in values.items()}
+        self.reads = 0
+        self.writes = []          # 每次 write_key 一项：(root, path, {name: (value, type) 或 None})
+        self.broadcasts = 0
+
+    def read_key(self, root, path):
+        self.reads += 1
+        values = self.keys.get((root, path.lower()))
+        return None if values is None else dict(values)
+
+    def write_key(self, root, path, changes):
+        self.writes.append((root, path, dict(changes)))
+        values = self.keys.setdefault((root, path.lower()), {})
+        for name, entry in changes.items():
+            if entry is None:
+                values.pop(name, None)
+            else:
+                values[name] = entry
+
+    def broadcast_environment(self):
+        self.broadcasts += 1
+
+
+class WinregBackend:
+    """真实注册表（winreg）"""
+
+    def __init__(self):
+        import winreg
+        self.winreg = winreg
+        self.roots = {HKCU: winreg.HKEY_CURRENT_USER, HKLM: winreg.HKEY_LOCAL_MACHINE}
+
+    def read_key(self, root, path):
+        """一次打开键枚举全部值；键不存在返回 None"""
+        winreg = self.winreg
+        try:
+            key = winreg.OpenKey(self.roots[root], path, 0, winreg.KEY_READ)
+        except FileNotFoundError:
+            return None
+        values = {}
+        with key:
+            index = 0
+            while True:
+                try:
+                    name, value, value_type = winreg.EnumValue(key, index)
+                except OSError:
+                    break
+                values[name] = (value, value_type)
+                index += 1
+        return values
+
+    def write_key(self, root, path, changes):
+        """一次打开（必要时创建）键，写入或删除 changes 中的全部值"""
+        winreg = self.winreg
+        with winreg.CreateKeyEx(self.roots[root], path, 0, winreg.KEY_SET_VALUE) as key:
+            for name, entry in changes.items():
+                if entry is None:
+                    try:
+                        winreg.DeleteValue(key, name)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    winreg.SetValueEx(key, name, 0, entry[1], entry[0])
+
+    def broadcast_environment(self):
+        """广播 WM_SETTINGCHANGE("Environment")，最多等待 5 秒（跳过无响应的窗口）"""
+        import ctypes
+        from ctypes import wintypes
+        HWND_BROADCAST, WM_SETTINGCHANGE, SMTO_ABORTIFHUNG = 0xFFFF, 0x001A, 0x0002
+        result = wintypes.DWORD()
+        ctypes.windll.user32.SendMessageTimeoutW(
+            HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, ctypes.byref(result))
+
+
+def _value_type(value):
+    return REG_DWORD if isinstance(value, int) else REG_SZ
+
+
+class Registry:
+    """带读缓存和写缓冲的注册表访问（线程安全）"""
+
+    def __init__(self, backend=None, journal=None):
+        self.backend = backend if backend is not None else WinregBackend()
+        self.journal = journal    # journal.Journal：flush() 写入前记录旧值，可撤销
+        self._cache = {}          # (root, path 小写) → {name: (value, type)} 或 None（键不存在）
+        self._pending = {}        # (root, path 小写) → (path, {name: (value, type) 或 _DELETED})
+        self._notified = False
+        self._lock = threading.RLock()
+
+    def _key(self, root, path):
+        key = (root, path.lower())
+        if key not in self._cache:
+            self._cache[key] = self.backend.read_key(root, path)
+        return key
+
+    def _current(self, key, name):
+        """当前值（含未写入的缓冲）：(value, type)，不存在返回 None"""
+        pending = self._pending.get(key)
+        if pending and name in pending[1]:
+            entry = pending[1][name]
+            return None if entry is _DELETED else entry
+        return (self._cache[key] or {}).get(name)
+
+    def exists(self, root, path):
+        """键是否存在（含缓冲中将要创建的键）"""
+        with self._lock:
+            key = self._key(root, path)
+            return self._cache[key] is not None or key in self._pending
+
+    def get(self, root, path, name, default=None):
+        """读取一个值；键或值不存在时返回 default"""
+        with self._lock:
+            entry = self._current(self._key(root, path), name)
+            return default if entry is None else entry[0]
+
+    def values(self, root, path):
+        """读取键下的全部值：{name: value}"""
+        with self._lock:
+            key = self._key(root, path)
+            names = set(self._cache[key] or {}) | set(self._pending.get(key, (None, {}))[1])
+            result = {}
+            for name in names:
+                entry = self._current(key, name)
+                if entry is not None:
+                    result[name] = entry[0]
+            return result
+
+    def set(self, root, path, name, value, value_type=None):
+        """缓冲一次写入；与当前值（及类型）相同时跳过，返回是否有变化"""
+        entry = (value, value_type if value_type is not None else _value_type(value))
+        with self._lock:
+            key = self._key(root, path)
+            if self._current(key, name) == entry:
+                return False
+            self._pending.setdefault(key, (path, {}))[1][name] = entry
+            return True
+
+    def delete(self, root, path, name):
+        """缓冲一次删除；值本来就不存在时跳过，返回是否有变化"""
+        with self._lock:
+            key = self._key(root, path)
+            if self._current(key, name) is None:
+                return False
+            self._pending.setdefault(key, (path, {}))[1][name] = _DELETED
+            return True
+
+    def flush(self):
+        """
+        把缓冲的变更写入后端：每个键一次 write_key，只包含与注册表现值不同的值。
+        写入了环境变量键时广播一次变更通知（每个 Registry 实例最多一次）。
+        某个键写入失败时抛出异常，该键的变更保留在缓冲区，已写入的键不受影响。
+        返回写入（含删除）的值个数。
+        """
+        with self._lock:
+            written = 0
+            environment_changed = False
+            for key in list(self._pending):
+                path, changes = self._pending[key]
+                stored = self._cache.get(key) or {}
+                changes = {name: None if entry is _DELETED else entry
+                           for name, entry in changes.items()
+                           if (None if entry is _DELETED else entry) != stored.get(name)}
+                if changes:
+                    if self.journal is not None:
+                        self.journal.record_registry(key[0], path, {name: stored.get(name) for name in changes})
+                    self.backend.write_key(key[0], path, changes)
+                    values = dict(stored)
+                    for name, entry in changes.items():
+                        if entry is None:
+                            values.pop(name, None)
+                        else:
+                            values[name] = entry
+                    self._cache[key] = values
+                    written += len(changes)
+                    environment_changed |= key in _ENVIRONMENT_KEYS
+                del self._pending[key]
+            if environment_changed and not self._notified:
+                self._notified = True
+                try:
+                    self.backend.broadcast_environment()
+                except Exception:
+                    pass          # 通知失败不影响写入结果，新启动的程序仍会读到新值
+            return written
+
+    def invalidate(self, root=None, path=None):
+        """丢弃读缓存（其他程序修改了注册表时）；不指定键则全部丢弃"""
+        with self._lock:
+            if root is None:
+                self._cache.clear()
+            else:
+                self._cache.pop((root, path.lower()), None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+# ---------- 每次运行共享的实例 ----------
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """返回本次运行共享的 Registry（首次调用时创建，读缓存在各步骤间共用）"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry()
+        return _registry
+
+
+def code_page(registry=None):
+    """系统 ANSI 代码页（HKLM\\...\\Nls\\CodePage 的 ACP，UTF-8 为 "65001"）；读不到返回 None"""
+    return (registry or get_registry()).get(HKLM, CODEPAGE_KEY, "ACP")
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+统一的外部命令执行器（基于 asyncio 子进程）
+
+所有外部命令（git/npm/scoop/cmd/pwsh 等）统一经过这里执行：
+- 全局并发上限 MAX_CONCURRENCY，互不依赖的命令可以并发执行
+- 默认超时 DEFAULT_TIMEOUT，卡死的工具会被杀掉，不会阻塞整个流程
+- 统一的解码策略：先按 UTF-8 解码，失败再按控制台代码页（如 GBK/cp936）解码
+- 记录返回码和耗时
+
+不使用 shell=True：命令通过 shutil.which 按 PATHEXT 解析（可直接找到 npm.cmd、scoop.cmd），
+只有传入字符串时才经 shell 执行。
+
+使用方法:
+    from runner import run, run_many
+    result = run(["git", "config", "--global", "--get", "http.proxy"])
+    git, npm = run_many([["git", "--version"], ["npm", "--version"]])
+"""
+
+import asyncio
+import locale
+import shutil
+import sys
+import time
+
+DEFAULT_TIMEOUT = 60       # 默认超时（秒）
+MAX_CONCURRENCY = 4        # 同时运行的外部进程上限
+
+# Python 3.7 在 Windows 上默认使用 SelectorEventLoop，不支持子进程
+if sys.platform == "win32" and sys.version_info < (3, 8):
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+
+def _console_encoding():
+    """当前控制台代码页对应的编码（Windows 下如 cp936），其他平台取 locale 编码"""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            codepage = kernel32.GetConsoleOutputCP() or kernel32.GetOEMCP()
+            return f"cp{codepage}"
+        except Exception:
+            pass
+    return locale.getpreferredencoding(False)
+
+
+CONSOLE_ENCODING = _console_encoding()
+
+
+def decode_output(data):
+    """
+    解码子进程输出：优先 UTF-8，失败则按控制台代码页解码（无法识别的字节替换为 �）。
+    同时统一换行符为 \\n。
+    """
+    if not data:
+        return ""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        try:
+            text = data.decode(CONSOLE_ENCODING, errors="replace")
+        except LookupError:
+            text = data.decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n")
+
+
+class CommandResult:
+    """一次命令执行的结果"""
+
+    def __init__(self, args, returncode=None, stdout="", stderr="",
+                 duration=0.0, timed_out=False, not_found=False):
+        self.args = args
+        self.returncode = returncode    # 未能启动时为 None
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration        # 秒
+        self.timed_out = timed_out
+        self.not_found = not_found      # 可执行文件不存在
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def __repr__(self):
+        return (f"CommandResult(args={self.args!r}, returncode={self.returncode}, "
+                f"duration={self.duration:.3f}, timed_out={self.timed_out})")
+
+
+async def run_async(args, timeout=None, input=None, cwd=None, env=None,
+                    capture=True, semaphore=None, encoding=None):
+    """
+    异步执行一条命令。
+
+    参数：
+        args      : list 或 str - list 直接执行；str 经 shell 执行
+        timeout   : float       - 超时秒数，默认 DEFAULT_TIMEOUT；超时后杀掉进程
+        input     : str/bytes   - 写入 stdin 的内容（str 按 UTF-8 编码）
+        capture   : bool        - False 时输出直接显示在控制台（如安装过程）
+        semaphore : asyncio.Semaphore - 并发限制，run_many 内部传入
+        encoding  : str         - 按此编码严格解码输出（无法解码的字节替换为 �），不回退到控制台代码页；
+                                  用于验证编码本身
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    if isinstance(input, str):
+        input = input.encode("utf-8")
+    pipe = asyncio.subprocess.PIPE if capture else None
+    stdin = asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL
+
+    if semaphore is not None:
+        async with semaphore:
+            return await run_async(args, timeout, input, cwd, env, capture, encoding=encoding)
+
+    start = time.perf_counter()
+    try:
+        if isinstance(args, str):
+            proc = await asyncio.create_subprocess_shell(
+                args, stdin=stdin, stdout=pipe, stderr=pipe, cwd=cwd, env=env)
+        else:
+            exe = shutil.which(args[0])
+            if exe is None:
+                return CommandResult(args, not_found=True)
+            proc = await asyncio.create_subprocess_exec(
+                exe, *args[1:], stdin=stdin, stdout=pipe, stderr=pipe, cwd=cwd, env=env)
+    except (FileNotFoundError, PermissionError):
+        return CommandResult(args, not_found=True, duration=time.perf_counter() - start)
+
+    timed_out = False
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        try:
+            # 孙进程可能仍持有管道，不再无限等待
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), 5)
+        except asyncio.TimeoutError:
+            stdout = stderr = b""
+
+    decode = decode_output if encoding is None else (
+        lambda data: (data or b"").decode(encoding, errors="replace").replace("\r\n", "\n"))
+    return CommandResult(
+        args,
+        returncode=proc.returncode,
+        stdout=decode(stdout),
+        stderr=decode(stderr),
+        duration=time.perf_counter() - start,
+        timed_out=timed_out,
+    )
+
+
+async def _gather(commands, kwargs):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return await asyncio.gather(
+        *(run_async(args, semaphore=semaphore, **kwargs) for args in commands))
+
+
+def run_many(commands, **kwargs):
+    """并发执行多条互不依赖的命令（受 MAX_CONCURRENCY 限制），按输入顺序返回结果列表"""
+    return asyncio.run(_gather(list(commands), kwargs))
+
+
+def run(args, **kwargs):
+    """同步执行一条命令，参数同 run_async，返回 CommandResult"""
+    return run_many([args], **kwargs)[0]
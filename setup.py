@@ -6,15 +6,26 @@ Windows 开发环境自动配置脚本
 使用方法: python setup.py
 """
 
+import argparse
+import base64
 import os
 import sys
 import json
-import subprocess
-import winreg
-import threading
 import time
 from pathlib import Path
 
+import journal
+from journal import BlobStore
+from download import CACHE_DIR, ProgressReporter, asset_sha256, download, github_release, mirror_urls, prune_cache
+from init_cache import FAILED, detect, refresh_all, render_bash, render_powershell, replace_bash_block
+from profile_builder import Budget, BudgetExceeded, Section, build_profile
+from proxy_select import select_endpoint
+import prompts
+import proxy_share
+from ps_worker import get_worker
+from registry import ENVIRONMENT_KEY, HKCU, INTERNET_SETTINGS_KEY, USER_FONTS_KEY, code_page, get_registry
+from runner import run, run_many
+
 # 强制 UTF-8 输出
 sys.stdout.reconfigure(encoding='utf-8')
 sys.stderr.reconfigure(encoding='utf-8')
@@ -25,22 +36,77 @@ PROXY_HTTP = "http://127.0.0.1:33210"
 PROXY_SOCKS = "socks5://127.0.0.1:33211"
 PROXY_HOST_PORT = "127.0.0.1:33210"
 
+# 候选代理端点（同一台机器可能同时运行多个代理，如 Clash 混合端口 + 公司中继）
+# 注册表 ProxyServer 会自动作为第一个候选；选择结果缓存 PROXY_SELECT_TTL 秒
+PROXY_CANDIDATES = [
+    "127.0.0.1:7897",    # Clash Verge 混合端口
+    "127.0.0.1:7890",    # Clash 默认端口
+    PROXY_HOST_PORT,
+]
+PROXY_SELECT_TTL = 600
+# 吞吐量采样地址（经代理以普通 HTTP 请求，读取前 64 KB）：延迟相近的端点按实际传输速度排名
+PROXY_SAMPLE_URL = "http://cachefly.cachefly.net/100kb.test"
+
+# 发布文件的下载镜像（按制品配置）：{url} 为 GitHub 官方下载地址。
+# 前 3 个同时竞速，保留起始速度最快的；传输中速率低于下限或卡住时从断点切换到下一个。
+# 第三方镜像只在已知 SHA-256（DOWNLOAD_SHA256 或 Release API 的 digest）时使用，否则只用 {url}
+DOWNLOAD_MIRRORS = {
+    "powershell": ["{url}", "https://ghfast.top/{url}", "https://gh-proxy.com/{url}"],
+    "nerd_font": ["{url}", "https://ghfast.top/{url}", "https://gh-proxy.com/{url}"],
+}
+# 固定的下载文件 SHA-256（资产文件名 → 十六进制），优先于 GitHub Release API 给出的 digest；
+# 用于锁定特定文件或 API 不可用时，版本更新后需同步修改。例：
+#   "PowerShell-7.5.0-win-x64.zip": "ab12...",
+DOWNLOAD_SHA256 = {}
+
+# 代理存活门控：启动时在预算内连不上代理则本会话回退直连（结果缓存几秒，多终端同时启动只探测一次）
+PROXY_ALIVE_BUDGET_MS = 30
+PROXY_ALIVE_CACHE_TTL = 15
+
+# 启动状态缓存：注册表代理状态未变时跳过用户级环境变量读写；写入时持有单写者锁，超过此秒数的锁视为遗留
+PROXY_STATE_LOCK_STALE = 10
+
+# Profile 构建：按段开关（ssl / utf8 / helpers / proxy），安装时去掉注释；
+# 超出字节数或启动语句数预算时构建失败，不写入 Profile
+PROFILE_MANIFEST = {
+    "ssl": True,        # 跳过 SSL 证书验证的环境变量
+    "utf8": True,       # 控制台与 Python 的 UTF-8 设置
+    "helpers": True,    # Set-AutoProxy 依赖的辅助函数
+    "proxy": True,      # 启动时自动检测代理
+    "integrations": True,   # starship / zoxide / conda / fnm 的缓存初始化与延迟加载（init_cache.py）
+}
+PROFILE_MINIFY = True
+# 分段计时标记：设置环境变量 PROFILE_TIMING_LOG 时把各段耗时追加到该文件（bench_startup.py 使用）
+PROFILE_TIMING = True
+# 预算按四个 Shell 集成全部检测到、且带分段计时标记时的大小留出余量（集成替代的是每次启动运行 init 命令）；
+# 新增内容应在预算内腾出空间，而不是上调预算
+PROFILE_BUDGET_BYTES = 11000
+PROFILE_BUDGET_STATEMENTS = 50
+
+# 启动耗时预算（bench_startup.py 按 p95 检查，毫秒）：wall 为启动进程到退出，其余为 Profile 各段计时
+STARTUP_BUDGET_MS = {
+    "cold": {"wall": 1500},
+    "warm": {"wall": 600, "proxy": 80, "integrations": 50},
+}
+
 
 # ==================== PowerShell Profile 内容 ====================
-POWERSHELL_PROFILE = '''# ========== SSL 证书验证配置（解决缺少根证书问题）==========
+# Profile 由以下命名段拼装（profile_builder.py）：安装时去掉注释和空行，并检查启动成本预算
+PROFILE_SSL = '''# ========== SSL 证书验证配置（解决缺少根证书问题）==========
 # 由于系统缺少 USERTrust ECC 根证书，且无管理员权限安装，配置跳过验证
 $env:NODE_TLS_REJECT_UNAUTHORIZED = "0"  # Node.js
 $env:PYTHONHTTPSVERIFY = "0"             # Python (部分版本)
 $env:GIT_SSL_NO_VERIFY = "true"          # Git (备用)
+'''
 
-# ========== UTF-8 编码设置（解决中文乱码）==========
+PROFILE_UTF8 = '''# ========== UTF-8 编码设置（解决中文乱码）==========
 [Console]::InputEncoding = [Console]::OutputEncoding = [System.Text.Encoding]::UTF8
 $OutputEncoding = [System.Text.Encoding]::UTF8
 $env:PYTHONUTF8 = "1"                   # Python 3.7+ 默认 UTF-8 模式
 $env:PYTHONIOENCODING = "utf-8"         # Python I/O 编码
 $env:LANG = "en_US.UTF-8"
 $env:LC_ALL = "en_US.UTF-8"
-chcp 65001 >$null 2>&1
+# 不调用 chcp 65001：设置 [Console]::OutputEncoding / InputEncoding 已切换控制台代码页，chcp.com 每次启动多一个进程
 
 # 持久化 UTF-8 环境变量到用户级（确保 CMD/Git Bash/-NoProfile 等场景也生效）
 if (-not [Environment]::GetEnvironmentVariable("PYTHONUTF8", "User")) {{
@@ -48,13 +114,10 @@ if (-not [Environment]::GetEnvironmentVariable("PYTHONUTF8", "User")) {{
     [Environment]::SetEnvironmentVariable("PYTHONIOENCODING", "utf-8", "User")
     [Environment]::SetEnvironmentVariable("LANG", "en_US.UTF-8", "User")
 }}
+'''
 
-# ========== 智能代理配置（动态读取注册表，自适应 VPN 客户端端口）==========
-# 兜底默认值（注册表读取失败时使用）
-$PROXY_FALLBACK_HTTP      = "{proxy_http}"
-$PROXY_FALLBACK_SOCKS     = "{proxy_socks}"
-$PROXY_FALLBACK_HOST_PORT = "{proxy_host_port}"
-
+# Set-AutoProxy 依赖的辅助函数（只在调用时读取 $PROXY_* 变量，可先于变量定义）
+PROFILE_HELPERS = r'''# ========== 代理辅助函数（Set-AutoProxy 启动路径使用）==========
 # 从 Windows 系统代理注册表读取当前代理地址（不管 ProxyEnable 状态）
 # 返回格式如 "127.0.0.1:7897"，读不到则返回 $null
 function Get-SystemProxyAddress {{
@@ -64,12 +127,173 @@ function Get-SystemProxyAddress {{
     return $null
 }}
 
-# 启动时自动检测代理：从注册表读取端口，只在值变化时才写用户级环境变量
+# 把注册表 ProxyOverride（代理例外列表）转换为 NO_PROXY，规则与 no_proxy.py 一致：
+# <local> → 回环地址，*.corp.com → .corp.com，10.* → 10.0.0.0/8，无法表达的通配符（如 intranet*）跳过
+function ConvertTo-NoProxy {{
+    param([string]$Override)
+    $entries = [System.Collections.Generic.List[string]]@('localhost', '127.0.0.1', '::1')
+    foreach ($pattern in ($Override -split '[;,\s]+')) {{
+        $entry = $pattern.Trim().ToLower() -replace '^[a-z][a-z0-9+.-]*://', ''
+        if ($entry -match '^\[([^\]]+)\](:\d+)?$' -or $entry -match '^([^:]+):\d+$') {{ $entry = $Matches[1] }}
+        $result = @()
+        if (-not $entry) {{ continue }}
+        elseif ($entry -eq '<local>') {{ $result = @('localhost', '127.0.0.1', '::1') }}
+        elseif ($entry -eq '*') {{ $result = @('*') }}
+        elseif ($entry -match '^\d{{1,3}}(\.(\d{{1,3}}|\*)){{0,3}}$') {{
+            $octets = $entry -split '\.'
+            $cut = [array]::IndexOf($octets, '*')
+            if ($cut -lt 0) {{ $result = @($entry) }}
+            elseif (-not ($octets[$cut..($octets.Count - 1)] | Where-Object {{ $_ -ne '*' }})) {{
+                $result = @(((@($octets[0..($cut - 1)]) + @('0') * (4 - $cut)) -join '.') + "/$(8 * $cut)")
+            }}
+        }}
+        elseif ($entry -match '^\*\.[^*]+$') {{ $result = @($entry.Substring(1)) }}
+        elseif ($entry -notmatch '\*') {{ $result = @($entry) }}
+        foreach ($e in $result) {{ if (-not $entries.Contains($e)) {{ $entries.Add($e) }} }}
+    }}
+    return ($entries -join ',')
+}}
+
+# 只读缓存（不探测，供启动路径使用）：未过期且候选集合包含当前系统代理时返回缓存的端点
+function Get-CachedProxyAddress {{
+    param([string]$SystemProxy = (Get-SystemProxyAddress))
+    if (-not (Test-Path $PROXY_SELECT_CACHE)) {{ return $null }}
+    try {{
+        $cache = Get-Content $PROXY_SELECT_CACHE -Raw | ConvertFrom-Json
+        $age = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds() - $cache.timestamp
+        if ($age -ge $cache.ttl) {{ return $null }}
+        if ($SystemProxy -and $cache.candidates -notcontains $SystemProxy) {{ return $null }}
+        return $cache.endpoint
+    }} catch {{ return $null }}
+}}
+
+# 代理存活门控：非阻塞连接，预算（几十毫秒）内连不上即判定失效
+# 结果缓存 $PROXY_ALIVE_CACHE_TTL 秒（格式 "endpoint|1|unix时间"，与 proxy_gate.py 一致）
+function Test-ProxyAlive {{
+    param([string]$Endpoint, [int]$BudgetMs = $PROXY_ALIVE_BUDGET_MS, [switch]$Force)
+    $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+    if (-not $Force) {{
+        try {{
+            $cached = [IO.File]::ReadAllText($PROXY_ALIVE_CACHE).Trim() -split '\|'
+            if ($cached[0] -eq $Endpoint -and ($now - [long]$cached[2]) -lt $PROXY_ALIVE_CACHE_TTL) {{
+                return $cached[1] -eq '1'
+            }}
+        }} catch {{ }}
+    }}
+    $hostName, $port = $Endpoint -split ':(?=\d+$)'
+    $client = New-Object System.Net.Sockets.TcpClient
+    try {{
+        $alive = $client.ConnectAsync($hostName, [int]$port).Wait($BudgetMs)
+    }} catch {{
+        $alive = $false   # 连接被拒绝等
+    }} finally {{
+        $client.Dispose()
+    }}
+    try {{ [IO.File]::WriteAllText($PROXY_ALIVE_CACHE, "$Endpoint|$([int]$alive)|$now") }} catch {{ }}
+    return $alive
+}}
+
+# 单写者锁：独占创建锁文件（DeleteOnClose，进程崩溃时由系统删除），已被持有则返回 $null 不等待
+# 超过 $PROXY_STATE_LOCK_STALE 秒的遗留锁尝试接管（仍被持有的锁文件删除会失败）
+function Enter-ProxyStateLock {{
+    $lockPath = "$PROXY_STATE_CACHE.lock"
+    for ($attempt = 0; $attempt -lt 2; $attempt++) {{
+        try {{
+            return [IO.FileStream]::new($lockPath, 'CreateNew', 'Write', 'None', 1, 'DeleteOnClose')
+        }} catch {{
+            try {{
+                $age = ([DateTime]::UtcNow - [IO.File]::GetLastWriteTimeUtc($lockPath)).TotalSeconds
+                if ($age -lt $PROXY_STATE_LOCK_STALE) {{ return $null }}
+                [IO.File]::Delete($lockPath)
+            }} catch {{ return $null }}
+        }}
+    }}
+    return $null
+}}
+
+# 启动状态缓存：$PROXY_STATE_CACHE 记录上次写入用户级环境变量时的注册表状态（与 startup_cache.py 一致）
+# 状态未变时跳过全部用户级变量读写；变化时在锁内逐个比较，只写变化的变量
+# 多个终端同时启动时只有取得锁的一个写注册表，其余跳过（当前会话变量已设置好）
+function Sync-UserProxyEnv {{
+    param([string]$StateKey, [string]$HttpProxy, [string]$SocksProxy, [string]$NoProxy)
+    try {{ if ([IO.File]::ReadAllText($PROXY_STATE_CACHE) -eq $StateKey) {{ return }} }} catch {{ }}
+    $lock = Enter-ProxyStateLock
+    if (-not $lock) {{ return }}
+    try {{
+        try {{ if ([IO.File]::ReadAllText($PROXY_STATE_CACHE) -eq $StateKey) {{ return }} }} catch {{ }}
+        $desired = [ordered]@{{ HTTP_PROXY = $HttpProxy; HTTPS_PROXY = $HttpProxy; ALL_PROXY = $SocksProxy; NO_PROXY = $NoProxy }}
+        foreach ($name in $desired.Keys) {{
+            $value = if ($desired[$name]) {{ $desired[$name] }} else {{ $null }}
+            if ([Environment]::GetEnvironmentVariable($name, "User") -ne $value) {{
+                [Environment]::SetEnvironmentVariable($name, $value, "User")
+            }}
+        }}
+        [IO.File]::WriteAllText($PROXY_STATE_CACHE, $StateKey)
+    }} finally {{
+        $lock.Dispose()
+    }}
+}}
+
+# 把代理决定发布到 $PROXY_SHARED_STATE，供 Git Bash / WSL 读取（格式与 proxy_share.py 一致）
+# 内容不变时不写；先写临时文件再替换，读取方不会读到写了一半的文件
+function Publish-ProxyState {{
+    param([string]$Mode, [string]$Endpoint, [string]$NoProxy)
+    $h = $s = ""
+    if ($Endpoint -and $Mode -in 'proxy', 'locked') {{ $h = "http://$Endpoint"; $s = "socks5://$Endpoint" }} else {{ $NoProxy = "" }}
+    $text = "PROXY_MODE=$Mode`nPROXY_ENDPOINT=$Endpoint`nHTTP_PROXY=$h`nHTTPS_PROXY=$h`nALL_PROXY=$s`nNO_PROXY=$NoProxy`n"
+    $f = $PROXY_SHARED_STATE; $tmp = "$f.$PID.tmp"
+    try {{ if ([IO.File]::ReadAllText($f) -eq $text) {{ return }} }} catch {{ }}
+    try {{
+        [IO.File]::WriteAllText($tmp, $text)
+        if ([IO.File]::Exists($f)) {{ [IO.File]::Replace($tmp, $f, $null) }} else {{ [IO.File]::Move($tmp, $f) }}
+    }} catch {{ try {{ [IO.File]::Delete($tmp) }} catch {{ }} }}
+}}
+'''
+
+PROFILE_PROXY = r'''# ========== 智能代理配置（动态读取注册表，自适应 VPN 客户端端口）==========
+# 兜底默认值（注册表读取失败时使用）
+$PROXY_FALLBACK_HTTP      = "{proxy_http}"
+$PROXY_FALLBACK_SOCKS     = "{proxy_socks}"
+$PROXY_FALLBACK_HOST_PORT = "{proxy_host_port}"
+$PROXY_CANDIDATES         = @({proxy_candidates})
+$PROXY_SELECT_CACHE       = "$env:USERPROFILE\.proxy_select.json"
+$PROXY_SELECT_TTL         = {proxy_select_ttl}
+$PROXY_ALIVE_BUDGET_MS    = {proxy_alive_budget_ms}
+$PROXY_ALIVE_CACHE_TTL    = {proxy_alive_cache_ttl}
+$PROXY_ALIVE_CACHE        = "$env:TEMP\proxy_alive.txt"
+$PROXY_STATE_CACHE        = "$env:TEMP\proxy_state.txt"
+$PROXY_STATE_LOCK_STALE   = {proxy_state_lock_stale}
+$PROXY_SHARED_STATE       = "$env:USERPROFILE\.proxy_env"
+
+# 启动时自动检测代理：从注册表读取端口，注册表状态变化时才读写用户级环境变量
 function Set-AutoProxy {{
+    param([switch]$Force)
     $regPath     = "HKCU:\Software\Microsoft\Windows\CurrentVersion\Internet Settings"
     $props       = Get-ItemProperty -Path $regPath -ErrorAction SilentlyContinue
     $proxyEnable = $props.ProxyEnable
     $proxyServer = $props.ProxyServer   # 如 "127.0.0.1:7897"
+    $noProxy     = ConvertTo-NoProxy $props.ProxyOverride   # 例外列表（内网/本机不走代理）
+
+    # 已有未过期的测速结果时使用最快端点（只读缓存文件，不在启动时探测）
+    if ($proxyServer) {{
+        $cached = Get-CachedProxyAddress -SystemProxy $proxyServer
+        if ($cached) {{ $proxyServer = $cached }}
+    }}
+    $stateKey = "$proxyEnable|$proxyServer|$($props.ProxyOverride)"
+
+    # 代理已开启但没有应答（客户端崩溃/未启动）：本会话回退直连，避免每个命令都等连接超时
+    # 用户级环境变量保持不变，代理恢复后新终端自动用回
+    $global:ProxyDeadEndpoint = $null
+    if ($proxyEnable -eq 1 -and $proxyServer -and -not (Test-ProxyAlive $proxyServer -Force:$Force)) {{
+        $env:HTTP_PROXY  = $null
+        $env:HTTPS_PROXY = $null
+        $env:ALL_PROXY   = $null
+        $env:NO_PROXY    = $null
+        $global:ProxyDeadEndpoint = $proxyServer
+        Publish-ProxyState dead $proxyServer
+        Write-Host "[Proxy] $proxyServer not responding, using direct connection ('Set-AutoProxy -Force' to retry)" -ForegroundColor Red
+        return
+    }}
 
     if ($proxyEnable -eq 1 -and $proxyServer) {{
         $httpProxy  = "http://$proxyServer"
@@ -79,42 +303,119 @@ function Set-AutoProxy {{
         $env:HTTP_PROXY  = $httpProxy
         $env:HTTPS_PROXY = $httpProxy
         $env:ALL_PROXY   = $socksProxy
+        $env:NO_PROXY    = $noProxy     # Windows 环境变量不区分大小写，no_proxy 同时生效
 
-        # 只在值变化时写注册表，避免每次启动都写（节省约 150-300ms）
-        $currentHttp = [Environment]::GetEnvironmentVariable("HTTP_PROXY", "User")
-        if ($currentHttp -ne $httpProxy) {{
-            [Environment]::SetEnvironmentVariable("HTTP_PROXY",  $httpProxy,  "User")
-            [Environment]::SetEnvironmentVariable("HTTPS_PROXY", $httpProxy,  "User")
-            [Environment]::SetEnvironmentVariable("ALL_PROXY",   $socksProxy, "User")
-        }}
+        # 只在注册表状态变化时读写用户级变量，避免每次启动都读写（节省约 150-300ms）
+        Sync-UserProxyEnv $stateKey $httpProxy $socksProxy $noProxy
+        Publish-ProxyState proxy $proxyServer $noProxy
 
         Write-Host "[Proxy] $httpProxy (use 'Sync-ProxyToTools' to sync to git/npm/scoop)" -ForegroundColor Green
     }} else {{
         $env:HTTP_PROXY  = $null
         $env:HTTPS_PROXY = $null
         $env:ALL_PROXY   = $null
+        $env:NO_PROXY    = $null
 
         # 只在已设置时才清除，避免不必要的注册表写入
-        $currentHttp = [Environment]::GetEnvironmentVariable("HTTP_PROXY", "User")
-        if ($currentHttp) {{
-            [Environment]::SetEnvironmentVariable("HTTP_PROXY",  $null, "User")
-            [Environment]::SetEnvironmentVariable("HTTPS_PROXY", $null, "User")
-            [Environment]::SetEnvironmentVariable("ALL_PROXY",   $null, "User")
-        }}
+        Sync-UserProxyEnv $stateKey
+        Publish-ProxyState direct
 
         Write-Host "[Proxy] Direct connection" -ForegroundColor Yellow
     }}
 }}
 
+# Sync-ProxyToTools、Enable/Disable-Proxy、Get-ProxyStatus、Lock/Unlock-Proxy、Update-Env、Get-ProxyHelp
+# 及别名 proxy / proxy-sync / proxy-status / us 在 ProxyTools 模块中，首次使用时由 PowerShell 自动加载
+
+# 启动时自动检测（快速，约 50ms）
+Set-AutoProxy
+'''
+PROFILE_SECTIONS = [
+    Section("ssl", PROFILE_SSL),
+    Section("utf8", PROFILE_UTF8),
+    Section("helpers", PROFILE_HELPERS),
+    Section("proxy", PROFILE_PROXY, requires=("helpers",)),
+    Section("integrations", "{shell_integrations}"),
+]
+
+# 精简后仍保留的首行（含“智能代理配置”，setup_powershell_profile 据此识别受管理的 Profile）
+PROFILE_HEADER = "# ========== 智能代理配置（由 windows_env_setup 生成，已去除注释；源码见 setup.py）=========="
+
+# ==================== 代理命令模块（ProxyTools.psm1，按需自动加载）====================
+# 启动时不需要的命令放在模块里：Profile 只保留 Set-AutoProxy 及其依赖，
+# 模块由命令自动发现在首次调用时加载。模块函数可直接读取 Profile 中定义的全局 $PROXY_* 变量。
+PROXY_MODULE_NAME = "ProxyTools"
+PROXY_MODULE_FUNCTIONS = [
+    "Get-FastestProxyAddress", "Sync-ProxyToTools", "Enable-Proxy", "Disable-Proxy",
+    "Get-ProxyStatus", "Lock-Proxy", "Unlock-Proxy", "Update-Env", "Get-ProxyHelp",
+]
+PROXY_MODULE_ALIASES = ["proxy", "proxy-sync", "proxy-status", "us"]
+
+PROXY_MODULE = r'''# ProxyTools：代理管理命令（由 windows_env_setup 生成，首次使用时自动加载）
+
+# 代理端点排名由 proxy_select.py 完成（缓存过期时调用）
+$PROXY_SELECT_PYTHON = '{select_python}'
+$PROXY_SELECT_SCRIPT = '{select_script}'
+$PROXY_SAMPLE_URL    = '{sample_url}'
+
+# 当前注册表例外列表对应的 NO_PROXY 值
+function Get-NoProxyValue {{
+    $regPath = "HKCU:\Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+    return ConvertTo-NoProxy (Get-ItemProperty -Path $regPath -ErrorAction SilentlyContinue).ProxyOverride
+}}
+
+# 候选端点列表：注册表 ProxyServer 排第一，其后是配置的候选（去重）
+function Get-ProxyCandidates {{
+    param([string]$SystemProxy = (Get-SystemProxyAddress))
+    $candidates = @()
+    if ($SystemProxy) {{ $candidates += $SystemProxy }}
+    foreach ($c in $PROXY_CANDIDATES) {{ if ($candidates -notcontains $c) {{ $candidates += $c }} }}
+    return $candidates
+}}
+
+# 选择最快的存活代理端点：缓存有效时直接返回，否则调用 proxy_select.py 重新排名（握手延迟 + 吞吐量采样），
+# 结果由它写回同一缓存文件。选择逻辑只在 Python 中实现一份，这里不再自行判断
+function Get-FastestProxyAddress {{
+    param([switch]$Force)
+    $systemProxy = Get-SystemProxyAddress
+    if (-not $Force) {{
+        $cached = Get-CachedProxyAddress -SystemProxy $systemProxy
+        if ($cached) {{ return $cached }}
+    }}
+    if (-not (Test-Path -LiteralPath $PROXY_SELECT_SCRIPT)) {{ return $null }}
+    $candidates = Get-ProxyCandidates -SystemProxy $systemProxy
+    $best = & $PROXY_SELECT_PYTHON $PROXY_SELECT_SCRIPT --force --ttl $PROXY_SELECT_TTL `
+        --sample-url $PROXY_SAMPLE_URL @candidates 2>$null
+    if ($LASTEXITCODE -eq 0 -and $best) {{ return "$($best | Select-Object -Last 1)".Trim() }}
+    return $null
+}}
+
+# 用户级代理变量被手动改写后（Lock-Proxy / Sync-ProxyToTools）使启动状态缓存失效
+function Clear-ProxyStateCache {{
+    try {{ [IO.File]::Delete($PROXY_STATE_CACHE) }} catch {{ }}
+}}
+
 # 同步代理设置到外部工具（手动调用，耗时约 3-4 秒）
 function Sync-ProxyToTools {{
     if ($env:HTTP_PROXY) {{
+        # 同步前切换到当前最快的存活端点，避免把已失效的端点写入各工具
+        $best = Get-FastestProxyAddress
+        if ($best -and $env:HTTP_PROXY -ne "http://$best") {{
+            $env:HTTP_PROXY  = "http://$best"
+            $env:HTTPS_PROXY = "http://$best"
+            $env:ALL_PROXY   = "socks5://$best"
+            Write-Host "[Proxy] Switched to fastest endpoint: $best" -ForegroundColor Cyan
+        }}
+
         Write-Host "Syncing proxy to tools..." -ForegroundColor Cyan
+        $env:NO_PROXY = Get-NoProxyValue   # 例外列表可能在启动后被修改，重新读取
 
-        # 设置用户级环境变量（对新进程永久生效）
+        # 设置用户级环境变量（对新进程永久生效；git/curl/pip 通过 NO_PROXY 跳过例外地址）
         [Environment]::SetEnvironmentVariable("HTTP_PROXY", $env:HTTP_PROXY, "User")
         [Environment]::SetEnvironmentVariable("HTTPS_PROXY", $env:HTTPS_PROXY, "User")
         [Environment]::SetEnvironmentVariable("ALL_PROXY", $env:ALL_PROXY, "User")
+        [Environment]::SetEnvironmentVariable("NO_PROXY", $env:NO_PROXY, "User")
+        Clear-ProxyStateCache
 
         # 配置各工具
         git config --global http.proxy $env:ALL_PROXY 2>$null
@@ -122,6 +423,7 @@ function Sync-ProxyToTools {{
         scoop config proxy ($env:HTTP_PROXY -replace '^https?://', '') 2>$null
         npm config set proxy $env:HTTP_PROXY 2>$null
         npm config set https-proxy $env:HTTP_PROXY 2>$null
+        npm config set noproxy $env:NO_PROXY 2>$null
 
         Write-Host "[Sync] Proxy synced to git/scoop/npm + user env" -ForegroundColor Green
     }} else {{
@@ -131,6 +433,8 @@ function Sync-ProxyToTools {{
         [Environment]::SetEnvironmentVariable("HTTP_PROXY", $null, "User")
         [Environment]::SetEnvironmentVariable("HTTPS_PROXY", $null, "User")
         [Environment]::SetEnvironmentVariable("ALL_PROXY", $null, "User")
+        [Environment]::SetEnvironmentVariable("NO_PROXY", $null, "User")
+        Clear-ProxyStateCache
 
         # 清除工具配置
         git config --global --unset http.proxy 2>$null
@@ -138,14 +442,15 @@ function Sync-ProxyToTools {{
         scoop config rm proxy 2>$null
         npm config delete proxy 2>$null
         npm config delete https-proxy 2>$null
+        npm config delete noproxy 2>$null
 
         Write-Host "[Sync] Proxy cleared from all tools" -ForegroundColor Yellow
     }}
 }}
 
-# 手动开启代理（优先从注册表读取当前端口，兜底用默认值）
+# 手动开启代理（在注册表端口和候选端点中选最快的存活端点，兜底用默认值）
 function Enable-Proxy {{
-    $proxyServer = Get-SystemProxyAddress
+    $proxyServer = Get-FastestProxyAddress
     if (-not $proxyServer) {{ $proxyServer = $PROXY_FALLBACK_HOST_PORT }}
     $httpProxy  = "http://$proxyServer"
     $socksProxy = "socks5://$proxyServer"
@@ -153,6 +458,7 @@ function Enable-Proxy {{
     $env:HTTP_PROXY  = $httpProxy
     $env:HTTPS_PROXY = $httpProxy
     $env:ALL_PROXY   = $socksProxy
+    $env:NO_PROXY    = Get-NoProxyValue
     Write-Host "[Proxy] Enabled: $httpProxy (session)" -ForegroundColor Green
 
     # 询问是否同步到工具
@@ -167,6 +473,7 @@ function Disable-Proxy {{
     $env:HTTP_PROXY = $null
     $env:HTTPS_PROXY = $null
     $env:ALL_PROXY = $null
+    $env:NO_PROXY = $null
     Write-Host "[Proxy] Disabled (session)" -ForegroundColor Yellow
 
     # 询问是否清除工具配置
@@ -190,6 +497,10 @@ function Get-ProxyStatus {{
         Write-Host "  Mode:        " -NoNewline; Write-Host "Auto-detect (follow system settings)" -ForegroundColor Yellow
     }}
 
+    if ($global:ProxyDeadEndpoint) {{
+        Write-Host "  Warning:     " -NoNewline; Write-Host "$global:ProxyDeadEndpoint not responding at startup, session is direct" -ForegroundColor Red
+    }}
+
     Write-Host "  ------------------------------------------------------------" -ForegroundColor DarkGray
 
     # 当前会话环境变量（完整显示三个地址）
@@ -198,6 +509,7 @@ function Get-ProxyStatus {{
         Write-Host "    HTTP_PROXY   = $env:HTTP_PROXY" -ForegroundColor Green
         Write-Host "    HTTPS_PROXY  = $env:HTTPS_PROXY" -ForegroundColor Green
         Write-Host "    ALL_PROXY    = $env:ALL_PROXY" -ForegroundColor Green
+        Write-Host "    NO_PROXY     = $env:NO_PROXY" -ForegroundColor Green
     }} else {{
         Write-Host "    (not set)" -ForegroundColor Gray
     }}
@@ -207,10 +519,12 @@ function Get-ProxyStatus {{
     $uHttp  = [Environment]::GetEnvironmentVariable("HTTP_PROXY", "User")
     $uHttps = [Environment]::GetEnvironmentVariable("HTTPS_PROXY", "User")
     $uAll   = [Environment]::GetEnvironmentVariable("ALL_PROXY", "User")
+    $uNo    = [Environment]::GetEnvironmentVariable("NO_PROXY", "User")
     if ($uHttp) {{
         Write-Host "    HTTP_PROXY   = $uHttp" -ForegroundColor Green
         Write-Host "    HTTPS_PROXY  = $uHttps" -ForegroundColor Green
         Write-Host "    ALL_PROXY    = $uAll" -ForegroundColor Green
+        Write-Host "    NO_PROXY     = $uNo" -ForegroundColor Green
     }} else {{
         Write-Host "    (not set)" -ForegroundColor Gray
     }}
@@ -231,12 +545,16 @@ function Get-ProxyStatus {{
     # npm 配置
     $npmProxy  = npm config get proxy 2>$null
     $npmHttps  = npm config get https-proxy 2>$null
+    $npmNo     = npm config get noproxy 2>$null
     Write-Host "  npm:" -ForegroundColor White
     if ($npmProxy -and $npmProxy -ne "null") {{
         Write-Host "    proxy        = $npmProxy" -ForegroundColor Green
         if ($npmHttps -and $npmHttps -ne "null") {{
             Write-Host "    https-proxy  = $npmHttps" -ForegroundColor Green
         }}
+        if ($npmNo -and $npmNo -ne "null") {{
+            Write-Host "    noproxy      = $npmNo" -ForegroundColor Green
+        }}
     }} else {{
         Write-Host "    (not configured)" -ForegroundColor Gray
     }}
@@ -256,7 +574,7 @@ function Get-ProxyStatus {{
 
 # ========== 代理锁定功能（固定代理状态，不跟随系统设置）==========
 function Lock-Proxy {{
-    $proxyServer = Get-SystemProxyAddress
+    $proxyServer = Get-FastestProxyAddress
     if (-not $proxyServer) {{ $proxyServer = $PROXY_FALLBACK_HOST_PORT }}
     $httpProxy  = "http://$proxyServer"
     $socksProxy = "socks5://$proxyServer"
@@ -264,10 +582,14 @@ function Lock-Proxy {{
     $env:HTTP_PROXY  = $httpProxy
     $env:HTTPS_PROXY = $httpProxy
     $env:ALL_PROXY   = $socksProxy
+    $env:NO_PROXY    = Get-NoProxyValue
     [Environment]::SetEnvironmentVariable("HTTP_PROXY",  $httpProxy,  "User")
     [Environment]::SetEnvironmentVariable("HTTPS_PROXY", $httpProxy,  "User")
     [Environment]::SetEnvironmentVariable("ALL_PROXY",   $socksProxy, "User")
+    [Environment]::SetEnvironmentVariable("NO_PROXY",    $env:NO_PROXY, "User")
+    Clear-ProxyStateCache
     New-Item -Path "$env:USERPROFILE\.proxy_lock" -ItemType File -Force >$null
+    Publish-ProxyState locked $proxyServer $env:NO_PROXY
     Write-Host "[Proxy] Locked: $httpProxy" -ForegroundColor Green
     Write-Host "        proxy keeps ON regardless of system settings" -ForegroundColor Gray
 }}
@@ -304,8 +626,21 @@ Set-Alias -Name proxy -Value Get-ProxyHelp
 Set-Alias -Name proxy-sync -Value Sync-ProxyToTools
 Set-Alias -Name proxy-status -Value Get-ProxyStatus
 Set-Alias -Name us -Value Update-Env
-# 启动时自动检测（快速，约 50ms）
-Set-AutoProxy
+
+Export-ModuleMember -Function {functions} -Alias {aliases}
+'''
+
+PROXY_MODULE_MANIFEST = '''@{{
+    RootModule        = '{name}.psm1'
+    ModuleVersion     = '1.0.0'
+    GUID              = '5b0f6a3e-8f2d-4c1e-9a57-3d2e7c4b9f10'
+    Description       = 'Proxy commands for windows_env_setup (auto-loaded on first use)'
+    PowerShellVersion = '5.1'
+    FunctionsToExport = @({functions})
+    CmdletsToExport   = @()
+    VariablesToExport = @()
+    AliasesToExport   = @({aliases})
+}}
 '''
 
 
@@ -342,16 +677,10 @@ def get_pwsh_path():
                 if pwsh_exe.exists():
                     return str(pwsh_exe)
 
-    # 尝试用 where 命令（兼容 GBK 编码输出）
-    try:
-        result = subprocess.run(
-            ["where", "pwsh"], capture_output=True, text=True,
-            encoding="gbk", errors="replace"
-        )
-        if result.returncode == 0:
-            return result.stdout.strip().split("\n")[0]
-    except Exception:
-        pass
+    # 尝试用 where 命令（runner 自动处理 GBK 编码输出）
+    result = run(["where", "pwsh"], timeout=10)
+    if result.ok and result.stdout.strip():
+        return result.stdout.strip().split("\n")[0]
 
     return None
 
@@ -359,17 +688,38 @@ def get_pwsh_path():
 def get_ps5_version():
     """获取当前 Windows PowerShell 5.x 版本号（如 5.1.22621.1）"""
     try:
-        # 用 -Command 而非 -File，避免编码问题
-        result = subprocess.run(
-            ["powershell.exe", "-NoProfile", "-NonInteractive",
-             "-Command", "$PSVersionTable.PSVersion.ToString()"],
-            capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
+        # 通过常驻工作进程查询，本次运行后续的 PowerShell 查询复用同一进程
+        return get_worker("powershell.exe").query("$PSVersionTable.PSVersion.ToString()") or None
     except Exception:
-        pass
-    return None
+        return None
+
+
+def download_artifact(name, url, dest, release=None):
+    """
+    从 DOWNLOAD_MIRRORS[name] 配置的镜像下载 url（竞速 + 中途故障转移），返回 DownloadResult。
+    期望的 SHA-256 优先取 DOWNLOAD_SHA256，其次取 release（GitHub Release API 信息）中该资产的 digest；
+    校验通过的文件按哈希存入本地下载缓存，下次直接复用。
+    """
+    asset = url.rsplit("/", 1)[-1]
+    sha256 = DOWNLOAD_SHA256.get(asset) or (asset_sha256(release, asset) if release else None)
+    cache = BlobStore(CACHE_DIR)
+    reporter = ProgressReporter()
+    try:
+        result = download(mirror_urls(url, DOWNLOAD_MIRRORS.get(name, ["{url}"])), dest, sha256=sha256,
+                          cache=cache, progress=reporter)
+    finally:
+        reporter.finish()
+    if result.cached:
+        print_ok(f"使用本地缓存: {asset}（SHA-256 已校验）")
+    else:
+        if result.url != url:
+            print_ok(f"使用镜像: {result.url}")
+        if sha256:
+            print_ok(f"SHA-256 校验通过: {sha256[:16]}...")
+        else:
+            print_warn(f"{asset} 没有可用的 SHA-256，只从官方地址下载，仅校验了文件长度")
+    prune_cache(cache)
+    return result
 
 
 def get_latest_powershell_version():
@@ -378,16 +728,10 @@ def get_latest_powershell_version():
     失败时返回 None，不阻塞主流程。
     """
     try:
-        import urllib.request
-        url = "https://api.github.com/repos/PowerShell/PowerShell/releases/latest"
-        proxy_handler = urllib.request.ProxyHandler()
-        opener = urllib.request.build_opener(proxy_handler)
-        with opener.open(url, timeout=10) as resp:
-            import json as _json
-            data = _json.loads(resp.read().decode())
-            tag = data.get("tag_name", "")
-            # tag_name 格式如 "v7.4.0"，去掉 'v' 前缀
-            return tag.lstrip("v")
+        # Release 信息在本次运行内缓存，install_powershell7 取资产 digest 时不再请求
+        tag = github_release("PowerShell/PowerShell").get("tag_name", "")
+        # tag_name 格式如 "v7.4.0"，去掉 'v' 前缀
+        return tag.lstrip("v")
     except Exception:
         return None
 
@@ -428,15 +772,10 @@ def check_and_prompt_powershell_upgrade():
         print("")
         print(f"  推荐安装 PowerShell 7（支持现代脚本、跨平台、更好性能）")
         print("")
-        while True:
-            choice = input(f"  是否安装 PowerShell 7？ [Y/n]: ").strip().lower()
-            if choice in ("", "y", "yes"):
-                return "upgrade"
-            elif choice in ("n", "no"):
-                print_ok("跳过安装，仅配置当前 PowerShell 5.x")
-                return "skip"
-            else:
-                print("  无效输入，请输入 Y 或 n")
+        if prompts.ask("powershell7", "  是否安装 PowerShell 7？ [Y/n]: ") == "y":
+            return "upgrade"
+        print_ok("跳过安装，仅配置当前 PowerShell 5.x")
+        return "skip"
 
     return "none"
 
@@ -446,8 +785,6 @@ def install_powershell7():
     下载并安装 PowerShell 7（用户级安装，无需管理员权限）。
     安装完成后返回 pwsh.exe 路径，失败返回 None。
     """
-    import urllib.request
-
     latest = get_latest_powershell_version()
     if not latest:
         print_err("无法获取 PowerShell 7 版本号，安装取消")
@@ -466,22 +803,7 @@ def install_powershell7():
         with __import__("tempfile").NamedTemporaryFile(suffix=".zip", delete=False) as f:
             tmp_zip = f.name
 
-        proxy_handler = urllib.request.ProxyHandler()
-        opener = urllib.request.build_opener(proxy_handler)
-        with opener.open(zip_url, timeout=180) as resp, open(tmp_zip, "wb") as out:
-            total = int(resp.headers.get("Content-Length", 0))
-            downloaded = 0
-            chunk = 65536
-            while True:
-                data = resp.read(chunk)
-                if not data:
-                    break
-                out.write(data)
-                downloaded += len(data)
-                if total:
-                    pct = downloaded * 100 // total
-                    print(f"\r    进度: {pct:3d}%  ({downloaded//1024//1024} MB)", end="", flush=True)
-        print()
+        download_artifact("powershell", zip_url, tmp_zip, release=github_release("PowerShell/PowerShell"))
         print_ok("下载完成，正在解压...")
 
         # 解压到用户目录
@@ -511,55 +833,6 @@ def install_powershell7():
                 pass
 
 
-# ----------------------------------------------------------------------
-# 通用工具
-# ----------------------------------------------------------------------
-class _InputResult:
-    """用于在线程间传递输入结果的简单容器"""
-    def __init__(self):
-        self.value = None
-        self.event = threading.Event()
-
-
-def prompt_with_timeout(prompt_text, timeout=15, default="y"):
-    """
-    显示提示并等待用户输入，超时后返回默认值。
-
-    参数：
-        prompt_text : str  - 提示文字（如 "是否下载字体？[Y/n]: "）
-        timeout      : int  - 超时秒数，默认 15 秒
-        default      : str  - 超时后返回的值，"y" 或 "n"
-
-    返回：
-        "y" 或 "n"
-    """
-    result = _InputResult()
-
-    def _read():
-        try:
-            result.value = input(prompt_text).strip().lower()
-        except Exception:
-            result.value = None
-        result.event.set()
-
-    t = threading.Thread(target=_read, daemon=True)
-    t.start()
-    t.join(timeout=timeout)
-
-    if not result.event.is_set():
-        # 超时
-        print(f"（等待 {timeout}s 无响应，默认 {default}）")
-        return default
-
-    val = result.value
-    if val in ("y", "yes", ""):
-        return "y"
-    elif val in ("n", "no"):
-        return "n"
-    else:
-        return default
-
-
 # ----------------------------------------------------------------------
 # Windows Terminal PowerShell 7 配置
 # ----------------------------------------------------------------------
@@ -637,8 +910,8 @@ def setup_windows_terminal_powershell7(pwsh_path=None):
                 print_ok("已将 Windows Terminal 默认 shell 设为 PowerShell 7")
 
             if changed:
-                settings_path.write_text(
-                    json.dumps(settings, indent=4, ensure_ascii=False),
+                journal.write_text(
+                    settings_path, json.dumps(settings, indent=4, ensure_ascii=False),
                     encoding='utf-8'
                 )
                 print_ok(f"已更新 Windows Terminal 设置: {settings_path}")
@@ -654,6 +927,81 @@ def setup_windows_terminal_powershell7(pwsh_path=None):
     return configured
 
 
+def _profile_params(integrations=None):
+    """Profile 模板参数（来自顶部配置）；integrations 为 init_cache.detect() 的结果"""
+    return dict(
+        proxy_http=PROXY_HTTP,
+        proxy_socks=PROXY_SOCKS,
+        proxy_host_port=PROXY_HOST_PORT,
+        proxy_candidates=", ".join(f'"{c}"' for c in PROXY_CANDIDATES),
+        proxy_select_ttl=PROXY_SELECT_TTL,
+        proxy_alive_budget_ms=PROXY_ALIVE_BUDGET_MS,
+        proxy_alive_cache_ttl=PROXY_ALIVE_CACHE_TTL,
+        proxy_state_lock_stale=PROXY_STATE_LOCK_STALE,
+        shell_integrations=render_powershell(integrations or []),
+    )
+
+
+def build_powershell_profile(manifest=None, minified=None, integrations=None):
+    """按顶部配置构建 PowerShell Profile，返回 BuildResult；超出预算时抛 BudgetExceeded"""
+    return build_profile(
+        PROFILE_SECTIONS,
+        manifest=PROFILE_MANIFEST if manifest is None else manifest,
+        params=_profile_params(integrations),
+        minified=PROFILE_MINIFY if minified is None else minified,
+        header=PROFILE_HEADER,
+        budget=Budget(PROFILE_BUDGET_BYTES, PROFILE_BUDGET_STATEMENTS),
+        timing=PROFILE_TIMING,
+    )
+
+
+def render_powershell_profile(manifest=None, minified=None, integrations=None):
+    """用顶部配置参数渲染 PowerShell Profile 内容"""
+    return build_powershell_profile(manifest, minified, integrations).text
+
+
+def render_proxy_module():
+    """渲染代理命令模块，返回 (psm1 内容, psd1 清单内容)"""
+    quoted = lambda names: ", ".join(f"'{n}'" for n in names)
+    literal = lambda text: str(text).replace("'", "''")      # PowerShell 单引号字符串
+    psm1 = PROXY_MODULE.format(functions=", ".join(PROXY_MODULE_FUNCTIONS),
+                               aliases=", ".join(PROXY_MODULE_ALIASES),
+                               select_python=literal(sys.executable),
+                               select_script=literal(Path(__file__).resolve().with_name("proxy_select.py")),
+                               sample_url=literal(PROXY_SAMPLE_URL))
+    psd1 = PROXY_MODULE_MANIFEST.format(name=PROXY_MODULE_NAME,
+                                        functions=quoted(PROXY_MODULE_FUNCTIONS),
+                                        aliases=quoted(PROXY_MODULE_ALIASES))
+    return psm1, psd1
+
+
+def install_proxy_module(profile_dir):
+    """把代理命令模块写入 profile_dir/Modules/ProxyTools（用户模块路径，命令自动发现可找到）"""
+    module_dir = profile_dir / "Modules" / PROXY_MODULE_NAME
+    module_dir.mkdir(parents=True, exist_ok=True)
+    psm1, psd1 = render_proxy_module()
+    # 带 BOM 写入：Windows PowerShell 5.x 按 ANSI 解码无 BOM 的脚本，中文输出会乱码
+    journal.write_text(module_dir / f"{PROXY_MODULE_NAME}.psm1", psm1, encoding="utf-8-sig")
+    journal.write_text(module_dir / f"{PROXY_MODULE_NAME}.psd1", psd1, encoding="utf-8-sig")
+    return module_dir
+
+
+def measure_parse_ms(script, exe="powershell.exe", rounds=20):
+    """用常驻 PowerShell 进程测量脚本的平均解析耗时（毫秒），失败返回 None"""
+    encoded = base64.b64encode(script.encode("utf-8")).decode("ascii")
+    try:
+        output = get_worker(exe).query(
+            f"$t = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{encoded}')); "
+            f"[void][Management.Automation.Language.Parser]::ParseInput($t, [ref]$null, [ref]$null); "
+            f"$sw = [Diagnostics.Stopwatch]::StartNew(); "
+            f"for ($i = 0; $i -lt {rounds}; $i++) {{ "
+            f"[void][Management.Automation.Language.Parser]::ParseInput($t, [ref]$null, [ref]$null) }}; "
+            f"$sw.Elapsed.TotalMilliseconds / {rounds}")
+        return float(output)
+    except Exception:
+        return None
+
+
 def setup_powershell_profile(ps7_path=None):
     """
     配置 PowerShell profile（追加模式，不覆盖现有配置）。
@@ -671,12 +1019,26 @@ def setup_powershell_profile(ps7_path=None):
     # 创建目录
     ps_profile_dir.mkdir(parents=True, exist_ok=True)
 
-    # 生成 profile 内容
-    profile_content = POWERSHELL_PROFILE.format(
-        proxy_http=PROXY_HTTP,
-        proxy_socks=PROXY_SOCKS,
-        proxy_host_port=PROXY_HOST_PORT
-    )
+    # 检测 starship / zoxide / conda / fnm：预先生成 init 输出缓存，Profile 只 dot-source 缓存
+    integrations = detect() if PROFILE_MANIFEST.get("integrations", True) else []
+    for (name, _), status in refresh_all(integrations, shells=("powershell",)).items():
+        if status == FAILED:
+            print_warn(f"{name} 初始化脚本生成失败，启动时将重试")
+        else:
+            print_ok(f"{name} 初始化脚本缓存: {status}")
+    for integration, exe in integrations:
+        if integration.lazy:
+            print_ok(f"{integration.name} 延迟加载（首次调用 {', '.join(integration.triggers)} 时初始化）: {exe}")
+
+    # 生成 profile 内容（启动快速路径）；其余代理命令安装为按需加载的模块
+    try:
+        build = build_powershell_profile(integrations=integrations)
+    except (BudgetExceeded, ValueError) as e:
+        print_err(f"{e}，未写入 Profile（调整 PROFILE_MANIFEST 或 PROFILE_BUDGET_*）")
+        return False
+    profile_content = build.text
+    print_ok(f"Profile 段: {', '.join(build.sections)}（{build.bytes} 字节，{build.statements} 条启动语句）")
+    module_content, _ = render_proxy_module()
 
     # 标记：用于识别我们管理的配置块
     BLOCK_START = "# ========== 以下由 windows_env_setup 自动添加 =========="
@@ -695,20 +1057,20 @@ def setup_powershell_profile(ps7_path=None):
                     new_content = profile_content
                 else:
                     new_content = profile_content
-                ps_profile_path.write_text(new_content, encoding='utf-8')
+                journal.write_text(ps_profile_path, new_content, encoding='utf-8')
                 print_ok(f"已更新 PowerShell 7 Profile: {ps_profile_path}")
             elif existing_content.strip():
                 print_ok(f"检测到现有 PowerShell 7 profile，追加配置")
-                with open(ps_profile_path, 'a', encoding='utf-8') as f:
-                    f.write("\n\n" + BLOCK_START + "\n")
-                    f.write(profile_content)
+                journal.append_text(ps_profile_path, "\n\n" + BLOCK_START + "\n" + profile_content)
                 print_ok(f"已追加配置到: {ps_profile_path}")
             else:
-                ps_profile_path.write_text(profile_content, encoding='utf-8')
+                journal.write_text(ps_profile_path, profile_content, encoding='utf-8')
                 print_ok(f"已创建 PowerShell 7 Profile: {ps_profile_path}")
         else:
-            ps_profile_path.write_text(profile_content, encoding='utf-8')
+            journal.write_text(ps_profile_path, profile_content, encoding='utf-8')
             print_ok(f"已创建 PowerShell 7 Profile: {ps_profile_path}")
+        module_dir = install_proxy_module(ps_profile_dir)
+        print_ok(f"已安装代理命令模块: {module_dir}")
     else:
         print_warn("未找到 PowerShell 7，跳过 PS7 profile 配置")
 
@@ -720,17 +1082,57 @@ def setup_powershell_profile(ps7_path=None):
     if ps5_profile_path.exists():
         ps5_content = ps5_profile_path.read_text(encoding='utf-8', errors='ignore')
         if "智能代理配置" in ps5_content:
-            ps5_profile_path.write_text(profile_content, encoding='utf-8')
+            journal.write_text(ps5_profile_path, profile_content, encoding='utf-8')
             print_ok(f"已更新 Windows PowerShell 5.x profile: {ps5_profile_path}")
         elif not ps5_content.strip():
-            ps5_profile_path.write_text(profile_content, encoding='utf-8')
+            journal.write_text(ps5_profile_path, profile_content, encoding='utf-8')
             print_ok(f"已创建 Windows PowerShell 5.x profile: {ps5_profile_path}")
         else:
             print_ok(f"Windows PowerShell 5.x profile 已存在，跳过")
     else:
-        ps5_profile_path.write_text(profile_content, encoding='utf-8')
+        journal.write_text(ps5_profile_path, profile_content, encoding='utf-8')
         print_ok(f"已创建 Windows PowerShell 5.x profile: {ps5_profile_path}")
+    module_dir = install_proxy_module(ps5_profile_dir)
+    print_ok(f"已安装代理命令模块: {module_dir}")
 
+    # 对比命令全部内联时的解析耗时（每次启动都要付出的成本）
+    inline_ms = measure_parse_ms(profile_content + "\n" + module_content)
+    profile_ms = measure_parse_ms(profile_content)
+    if inline_ms and profile_ms:
+        print_ok(f"Profile 解析耗时: {profile_ms:.1f}ms（命令全部内联时 {inline_ms:.1f}ms，"
+                 f"减少 {(1 - profile_ms / inline_ms) * 100:.0f}%）")
+
+    return True
+
+
+def setup_proxy_selection():
+    """
+    并发探测所有候选代理端点，按握手延迟 + 吞吐量采样选出最快的存活端点并写入缓存，
+    Profile 中的 Set-AutoProxy / Lock-Proxy / Sync-ProxyToTools 直接使用该结果。
+    本机没有运行代理时不算失败（Profile 直连）。
+    """
+    print_step("选择最快的代理端点...")
+
+    candidates = list(PROXY_CANDIDATES)
+    try:
+        proxy_server = get_registry().get(HKCU, INTERNET_SETTINGS_KEY, "ProxyServer")
+        if proxy_server:
+            candidates.insert(0, proxy_server)
+    except (OSError, ImportError):
+        pass
+
+    selection = select_endpoint(candidates, ttl=PROXY_SELECT_TTL, sample_url=PROXY_SAMPLE_URL, force=True)
+    for entry in selection.ranking:
+        if entry["alive"]:
+            rate = f"  {entry['throughput'] / 1024:.0f} KB/s" if entry["throughput"] else ""
+            print_ok(f"{entry['endpoint']:<22} {entry['latency_ms']:.0f}ms{rate}")
+        else:
+            print_warn(f"{entry['endpoint']:<22} 不可用（{entry['error']}）")
+
+    if selection.endpoint:
+        print_ok(f"已选择 {selection.endpoint}（缓存 {PROXY_SELECT_TTL}s）")
+    else:
+        print_ok("本机没有运行中的代理，Profile 将直连")
     return True
 
 
@@ -821,8 +1223,8 @@ def setup_vscode_settings(ps7_path=None):
     deep_merge(settings, new_settings)
 
     # 写入文件
-    vscode_settings_path.write_text(
-        json.dumps(settings, indent=4, ensure_ascii=False),
+    journal.write_text(
+        vscode_settings_path, json.dumps(settings, indent=4, ensure_ascii=False),
         encoding='utf-8'
     )
     print_ok(f"已更新 VS Code 设置: {vscode_settings_path}")
@@ -852,24 +1254,15 @@ def setup_scoop_aria2():
 
     # 询问用户是否配置 Scoop（默认 no，超时 15s 默认拒绝）
     print("")
-    choice = prompt_with_timeout(
-        "  是否配置 Scoop（需先安装 Scoop）？ [y/N]: ",
-        timeout=15,
-        default="n"
-    )
+    choice = prompts.ask("scoop", "  是否配置 Scoop（需先安装 Scoop）？ [y/N]: ", timeout=15)
     if choice != "y":
         print_ok("跳过 Scoop 配置")
         return True
 
-    def _scoop_run(args):
-        """执行 scoop 命令，兼容 Windows GBK 输出"""
-        try:
-            return subprocess.run(
-                args, capture_output=True, text=True,
-                encoding="gbk", errors="replace", shell=True
-            )
-        except (FileNotFoundError, UnicodeDecodeError):
-            return None
+    def _scoop_run(args, timeout=None):
+        """执行 scoop 命令（scoop.cmd 由 runner 按 PATHEXT 解析，无需 shell）"""
+        result = run(args, timeout=timeout)
+        return None if result.not_found else result
 
     def _install_scoop():
         """通过 PowerShell 安装 Scoop（用户级，无需管理员权限）"""
@@ -879,19 +1272,16 @@ def setup_scoop_aria2():
             '"Set-ExecutionPolicy -ExecutionPolicy RemoteSigned -Scope CurrentUser -Force; '
             'irm get.scoop.sh | iex"'
         )
-        try:
-            result = subprocess.run(
-                cmd, shell=True, text=True,
-                encoding="gbk", errors="replace"
-            )
-            if result.returncode == 0:
-                print_ok("Scoop 安装完成")
-                return True
-            else:
-                print_err(f"Scoop 安装失败（返回码 {result.returncode}）")
-                return False
-        except Exception as e:
-            print_err(f"Scoop 安装异常: {e}")
+        # 安装过程直接输出到控制台，给足时间但不无限等待
+        result = run(cmd, timeout=600, capture=False)
+        if result.ok:
+            print_ok("Scoop 安装完成")
+            return True
+        elif result.timed_out:
+            print_err("Scoop 安装超时")
+            return False
+        else:
+            print_err(f"Scoop 安装失败（返回码 {result.returncode}）")
             return False
 
     # 检查 scoop 是否安装，未安装则自动安装
@@ -910,7 +1300,7 @@ def setup_scoop_aria2():
     result = _scoop_run(["scoop", "list"])
     if result is None or "aria2" not in result.stdout:
         print_ok("正在安装 aria2...")
-        install_result = _scoop_run(["scoop", "install", "aria2"])
+        install_result = _scoop_run(["scoop", "install", "aria2"], timeout=600)
         if install_result is None or install_result.returncode != 0:
             print_warn("aria2 安装失败，请手动运行: scoop install aria2")
             return False
@@ -923,11 +1313,22 @@ def setup_scoop_aria2():
         ("aria2-warning-enabled", "false"),
     ]
 
+    # 每条 scoop config 都会读取、修改并重写同一个 ~/.config/scoop/config.json，必须依次执行；
+    # 先记录原内容，journal.py undo 可恢复
+    journal.get_journal().record_file(Path.home() / ".config" / "scoop" / "config.json", external=True)
+    ok = True
     for key, value in configs:
-        _scoop_run(["scoop", "config", key, value])
-        print_ok(f"已设置 scoop config {key} = {value}")
+        result = run(["scoop", "config", key, value])
+        if result.ok:
+            print_ok(f"已设置 scoop config {key} = {value}")
+        elif result.timed_out:
+            print_warn(f"scoop config {key} 超时")
+            ok = False
+        else:
+            print_warn(f"scoop config {key} 设置失败（返回码 {result.returncode}）")
+            ok = False
 
-    return True
+    return ok
 
 
 def setup_ssl_workarounds():
@@ -964,52 +1365,39 @@ def setup_ssl_workarounds():
                 print_ok("~/.curlrc 已包含 insecure 配置")
             elif existing_content.strip():
                 # 追加配置
-                with open(curlrc_path, 'a', encoding='utf-8') as f:
-                    f.write("\n# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n")
+                journal.append_text(curlrc_path, "\n# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n")
                 print_ok("已追加 insecure 到 ~/.curlrc")
             else:
                 # 文件为空
-                curlrc_path.write_text("# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n", encoding='utf-8')
+                journal.write_text(curlrc_path, "# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n", encoding='utf-8')
                 print_ok("已创建 ~/.curlrc")
         else:
-            curlrc_path.write_text("# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n", encoding='utf-8')
+            journal.write_text(curlrc_path, "# 跳过 SSL 证书验证（解决缺少根证书问题）\ninsecure\n", encoding='utf-8')
             print_ok("已创建 ~/.curlrc (curl 跳过证书验证)")
         results.append(True)
     except Exception as e:
         print_err(f"配置 ~/.curlrc 失败: {e}")
         results.append(False)
 
-    # 2. 配置 Git 跳过 SSL 验证
-    try:
-        result = subprocess.run(
-            ["git", "config", "--global", "http.sslVerify", "false"],
-            capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print_ok("已配置 Git http.sslVerify = false")
+    # 2-3. 配置 Git / npm 跳过 SSL 验证（分别写 ~/.gitconfig 与 ~/.npmrc，互不影响，并发执行）
+    # 两个文件由子进程改写：先记录原内容，journal.py undo 可恢复
+    for config_path in (Path.home() / ".gitconfig", Path.home() / ".npmrc"):
+        journal.get_journal().record_file(config_path, external=True)
+    git_result, npm_result = run_many([
+        ["git", "config", "--global", "http.sslVerify", "false"],
+        ["npm", "config", "set", "strict-ssl", "false"],
+    ])
+    for tool, setting, result in (("Git", "http.sslVerify", git_result),
+                                  ("npm", "strict-ssl", npm_result)):
+        if result.ok:
+            print_ok(f"已配置 {tool} {setting} = false")
             results.append(True)
-        else:
-            print_warn("Git 配置失败（可能未安装）")
+        elif result.timed_out:
+            print_warn(f"{tool} 配置超时")
             results.append(False)
-    except Exception as e:
-        print_warn(f"Git 配置失败: {e}")
-        results.append(False)
-
-    # 3. 配置 npm 跳过 SSL 验证
-    try:
-        result = subprocess.run(
-            ["npm", "config", "set", "strict-ssl", "false"],
-            capture_output=True, text=True, shell=True
-        )
-        if result.returncode == 0:
-            print_ok("已配置 npm strict-ssl = false")
-            results.append(True)
         else:
-            print_warn("npm 配置失败（可能未安装）")
+            print_warn(f"{tool} 配置失败（可能未安装）")
             results.append(False)
-    except Exception as e:
-        print_warn(f"npm 配置失败: {e}")
-        results.append(False)
 
     # 4. 提示用户 PowerShell 环境变量已在 profile 中配置
     print_ok("Node.js/Python SSL 跳过已在 PowerShell profile 中配置")
@@ -1017,13 +1405,42 @@ def setup_ssl_workarounds():
     return all(results) or any(results)
 
 
+BASH_PROFILE_DEFAULT = """# generated by Git for Windows
+test -f ~/.profile && . ~/.profile
+test -f ~/.bashrc && . ~/.bashrc
+"""
+
+BASH_PROFILE_UTF8 = """
+# UTF-8 Configuration for Git Bash
+# Generated by windows_env_setup
+export LANG=en_US.UTF-8
+export LC_ALL=en_US.UTF-8
+export TERM=xterm-256color
+"""
+
+
+def render_bash_profile(existing=None, integrations=()):
+    """
+    生成 Git Bash ~/.bash_profile 的内容（setup_git_bash 写入的就是它）
+
+    existing 为现有内容（None 表示文件不存在，从 Git for Windows 的默认内容开始）；
+    缺少 UTF-8 配置时追加，Shell 集成和共享代理状态的受管理片段整体替换。
+    """
+    content = BASH_PROFILE_DEFAULT if existing is None else existing
+    if "LANG=en_US.UTF-8" not in content:
+        content += BASH_PROFILE_UTF8
+    content = replace_bash_block(content, render_bash(integrations))
+    return replace_bash_block(content, proxy_share.render_source_block(),
+                              proxy_share.BLOCK_START, proxy_share.BLOCK_END)
+
+
 def setup_git_bash():
     """
     配置 Git Bash 的 UTF-8 和 Emoji 支持（追加模式，不覆盖现有配置）
 
     配置文件：
     - ~/.minttyrc: MinTTY 终端配置（字体、编码）
-    - ~/.bash_profile: Bash 环境变量
+    - ~/.bash_profile: Bash 环境变量、Shell 集成、共享代理状态（render_bash_profile）
     """
     print_step("配置 Git Bash UTF-8 和 Emoji 支持...")
 
@@ -1058,49 +1475,41 @@ AllowBlinking=yes
                     additions.append("Font=Cascadia Mono")
                     additions.append("FontHeight=11")
                 if additions:
-                    with open(minttyrc_path, 'a', encoding='utf-8') as f:
-                        f.write("\n# Added by windows_env_setup\n")
-                        f.write("\n".join(additions) + "\n")
+                    journal.append_text(minttyrc_path,
+                                        "\n# Added by windows_env_setup\n" + "\n".join(additions) + "\n")
                     print_ok("已追加配置到 ~/.minttyrc")
             else:
                 # 文件为空
-                minttyrc_path.write_text(minttyrc_content, encoding='utf-8')
+                journal.write_text(minttyrc_path, minttyrc_content, encoding='utf-8')
                 print_ok("已创建 ~/.minttyrc")
         else:
-            minttyrc_path.write_text(minttyrc_content, encoding='utf-8')
+            journal.write_text(minttyrc_path, minttyrc_content, encoding='utf-8')
             print_ok("已创建 ~/.minttyrc (Git Bash 终端配置)")
         results.append(True)
     except Exception as e:
         print_err(f"配置 ~/.minttyrc 失败: {e}")
         results.append(False)
 
-    # 2. 配置 .bash_profile
+    # 2. 配置 .bash_profile：UTF-8 环境变量、Shell 集成（缓存 init 输出 / 延迟加载）、共享代理状态
     bash_profile_path = Path.home() / ".bash_profile"
-    bash_profile_addition = """
-# UTF-8 Configuration for Git Bash
-# Generated by windows_env_setup
-export LANG=en_US.UTF-8
-export LC_ALL=en_US.UTF-8
-export TERM=xterm-256color
-"""
     try:
-        if bash_profile_path.exists():
-            existing_content = bash_profile_path.read_text(encoding='utf-8', errors='ignore')
-            if "LANG=en_US.UTF-8" not in existing_content:
-                # 追加配置
-                with open(bash_profile_path, 'a', encoding='utf-8') as f:
-                    f.write(bash_profile_addition)
-                print_ok("已更新 ~/.bash_profile (追加 UTF-8 配置)")
-            else:
-                print_ok("~/.bash_profile 已包含 UTF-8 配置")
+        integrations = detect() if PROFILE_MANIFEST.get("integrations", True) else []
+        for (name, _), status in refresh_all(integrations, shells=("bash",)).items():
+            if status == FAILED:
+                print_warn(f"{name} 的 Bash 初始化脚本生成失败，启动时将重试")
+        # 共享代理状态：读取 PowerShell 发布的 ~/.proxy_env（只用 Bash 内建命令，不启动子进程）
+        if proxy_share.install_snippet():
+            print_ok(f"已写入 {proxy_share.SNIPPET_PATH}（读取 PowerShell 发布的代理状态）")
+        existing = (bash_profile_path.read_text(encoding='utf-8', errors='ignore')
+                    if bash_profile_path.exists() else None)
+        new_content = render_bash_profile(existing, integrations)
+        if new_content == existing:
+            print_ok("~/.bash_profile 已是最新")
         else:
-            # 创建新文件
-            default_content = """# generated by Git for Windows
-test -f ~/.profile && . ~/.profile
-test -f ~/.bashrc && . ~/.bashrc
-"""
-            bash_profile_path.write_text(default_content + bash_profile_addition, encoding='utf-8')
-            print_ok(f"已创建 ~/.bash_profile")
+            # Bash 不认 CRLF，统一写成 LF
+            journal.write_text(bash_profile_path, new_content, newline="\n")
+            names = ", ".join(i.name for i, _ in integrations) or "无"
+            print_ok(f"已{'创建' if existing is None else '更新'} ~/.bash_profile（Shell 集成: {names}）")
         results.append(True)
     except Exception as e:
         print_err(f"配置 ~/.bash_profile 失败: {e}")
@@ -1109,20 +1518,78 @@ test -f ~/.bashrc && . ~/.bashrc
     return all(results)
 
 
+def list_wsl_distros():
+    """已安装的 WSL 发行版（跳过 docker-desktop 等内部发行版）；没有 WSL 返回 None"""
+    result = run(["wsl", "-l", "-q"], timeout=15)
+    if result.not_found or not result.ok:
+        return None
+    # wsl.exe 输出 UTF-16，按本地编码解码后夹杂 \x00
+    names = [line.replace("\x00", "").strip() for line in result.stdout.splitlines()]
+    return [n for n in names if n and not n.lower().startswith("docker-desktop")]
+
+
+def wsl_bashrc_path(distro):
+    """发行版默认用户的 ~/.bashrc 在 Windows 侧的路径（\\\\wsl$\\<发行版>\\home\\...）；查询失败返回 None"""
+    result = run(["wsl", "-d", distro, "-e", "sh", "-c", 'printf %s "$HOME"'], timeout=30)
+    home = result.stdout.strip() if result.ok else ""
+    if not home.startswith("/"):
+        return None
+    return Path(f"\\\\wsl$\\{distro}") / home.lstrip("/") / ".bashrc"
+
+
+def setup_wsl_proxy():
+    """
+    在各 WSL 发行版的 ~/.bashrc 中加入共享代理状态片段（source /mnt/c/Users/.../.proxy_env.sh）。
+    已包含片段的发行版不修改；修改前经 \\\\wsl$ 记录原内容（回滚日志）。
+    WSL2 NAT 网络需在 ~/.bashrc 中自行设置 PROXY_WSL_HOST。
+    """
+    print_step("配置 WSL 共享代理状态...")
+
+    distros = list_wsl_distros()
+    if distros is None:
+        print_warn("未检测到 WSL，跳过")
+        return True
+    try:
+        proxy_share.install_snippet()
+    except OSError as e:
+        print_err(f"写入 {proxy_share.SNIPPET_PATH} 失败: {e}")
+        return False
+
+    # -e 直接执行 sh，不经发行版的默认 Shell 再解析一遍命令行；片段经 stdin 传入，引号和换行原样保留
+    block = proxy_share.render_source_block()
+    script = (f"grep -qF '{proxy_share.BLOCK_START}' ~/.bashrc 2>/dev/null"
+              " || { printf '\\n'; cat; } >> ~/.bashrc")
+    ok = True
+    for distro in distros:
+        # 由 WSL 内的 sh 原地追加：先经 \\wsl$ 记录原内容，journal.py undo 可恢复
+        bashrc = wsl_bashrc_path(distro)
+        try:
+            if bashrc is None:
+                raise OSError("无法确定 ~ 目录")
+            journal.get_journal().record_file(bashrc, external=True)
+        except OSError as e:
+            print_warn(f"{distro}: 无法记录 ~/.bashrc 的原内容（{e}），跳过")
+            ok = False
+            continue
+        result = run(["wsl", "-d", distro, "-e", "sh", "-c", script], input=block, timeout=30)
+        if result.ok:
+            print_ok(f"{distro}: ~/.bashrc 已包含共享代理状态片段")
+        else:
+            print_warn(f"{distro}: 更新 ~/.bashrc 失败（{result.stderr.strip() or result.returncode}）")
+            ok = False
+    return ok
+
+
 def check_system_utf8():
     """检查并提示启用 Windows UTF-8 全局支持"""
     print_step("检查系统 UTF-8 设置...")
 
     try:
-        # 读取注册表检查当前代码页
-        key = winreg.OpenKey(
-            winreg.HKEY_LOCAL_MACHINE,
-            r"SYSTEM\CurrentControlSet\Control\Nls\CodePage",
-            0,
-            winreg.KEY_READ
-        )
-        acp_value, _ = winreg.QueryValueEx(key, "ACP")
-        winreg.CloseKey(key)
+        # 读取注册表检查当前代码页（同一次运行内只读一次）
+        acp_value = code_page()
+        if acp_value is None:
+            print_warn("无法检查系统代码页设置: 注册表中没有 ACP")
+            return False
 
         if acp_value == "65001":
             print_ok("系统已启用 UTF-8 全局支持 (代码页 65001)")
@@ -1166,24 +1633,18 @@ def setup_utf8_env():
     }
 
     try:
-        # 通过注册表直接写入用户级环境变量
-        reg_path = r"Environment"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0,
-                            winreg.KEY_READ | winreg.KEY_WRITE) as key:
-            for var_name, var_value in utf8_vars.items():
-                try:
-                    existing_value, _ = winreg.QueryValueEx(key, var_name)
-                    if existing_value == var_value:
-                        print_ok(f"{var_name}={var_value} (已存在)")
-                        continue
-                except FileNotFoundError:
-                    pass  # 变量不存在，需要创建
-
-                winreg.SetValueEx(key, var_name, 0, winreg.REG_SZ, var_value)
-                print_ok(f"{var_name}={var_value} (已设置)")
-
-                # 同时设置当前进程环境变量（立即生效）
-                os.environ[var_name] = var_value
+        # 通过注册表直接写入用户级环境变量：一次读出 Environment 键，变化的值集中写入一次
+        reg = get_registry()
+        for var_name, var_value in utf8_vars.items():
+            if not reg.set(HKCU, ENVIRONMENT_KEY, var_name, var_value):
+                print_ok(f"{var_name}={var_value} (已存在)")
+                continue
+            print_ok(f"{var_name}={var_value} (已设置)")
+
+            # 同时设置当前进程环境变量（立即生效）
+            os.environ[var_name] = var_value
+        # 有写入时广播环境变量变更（每次运行最多一次）
+        reg.flush()
 
         print_ok("用户级环境变量已持久化（新终端自动生效）")
         return True
@@ -1222,8 +1683,8 @@ def _configure_windows_terminal_font(font_face):
                 print_ok(f"Windows Terminal 字体已是 {font_face}，无需修改")
             else:
                 defaults.setdefault("font", {})["face"] = font_face
-                settings_path.write_text(
-                    json.dumps(settings, indent=4, ensure_ascii=False),
+                journal.write_text(
+                    settings_path, json.dumps(settings, indent=4, ensure_ascii=False),
                     encoding='utf-8'
                 )
                 print_ok(f"已更新 Windows Terminal 默认字体 → {font_face}")
@@ -1273,8 +1734,8 @@ def setup_windows_terminal_wsl_home():
                         changed = True
 
             if changed:
-                settings_path.write_text(
-                    json.dumps(settings, indent=4, ensure_ascii=False),
+                journal.write_text(
+                    settings_path, json.dumps(settings, indent=4, ensure_ascii=False),
                     encoding='utf-8'
                 )
                 print_ok(f"已设置 WSL 起始目录 → ~（Linux home）")
@@ -1297,14 +1758,13 @@ def setup_nerd_font():
     并自动更新 Windows Terminal 默认字体配置。
     字体来源：https://www.nerdfonts.com/
     """
-    import urllib.request
     import zipfile
     import tempfile
 
     FONT_FACE = "FantasqueSansM Nerd Font Mono"
-    FONT_ZIP_URL = (
-        "https://github.com/ryanoasis/nerd-fonts/releases/latest/download/FantasqueSansMono.zip"
-    )
+    FONT_REPO = "ryanoasis/nerd-fonts"
+    FONT_ASSET = "FantasqueSansMono.zip"
+    FONT_ZIP_URL = f"https://github.com/{FONT_REPO}/releases/latest/download/{FONT_ASSET}"
 
     print_step("安装 Nerd Font（FantasqueSansMono Nerd Font）...")
 
@@ -1324,7 +1784,7 @@ def setup_nerd_font():
 
     # 询问用户是否下载（默认 yes，超时 15s 自动确认）
     print("")
-    choice = prompt_with_timeout("  是否下载并安装 Nerd Font（FantasqueSansMono）？ [Y/n]: ", timeout=15, default="y")
+    choice = prompts.ask("nerd_font", "  是否下载并安装 Nerd Font（FantasqueSansMono）？ [Y/n]: ", timeout=15)
     if choice != "y":
         print_ok("跳过字体下载")
         return True
@@ -1336,23 +1796,14 @@ def setup_nerd_font():
         with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
             tmp_zip = f.name
 
-        # 支持代理环境变量（HTTP_PROXY / HTTPS_PROXY）
-        proxy_handler = urllib.request.ProxyHandler()
-        opener = urllib.request.build_opener(proxy_handler)
-        with opener.open(FONT_ZIP_URL, timeout=120) as resp, open(tmp_zip, "wb") as out:
-            total = int(resp.headers.get("Content-Length", 0))
-            downloaded = 0
-            chunk = 65536
-            while True:
-                data = resp.read(chunk)
-                if not data:
-                    break
-                out.write(data)
-                downloaded += len(data)
-                if total:
-                    pct = downloaded * 100 // total
-                    print(f"\r    进度: {pct:3d}%  ({downloaded//1024//1024} MB)", end="", flush=True)
-        print()
+        # 按最新 Release 的 tag 拼出固定地址并取资产 digest 校验；API 不可用时用 latest 地址，不校验哈希
+        try:
+            release = github_release(FONT_REPO)
+            url = f"https://github.com/{FONT_REPO}/releases/download/{release['tag_name']}/{FONT_ASSET}"
+        except Exception:
+            release, url = None, FONT_ZIP_URL
+        # 支持代理环境变量（HTTP_PROXY / HTTPS_PROXY）；多个镜像竞速，传输中变慢时切换
+        download_artifact("nerd_font", url, tmp_zip, release=release)
         print_ok("下载完成")
 
         # 解压并安装：只安装 NerdFontMono 变体（严格等宽，终端专用）
@@ -1372,19 +1823,17 @@ def setup_nerd_font():
                 dest = font_dir / basename
                 if dest.exists():
                     continue
-                with zf.open(name) as src, open(dest, "wb") as dst:
-                    dst.write(src.read())
+                with zf.open(name) as src:
+                    journal.write_bytes(dest, src.read())
                 # 注册表值名：去掉 .ttf + 加 "(TrueType)"
                 reg_entries[basename[:-4] + " (TrueType)"] = str(dest)
                 installed += 1
 
-        # 注册到用户字体注册表（让 Windows 应用能识别）
-        reg_path = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\Fonts"
-        with winreg.OpenKey(
-            winreg.HKEY_CURRENT_USER, reg_path, 0, winreg.KEY_WRITE
-        ) as key:
-            for reg_name, font_path in reg_entries.items():
-                winreg.SetValueEx(key, reg_name, 0, winreg.REG_SZ, font_path)
+        # 注册到用户字体注册表（让 Windows 应用能识别）：已注册的跳过，其余一次写入
+        reg = get_registry()
+        for reg_name, font_path in reg_entries.items():
+            reg.set(HKCU, USER_FONTS_KEY, reg_name, font_path)
+        reg.flush()
 
         print_ok(f"已安装 {installed} 个字体文件 → {font_dir}")
 
@@ -1402,13 +1851,45 @@ def setup_nerd_font():
     return True
 
 
-def main():
+def parse_args(argv=None):
+    """命令行参数：无人值守模式与预设答案（问题列表见 prompts.QUESTIONS）"""
+    questions = "; ".join(f"{key}: {desc}（默认 {default}）" for key, (desc, default) in prompts.QUESTIONS.items())
+    parser = argparse.ArgumentParser(description="Windows 开发环境自动配置脚本",
+                                     epilog=f"可预设答案的问题 — {questions}")
+    parser.add_argument("--non-interactive", action="store_true",
+                        help="不读取控制台，未预设答案的问题取默认值（标准输入不是终端时自动启用）")
+    parser.add_argument("--interactive", action="store_true", help="即使标准输入不是终端也等待输入")
+    parser.add_argument("--answers", metavar="FILE", help='JSON 应答文件，如 {"scoop": "n", "nerd_font": "y"}')
+    parser.add_argument("--answer", action="append", default=[], metavar="KEY=y|n",
+                        help="预设单个答案，可重复，优先于应答文件")
+    parser.add_argument("-y", "--yes", action="store_true", help="所有问题回答 y（--answer 可逐个覆盖）")
+    parser.add_argument("--journal-max-mb", type=float, default=journal.MAX_STORE_BYTES / 1024 / 1024,
+                        help="修改记录（可用 python journal.py undo 撤销）的存储上限，超出时删除最旧的记录")
+    args = parser.parse_args(argv)
+    try:
+        answers = {key: "y" for key in prompts.QUESTIONS} if args.yes else {}
+        if args.answers:
+            answers.update(prompts.load_answers(args.answers))
+        answers.update(prompts.parse_answer_items(args.answer))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    args.preset = answers
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    interactive = False if args.non_interactive else (True if args.interactive else None)
+    prompter = prompts.configure(args.preset, interactive)
+
     print("=" * 60)
     print("Windows 开发环境自动配置脚本")
     print("=" * 60)
     print(f"\n代理配置:")
     print(f"  HTTP:  {PROXY_HTTP}")
     print(f"  SOCKS: {PROXY_SOCKS}")
+    if not prompter.interactive:
+        print("  模式:  无人值守（未预设答案的问题取默认值）")
 
     # 检查 Python 版本
     if sys.version_info < (3, 7):
@@ -1420,6 +1901,10 @@ def main():
         print_err("此脚本仅支持 Windows")
         sys.exit(1)
 
+    # 记录本次运行对文件和注册表的修改（修改前的内容），可用 python journal.py undo 撤销
+    run_journal = journal.start()
+    get_registry().journal = run_journal
+
     # 检查系统 UTF-8 设置（重要！）
     check_system_utf8()
 
@@ -1449,6 +1934,9 @@ def main():
     # 2. 配置 PowerShell Profile（传入 ps7_path 以决定是否配置 PS7 profile）
     results.append(("PowerShell Profile", setup_powershell_profile(ps7_path)))
 
+    # 2.5. 探测候选代理端点，缓存最快的存活端点供 Profile 使用
+    results.append(("代理端点选择", setup_proxy_selection()))
+
     # 3. 配置 VS Code（传入 ps7_path 以配置终端配置）
     results.append(("VS Code 设置", setup_vscode_settings(ps7_path)))
 
@@ -1470,6 +1958,9 @@ def main():
     # 8. 配置 Windows Terminal WSL 起始目录为 Linux home
     results.append(("WSL 起始目录", setup_windows_terminal_wsl_home()))
 
+    # 9. WSL 读取 PowerShell 发布的代理状态
+    results.append(("WSL 共享代理", setup_wsl_proxy()))
+
     # 总结
     print("\n" + "=" * 60)
     print("配置结果:")
@@ -1478,6 +1969,11 @@ def main():
         status = "[OK]" if success else "[SKIP]"
         print(f"  {status} {name}")
 
+    if run_journal.data["files"] or run_journal.data["registry"]:
+        print(f"\n本次修改了 {len(run_journal.data['files'])} 个文件、{len(run_journal.data['registry'])} 个注册表值，"
+              f"撤销: python journal.py undo {run_journal.run_id}")
+        journal.prune(int(args.journal_max_mb * 1024 * 1024))
+
     print("\n后续步骤:")
     print("  1. 重启 PowerShell / Windows Terminal")
     print("  2. 重启 VS Code")
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+多 Shell 编码矩阵：在找到的每个 Shell（pwsh、Windows PowerShell、cmd、Git Bash）中并发执行
+同一个 UTF-8 往返探针，汇总为 Shell × 检查项的表格
+
+探针文本含中文、Emoji 和带重音的拉丁字母（PROBE_TEXT），每个 Shell 做三件事：
+- stdout：输出脚本中的探针文本，Python 按 UTF-8 严格解码捕获的输出（不回退到控制台代码页，
+  否则 GBK 输出也会被"正确"解码，掩盖乱码）
+- stdin ：从标准输入读取一行 UTF-8 文本并原样输出
+- file  ：用 Shell 默认的方式把探针文本写入文件，Python 检查文件是否为 UTF-8（允许 BOM）
+
+各 Shell 经 runner.run_many 并发启动，总耗时约等于最慢的一个，与原来逐个冷启动的检查相当。
+
+使用方法:
+    python shell_matrix.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from runner import run_many
+
+PROBE_TEXT = "中文测试 ✅ café"     # 不含引号、& 和 !，可直接嵌入各 Shell 的命令行
+PROBE_TIMEOUT = 15                 # 秒；冷启动 Windows PowerShell 可能需要数秒
+PROBES = ("stdout", "stdin", "file")
+
+# 单元格状态
+OK = "OK"
+BAD = "FAIL"
+ERROR = "ERR"
+MISSING = "-"
+
+
+def powershell_args(exe, text, filename):
+    """pwsh / powershell：[Console]::In 读 stdin，Set-Content 按该版本的默认编码写文件"""
+    script = ("$line = [Console]::In.ReadLine(); "
+              f"Write-Output 'OUT:{text}'; Write-Output ('IN:' + $line); "
+              f"Set-Content -LiteralPath '{filename}' -Value '{text}' -NoNewline")
+    return [exe, "-NoProfile", "-NonInteractive", "-Command", script]
+
+
+def cmd_args(exe, text, filename):
+    """cmd：set /p 读 stdin（延迟展开 !LINE!），echo 重定向写文件"""
+    script = f"set /p LINE=& echo OUT:{text}& echo IN:!LINE!& >{filename} echo {text}"
+    return [exe, "/d", "/v:on", "/c", script]
+
+
+def bash_args(exe, text, filename):
+    """Git Bash：read 读 stdin；命令行中不用双引号（Windows 命令行转义规则与 MSYS 不同）"""
+    script = (f"set -f; IFS=; read -r line; printf 'OUT:%s\\n' '{text}'; "
+              f"printf 'IN:%s\\n' $line; printf '%s' '{text}' > {filename}")
+    return [exe, "--noprofile", "--norc", "-c", script]
+
+
+GIT_BASH_SEARCH = [r"%ProgramFiles%\Git\bin\bash.exe", r"%LOCALAPPDATA%\Programs\Git\bin\bash.exe"]
+
+
+def find_git_bash(which=shutil.which):
+    """Git for Windows 自带的 bash：PATH 中的 bash.exe 可能是 WSL 启动器，从 git.exe 的位置推断"""
+    candidates = []
+    git = which("git")
+    if git:
+        # Git\cmd\git.exe、Git\bin\git.exe、Git\mingw64\bin\git.exe
+        candidates += [parent / "bin" / "bash.exe" for parent in list(Path(git).resolve().parents)[:3]]
+    candidates += [Path(os.path.expandvars(path)) for path in GIT_BASH_SEARCH]
+    for candidate in candidates:
+        if candidate.is_file():
+            return str(candidate)
+    return None
+
+
+class Shell:
+    """
+    矩阵中的一个 Shell。
+
+    参数：
+        name     : str      - 显示名
+        commands : tuple    - 在 PATH 中查找的命令名
+        build    : callable - (exe, text, filename) -> 探针命令行
+        search   : tuple    - PATH 中找不到时依次尝试的路径（可含环境变量）
+        locate   : callable - (which) -> 路径；给出时代替 commands / search
+    """
+
+    def __init__(self, name, commands, build, search=(), locate=None):
+        self.name = name
+        self.commands = tuple(commands)
+        self.build = build
+        self.search = tuple(search)
+        self.locate = locate
+
+    def find(self, which=shutil.which):
+        if self.locate:
+            return self.locate(which)
+        for command in self.commands:
+            path = which(command)
+            if path:
+                return path
+        for candidate in self.search:
+            path = Path(os.path.expandvars(candidate))
+            if path.is_file():
+                return str(path)
+        return None
+
+
+SHELLS = [
+    Shell("pwsh", ["pwsh"], powershell_args, [r"%ProgramFiles%\PowerShell\7\pwsh.exe"]),
+    Shell("powershell", ["powershell"], powershell_args,
+          [r"%SystemRoot%\System32\WindowsPowerShell\v1.0\powershell.exe"]),
+    Shell("cmd", ["cmd"], cmd_args, [r"%SystemRoot%\System32\cmd.exe"]),
+    Shell("Git Bash", [], bash_args, locate=find_git_bash),
+]
+
+
+class ShellResult:
+    """一个 Shell 的探针结果：cells 为 {检查项: OK/FAIL/ERR/-}，observed 为失败项实际得到的文本"""
+
+    def __init__(self, name, exe=None, cells=None, observed=None, duration=0.0, error=None):
+        self.name = name
+        self.exe = exe
+        self.cells = cells or {probe: MISSING for probe in PROBES}
+        self.observed = observed or {}
+        self.duration = duration
+        self.error = error
+
+    @property
+    def found(self):
+        return self.exe is not None
+
+    @property
+    def passed(self):
+        return all(cell == OK for cell in self.cells.values())
+
+
+def _tagged(lines, tag):
+    for line in lines:
+        if line.startswith(tag):
+            return line[len(tag):].rstrip()
+    return None
+
+
+def evaluate(shell, exe, result, file_path, text=PROBE_TEXT):
+    """命令结果 + 写出的文件 → ShellResult"""
+    if result.not_found or result.returncode is None:
+        return ShellResult(shell.name, exe, {p: ERROR for p in PROBES}, error="未能启动")
+    if result.timed_out:
+        return ShellResult(shell.name, exe, {p: ERROR for p in PROBES}, duration=result.duration,
+                           error=f"超时（{PROBE_TIMEOUT}s）")
+
+    lines = result.stdout.split("\n")
+    values = {"stdout": _tagged(lines, "OUT:"), "stdin": _tagged(lines, "IN:")}
+    try:
+        data = Path(file_path).read_bytes()
+        try:
+            values["file"] = data.decode("utf-8-sig").rstrip("\r\n ")
+        except UnicodeDecodeError:
+            values["file"] = data.decode("utf-8", errors="replace").rstrip("\r\n ")
+    except OSError:
+        values["file"] = None
+
+    cells, observed = {}, {}
+    for probe in PROBES:
+        cells[probe] = OK if values[probe] == text else BAD
+        if cells[probe] == BAD:
+            observed[probe] = values[probe] if values[probe] is not None else "(无)"
+    error = result.stderr.strip().split("\n")[0] if result.returncode != 0 and result.stderr.strip() else None
+    return ShellResult(shell.name, exe, cells, observed, result.duration, error)
+
+
+def run_matrix(shells=SHELLS, which=shutil.which, text=PROBE_TEXT, timeout=PROBE_TIMEOUT):
+    """并发执行探针，按 shells 顺序返回 ShellResult 列表（未找到的 Shell 也在其中）"""
+    located = [(shell, shell.find(which)) for shell in shells]
+    found = [(shell, exe) for shell, exe in located if exe]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="shell_matrix_") as tmp:
+        # 文件名相对于工作目录，命令行中不出现可能含空格或非 ASCII 字符的临时目录路径
+        names = {shell.name: f"probe-{i}.txt" for i, (shell, _) in enumerate(found)}
+        commands = [shell.build(exe, text, names[shell.name]) for shell, exe in found]
+        # \r\n 结尾：cmd 的 set /p 按行读取，其余 Shell 的多余 \r 在解码时去掉
+        outputs = run_many(commands, input=text + "\r\n", cwd=tmp, timeout=timeout, encoding="utf-8")
+        for (shell, exe), result in zip(found, outputs):
+            results[shell.name] = evaluate(shell, exe, result, Path(tmp) / names[shell.name], text)
+    return [results.get(shell.name) or ShellResult(shell.name) for shell, _ in located]
+
+
+def format_grid(results):
+    """Shell × 检查项表格（每行一个 Shell）"""
+    width = max([len("Shell")] + [len(r.name) for r in results])
+    lines = [f"{'Shell':<{width}}  " + "  ".join(f"{p:<6}" for p in PROBES) + "  耗时"]
+    for r in results:
+        cells = "  ".join(f"{r.cells[p]:<6}" for p in PROBES)
+        if not r.found:
+            tail = "未找到"
+        else:
+            tail = f"{r.duration:.2f}s" + (f"  {r.error}" if r.error else "")
+        lines.append(f"{r.name:<{width}}  {cells}  {tail}")
+    return lines
+
+
+def describe_failures(results):
+    """失败单元格的说明：["powershell stdin: 观察到 '???? ?'", ...]"""
+    failures = []
+    for r in results:
+        if r.found and not r.observed and not r.passed:
+            failures.append(f"{r.name}: {r.error}")
+        for probe, value in r.observed.items():
+            failures.append(f"{r.name} {probe}: 观察到 {value!r}")
+    return failures
+
+
+def summarize(results):
+    """一行摘要：pwsh=ok powershell=stdin,file cmd=ok Git Bash=missing"""
+    parts = []
+    for r in results:
+        if not r.found:
+            state = "missing"
+        elif r.passed:
+            state = "ok"
+        else:
+            state = ",".join(p for p in PROBES if r.cells[p] != OK)
+        parts.append(f"{r.name}={state}")
+    return " ".join(parts)
+
+
+def main():
+    results = run_matrix()
+    print(f"探针文本: {PROBE_TEXT}")
+    for line in format_grid(results):
+        print(line)
+    for failure in describe_failures(results):
+        print(f"  {failure}")
+    found = [r for r in results if r.found]
+    return 0 if found and all(r.passed for r in found) else 1
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+环境快照与对比：把 setup.py 管理的配置收集为一份按内容哈希的 JSON，并与另一份快照或当前状态对比
+
+收集范围（MANAGED_FILES / MANAGED_KEYS）：
+- 两个 PowerShell Profile 及各自的 ProxyTools 模块
+- VS Code、Windows Terminal（稳定版 / 预览版）settings.json
+- ~/.minttyrc、~/.bash_profile、~/.proxy_env.sh、~/.curlrc
+- git（~/.gitconfig）、npm（~/.npmrc）、scoop（~/.config/scoop/config.json）配置：直接读配置文件，
+  不启动 git / npm / scoop 进程
+- 注册表 HKCU\\Environment 全部值，及 Internet Settings 中的代理设置
+
+快照格式（紧凑 JSON）：
+    {"version": 1, "created": 1760000000.0, "host": "PC",
+     "files": {"vscode": {"path": "...", "size": 1234, "mtime_ns": ..., "sha256": "ab12..."},
+               "curlrc": {"path": "...", "missing": true}},
+     "registry": {"HKCU\\\\Environment": {"PYTHONUTF8": "1", ...}},
+     "blobs": {"ab12...": "文件内容"}}
+
+文件内容按 SHA-256 存入 blobs，同样内容（如两个 Profile 目录下相同的模块）只存一份。
+采集时以上一份快照为基准：大小和修改时间都没变的文件不重新读取，直接沿用基准中的哈希和内容，
+因此与当前状态对比通常只需几毫秒。
+
+使用方法:
+    python snapshot.py snapshot                 # 保存到 %LOCALAPPDATA%\\windows_env_setup\\snapshots\\
+    python snapshot.py snapshot -o before.json
+    python snapshot.py diff before.json         # 与当前状态对比
+    python snapshot.py diff before.json after.json
+"""
+
+import argparse
+import base64
+import difflib
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from registry import ENVIRONMENT_KEY, HKCU, INTERNET_SETTINGS_KEY, get_registry
+
+VERSION = 1
+SNAPSHOT_DIR = Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()) / "windows_env_setup" / "snapshots"
+MAX_WORKERS = 8
+PROXY_VALUES = ("ProxyEnable", "ProxyServer", "ProxyOverride")
+
+# 变化类型
+ADDED = "+"
+REMOVED = "-"
+CHANGED = "~"
+
+
+def managed_files():
+    """快照中的文件：{名称: 路径}（名称用于对比输出，与机器无关）"""
+    home = Path.home()
+    appdata = Path(os.environ.get("APPDATA", ""))
+    local = Path(os.environ.get("LOCALAPPDATA", ""))
+    files = {}
+    for shell, folder in (("pwsh", "PowerShell"), ("powershell", "WindowsPowerShell")):
+        profile_dir = home / "Documents" / folder
+        files[f"{shell}.profile"] = profile_dir / "Microsoft.PowerShell_profile.ps1"
+        for suffix in ("psm1", "psd1"):
+            files[f"{shell}.ProxyTools.{suffix}"] = profile_dir / "Modules" / "ProxyTools" / f"ProxyTools.{suffix}"
+    files["vscode.settings"] = appdata / "Code" / "User" / "settings.json"
+    for name, package in (("wt.settings", "Microsoft.WindowsTerminal_8wekyb3d8bbwe"),
+                          ("wt-preview.settings", "Microsoft.WindowsTerminalPreview_8wekyb3d8bbwe")):
+        files[name] = local / "Packages" / package / "LocalState" / "settings.json"
+    for name in (".minttyrc", ".bash_profile", ".proxy_env.sh", ".curlrc", ".gitconfig", ".npmrc"):
+        files[name] = home / name
+    files["scoop.config"] = home / ".config" / "scoop" / "config.json"
+    return files
+
+
+# 注册表：(显示名, 根键, 路径, 只取这些值；None 表示全部)
+MANAGED_KEYS = [
+    (f"HKCU\\{ENVIRONMENT_KEY}", HKCU, ENVIRONMENT_KEY, None),
+    (f"HKCU\\{INTERNET_SETTINGS_KEY}", HKCU, INTERNET_SETTINGS_KEY, PROXY_VALUES),
+]
+
+
+def _blob(data):
+    """文件内容 → JSON 值：能按 UTF-8 解码的存文本，否则存 {"base64": ...}"""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+
+def blob_text(blob):
+    """blobs 中的值 → 文本（二进制内容返回 None）"""
+    return blob if isinstance(blob, str) else None
+
+
+def _collect_file(path, base_entry):
+    """
+    采集一个文件：返回 (条目, 内容 blob 或 None)。
+    大小和修改时间与基准条目相同时不读取文件，blob 返回 None 表示沿用基准中的内容。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {"path": str(path), "missing": True}, None
+    entry = {"path": str(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if base_entry and base_entry.get("size") == st.st_size and base_entry.get("mtime_ns") == st.st_mtime_ns:
+        entry["sha256"] = base_entry["sha256"]
+        return entry, None
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return {"path": str(path), "missing": True}, None
+    entry["size"] = len(data)
+    entry["sha256"] = hashlib.sha256(data).hexdigest()
+    return entry, _blob(data)
+
+
+def _json_value(value):
+    """注册表值 → JSON 值（REG_BINARY 存为十六进制）"""
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _collect_key(registry, root, path, names):
+    try:
+        values = registry.values(root, path)
+    except Exception:                          # 非 Windows 或无权限
+        return None
+    if names is not None:
+        values = {name: values[name] for name in names if name in values}
+    return {name: _json_value(value) for name, value in sorted(values.items())}
+
+
+def collect(files=None, keys=MANAGED_KEYS, registry=None, base=None, workers=MAX_WORKERS, clock=time.time):
+    """
+    并发采集当前状态，返回快照文档。
+
+    参数：
+        files    : dict     - {名称: 路径}，默认 managed_files()
+        registry : Registry - 默认 get_registry()；None 且无法创建时跳过注册表
+        base     : dict     - 基准快照，未变化的文件沿用其中的哈希和内容
+    """
+    files = managed_files() if files is None else files
+    base = base or {}
+    base_files = base.get("files", {})
+    if registry is None:
+        try:
+            registry = get_registry()
+        except Exception:
+            registry = None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        file_jobs = {name: pool.submit(_collect_file, path, base_files.get(name)) for name, path in files.items()}
+        key_jobs = ({label: pool.submit(_collect_key, registry, root, path, names)
+                     for label, root, path, names in keys} if registry is not None else {})
+
+        doc = {"version": VERSION, "created": clock(), "host": socket.gethostname(),
+               "files": {}, "registry": {}, "blobs": {}}
+        for name, job in file_jobs.items():
+            entry, blob = job.result()
+            doc["files"][name] = entry
+            digest = entry.get("sha256")
+            if digest and digest not in doc["blobs"]:
+                doc["blobs"][digest] = blob if blob is not None else base.get("blobs", {}).get(digest)
+        for label, job in key_jobs.items():
+            values = job.result()
+            if values is not None:
+                doc["registry"][label] = values
+    return doc
+
+
+def save(doc, path):
+    """原子写入快照（紧凑 JSON）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    if not isinstance(doc, dict) or doc.get("version") != VERSION:
+        raise ValueError(f"不是可识别的快照文件: {path}")
+    return doc
+
+
+def latest(directory=SNAPSHOT_DIR):
+    """目录中最新的快照路径，没有返回 None"""
+    try:
+        paths = sorted(Path(directory).glob("snapshot-*.json"))
+    except OSError:
+        return None
+    return paths[-1] if paths else None
+
+
+def default_path(directory=SNAPSHOT_DIR, clock=time.time):
+    return Path(directory) / time.strftime("snapshot-%Y%m%d-%H%M%S.json", time.localtime(clock()))
+
+
+class Change:
+    """一处差异：kind 为 "file" / "registry"，status 为 + / - / ~"""
+
+    def __init__(self, kind, name, status, before=None, after=None):
+        self.kind = kind
+        self.name = name
+        self.status = status
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f"Change({self.kind!r}, {self.name!r}, {self.status!r})"
+
+
+def _file_digest(entry):
+    return None if entry is None or entry.get("missing") else entry.get("sha256")
+
+
+def diff(old, new):
+    """对比两份快照，返回 Change 列表（只比较哈希和值，不读取文件）"""
+    changes = []
+    old_files, new_files = old.get("files", {}), new.get("files", {})
+    for name in sorted(set(old_files) | set(new_files)):
+        before, after = _file_digest(old_files.get(name)), _file_digest(new_files.get(name))
+        if before == after:
+            continue
+        status = ADDED if before is None else REMOVED if after is None else CHANGED
+        changes.append(Change("file", name, status, before, after))
+
+    old_keys, new_keys = old.get("registry", {}), new.get("registry", {})
+    for label in sorted(set(old_keys) & set(new_keys)):      # 一侧没有采集到注册表时不比较
+        before_values, after_values = old_keys[label], new_keys[label]
+        for value_name in sorted(set(before_values) | set(after_values)):
+            before, after = before_values.get(value_name), after_values.get(value_name)
+            if before == after:
+                continue
+            status = ADDED if value_name not in before_values else REMOVED if value_name not in after_values else CHANGED
+            changes.append(Change("registry", f"{label}\\{value_name}", status, before, after))
+    return changes
+
+
+def format_diff(changes, old, new, context=3, old_label="快照", new_label="当前"):
+    """差异 → 输出行；文本文件的修改附带 unified diff"""
+    lines = []
+    for change in changes:
+        if change.kind == "registry":
+            if change.status == CHANGED:
+                lines.append(f"~ {change.name}: {change.before!r} → {change.after!r}")
+            else:
+                lines.append(f"{change.status} {change.name} = {change.after if change.status == ADDED else change.before!r}")
+            continue
+        entry = (new if change.status != REMOVED else old)["files"][change.name]
+        lines.append(f"{change.status} {change.name}  ({entry['path']})")
+        if change.status != CHANGED:
+            continue
+        before = blob_text(old.get("blobs", {}).get(change.before))
+        after = blob_text(new.get("blobs", {}).get(change.after))
+        if before is None or after is None:
+            lines.append("    (二进制内容或快照中缺少内容，只比较了哈希)")
+            continue
+        for line in difflib.unified_diff(before.splitlines(), after.splitlines(), old_label, new_label,
+                                         n=context, lineterm=""):
+            lines.append(f"    {line}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="环境快照与对比")
+    sub = parser.add_subparsers(dest="command", required=True)
+    snap = sub.add_parser("snapshot", help="采集当前状态并保存")
+    snap.add_argument("-o", "--output", help=f"快照文件（默认保存到 {SNAPSHOT_DIR}）")
+    cmp_ = sub.add_parser("diff", help="对比两份快照，或快照与当前状态")
+    cmp_.add_argument("old", help="旧快照")
+    cmp_.add_argument("new", nargs="?", help="新快照（省略时与当前状态对比）")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "snapshot":
+        base_path = latest()
+        doc = collect(base=load(base_path) if base_path else None)
+        path = save(doc, args.output or default_path())
+        print(f"已保存快照: {path}（{len(doc['files'])} 个文件，{len(doc['blobs'])} 份内容，"
+              f"{(time.perf_counter() - start) * 1000:.0f} ms）")
+        return 0
+
+    old = load(args.old)
+    new = load(args.new) if args.new else collect(base=old)
+    changes = diff(old, new)
+    for line in format_diff(changes, old, new, new_label=args.new or "当前"):
+        print(line)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{len(changes)} 处差异（{elapsed:.0f} ms）" if changes else f"没有差异（{elapsed:.0f} ms）")
+    return 1 if changes else 0
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.exit(main())
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+本地替身服务器（离线测试代理探测、选路、测速用）
+
+每个替身在后台线程里运行自己的 asyncio 事件循环，监听 127.0.0.1 的随机端口：
+    with StandinProxy(delay=0.05) as proxy:
+        probe_endpoints([proxy.address], mode="http")
+
+StandinProxy 支持：
+- HTTP CONNECT 隧道（目标不可达时返回 502）
+- 绝对 URI 形式的 HTTP 转发（GET http://host:port/path）
+- SOCKS5（无认证）问候与 CONNECT
+- delay 模拟握手延迟，rate 模拟带宽受限的线路，respond=False 模拟“端口在但不应答”的假死代理
+
+StandinOrigin 是一个最小 HTTP 源站：GET /bytes/<N> 返回 N 个字节，/redirect/<N> 重定向到 /bytes/<N>；
+tls=True 时改为 HTTPS（standin_cert.pem 中的自签名证书，客户端用 client_ssl_context() 信任它）。
+StandinMirror 是发布文件的镜像：支持 Range、限速、中途变慢或挂起、返回错误状态码。
+
+standin_cert.pem（私钥 + 证书，127.0.0.1 / localhost，有效期 100 年）只用于测试，重新生成：
+    openssl req -x509 -newkey rsa:2048 -nodes -days 36500 -subj /CN=standin \\
+        -addext subjectAltName=IP:127.0.0.1,DNS:localhost -keyout key.pem -out cert.pem
+    cat key.pem cert.pem > standin_cert.pem
+"""
+
+import asyncio
+import socket
+import ssl
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+STANDIN_CERT = Path(__file__).with_name("standin_cert.pem")
+
+
+def client_ssl_context():
+    """信任替身证书的客户端 SSL 上下文（照常校验证书链和主机名）"""
+    return ssl.create_default_context(cafile=str(STANDIN_CERT))
+
+
+class StandinServer:
+    """后台线程中运行的 asyncio TCP 服务器基类，子类实现 handle()"""
+
+    def __init__(self, host="127.0.0.1", ssl_context=None):
+        self.host = host
+        self.port = None
+        self.ssl_context = ssl_context
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def address(self):
+        return (self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, 0, ssl=self.ssl_context))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            # 取消仍在处理的连接（挂起的假死连接、转发中的隧道），让传输层在关闭循环前释放
+            server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(server.wait_closed())
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            await self.handle(reader, writer)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, reader, writer):
+        raise NotImplementedError
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+async def _pipe(reader, writer, rate=None):
+    """单向转发直到读端关闭；rate 为转发速率上限（字节/秒），None 为不限速"""
+    try:
+        while True:
+            data = await reader.read(65536 if rate is None else max(rate // 20, 1))
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+            if rate:
+                await asyncio.sleep(len(data) / rate)
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def relay(reader, writer, target_reader, target_writer, rate=None):
+    """双向转发直到任一方向关闭；rate 限制目标 → 客户端方向的速率"""
+    await asyncio.gather(_pipe(reader, target_writer), _pipe(target_reader, writer, rate))
+
+
+class StandinProxy(StandinServer):
+    """
+    替身代理。
+
+    参数：
+        delay   : float - 应答握手前的延迟（秒），模拟不同延迟的代理
+        respond : bool  - False 时接受连接但从不应答（假死）
+        rate    : int   - 转发响应的速率上限（字节/秒），None 为不限速；握手延迟不受影响
+    """
+
+    def __init__(self, delay=0.0, respond=True, host="127.0.0.1", rate=None):
+        super().__init__(host)
+        self.delay = delay
+        self.respond = respond
+        self.rate = rate
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        first = await reader.readexactly(1)
+        if not self.respond:
+            await reader.read()   # 一直挂着直到客户端断开
+            return
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if first == b"\x05":
+            await self._handle_socks5(reader, writer)
+        else:
+            await self._handle_http(first + await reader.readuntil(b"\r\n\r\n"), reader, writer)
+
+    async def _open_target(self, host, port):
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(host, port), 2)
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+    async def _handle_http(self, head, reader, writer):
+        method, target = head.decode("latin-1").split(" ", 2)[:2]
+        if method != "CONNECT":
+            await self._forward(head, target, writer)
+            return
+        host, _, port = target.rpartition(":")
+        upstream = await self._open_target(host, int(port))
+        if upstream is None:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            return
+        writer.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+        await writer.drain()
+        await relay(reader, writer, *upstream, rate=self.rate)
+
+    async def _forward(self, head, target, writer):
+        """把绝对 URI 请求改写为源站形式后转发，并把响应原样传回"""
+        url = urlsplit(target)
+        if not url.hostname:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return
+        upstream = await self._open_target(url.hostname, url.port or 80)
+        if upstream is None:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            return
+        up_reader, up_writer = upstream
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+        # 每个连接只转发一个请求：去掉原有 Connection 头，统一要求源站发送后关闭
+        lines = head.rstrip(b"\r\n").split(b"\r\n")
+        method, _, version = lines[0].split(b" ", 2)
+        headers = [h for h in lines[1:] if not h.lower().startswith((b"connection:", b"proxy-connection:"))]
+        up_writer.write(b"\r\n".join(
+            [method + b" " + path.encode("latin-1") + b" " + version] + headers
+            + [b"Connection: close", b"", b""]))
+        await up_writer.drain()
+        await _pipe(up_reader, writer, self.rate)
+        up_writer.close()
+
+    async def _handle_socks5(self, reader, writer):
+        nmethods = (await reader.readexactly(1))[0]
+        await reader.readexactly(nmethods)
+        writer.write(b"\x05\x00")
+        await writer.drain()
+        header = await reader.read(4)
+        if len(header) < 4:
+            return   # 只做了问候（存活探测）
+        atyp = header[3]
+        if atyp == 0x01:
+            host = socket.inet_ntoa(await reader.readexactly(4))
+        elif atyp == 0x03:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("idna")
+        else:
+            writer.write(b"\x05\x08\x00\x01\x00\x00\x00\x00\x00\x00")
+            return
+        port = int.from_bytes(await reader.readexactly(2), "big")
+        upstream = await self._open_target(host, port)
+        if upstream is None:
+            writer.write(b"\x05\x05\x00\x01\x00\x00\x00\x00\x00\x00")
+            return
+        writer.write(b"\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00")
+        await writer.drain()
+        await relay(reader, writer, *upstream, rate=self.rate)
+
+
+def unused_port(host="127.0.0.1"):
+    """返回一个当前无人监听的端口（用于模拟已退出的代理）"""
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class StandinOrigin(StandinServer):
+    """
+    最小 HTTP/1.1 源站：GET /bytes/<N> 返回 N 个字节，/redirect/<N> 返回 302 到 /bytes/<N>，支持 keep-alive。
+
+    参数：
+        delay : float - 返回响应头前的延迟（秒），模拟首字节时间
+        rate  : int   - 发送速率上限（字节/秒），None 为不限速
+        tls   : bool  - 以 HTTPS 提供服务（证书见 standin_cert.pem）
+    """
+
+    CHUNK = 16384
+
+    def __init__(self, delay=0.0, rate=None, host="127.0.0.1", tls=False):
+        context = None
+        if tls:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(STANDIN_CERT)
+        super().__init__(host, context)
+        self.delay = delay
+        self.rate = rate
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                return
+            self.requests += 1
+            path = head.split(b" ", 2)[1].decode("latin-1")
+            keep_alive = b"connection: close" not in head.lower()
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if path.startswith("/redirect/"):
+                writer.write(f"HTTP/1.1 302 Found\r\nLocation: /bytes/{path[10:]}\r\n"
+                             f"Content-Length: 0\r\n\r\n".encode("ascii"))
+                await writer.drain()
+                continue
+            if not path.startswith("/bytes/") or not path[7:].isdigit():
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+                continue
+            size = int(path[7:])
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Length: {size}\r\n"
+                f"Content-Type: application/octet-stream\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("ascii"))
+            await self._send_body(writer, size)
+            if not keep_alive:
+                return
+
+    async def _send_body(self, writer, size):
+        block = b"x" * self.CHUNK
+        sent = 0
+        while sent < size:
+            n = min(self.CHUNK, size - sent)
+            writer.write(block[:n])
+            await writer.drain()
+            sent += n
+            if self.rate:
+                await asyncio.sleep(n / self.rate)
+
+    def url(self, size):
+        scheme = "https" if self.ssl_context else "http"
+        return f"{scheme}://{self.host}:{self.port}/bytes/{size}"
+
+
+class StandinMirror(StandinServer):
+    """
+    发布文件的替身镜像：GET 任意路径返回 content，支持 Range: bytes=N-（206 Partial Content）。
+
+    参数：
+        content     : bytes - 文件内容
+        rate        : int   - 发送速率上限（字节/秒），None 为不限速
+        delay       : float - 返回响应头前的延迟（秒）
+        stall_after : int   - 每个响应发送这么多字节后改用 stall_rate（模拟传输中途变慢）
+        stall_rate  : int   - 变慢后的速率；0 表示不再发送（挂起）
+        ranges      : bool  - False 时忽略 Range，总是返回完整内容
+        status      : int   - 非 200 时直接返回该状态码（如 503）
+
+    requests 记录每个请求的 Range 起点（无 Range 为 0）。
+    """
+
+    CHUNK = 8192
+
+    def __init__(self, content, rate=None, delay=0.0, stall_after=None, stall_rate=0, ranges=True, status=200,
+                 host="127.0.0.1"):
+        super().__init__(host)
+        self.content = content
+        self.rate = rate
+        self.delay = delay
+        self.stall_after = stall_after
+        self.stall_rate = stall_rate
+        self.ranges = ranges
+        self.status = status
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        start = 0
+        for line in head.split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "range" and self.ranges:
+                start = int(value.strip()[len("bytes="):].split("-")[0])
+        self.requests.append(start)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.status != 200:
+            writer.write(f"HTTP/1.1 {self.status} Unavailable\r\nContent-Length: 0\r\n\r\n".encode("ascii"))
+            await writer.drain()
+            return
+        total = len(self.content)
+        body = self.content[start:]
+        if start:
+            status = (f"HTTP/1.1 206 Partial Content\r\n"
+                      f"Content-Range: bytes {start}-{total - 1}/{total}\r\n")
+        else:
+            status = "HTTP/1.1 200 OK\r\n"
+        writer.write(f"{status}Content-Length: {len(body)}\r\nAccept-Ranges: bytes\r\n"
+                     f"Connection: close\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        sent = 0
+        while sent < len(body):
+            rate = self.rate
+            if self.stall_after is not None and sent >= self.stall_after:
+                if not self.stall_rate:
+                    await asyncio.sleep(3600)         # 挂起，直到客户端断开或服务器停止
+                rate = self.stall_rate
+            n = min(self.CHUNK, len(body) - sent)
+            writer.write(body[sent:sent + n])
+            await writer.drain()
+            sent += n
+            if rate:
+                await asyncio.sleep(n / rate)
+
+    def url(self, name="artifact.zip"):
+        return f"http://{self.host}:{self.port}/{name}"
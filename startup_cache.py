@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+启动状态缓存 + 单写者锁（Profile 中 Set-AutoProxy / Sync-UserProxyEnv 的 Python 参考实现）
+
+每次启动 PowerShell，Set-AutoProxy 都要读注册表，再逐个读用户级环境变量比较、必要时写入
+（每次写入都会广播一次设置变更）。Windows Terminal 一次恢复十个标签页时，十个进程同时走
+“读-比较-写”路径，互相覆盖。
+
+状态缓存文件记录上次已写入用户级环境变量时的注册表状态（键为 "ProxyEnable|端点|ProxyOverride"）：
+1. 键与缓存一致                → 用户级变量已是期望值，跳过全部读写（常见情况）
+2. 键变化                      → 取单写者锁，锁内再次检查缓存，逐个比较并只写变化的变量，最后更新缓存
+3. 锁被其他终端持有            → 直接跳过（对方正按同样的注册表状态写入，当前会话变量已设置好）
+
+锁文件以独占方式创建（O_CREAT|O_EXCL，Profile 中为 FileMode.CreateNew + DeleteOnClose），
+超过 LOCK_STALE 秒仍存在的锁视为崩溃遗留，可以接管。
+
+缓存文件和锁文件与 Profile 共用（%TEMP%\\proxy_state.txt / proxy_state.txt.lock）。
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from no_proxy import no_proxy_value
+
+STATE_PATH = Path(tempfile.gettempdir()) / "proxy_state.txt"
+LOCK_STALE = 10                   # 锁文件存在超过此秒数视为遗留
+
+USER_ENV_NAMES = ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "NO_PROXY")
+
+CACHED = "cached"                 # 状态未变，跳过
+BUSY = "busy"                     # 其他终端正在写入，跳过
+WRITTEN = "written"               # 已比较并写入（可能没有变量需要改动）
+
+
+def state_key(proxy_enable, proxy_server, proxy_override):
+    """注册表状态 → 缓存键（与 Profile 中 "$proxyEnable|$proxyServer|$($props.ProxyOverride)" 一致）"""
+    return "|".join("" if v is None else str(v) for v in (proxy_enable, proxy_server, proxy_override))
+
+
+def desired_user_env(proxy_enable, proxy_server, proxy_override):
+    """注册表状态对应的用户级环境变量期望值（None 表示应清除）"""
+    if proxy_enable != 1 or not proxy_server:
+        return dict.fromkeys(USER_ENV_NAMES)
+    return {
+        "HTTP_PROXY": f"http://{proxy_server}",
+        "HTTPS_PROXY": f"http://{proxy_server}",
+        "ALL_PROXY": f"socks5://{proxy_server}",
+        "NO_PROXY": no_proxy_value(proxy_override),
+    }
+
+
+class StateCache:
+    """状态缓存文件：内容就是上次写入成功时的键"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = Path(path)
+
+    def matches(self, key):
+        try:
+            return self.path.read_text(encoding="utf-8") == key
+        except OSError:
+            return False
+
+    def store(self, key):
+        try:
+            self.path.write_text(key, encoding="utf-8")
+        except OSError:
+            pass
+
+    def clear(self):
+        """用户级变量被其他途径改写后（Lock-Proxy / Sync-ProxyToTools）使缓存失效"""
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+class SingleWriterLock:
+    """
+    基于独占创建锁文件的非阻塞单写者锁。
+
+        lock = SingleWriterLock(path)
+        if lock.acquire():
+            try: ...
+            finally: lock.release()
+    """
+
+    def __init__(self, path, stale_after=LOCK_STALE):
+        self.path = Path(path)
+        self.stale_after = stale_after
+        self._fd = None
+
+    def acquire(self):
+        """取得锁返回 True；锁被持有（且未过期）返回 False，不等待"""
+        # Windows 上 O_TEMPORARY 使锁文件在句柄关闭（包括进程崩溃）时自动删除
+        flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_TEMPORARY", 0)
+        for _ in range(2):
+            try:
+                self._fd = os.open(self.path, flags)
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - self.path.stat().st_mtime < self.stale_after:
+                        return False
+                    self.path.unlink()     # 遗留锁：接管（Windows 上仍被持有时删除会失败）
+                except FileNotFoundError:
+                    pass                   # 对方刚好释放，重试一次
+                except OSError:
+                    return False
+            except OSError:
+                return False
+        return False
+
+    def release(self):
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def sync_user_env(key, desired, read_env, write_env, cache=None, lock=None):
+    """
+    按缓存键同步用户级环境变量。
+
+    参数：
+        key       : str              - state_key() 的结果
+        desired   : dict             - desired_user_env() 的结果
+        read_env  : callable         - read_env(name) -> str 或 None
+        write_env : callable         - write_env(name, value)，value 为 None 表示清除
+        cache     : StateCache       - 默认 STATE_PATH
+        lock      : SingleWriterLock - 默认 STATE_PATH 旁的 .lock 文件
+
+    返回 CACHED / BUSY / WRITTEN。
+    """
+    cache = cache or StateCache()
+    lock = lock or SingleWriterLock(str(cache.path) + ".lock")
+    if cache.matches(key):
+        return CACHED
+    if not lock.acquire():
+        return BUSY
+    try:
+        if cache.matches(key):     # 首次检查之后、取得锁之前其他终端已写完
+            return CACHED
+        for name, value in desired.items():
+            if (read_env(name) or None) != (value or None):
+                write_env(name, value or None)
+        cache.store(key)
+        return WRITTEN
+    finally:
+        lock.release()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+bench_proxy 测试（本地替身源站（HTTP / HTTPS）+ 替身转发代理，完全离线）
+
+使用方法: python -m pytest test_bench_proxy.py
+"""
+
+import pytest
+
+from bench_proxy import fetch, format_table, main, parse_size, percentile, run_benchmark
+from standin_servers import StandinOrigin, StandinProxy, client_ssl_context, unused_port
+
+
+@pytest.fixture(scope="module")
+def servers():
+    origin, proxy = StandinOrigin().start(), StandinProxy().start()
+    yield origin, proxy
+    origin.stop()
+    proxy.stop()
+
+
+def test_parse_size_and_percentile():
+    assert parse_size("16K") == 16384
+    assert parse_size("1M") == 1048576
+    assert parse_size("512") == 512
+    assert percentile([], 50) is None
+    assert percentile([5], 95) == 5
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4, 100], 100) == 100
+
+
+def test_direct_fetch(servers):
+    origin, _ = servers
+    sample = fetch(origin.url(50000))
+    assert sample.ok and sample.bytes == 50000
+    assert sample.connect_ms is not None and sample.ttfb_ms <= sample.total_ms
+    assert sample.throughput > 0
+
+
+@pytest.mark.parametrize("tunnel", [False, True])
+def test_proxied_fetch(servers, tunnel):
+    origin, proxy = servers
+    before = proxy.connections
+    sample = fetch(origin.url(20000), proxy=proxy.address, tunnel=tunnel)
+    assert sample.ok and sample.bytes == 20000
+    assert proxy.connections == before + 1
+
+
+def test_https_fetch_through_connect_tunnel():
+    # HTTPS 经代理：CONNECT 隧道 + 隧道内 TLS 握手都计入 connect_ms
+    with StandinOrigin(tls=True) as origin, StandinProxy(delay=0.1) as proxy:
+        sample = fetch(origin.url(30000), proxy=proxy.address, ssl_context=client_ssl_context())
+        assert sample.ok and sample.bytes == 30000
+        assert proxy.connections == 1 and origin.requests == 1
+        assert sample.connect_ms >= 90 and sample.ttfb_ms <= sample.total_ms
+        # 证书不受信任时在建连阶段（握手）失败，不发出请求
+        sample = fetch(origin.url(10), proxy=proxy.address)
+        assert not sample.ok and "CERTIFICATE_VERIFY_FAILED" in sample.error
+        assert sample.connect_ms is None and origin.requests == 1
+        results = run_benchmark(f"https://{origin.host}:{origin.port}/bytes/{{size}}", sizes=[4096],
+                                concurrency_levels=[2], requests=4, proxy=proxy.address, insecure=True)
+        assert [r["summary"]["ok"] for r in results] == [4, 4]
+
+
+def test_dead_proxy_reports_error(servers):
+    origin, _ = servers
+    sample = fetch(origin.url(10), proxy=("127.0.0.1", unused_port()), timeout=2)
+    assert not sample.ok
+    assert sample.error
+
+
+def test_ttfb_reflects_origin_delay():
+    with StandinOrigin(delay=0.2) as origin:
+        sample = fetch(origin.url(100))
+    assert sample.ttfb_ms >= 180
+
+
+def test_benchmark_matrix(servers):
+    origin, proxy = servers
+    results = run_benchmark(f"http://{origin.host}:{origin.port}/bytes/{{size}}",
+                            sizes=[1024, 65536], concurrency_levels=[1, 3], requests=6,
+                            proxy=proxy.address)
+    assert len(results) == 2 * 2 * 2
+    assert {r["path"] for r in results} == {"direct", "proxy"}
+    for r in results:
+        s = r["summary"]
+        assert s["ok"] == s["requests"] == 6
+        assert s["ttfb_ms"]["p50"] <= s["ttfb_ms"]["p99"]
+        assert s["aggregate_throughput"] > 0
+    table = format_table(results)
+    assert "ttfb p95" in table and "64K" in table
+
+
+def test_offline_command(capsys):
+    assert main(["--offline", "--sizes", "4K", "--concurrency", "2", "--requests", "4"]) == 0
+    out = capsys.readouterr().out
+    assert "direct" in out and "proxy" in out
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+bench_startup 测试（模拟的启动和计时日志，不启动真实 Shell）
+
+使用方法: python -m pytest test_bench_startup.py
+"""
+
+import json
+
+import pytest
+
+from bench_startup import (StartupRun, check_budget, format_report, main, parse_budget, parse_timing_log,
+                           run_bench, save_runs, summarize)
+
+LOG = """4242 host=180.5 ssl=0.2 utf8=3.1 helpers=1.0 proxy=42.0 integrations=8.5
+garbage line
+4243 host=175.0 ssl=0.1 utf8=2.9 helpers=0.9 proxy=12.5
+"""
+
+
+def test_parse_timing_log_skips_garbage():
+    runs = parse_timing_log(LOG)
+    assert len(runs) == 2
+    assert runs[0] == {"host": 180.5, "ssl": 0.2, "utf8": 3.1, "helpers": 1.0, "proxy": 42.0,
+                       "integrations": 8.5}
+    assert parse_timing_log("4244 host=1 broken\n4245 host=x\n") == []
+
+
+class FakeShell:
+    """模拟启动：cold 时 proxy 段慢（要探测、写环境变量），每次向计时日志追加一行"""
+
+    def __init__(self):
+        self.cleared = 0
+        self.launches = 0
+
+    def clear(self):
+        self.cleared += 1
+
+    def __call__(self, command, env):
+        self.launches += 1
+        cold = self.cleared == self.launches
+        proxy = 60.0 if cold else 5.0 + self.launches % 3
+        with open(env["PROFILE_TIMING_LOG"], "a", encoding="utf-8") as f:
+            f.write(f"{1000 + self.launches} host=150 ssl=0.1 proxy={proxy}\n")
+        return 300.0 + proxy, None
+
+
+def test_run_bench_cold_and_warm(tmp_path):
+    shell = FakeShell()
+    runs = run_bench(["pwsh"], runs=4, launch=shell, clear=shell.clear, log_path=tmp_path / "t.log")
+    assert shell.cleared == 4 and shell.launches == 9          # warm 多一次预热
+    assert [r.mode for r in runs] == ["cold"] * 4 + ["warm"] * 4
+    summary = summarize(runs)
+    assert summary["cold"]["metrics"]["proxy"]["p50"] == 60.0
+    assert summary["warm"]["metrics"]["proxy"]["p95"] < 8
+    assert summary["warm"]["metrics"]["wall"]["p50"] < summary["cold"]["metrics"]["wall"]["p50"]
+
+    assert check_budget(summary, {"warm": {"wall": 400, "proxy": 10}}) == []
+    problems = check_budget(summary, {"cold": {"proxy": 50}, "warm": {"integrations": 5}})
+    assert problems == ["cold.proxy: p95 60.0ms > 预算 50ms"]          # 未启用的段不检查
+    report = format_report(summary, {"cold": {"proxy": 50}})
+    assert "cold  proxy" in report and "4/4" in report
+
+
+def test_failures_and_missing_timing_fail_budget():
+    runs = [StartupRun("warm", 500.0), StartupRun("warm", None, error="退出码 1")]
+    problems = check_budget(summarize(runs), {"warm": {"wall": 600, "proxy": 50}})
+    assert problems == ["warm: 1/2 次启动失败", "warm.proxy: 没有数据（Profile 未开启计时？）"]
+
+
+def test_parse_budget():
+    assert parse_budget(["warm.wall=400", "cold.proxy=60.5"]) == {"warm": {"wall": 400.0},
+                                                                 "cold": {"proxy": 60.5}}
+    with pytest.raises(ValueError):
+        parse_budget(["hot.wall=1"])
+
+
+def test_replay_recorded_runs(tmp_path, capsys):
+    path = tmp_path / "runs.jsonl"
+    save_runs([StartupRun("warm", 400.0 + i, {"proxy": 5.0 + i}) for i in range(10)], path)
+    assert main(["--replay", str(path), "--no-budget", "--budget", "warm.wall=500"]) == 0
+    assert "[OK]" in capsys.readouterr().out
+    assert main(["--replay", str(path), "--no-budget", "--budget", "warm.proxy=10", "--json"]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["problems"] == ["warm.proxy: p95 13.6ms > 预算 10ms"]
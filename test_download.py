@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+download 测试：用多个不同速度的本地替身镜像验证竞速、中途故障转移、续传比对与哈希校验
+
+使用方法: python -m pytest test_download.py
+"""
+
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from download import DownloadError, ProgressReporter, asset_sha256, download, mirror_urls, prune_cache
+from http_client import HttpClient
+from journal import BlobStore
+from standin_servers import StandinMirror
+
+CONTENT = os.urandom(600 * 1024)
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+DIRECT = HttpClient(proxy=None)     # 不经环境变量或注册表中的代理
+
+
+def fetch(urls, tmp_path, **kwargs):
+    kwargs.setdefault("race_seconds", 0.3)
+    kwargs.setdefault("timeout", 2)
+    return download(urls, tmp_path / "artifact.zip", client=DIRECT, **kwargs)
+
+
+def test_race_keeps_fastest_mirror(tmp_path):
+    with StandinMirror(CONTENT, rate=100 * 1024) as slow, StandinMirror(CONTENT, rate=2 * 1024 * 1024) as fast, \
+            StandinMirror(CONTENT, status=503) as broken:
+        result = fetch([slow.url(), broken.url(), fast.url()], tmp_path, sha256=DIGEST)
+    assert result.url == fast.url() and result.mirrors == [fast.url()]
+    assert (tmp_path / "artifact.zip").read_bytes() == CONTENT and result.sha256 == DIGEST
+    assert not (tmp_path / "artifact.zip.part").exists()
+
+
+def test_fails_over_mid_transfer_with_range_resume(tmp_path):
+    # 首选镜像开始很快，传到 200 KB 后挂起；备用镜像较慢但稳定
+    with StandinMirror(CONTENT, rate=4 * 1024 * 1024, stall_after=200 * 1024, stall_rate=8 * 1024) as flaky, \
+            StandinMirror(CONTENT, rate=1024 * 1024, delay=0.4) as backup:
+        start = time.monotonic()
+        result = fetch([flaky.url(), backup.url()], tmp_path, sha256=DIGEST, min_rate=64 * 1024, window=0.5)
+        elapsed = time.monotonic() - start
+    assert result.mirrors == [flaky.url(), backup.url()]
+    assert backup.requests[-1] > 0                       # 续传：从已下载的位置（减去比对区）开始
+    assert (tmp_path / "artifact.zip").read_bytes() == CONTENT
+    assert elapsed < 5
+
+
+class RecordingClient(HttpClient):
+    """记录 download 打开的每个响应，检查是否都被关闭"""
+
+    def __init__(self):
+        super().__init__(proxy=None)
+        self.responses = []
+
+    def request(self, *args, **kwargs):
+        response = super().request(*args, **kwargs)
+        self.responses.append(response)
+        return response
+
+
+def test_racers_still_connecting_close_their_responses(tmp_path):
+    client = RecordingClient()
+    with StandinMirror(CONTENT, rate=4 * 1024 * 1024) as fast, StandinMirror(CONTENT, delay=0.8) as late:
+        result = download([fast.url(), late.url()], tmp_path / "artifact.zip", sha256=DIGEST, client=client,
+                          race_seconds=0.2, timeout=2)
+        assert result.url == fast.url()
+        deadline = time.monotonic() + 3
+        while len(client.responses) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)                     # 落选者在竞速结束后才收到响应头
+        time.sleep(0.1)
+    assert len(client.responses) == 2
+    assert all(r._released for r in client.responses)
+
+
+def test_mismatched_mirror_content_restarts_and_hash_is_enforced(tmp_path):
+    other = bytes(reversed(CONTENT))
+    with StandinMirror(CONTENT, stall_after=300 * 1024) as stalls, StandinMirror(other) as wrong, \
+            StandinMirror(CONTENT, ranges=False) as no_range:
+        # wrong 的续传比对不一致 → 从头下载 wrong 的内容 → 哈希不符 → no_range 从头下载
+        result = fetch([stalls.url(), wrong.url(), no_range.url()], tmp_path, sha256=DIGEST, race_width=1,
+                       timeout=0.5)
+        assert result.mirrors == [stalls.url(), wrong.url(), no_range.url()]
+        assert (tmp_path / "artifact.zip").read_bytes() == CONTENT
+
+        with pytest.raises(DownloadError, match="SHA-256"):
+            fetch([wrong.url()], tmp_path / "bad", sha256=DIGEST)
+    assert not (tmp_path / "bad" / "artifact.zip").exists()
+
+
+def test_verified_downloads_are_cached_by_hash(tmp_path):
+    cache = BlobStore(tmp_path / "cache")
+    with StandinMirror(CONTENT) as mirror:
+        first = fetch([mirror.url()], tmp_path, sha256=DIGEST, cache=cache)
+        assert not first.cached and cache.has(DIGEST)
+        again = fetch([mirror.url()], tmp_path / "again", sha256=DIGEST.upper(), cache=cache)
+        assert again.cached and again.url is None and len(mirror.requests) == 1
+        assert (tmp_path / "again" / "artifact.zip").read_bytes() == CONTENT
+
+        cache.path(DIGEST).write_bytes(CONTENT[:-1] + b"?")         # 缓存损坏：丢弃后重新下载
+        repaired = fetch([mirror.url()], tmp_path / "repaired", sha256=DIGEST, cache=cache)
+        assert not repaired.cached and len(mirror.requests) == 2
+        assert cache.path(DIGEST).read_bytes() == CONTENT
+
+        with StandinMirror(CONTENT) as untrusted:
+            result = fetch([mirror.url(), untrusted.url()], tmp_path / "unverified",
+                           cache=BlobStore(tmp_path / "other"))
+        assert result.mirrors == [mirror.url()] and not untrusted.requests   # 无法校验时不用第三方镜像
+        assert not BlobStore(tmp_path / "other").digests()          # 未校验的下载不入缓存
+
+    cache.put_bytes(b"old")
+    os.utime(cache.path(hashlib.sha256(b"old").hexdigest()), (1, 1))
+    assert prune_cache(cache, max_bytes=len(CONTENT)) == 1 and list(cache.digests()) == [DIGEST]
+
+
+def test_asset_sha256():
+    release = {"tag_name": "v7.5.0", "assets": [
+        {"name": "PowerShell-7.5.0-win-x64.zip", "digest": "sha256:" + DIGEST.upper()},
+        {"name": "old.zip", "digest": None},
+    ]}
+    assert asset_sha256(release, "PowerShell-7.5.0-win-x64.zip") == DIGEST
+    assert asset_sha256(release, "old.zip") is None and asset_sha256(release, "missing.zip") is None
+
+
+def test_mirror_urls():
+    url = "https://github.com/a/b/releases/download/v1/x.zip"
+    assert mirror_urls(url, ["{url}", "https://ghfast.top/{url}", "{url}"]) == [url, f"https://ghfast.top/{url}"]
+
+
+class Console(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_progress_reporter_is_throttled_and_shows_speed_and_eta():
+    now = [0.0]
+    console = Console()
+    reporter = ProgressReporter(stream=console, clock=lambda: now[0])
+    for i in range(1, 101):                      # 1 秒内 100 次回调，每次 10 KB
+        now[0] = i / 100
+        reporter(i * 10 * 1024, 10 * 1024 * 1024)
+    assert console.getvalue().count("\r") == 4   # 0.01 / 0.26 / 0.51 / 0.76 秒：每 0.25 秒最多一次
+    assert reporter.line() == "    进度:   9%  1000 KB / 10.0 MB  1000 KB/s  剩余 00:09"
+    reporter.finish()
+    assert console.getvalue().endswith("\n")
+
+    log = io.StringIO()
+    reporter = ProgressReporter(stream=log, clock=lambda: now[0])
+    reporter(0, None)
+    now[0] += 1
+    reporter(512 * 1024, None)                   # 非控制台：每 5 秒一行
+    assert log.getvalue().count("\n") == 1 and "\r" not in log.getvalue()
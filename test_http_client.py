@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+http_client 测试：本地替身源站 / 代理 / 镜像验证连接复用、代理与例外、重定向、重试退避和代理探测
+
+使用方法: python -m pytest test_http_client.py
+"""
+
+import pytest
+
+from http_client import HttpClient, HttpError, _endpoint, bypass_proxy, detect_proxy
+from registry import HKCU, INTERNET_SETTINGS_KEY, MemoryBackend, Registry
+from standin_servers import StandinMirror, StandinOrigin, StandinProxy
+
+
+def test_connections_are_reused_and_timed():
+    timings = []
+    with StandinOrigin() as origin:
+        client = HttpClient(proxy=None)
+        client.listeners.append(timings.append)
+        for size in (1000, 200000, 0):
+            with client.get(origin.url(size)) as resp:
+                assert len(resp.read()) == size
+        # 重定向在同一条 keep-alive 连接上完成
+        resp = client.get(origin.url(10).replace("/bytes/", "/redirect/"))
+        assert resp.read() == b"x" * 10 and resp.url == origin.url(10)
+        assert origin.requests == 5
+        assert client.idle_connections() == 1
+        client.close()
+    assert [t.reused for t in timings] == [False, True, True, True]
+    assert timings[0].connect > 0 and timings[1].connect == 0
+    assert [t.bytes for t in timings] == [1000, 200000, 0, 10]
+    assert timings[3].redirects == 1 and timings[3].attempts == 2
+    assert all(t.total >= t.ttfb for t in timings)
+
+
+def test_readinto_fills_caller_buffer_and_returns_connection():
+    with StandinOrigin(rate=4 * 1024 * 1024) as origin:
+        client = HttpClient(proxy=None)
+        buffer = memoryview(bytearray(65536))
+        resp = client.get(origin.url(300000))
+        sizes = []
+        while True:
+            n = resp.readinto(buffer)
+            if not n:
+                break
+            assert buffer[:n] == b"x" * n
+            sizes.append(n)
+        assert sizes == [65536] * 4 + [300000 - 4 * 65536] and resp.timing.bytes == 300000
+        assert client.idle_connections() == 1
+
+
+def test_proxy_and_no_proxy():
+    with StandinOrigin() as origin, StandinProxy() as proxy:
+        client = HttpClient(proxy=f"http://127.0.0.1:{proxy.port}")
+        assert client.get(origin.url(100)).read() == b"x" * 100
+        assert proxy.connections == 1 and origin.requests == 1
+        direct = HttpClient(proxy=proxy.address, no_proxy=["localhost", "127.0.0.0/8"])
+        assert direct.proxy_for(origin.url(1)) is None
+        assert direct.get(origin.url(100)).read() == b"x" * 100
+        assert proxy.connections == 1 and origin.requests == 2
+
+
+def test_retries_with_backoff_then_raises():
+    sleeps = []
+    with StandinMirror(b"", status=503) as broken:
+        client = HttpClient(proxy=None, retries=2, backoff=0.5, sleep=sleeps.append)
+        with pytest.raises(HttpError, match="503") as info:
+            client.get(broken.url())
+        assert info.value.status == 503
+        assert len(broken.requests) == 3 and sleeps == [0.5, 1.0]
+        resp = client.get(broken.url(), check=False, retries=0)
+        assert resp.status == 503 and len(broken.requests) == 4
+    with pytest.raises(OSError):
+        HttpClient(proxy=None, retries=1, sleep=sleeps.append).get(broken.url(), timeout=1)
+    assert sleeps == [0.5, 1.0, 0.5]
+
+
+def test_detect_proxy_from_environment_then_registry():
+    env = {"HTTP_PROXY": "http://10.0.0.1:8080", "NO_PROXY": "localhost,.corp.com"}
+    assert detect_proxy(env) == (("10.0.0.1", 8080), ["localhost", ".corp.com"])
+
+    settings = {"ProxyEnable": 1, "ProxyServer": "http=127.0.0.1:7897;https=127.0.0.1:7897",
+                "ProxyOverride": "<local>;*.corp.com;10.*"}
+    registry = Registry(MemoryBackend({(HKCU, INTERNET_SETTINGS_KEY): settings}))
+    endpoint, no_proxy = detect_proxy({}, registry)
+    assert endpoint == ("127.0.0.1", 7897)
+    assert no_proxy == ["localhost", "127.0.0.1", "::1", ".corp.com", "10.0.0.0/8"]
+    assert bypass_proxy("git.corp.com", no_proxy) and bypass_proxy("10.1.2.3", no_proxy)
+    assert not bypass_proxy("github.com", no_proxy) and not bypass_proxy("corp.com.cn", no_proxy)
+
+    settings["ProxyServer"] = "http=127.0.0.1:7890;https=127.0.0.1:7897;socks=127.0.0.1:7898"
+    assert detect_proxy({}, Registry(MemoryBackend({(HKCU, INTERNET_SETTINGS_KEY): settings})))[0] \
+        == ("127.0.0.1", 7897)                                    # HTTPS 请求取 https= 项
+    assert detect_proxy({"HTTPS_PROXY": "socks5://127.0.0.1:7898", "HTTP_PROXY": "http://127.0.0.1:7890"})[0] \
+        == ("127.0.0.1", 7890)                                    # SOCKS 地址不能发 CONNECT，跳过
+    assert _endpoint("socks=127.0.0.1:7898") is None
+    assert _endpoint("http=127.0.0.1:7890;127.0.0.1:7891") == ("127.0.0.1", 7891)
+
+    settings["ProxyEnable"] = 0
+    assert detect_proxy({}, Registry(MemoryBackend({(HKCU, INTERNET_SETTINGS_KEY): settings}))) == (None, [])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+init_cache 测试（伪造的 init 命令；Bash 片段在本机 bash 中实际执行）
+
+使用方法: python -m pytest test_init_cache.py
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import setup
+from init_cache import (BASH_BLOCK_END, BASH_BLOCK_START, FAILED, FRESH, INTEGRATIONS, REGENERATED,
+                        binary_stamp, cache_paths, detect, find_executable, msys_path, refresh_cache,
+                        render_bash, render_powershell, replace_bash_block)
+from runner import CommandResult
+
+STARSHIP, ZOXIDE, CONDA, FNM = INTEGRATIONS
+
+
+class FakeRun:
+    """记录调用次数的 run() 替身"""
+
+    def __init__(self, stdout="Invoke-Expression 'init'\n", returncode=0):
+        self.stdout = stdout
+        self.returncode = returncode
+        self.calls = []
+
+    def __call__(self, args):
+        self.calls.append(args)
+        return CommandResult(args, self.returncode, self.stdout)
+
+
+@pytest.fixture
+def tool(tmp_path):
+    exe = tmp_path / "bin" / "starship.exe"
+    exe.parent.mkdir()
+    exe.write_bytes(b"v1")
+    return exe
+
+
+def test_binary_stamp_tracks_path_size_and_mtime(tool):
+    stamp = binary_stamp(str(tool))
+    path, size, ticks = stamp.rsplit("|", 2)
+    assert path == str(tool) and size == "2"
+    assert int(ticks) == os.stat(tool).st_mtime_ns // 100 + 621355968000000000
+    os.utime(tool, ns=(0, os.stat(tool).st_mtime_ns + 10 ** 9))
+    assert binary_stamp(str(tool)) != stamp
+    assert binary_stamp(str(tool.parent / "missing.exe")) is None
+    assert msys_path(r"C:\Users\a b\fnm.exe") == "/c/Users/a b/fnm.exe"
+
+
+def test_refresh_cache_regenerates_only_when_binary_changes(tool, tmp_path):
+    cache_dir = tmp_path / "cache"
+    fake = FakeRun()
+    assert refresh_cache(STARSHIP, str(tool), "powershell", cache_dir, run=fake) == REGENERATED
+    assert fake.calls == [[str(tool), "init", "powershell", "--print-full-init"]]
+    cache, stamp = cache_paths(STARSHIP, "powershell", cache_dir)
+    assert cache.read_bytes().startswith(b"\xef\xbb\xbf")
+    assert stamp.read_text(encoding="utf-8") == binary_stamp(str(tool))
+
+    assert refresh_cache(STARSHIP, str(tool), "powershell", cache_dir, run=fake) == FRESH
+    assert len(fake.calls) == 1
+
+    tool.write_bytes(b"v2 upgraded")          # 升级：大小与修改时间都变了
+    assert refresh_cache(STARSHIP, str(tool), "powershell", cache_dir, run=fake) == REGENERATED
+    moved = tool.parent / "starship2.exe"
+    shutil.copy2(tool, moved)                 # 换位置：大小和时间不变，路径变了
+    assert refresh_cache(STARSHIP, str(moved), "powershell", cache_dir, run=fake) == REGENERATED
+    assert len(fake.calls) == 3
+
+
+def test_refresh_cache_failure_leaves_no_cache(tool, tmp_path):
+    assert refresh_cache(ZOXIDE, str(tool), "bash", tmp_path, run=FakeRun(returncode=1)) == FAILED
+    assert refresh_cache(ZOXIDE, str(tool), "bash", tmp_path, run=FakeRun(stdout="  \n")) == FAILED
+    assert not cache_paths(ZOXIDE, "bash", tmp_path)[0].exists()
+    assert refresh_cache(ZOXIDE, str(tool), "bash", tmp_path, run=FakeRun("z() {\r\n :\r\n}\r\n")) == REGENERATED
+    text = cache_paths(ZOXIDE, "bash", tmp_path)[0].read_bytes().decode()
+    assert text == f"# {msys_path(tool)}\nz() {{\n :\n}}\n"
+
+
+def test_detect_prefers_exe_next_to_conda_bat(tmp_path):
+    (tmp_path / "conda.bat").write_text("@echo off")
+    (tmp_path / "conda.exe").write_bytes(b"")
+    which = {"conda": str(tmp_path / "conda.bat"), "fnm": str(tmp_path / "fnm")}.get
+    assert find_executable(CONDA, which) == str(tmp_path / "conda.exe")
+    assert [(i.name, exe) for i, exe in detect(INTEGRATIONS, which)] == [
+        ("conda", str(tmp_path / "conda.exe")), ("fnm", str(tmp_path / "fnm"))]
+
+
+def test_render_powershell():
+    assert render_powershell([]) == ""
+    text = render_powershell([(STARSHIP, r"C:\s\starship.exe"), (CONDA, r"C:\c\conda.exe"),
+                              (FNM, r"C:\f\fnm.exe")], cache_dir=r"C:\cache")
+    assert "Join-Path 'C:\\cache'" in text
+    # 启动时只读缓存，不直接运行 init 命令
+    assert "if ($initScript = Get-InitCache starship 'C:\\s\\starship.exe' " \
+           "@('init','powershell','--print-full-init')) { . $initScript }" in text
+    assert "function conda { Initialize-Conda; & conda @args }" in text
+    assert "Remove-Item Function:\\fnm, Function:\\node, Function:\\npm, Function:\\npx" in text
+    assert "'env' '--use-on-cd' '--shell' 'powershell' | Out-String | Invoke-Expression }" in text
+
+
+def test_profile_with_integrations_fits_budget():
+    detected = [(STARSHIP, r"C:\Users\someone\scoop\shims\starship.exe"),
+                (ZOXIDE, r"C:\Users\someone\scoop\shims\zoxide.exe"),
+                (CONDA, r"C:\Users\someone\miniconda3\Scripts\conda.exe"),
+                (FNM, r"C:\Users\someone\scoop\shims\fnm.exe")]
+    build = setup.build_powershell_profile(integrations=detected)
+    assert build.sections[-1] == "integrations"
+    assert "function Get-InitCache" in build.text
+    assert "Get-InitCache" not in setup.render_powershell_profile()
+    assert "Get-InitCache" not in setup.render_powershell_profile(integrations=detected,
+                                                                   manifest={"integrations": False})
+
+
+def test_replace_bash_block():
+    block = f"{BASH_BLOCK_START}\nfoo\n{BASH_BLOCK_END}\n"
+    base = "export LANG=en_US.UTF-8\n"
+    once = replace_bash_block(base, block)
+    assert once == base + "\n" + block
+    assert replace_bash_block(once, block) == once
+    updated = replace_bash_block(once + "alias ll='ls -l'\n", block.replace("foo", "bar"))
+    assert "foo" not in updated and updated.endswith("bar\n" + BASH_BLOCK_END + "\nalias ll='ls -l'\n")
+    assert replace_bash_block(once, "") == base + "\n"
+    assert replace_bash_block("", block) == block
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="需要 bash")
+def test_bash_block_caches_and_lazy_loads(tmp_path):
+    log = tmp_path / "calls.log"
+
+    def fake_tool(name, output):
+        exe = tmp_path / name
+        exe.write_text(f"#!/bin/sh\necho \"{name} $*\" >> '{log}'\nprintf '%s\\r\\n' '{output}'\n")
+        exe.chmod(0o755)
+        return exe
+
+    starship = fake_tool("starship", "export PROMPT_READY=1")
+    conda = fake_tool("conda", "conda() { echo \"real conda $*\"; }")
+    block = render_bash([(STARSHIP, str(starship)), (CONDA, str(conda))], cache_dir=tmp_path / "cache")
+    profile = tmp_path / "profile.sh"
+    profile.write_text(block)
+
+    def shell(command):
+        return subprocess.run(["bash", "--noprofile", "--norc", "-c", f". '{profile}'; {command}"],
+                              capture_output=True, text=True, timeout=30).stdout
+
+    assert shell("echo $PROMPT_READY") == "1\n"
+    assert shell("echo $PROMPT_READY") == "1\n"
+    assert log.read_text() == "starship init bash --print-full-init\n"   # 第二次只读缓存
+
+    assert shell("conda info") == "real conda info\n"                   # 首次调用才初始化
+    assert log.read_text().count("conda shell.bash hook") == 1
+    assert shell("type -t conda") == "function\n"                        # 未调用时不运行 conda
+    assert log.read_text().count("conda shell.bash hook") == 1
+
+    cache = tmp_path / "cache" / "starship.sh"
+    os.utime(cache, (0, 0))                   # 可执行文件比缓存新 → 重新生成
+    shell(":")
+    assert log.read_text().count("starship init") == 2
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+journal 测试：修改前内容的去重存储、硬链接、撤销与清理
+
+使用方法: python -m pytest test_journal.py
+"""
+
+import os
+
+import pytest
+
+from journal import BlobStore, Journal, list_runs, prune, undo
+from registry import ENVIRONMENT_KEY, HKCU, MemoryBackend, Registry
+
+
+def test_before_images_are_linked_and_deduplicated(tmp_path):
+    store = tmp_path / "store"
+    profile, copy = tmp_path / "profile.ps1", tmp_path / "copy.ps1"
+    profile.write_bytes(b"# old\n")
+    copy.write_bytes(b"# old\n")
+    inode = os.stat(profile).st_ino
+
+    run = Journal(store)
+    assert run.write_text(profile, "# new\n", newline="\n")
+    assert not run.write_text(profile, "# new\n", newline="\n")      # 内容相同：不写也不再记录
+    run.write_text(copy, "# new\n", newline="\n")
+    digest = run.data["files"][0]["before"]
+    blob = BlobStore(store).path(digest)
+    assert blob.read_bytes() == b"# old\n" and profile.read_bytes() == b"# new\n"
+    assert os.stat(blob).st_ino == inode and run.store.linked == 1   # 原文件的数据留在硬链接里
+    assert [f["before"] for f in run.data["files"]] == [digest, digest]
+
+    Journal(store).write_text(tmp_path / "new.txt", "x")             # 原来不存在的文件记为 null
+    assert list_runs(store)[-1]["files"][0]["before"] is None
+    assert len(BlobStore(store).digests()) == 1
+
+
+def test_undo_restores_files_and_registry_in_one_pass(tmp_path):
+    store = tmp_path / "store"
+    settings, curlrc = tmp_path / "settings.json", tmp_path / ".curlrc"
+    settings.write_text("{}", encoding="utf-8")
+    backend = MemoryBackend({(HKCU, ENVIRONMENT_KEY): {"LANG": "C"}})
+    registry = Registry(backend)
+
+    first = Journal(store)
+    registry.journal = first
+    first.write_text(settings, '{"a": 1}')
+    registry.set(HKCU, ENVIRONMENT_KEY, "LANG", "en_US.UTF-8")
+    registry.set(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8", "1")
+    registry.flush()
+
+    second = Journal(store)
+    registry.journal = second
+    second.write_text(settings, '{"a": 2}')
+    second.append_text(curlrc, "insecure\n")
+    registry.set(HKCU, ENVIRONMENT_KEY, "LANG", "zh_CN.UTF-8")
+    registry.flush()
+
+    undone = undo(first.run_id, store, registry=registry)           # 撤销第一次及其后的全部运行
+    assert settings.read_text(encoding="utf-8") == "{}" and not curlrc.exists()
+    assert registry.values(HKCU, ENVIRONMENT_KEY) == {"LANG": "C"}
+    assert len([w for w in backend.writes if w[2].get("LANG") == ("C", 1)]) == 1
+    assert [r["undone"] for r in list_runs(store)[:2]] == [undone.run_id] * 2
+
+    undo(store=store, registry=registry)                            # 撤销"撤销"
+    assert settings.read_text(encoding="utf-8") == '{"a": 2}' and curlrc.read_text() == "insecure\n"
+    assert registry.values(HKCU, ENVIRONMENT_KEY) == {"LANG": "zh_CN.UTF-8", "PYTHONUTF8": "1"}
+    with pytest.raises(ValueError):
+        undo("no-such-run", store, registry=registry)
+
+
+def test_prune_keeps_store_under_limit(tmp_path):
+    store = tmp_path / "store"
+    target = tmp_path / "big.txt"
+    for i in range(4):
+        target.write_bytes(bytes([i]) * 1000)
+        Journal(store).write_bytes(target, b"next")
+    assert len(list_runs(store)) == 4
+    assert prune(2500, store) == (2, 2)
+    assert len(list_runs(store)) == 2 and len(BlobStore(store).digests()) == 2
+    assert prune(0, store) == (1, 1)                                # 最近一次运行总是保留
+
+
+def test_files_rewritten_by_external_tools_are_copied_and_undone(tmp_path):
+    store = tmp_path / "store"
+    gitconfig, npmrc = tmp_path / ".gitconfig", tmp_path / ".npmrc"
+    gitconfig.write_text("[user]\n\tname = a\n", encoding="utf-8")
+    run = Journal(store)
+    run.record_file(gitconfig, external=True)
+    run.record_file(npmrc, external=True)                          # 尚不存在：撤销时删除
+    with open(gitconfig, "r+", encoding="utf-8") as f:             # 像 npm 一样原地改写
+        f.seek(0, os.SEEK_END)
+        f.write("[http]\n\tsslVerify = false\n")
+    npmrc.write_text("strict-ssl=false\n", encoding="utf-8")
+    assert run.store.linked == 0 and run.store.copied == 1
+
+    undo(run.run_id, store, registry=Registry(MemoryBackend()))
+    assert gitconfig.read_text(encoding="utf-8") == "[user]\n\tname = a\n"
+    assert not npmrc.exists()
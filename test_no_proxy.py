@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+ProxyOverride → NO_PROXY 转换测试
+
+使用方法: python -m pytest test_no_proxy.py
+"""
+
+import pytest
+
+import setup
+from no_proxy import LOOPBACK, no_proxy_value, translate_entry, translate_proxy_override
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("<local>", LOOPBACK),
+    ("*.corp.example.com", [".corp.example.com"]),
+    (".corp.example.com", [".corp.example.com"]),
+    ("Mirror.Corp.Example.com", ["mirror.corp.example.com"]),
+    ("10.*", ["10.0.0.0/8"]),
+    ("192.168.*", ["192.168.0.0/16"]),
+    ("172.16.*.*", ["172.16.0.0/16"]),
+    ("192.168.1.*", ["192.168.1.0/24"]),
+    ("192.168.1.20", ["192.168.1.20"]),
+    ("http://nexus.corp:8081", ["nexus.corp"]),
+    ("[fe80::1]:8080", ["fe80::1"]),
+    ("*", ["*"]),
+])
+def test_translate_entry(pattern, expected):
+    assert translate_entry(pattern) == expected
+
+
+@pytest.mark.parametrize("pattern", ["intranet*", "*corp*", "10.*.0.1", "", "   "])
+def test_untranslatable_entries_are_dropped(pattern):
+    assert translate_entry(pattern) == []
+
+
+def test_loopback_always_first_and_deduplicated():
+    entries = translate_proxy_override("localhost;127.0.0.1;<local>;10.*;10.*")
+    assert entries == LOOPBACK + ["10.0.0.0/8"]
+    assert translate_proxy_override("") == LOOPBACK
+    assert translate_proxy_override(None) == LOOPBACK
+
+
+def test_typical_override_list():
+    override = "localhost;127.*;10.*;172.16.*;192.168.*;*.corp.example.com;intranet*;<local>"
+    assert no_proxy_value(override) == ("localhost,127.0.0.1,::1,127.0.0.0/8,10.0.0.0/8,"
+                                        "172.16.0.0/16,192.168.0.0/16,.corp.example.com")
+
+
+def test_profile_emits_and_propagates_no_proxy():
+    profile = setup.render_powershell_profile()
+    module, _ = setup.render_proxy_module()
+    assert "function ConvertTo-NoProxy" in profile
+    assert "ConvertTo-NoProxy $props.ProxyOverride" in profile        # Set-AutoProxy
+    lock = module[module.index("function Lock-Proxy"):module.index("function Unlock-Proxy")]
+    assert '[Environment]::SetEnvironmentVariable("NO_PROXY"' in lock  # Lock-Proxy 持久化
+    sync = module[module.index("function Sync-ProxyToTools"):module.index("function Enable-Proxy")]
+    assert "npm config set noproxy" in sync and "npm config delete noproxy" in sync
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Profile 构建流水线测试：段开关、精简、语句计数、缓存、预算
+
+使用方法: python -m pytest test_profile_builder.py
+"""
+
+import pytest
+
+import setup
+from init_cache import INTEGRATIONS
+from profile_builder import (Budget, BudgetExceeded, Section, build_profile, count_statements, minify,
+                             select_sections)
+
+
+SCRIPT = '''#requires -Version 5.1
+<#
+.SYNOPSIS
+    帮助文本
+#>
+# 整行注释
+$a = "value # not a comment"   # 行尾注释
+$b = 'x#y'
+$c = "say `"#hi`""  # 转义引号后的注释
+
+function Get-Thing {
+    # 函数内注释
+    return $a
+}
+$text = @"
+# here-string 里的内容原样保留
+"@
+'''
+
+
+def test_minify_strips_comments_but_not_strings():
+    out = minify(SCRIPT)
+    assert out.splitlines() == [
+        "#requires -Version 5.1",
+        '$a = "value # not a comment"',
+        "$b = 'x#y'",
+        '$c = "say `"#hi`""',
+        "function Get-Thing {",
+        "    return $a",
+        "}",
+        '$text = @"',
+        "# here-string 里的内容原样保留",
+        '"@',
+    ]
+
+
+def test_count_statements():
+    assert count_statements(minify(SCRIPT)) == 6
+    assert count_statements("$a = 1; $b = 2\nif ($a) {\n  $c = 3\n}\nelse {\n}\n") == 3
+    assert count_statements("Get-Item x |\n    Select-Object Name\n") == 1
+
+
+SECTIONS = [
+    Section("a", "# A\n$a = {value}\n"),
+    Section("b", "$b = 2\n"),
+    Section("c", "$c = $a\n", requires=("a",)),
+]
+
+
+def test_manifest_toggles_and_dependencies():
+    assert [s.name for s in select_sections(SECTIONS, {"b": False})] == ["a", "c"]
+    with pytest.raises(ValueError, match="依赖 a"):
+        select_sections(SECTIONS, {"a": False})
+    with pytest.raises(ValueError, match="未知"):
+        select_sections(SECTIONS, {"zzz": True})
+
+
+def test_build_is_memoized_on_inputs():
+    first = build_profile(SECTIONS, params={"value": 1}, header="# managed")
+    assert first.text == "# managed\n$a = 1\n$b = 2\n$c = $a\n"
+    assert build_profile(SECTIONS, params={"value": 1}, header="# managed") is first
+    assert build_profile(SECTIONS, params={"value": 2}, header="# managed") is not first
+    assert build_profile(SECTIONS, params={"value": 1}, minified=False).text.startswith("# A\n")
+
+
+def test_timing_markers_wrap_each_section():
+    text = build_profile(SECTIONS + [Section("empty", "")], params={"value": 1}, timing=True).text
+    lines = text.splitlines()
+    assert lines[0].startswith("if ($env:PROFILE_TIMING_LOG) {")
+    assert lines[1:3] == ["$a = 1", 'if ($__pt) { $__pl += " a=$($__pt.Elapsed.TotalMilliseconds)"; $__pt.Restart() }']
+    assert " empty=" not in text                     # 空段不计时
+    assert lines[-1].startswith("if ($__pt) { [IO.File]::AppendAllText($env:PROFILE_TIMING_LOG")
+    assert count_statements(text) == 3 + 3 + 2
+
+
+def test_budget_fails_build():
+    result = build_profile(SECTIONS, params={"value": 1})
+    assert (result.bytes, result.statements) == (22, 3)
+    build_profile(SECTIONS, params={"value": 1}, budget=Budget(22, 3))
+    with pytest.raises(BudgetExceeded, match="字节"):
+        build_profile(SECTIONS, params={"value": 1}, budget=Budget(max_bytes=21))
+    with pytest.raises(BudgetExceeded, match="启动语句"):
+        build_profile(SECTIONS, params={"value": 1}, budget=Budget(max_statements=2))
+
+
+def test_setup_profile_within_budget():
+    build = setup.build_powershell_profile()
+    assert build.sections == ["ssl", "utf8", "helpers", "proxy", "integrations"]
+    assert build.bytes <= setup.PROFILE_BUDGET_BYTES
+    assert build.statements <= setup.PROFILE_BUDGET_STATEMENTS
+    assert build.text.startswith(setup.PROFILE_HEADER)
+    assert "智能代理配置" in build.text          # setup_powershell_profile 据此识别受管理的 Profile
+    assert all(not line.lstrip().startswith("#") for line in build.text.splitlines()[1:])
+    assert "\nSet-AutoProxy\n" in build.text
+    # 预算按四个集成全部检测到的最坏情况计算
+    worst = setup.build_powershell_profile(integrations=[(i, "C:/tools/x.exe") for i in INTEGRATIONS])
+    assert worst.bytes <= setup.PROFILE_BUDGET_BYTES
+
+
+def test_setup_manifest_can_drop_sections():
+    text = setup.render_powershell_profile(manifest={"ssl": False})
+    assert "NODE_TLS_REJECT_UNAUTHORIZED" not in text
+    assert "function Set-AutoProxy" in text
+    with pytest.raises(ValueError):
+        setup.render_powershell_profile(manifest={"helpers": False})
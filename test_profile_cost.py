@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+profile_cost 测试：生成的 PowerShell / Git Bash Profile 启动路径中不得新增外部进程
+
+使用方法: python -m pytest test_profile_cost.py
+"""
+
+import pytest
+
+import proxy_share
+import setup
+from init_cache import INTEGRATIONS, render_bash
+from profile_cost import CONSOLE, EXTERNAL, FILE, NETWORK, PURE, REGISTRY, analyze_bash, analyze_powershell
+
+STARSHIP, ZOXIDE, CONDA, FNM = INTEGRATIONS
+DETECTED = [(STARSHIP, r"C:\s\starship.exe"), (ZOXIDE, r"C:\z\zoxide.exe"),
+            (CONDA, r"C:\c\conda.exe"), (FNM, r"C:\f\fnm.exe")]
+
+
+def _launches(report):
+    return [op.detail for _, op in report.violations()]
+
+
+@pytest.mark.parametrize("integrations", [None, DETECTED])
+def test_generated_profile_launches_no_processes(integrations):
+    report = analyze_powershell(setup.render_powershell_profile(integrations=integrations))
+    assert _launches(report) == [], report.format()
+    # init 缓存失效时才运行工具，登记为允许的启动
+    assert [op.via[-1] for _, op in report.launches()] == (["Get-InitCache"] * 2 if integrations else [])
+
+
+def test_set_auto_proxy_classification():
+    report = analyze_powershell(setup.render_powershell_profile())
+    statement = next(s for s in report.startup if s.text.strip() == "Set-AutoProxy")
+    categories = {op.category for op in statement.operations}
+    assert {NETWORK, REGISTRY, FILE, CONSOLE} <= categories
+    assert statement.category == NETWORK
+    assert all(s.category == PURE for s in report.startup if s.text.startswith("$env:"))
+
+
+def test_external_launches_are_detected():
+    script = '''
+chcp 65001 >$null 2>&1
+Write-Host "run git status"
+$branch = "$(git rev-parse --abbrev-ref HEAD)"
+function Sync-Tools { npm config set proxy $env:HTTP_PROXY }
+function Unused { scoop update }
+Sync-Tools
+$map = @{ Name = 'x'; Value = 1 }
+'''
+    report = analyze_powershell(script)
+    assert _launches(report) == ["chcp", "git", "npm"]
+    assert [op.via for _, op in report.violations()][-1] == ("Sync-Tools",)
+    assert report.startup[1].category == CONSOLE
+    assert report.startup[-1].category == PURE
+
+
+@pytest.mark.parametrize("existing", [None, "alias ll='ls -l'\n"])
+def test_git_bash_profile(existing):
+    text = setup.render_bash_profile(existing, DETECTED)
+    assert text == setup.render_bash_profile(text, DETECTED)         # 重新运行不再变化
+    assert render_bash(DETECTED) in text and proxy_share.render_source_block() in text
+    report = analyze_bash(text)
+    assert _launches(report) == [], report.format()
+    assert {op.via[-1] for _, op in report.launches()} == {"__init_cache"}
+    # 除缓存失效时才运行工具的 __init_cache 外，启动时只有环境变量和读文件
+    assert {s.category for s in report.startup if not s.text.startswith("__init_cache")} == {PURE, FILE}
+
+    bad = analyze_bash('PS1="$(git branch --show-current) $ "\neval "$(fnm env)"\nFOO=1 ls > /tmp/x\n')
+    assert _launches(bad) == ["$(...) 子 Shell", "git", "$(...) 子 Shell", "fnm", "ls"]
+    assert all(s.category == EXTERNAL for s in bad.startup)
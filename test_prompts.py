@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+prompts 测试：应答优先、无人值守不读控制台、单一读取线程与超时
+
+使用方法: python -m pytest test_prompts.py
+"""
+
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+import setup
+from prompts import ConsoleInput, Prompter, load_answers, parse_answer_items
+
+
+class ScriptedConsole:
+    """按顺序返回预设行的 readline；lines 耗尽后阻塞，直到 release()"""
+
+    def __init__(self, *lines):
+        self.lines = queue.Queue()
+        for line in lines:
+            self.lines.put(line)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.lines.get()
+
+    def feed(self, line):
+        self.lines.put(line)
+
+
+def prompter(console=None, **kwargs):
+    output = []
+    p = Prompter(console=console and ConsoleInput(console),
+                 output=lambda text, end="\n": output.append(text + end), **kwargs)
+    return p, output
+
+
+def test_answers_and_unattended_defaults_never_read_console():
+    console = ScriptedConsole()
+    p, output = prompter(console, answers={"scoop": "yes", "nerd_font": False}, interactive=False)
+    assert p.ask("scoop", "scoop? ") == "y"
+    assert p.ask("nerd_font", "font? ") == "n"
+    assert p.ask("powershell7", "pwsh? ", timeout=None) == "y"         # 不会无限期等待
+    assert console.calls == 0
+    assert output[-1] == "pwsh? y（无人值守，默认）\n"
+    with pytest.raises(ValueError):
+        Prompter(answers={"unknown": "y"})
+
+
+def test_interactive_reuses_one_reader_thread():
+    console = ScriptedConsole("maybe\n", "\n")
+    p, output = prompter(console)
+    assert p.ask("powershell7", "pwsh? ") == "y"                      # 无效输入后重新提示，空行取默认值
+    assert output.count("pwsh? ") == 2 and "  无效输入，请输入 y 或 n\n" in output
+    reader = p.console._thread
+    threading.Timer(0.05, console.feed, ["N\r\n"]).start()
+    assert p.ask("scoop", "scoop? ", timeout=5) == "n"
+    assert p.console._thread is reader and reader.is_alive()          # 同一个读取线程读完全部输入
+
+
+def test_timeout_leaves_no_stray_reader_and_discards_late_input():
+    console = ScriptedConsole()
+    p, output = prompter(console)
+    start = time.monotonic()
+    assert p.ask("nerd_font", "font? ", timeout=0.05) == "y"
+    assert time.monotonic() - start < 2
+    console.feed("n\n")                     # 超时后才到达的输入不属于下一个问题
+    time.sleep(0.05)
+    console.feed("y\n")
+    assert p.ask("scoop", "scoop? ", timeout=5) == "y"
+    assert console.calls == 3
+    console.feed("")                        # EOF：之后的问题立即取默认值
+    assert p.ask("powershell7", "pwsh? ", timeout=5) == "y"
+    assert p.ask("scoop", "scoop? ") == "n"
+
+
+def test_answers_file_and_cli(tmp_path):
+    path = tmp_path / "answers.json"
+    path.write_text(json.dumps({"powershell7": "n", "scoop": True}), encoding="utf-8-sig")
+    assert load_answers(path) == {"powershell7": "n", "scoop": "y"}
+    assert parse_answer_items(["nerd_font=no"]) == {"nerd_font": "n"}
+    with pytest.raises(ValueError):
+        parse_answer_items(["nerd_font"])
+
+    args = setup.parse_args(["--answers", str(path), "--answer", "scoop=n", "--non-interactive"])
+    assert args.preset == {"powershell7": "n", "scoop": "n"} and args.non_interactive
+    assert setup.parse_args(["-y", "--answer", "powershell7=n"]).preset == {
+        "powershell7": "n", "scoop": "y", "nerd_font": "y"}
+    with pytest.raises(SystemExit):
+        setup.parse_args(["--answer", "colour=y"])
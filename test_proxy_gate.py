@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+代理存活门控测试：proxy_gate 参考实现 + 生成的 Profile 门控代码
+
+使用方法: python -m pytest test_proxy_gate.py
+"""
+
+import time
+
+import setup
+from proxy_gate import DEAD, DIRECT, PROXY, AliveCache, check_alive, decide
+from standin_servers import StandinProxy, unused_port
+
+
+def test_disabled_or_unconfigured_is_direct():
+    calls = []
+    probe = calls.append
+    assert decide(0, "127.0.0.1:7897", probe).mode == DIRECT
+    assert decide(1, "", probe).mode == DIRECT
+    assert decide(1, None, probe).session_env["HTTP_PROXY"] is None
+    assert decide(0, "127.0.0.1:7897", probe, proxy_override="<local>").session_env["NO_PROXY"] is None
+    assert calls == []   # 直连时不探测
+
+
+def test_live_proxy_exports_env():
+    with StandinProxy() as proxy:
+        endpoint = f"{proxy.host}:{proxy.port}"
+        decision = decide(1, endpoint, proxy_override="<local>;*.corp.com;10.*")
+    assert decision.mode == PROXY
+    assert decision.session_env == {
+        "HTTP_PROXY": f"http://{endpoint}",
+        "HTTPS_PROXY": f"http://{endpoint}",
+        "ALL_PROXY": f"socks5://{endpoint}",
+        "NO_PROXY": "localhost,127.0.0.1,::1,.corp.com,10.0.0.0/8",   # 与 Set-AutoProxy 一致
+    }
+    # 没有例外列表时也导出回环地址（与 ConvertTo-NoProxy 一致）
+    assert decide(1, endpoint, lambda _: True).session_env["NO_PROXY"] == "localhost,127.0.0.1,::1"
+
+
+def test_dead_proxy_falls_back_within_budget():
+    endpoint = f"127.0.0.1:{unused_port()}"
+    start = time.perf_counter()
+    decision = decide(1, endpoint)
+    assert (time.perf_counter() - start) * 1000 < 200
+    assert decision.mode == DEAD
+    assert decision.endpoint == endpoint
+    assert all(v is None for v in decision.session_env.values())
+    # 回退直连时清除 NO_PROXY（与 Set-AutoProxy / Publish-ProxyState 一致）
+    assert set(decision.session_env) == {"HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "NO_PROXY"}
+
+
+def test_check_alive_rejects_garbage():
+    assert not check_alive("not-an-endpoint")
+
+
+def test_cache_skips_probe_until_ttl(tmp_path):
+    cache = AliveCache(tmp_path / "proxy_alive.txt", ttl=15)
+    calls = []
+
+    def probe(endpoint):
+        calls.append(endpoint)
+        return False
+
+    assert decide(1, "127.0.0.1:7897", probe, cache, now=1000).mode == DEAD
+    cached = decide(1, "127.0.0.1:7897", probe, cache, now=1010)
+    assert cached.mode == DEAD and cached.from_cache
+    assert len(calls) == 1
+    # 端点变化或过期都会重新探测
+    decide(1, "127.0.0.1:7890", probe, cache, now=1011)
+    decide(1, "127.0.0.1:7890", probe, cache, now=1030)
+    assert len(calls) == 3
+
+
+def test_cache_file_format_matches_profile(tmp_path):
+    cache = AliveCache(tmp_path / "proxy_alive.txt")
+    cache.put("127.0.0.1:7897", True, now=1234)
+    assert (tmp_path / "proxy_alive.txt").read_text(encoding="utf-8") == "127.0.0.1:7897|1|1234"
+
+
+def test_profile_emits_bounded_gate():
+    profile = setup.render_powershell_profile()
+    assert "function Test-ProxyAlive" in profile
+    assert f"$PROXY_ALIVE_BUDGET_MS    = {setup.PROXY_ALIVE_BUDGET_MS}" in profile
+    assert ".Wait($BudgetMs)" in profile
+    # 门控在导出代理变量之前执行，失效时标记并直接返回
+    gate = profile.index("-not (Test-ProxyAlive $proxyServer")
+    export = profile.index('$env:HTTP_PROXY  = $httpProxy')
+    assert gate < export
+    assert "$global:ProxyDeadEndpoint = $proxyServer" in profile
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+代理命令模块（ProxyTools）测试：Profile 只保留启动路径，其余命令由模块导出
+
+使用方法: python -m pytest test_proxy_module.py
+"""
+
+import re
+
+import setup
+from proxy_select import Selection
+
+
+def defined_functions(script):
+    return set(re.findall(r"^function ([\w-]+) \{", script, re.MULTILINE))
+
+
+def test_profile_keeps_only_startup_path():
+    profile = setup.render_powershell_profile()
+    module, _ = setup.render_proxy_module()
+    assert defined_functions(profile).isdisjoint(defined_functions(module))
+    for name in setup.PROXY_MODULE_FUNCTIONS:
+        assert f"function {name} {{" not in profile
+    assert "Set-Alias" not in profile
+    # 启动时执行的 Set-AutoProxy 只调用 Profile 自身定义的函数，不会在启动时触发模块加载
+    auto = profile[profile.index("function Set-AutoProxy"):].split("\n}\n")[0]
+    auto = re.sub(r'"[^"]*"', '""', auto)          # 提示文字里的命令名不算调用
+    called = set(re.findall(r"\b([A-Z][a-z]+-[A-Z][A-Za-z]+)\b", auto)) - {
+        "Get-ItemProperty", "Write-Host", "Set-AutoProxy"}
+    assert called <= defined_functions(profile)
+
+
+def test_module_exports_match_manifest():
+    module, manifest = setup.render_proxy_module()
+    assert set(setup.PROXY_MODULE_FUNCTIONS) <= defined_functions(module)
+    for alias in setup.PROXY_MODULE_ALIASES:
+        assert f"Set-Alias -Name {alias} " in module
+    export = module.strip().splitlines()[-1]
+    assert export.startswith("Export-ModuleMember -Function Get-FastestProxyAddress, ")
+    assert "-Alias proxy, proxy-sync, proxy-status, us" in export
+    assert "RootModule        = 'ProxyTools.psm1'" in manifest
+    assert "FunctionsToExport = @('Get-FastestProxyAddress', 'Sync-ProxyToTools'" in manifest
+    assert "AliasesToExport   = @('proxy', 'proxy-sync', 'proxy-status', 'us')" in manifest
+
+
+def test_install_writes_module_with_bom(tmp_path):
+    module_dir = setup.install_proxy_module(tmp_path)
+    assert module_dir == tmp_path / "Modules" / "ProxyTools"
+    for suffix in (".psm1", ".psd1"):
+        data = (module_dir / f"ProxyTools{suffix}").read_bytes()
+        assert data.startswith(b"\xef\xbb\xbf")
+    assert "Update-Env" in (module_dir / "ProxyTools.psm1").read_text(encoding="utf-8-sig")
+
+
+def test_profile_is_much_smaller():
+    profile = setup.render_powershell_profile()
+    module, _ = setup.render_proxy_module()
+    assert len(profile) < 0.6 * (len(profile) + len(module))
+
+
+def test_module_delegates_selection_to_proxy_select():
+    module, _ = setup.render_proxy_module()
+    fastest = module[module.index("function Get-FastestProxyAddress"):].split("\n}\n")[0]
+    assert "TcpClient" not in fastest and "$PROXY_SELECT_SCRIPT --force" in fastest
+    assert "--sample-url $PROXY_SAMPLE_URL" in fastest
+    assert f"$PROXY_SAMPLE_URL    = '{setup.PROXY_SAMPLE_URL}'" in module
+    assert "proxy_select.py'" in module
+
+
+def test_proxy_selection_samples_throughput_and_accepts_no_proxy(monkeypatch):
+    calls = []
+
+    def fake_select(candidates, **kwargs):
+        calls.append(kwargs)
+        return Selection(None, [{"endpoint": "127.0.0.1:7897", "alive": False, "error": "refused"}], 0)
+
+    monkeypatch.setattr(setup, "select_endpoint", fake_select)
+    assert setup.setup_proxy_selection() is True           # 没有运行代理不算失败
+    assert calls[0]["sample_url"] == setup.PROXY_SAMPLE_URL and calls[0]["force"]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+proxy_probe 测试（使用 standin_servers 本地替身代理，完全离线）
+
+使用方法: python -m pytest test_proxy_probe.py
+"""
+
+import time
+
+from proxy_probe import parse_proxy_modes, parse_proxy_server, probe_endpoints
+from standin_servers import StandinProxy, unused_port
+
+
+def test_parse_proxy_server_formats():
+    assert parse_proxy_server("127.0.0.1:7897") == [("127.0.0.1", 7897)]
+    assert parse_proxy_server("http://127.0.0.1:7897/") == [("127.0.0.1", 7897)]
+    assert parse_proxy_server(
+        "http=127.0.0.1:7897;https=127.0.0.1:7897;socks=127.0.0.1:7898"
+    ) == [("127.0.0.1", 7897), ("127.0.0.1", 7898)]
+    assert parse_proxy_server("") == []
+    assert parse_proxy_server("no-port") == []
+
+
+def test_parse_proxy_modes_probes_socks_entries_with_socks5():
+    assert parse_proxy_modes("http=127.0.0.1:7890;https=127.0.0.1:7890;socks=127.0.0.1:7891") == [
+        (("127.0.0.1", 7890), "http"), (("127.0.0.1", 7891), "socks5")]
+    assert parse_proxy_modes("socks5://127.0.0.1:1080;127.0.0.1:8080") == [
+        (("127.0.0.1", 1080), "socks5"), (("127.0.0.1", 8080), "http")]
+    # 混合端口（HTTP 与 SOCKS 同端口）只探测一次
+    assert parse_proxy_modes("http=127.0.0.1:7897;socks=127.0.0.1:7897") == [(("127.0.0.1", 7897), "http")]
+
+
+def test_tcp_only_probe():
+    with StandinProxy() as proxy:
+        [result] = probe_endpoints([proxy.address])
+    assert result.alive
+    assert result.connect_ms is not None
+    assert result.handshake_ms is None
+
+
+def test_http_connect_handshake():
+    with StandinProxy() as target, StandinProxy() as proxy:
+        [result] = probe_endpoints([proxy.address], mode="http", target=target.address)
+    assert result.alive
+    assert result.status == 200
+    assert result.handshake_ms is not None
+
+
+def test_http_connect_upstream_unreachable_still_alive():
+    with StandinProxy() as proxy:
+        [result] = probe_endpoints([proxy.address], mode="http",
+                                   target=("127.0.0.1", unused_port()))
+    assert result.alive
+    assert result.status == 502
+
+
+def test_socks5_handshake():
+    with StandinProxy() as proxy:
+        [result] = probe_endpoints([proxy.address], mode="socks5")
+    assert result.alive
+    assert result.handshake_ms is not None
+
+
+def test_dead_port_fails_fast():
+    [result] = probe_endpoints([("127.0.0.1", unused_port())], mode="http")
+    assert not result.alive
+    assert result.connect_ms is None
+    assert "连接失败" in result.error
+
+
+def test_unresponsive_proxy_hits_handshake_deadline():
+    with StandinProxy(respond=False) as proxy:
+        [result] = probe_endpoints([proxy.address], mode="socks5", handshake_timeout=0.2)
+    assert not result.alive
+    assert result.connect_ms is not None
+    assert "握手超时" in result.error
+
+
+def test_endpoints_probed_concurrently():
+    proxies = [StandinProxy(delay=0.4).start() for _ in range(3)]
+    try:
+        start = time.perf_counter()
+        results = probe_endpoints([p.address for p in proxies], mode="socks5")
+        elapsed = time.perf_counter() - start
+    finally:
+        for p in proxies:
+            p.stop()
+    assert all(r.alive for r in results)
+    assert all(r.handshake_ms >= 350 for r in results)
+    assert elapsed < 1.0   # 串行至少 1.2 秒
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+proxy_select 测试（本地替身代理/源站，完全离线）
+
+使用方法: python -m pytest test_proxy_select.py
+"""
+
+import json
+
+from proxy_select import normalize_candidates, select_endpoint
+from standin_servers import StandinOrigin, StandinProxy, unused_port
+
+
+def _endpoint(server):
+    return f"{server.host}:{server.port}"
+
+
+def test_normalize_candidates_dedupes_and_expands():
+    assert normalize_candidates([
+        "127.0.0.1:7897", "http=127.0.0.1:7897;socks=127.0.0.1:7898", "bad",
+    ]) == ["127.0.0.1:7897", "127.0.0.1:7898"]
+
+
+def test_selects_lowest_latency_live_endpoint(tmp_path):
+    dead = f"127.0.0.1:{unused_port()}"
+    with StandinProxy(delay=0.2) as slow, StandinProxy() as fast:
+        selection = select_endpoint(
+            [dead, _endpoint(slow), _endpoint(fast)],
+            cache_path=tmp_path / "cache.json", target=slow.address)
+    assert selection.endpoint == _endpoint(fast)
+    assert [e["alive"] for e in selection.ranking] == [True, True, False]
+    assert selection.ranking[-1]["endpoint"] == dead
+
+
+def test_throughput_sample_breaks_latency_tie(tmp_path):
+    # 握手延迟相同（都不延迟），slow 的线路限速 128KB/s：按吞吐量选出 fast（slow 排在候选列表前面）
+    with StandinOrigin() as origin, StandinProxy(rate=128 * 1024) as slow, StandinProxy() as fast:
+        selection = select_endpoint(
+            [_endpoint(slow), _endpoint(fast)], cache_path=tmp_path / "cache.json",
+            sample_url=origin.url(65536), target=origin.address)
+    assert selection.endpoint == _endpoint(fast)
+    first, second = selection.ranking
+    assert second["endpoint"] == _endpoint(slow) and first["throughput"] > 4 * second["throughput"]
+    # 名次由吞吐量决定，不是延迟的偶然差异
+    assert second["score_ms"] - first["score_ms"] > abs(second["latency_ms"] - first["latency_ms"]) + 100
+
+
+def test_winner_is_cached_with_ttl(tmp_path):
+    cache = tmp_path / "cache.json"
+    with StandinProxy() as proxy:
+        candidates = [_endpoint(proxy)]
+        first = select_endpoint(candidates, ttl=60, cache_path=cache, now=1000)
+        assert not first.from_cache
+        data = json.loads(cache.read_text(encoding="utf-8"))
+        assert data["endpoint"] == _endpoint(proxy)
+        assert data["candidates"] == candidates
+
+    # 代理已停止，但缓存未过期：直接返回缓存结果
+    cached = select_endpoint(candidates, ttl=60, cache_path=cache, now=1030)
+    assert cached.from_cache and cached.endpoint == _endpoint(proxy)
+
+    # 缓存过期后重新探测，已停止的代理不再被选中
+    expired = select_endpoint(candidates, ttl=60, cache_path=cache, now=2000)
+    assert not expired.from_cache
+    assert expired.endpoint is None
+
+
+def test_cache_ignored_when_candidates_change(tmp_path):
+    cache = tmp_path / "cache.json"
+    with StandinProxy() as a, StandinProxy() as b:
+        select_endpoint([_endpoint(a)], cache_path=cache)
+        selection = select_endpoint([_endpoint(a), _endpoint(b)], cache_path=cache)
+    assert not selection.from_cache
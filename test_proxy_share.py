@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+共享代理状态文件测试（Bash 片段在本机 bash 中实际执行，PATH 置空以确认不启动子进程）
+
+使用方法: python -m pytest test_proxy_share.py
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import setup
+from init_cache import replace_bash_block
+from profile_cost import analyze_bash
+from proxy_share import (BLOCK_END, BLOCK_START, DEAD, DIRECT, LOCKED, PROXY, format_state, read_state,
+                         render_snippet, render_source_block, write_state, wsl_path)
+
+NO_PROXY = "localhost,127.0.0.1,::1"
+
+
+def test_format_state():
+    assert format_state(PROXY, "127.0.0.1:7897", NO_PROXY) == (
+        "PROXY_MODE=proxy\nPROXY_ENDPOINT=127.0.0.1:7897\nHTTP_PROXY=http://127.0.0.1:7897\n"
+        "HTTPS_PROXY=http://127.0.0.1:7897\nALL_PROXY=socks5://127.0.0.1:7897\n"
+        f"NO_PROXY={NO_PROXY}\n")
+    assert format_state(LOCKED, "127.0.0.1:7890", "").startswith("PROXY_MODE=locked\n")
+    # 代理无应答：记录端点，但不导出代理变量
+    assert format_state(DEAD, "127.0.0.1:7897", NO_PROXY) == (
+        "PROXY_MODE=dead\nPROXY_ENDPOINT=127.0.0.1:7897\nHTTP_PROXY=\nHTTPS_PROXY=\nALL_PROXY=\nNO_PROXY=\n")
+    assert format_state(DIRECT).startswith("PROXY_MODE=direct\nPROXY_ENDPOINT=\nHTTP_PROXY=\n")
+    assert wsl_path(r"C:\Users\a b\.proxy_env") == "/mnt/c/Users/a b/.proxy_env"
+
+
+def test_write_state_is_atomic_and_skips_unchanged(tmp_path):
+    path = tmp_path / ".proxy_env"
+    text = format_state(PROXY, "127.0.0.1:7897", NO_PROXY)
+    assert write_state(text, path)
+    assert not write_state(text, path)
+    assert read_state(path)["HTTP_PROXY"] == "http://127.0.0.1:7897"
+    assert write_state(format_state(DIRECT), path)
+    assert read_state(path)["PROXY_MODE"] == DIRECT
+    assert [p.name for p in tmp_path.iterdir()] == [".proxy_env"]     # 不留临时文件
+    assert read_state(tmp_path / "missing") == {}
+
+
+def test_powershell_publishes_every_decision():
+    profile = setup.render_powershell_profile()
+    auto = profile[profile.index("function Set-AutoProxy"):].split("\n}\n")[0]
+    for call in ("Publish-ProxyState dead $proxyServer", "Publish-ProxyState proxy $proxyServer $noProxy",
+                 "Publish-ProxyState direct"):
+        assert call in auto
+    assert "function Publish-ProxyState {" in profile
+    assert "[IO.File]::Replace($tmp, $f, $null)" in profile
+    module, _ = setup.render_proxy_module()
+    assert "Publish-ProxyState locked $proxyServer $env:NO_PROXY" in module
+
+
+def test_source_block_is_managed():
+    block = render_source_block(r"C:\Users\a\.proxy_env.sh")
+    assert block == (f"{BLOCK_START}\n[ -r '/c/Users/a/.proxy_env.sh' ] && . '/c/Users/a/.proxy_env.sh'\n"
+                     f"[ -r '/mnt/c/Users/a/.proxy_env.sh' ] && . '/mnt/c/Users/a/.proxy_env.sh'\n{BLOCK_END}\n")
+    once = replace_bash_block("export LANG=en_US.UTF-8\n", block, BLOCK_START, BLOCK_END)
+    assert replace_bash_block(once, block, BLOCK_START, BLOCK_END) == once
+    assert analyze_bash(render_snippet(r"C:\Users\a\.proxy_env")).launches() == []
+
+
+def test_setup_wsl_proxy_passes_block_on_stdin(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(setup, "list_wsl_distros", lambda: ["Ubuntu"])
+    monkeypatch.setattr(setup.proxy_share, "install_snippet", lambda: False)
+    monkeypatch.setattr(setup, "run", lambda args, **kwargs: calls.append((args, kwargs))
+                        or SimpleNamespace(ok=True, stdout="/home/a\n", stderr="", returncode=0))
+    journal = SimpleNamespace(record_file=lambda path, external=False: calls.append((path, external)))
+    monkeypatch.setattr(setup.journal, "get_journal", lambda: journal)
+    assert setup.setup_wsl_proxy()
+    home, record, (args, kwargs) = calls
+    # 追加之前经 \\wsl$ 记录原内容（由外部进程原地改写，复制保存）
+    assert home[0][:4] == ["wsl", "-d", "Ubuntu", "-e"]
+    assert record == (Path("\\\\wsl$\\Ubuntu") / "home/a" / ".bashrc", True)
+    # -e：不经发行版的默认 Shell，脚本只由 sh 解析一次；片段经 stdin 传入，不出现在命令行上
+    assert args[:6] == ["wsl", "-d", "Ubuntu", "-e", "sh", "-c"] and len(args) == 7
+    assert kwargs["input"] == render_source_block() and "$0" not in args[6]
+    if shutil.which("sh"):
+        bashrc = tmp_path / ".bashrc"
+        bashrc.write_text("alias ll='ls -l'\n")
+        for _ in range(2):                         # 已包含片段时不再追加
+            subprocess.run(args[4:], input=kwargs["input"], text=True, check=True, timeout=30,
+                           env={"HOME": str(tmp_path), "PATH": "/usr/bin:/bin"})
+        assert bashrc.read_text() == "alias ll='ls -l'\n\n" + render_source_block()
+
+
+def test_setup_wsl_proxy_skips_distro_it_cannot_journal(monkeypatch):
+    calls = []
+    monkeypatch.setattr(setup, "list_wsl_distros", lambda: ["Ubuntu"])
+    monkeypatch.setattr(setup.proxy_share, "install_snippet", lambda: False)
+    monkeypatch.setattr(setup, "run", lambda args, **kwargs: calls.append(args)
+                        or SimpleNamespace(ok=False, stdout="", stderr="", returncode=1))
+    assert not setup.setup_wsl_proxy()
+    assert len(calls) == 1                         # 只查询了 ~ 目录，没有追加
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="需要 bash")
+class TestSnippet:
+    @pytest.fixture
+    def env(self, tmp_path):
+        state = tmp_path / ".proxy_env"
+        snippet = tmp_path / ".proxy_env.sh"
+        snippet.write_text(render_snippet(state))
+
+        def shell(command, text, **extra):
+            state.write_bytes(text.replace("\n", "\r\n").encode())      # PowerShell 可能写出 CRLF
+            env = {"PATH": "/nonexistent", **extra}                      # 任何外部命令都会失败
+            return subprocess.run([shutil.which("bash"), "--noprofile", "--norc", "-c",
+                                   f". '{snippet}'; {command}"],
+                                  capture_output=True, text=True, env=env, timeout=30)
+        return shell
+
+    def test_proxy_mode_exports_both_cases(self, env):
+        result = env('echo "$PROXY_MODE|$HTTP_PROXY|$https_proxy|$all_proxy|$no_proxy"',
+                     format_state(PROXY, "127.0.0.1:7897", NO_PROXY))
+        assert result.stderr == ""
+        assert result.stdout == ("proxy|http://127.0.0.1:7897|http://127.0.0.1:7897|"
+                                 f"socks5://127.0.0.1:7897|{NO_PROXY}\n")
+
+    def test_direct_mode_clears_inherited_proxy(self, env):
+        result = env('echo "$PROXY_MODE|${HTTP_PROXY-unset}|${http_proxy-unset}|${__pv-clean}"',
+                     format_state(DIRECT), HTTP_PROXY="http://stale:1", http_proxy="http://stale:1")
+        assert result.stdout == "direct|unset|unset|clean\n"
+
+    def test_wsl_host_substitution(self, env):
+        state = format_state(PROXY, "127.0.0.1:7897", NO_PROXY)
+        result = env('echo "$http_proxy|$NO_PROXY"', state,
+                     WSL_DISTRO_NAME="Ubuntu", PROXY_WSL_HOST="172.20.0.1")
+        assert result.stdout == f"http://172.20.0.1:7897|{NO_PROXY}\n"
+        assert env('echo "$http_proxy"', state, PROXY_WSL_HOST="172.20.0.1").stdout == \
+            "http://127.0.0.1:7897\n"
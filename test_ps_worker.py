@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+ps_worker 协议测试（使用 ps_worker_standin.py 替身，无需 PowerShell）
+
+使用方法: python -m pytest test_ps_worker.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from ps_worker import PowerShellTimeout, PowerShellWorker, PowerShellWorkerError
+
+STANDIN = [sys.executable, str(Path(__file__).with_name("ps_worker_standin.py"))]
+
+
+@pytest.fixture
+def worker():
+    w = PowerShellWorker(command=STANDIN, timeout=5)
+    yield w
+    w.close()
+
+
+def test_query_round_trip(worker):
+    assert worker.query("echo:hello") == "hello"
+    assert worker.query("echo:中文 ✅") == "中文 ✅"
+
+
+def test_batch_reuses_single_process(worker):
+    outputs = worker.query_many(["pid", "echo:a", "pid", "echo:b"])
+    assert outputs[1:4:2] == ["a", "b"]
+    assert outputs[0] == outputs[2]
+    assert worker.query("pid") == outputs[0]
+    assert worker.restarts == 0
+
+
+def test_unframed_output_is_ignored(worker):
+    assert worker.query("noise:stray line") == "stray line"
+    assert worker.query("echo:next") == "next"
+
+
+def test_script_error_raises(worker):
+    with pytest.raises(PowerShellWorkerError, match="boom"):
+        worker.query("error:boom")
+    assert worker.query("echo:still alive") == "still alive"
+
+
+def test_timeout_restarts_worker(worker):
+    pid = worker.query("pid")
+    with pytest.raises(PowerShellTimeout):
+        worker.query("sleep:5", timeout=0.3)
+    assert worker.restarts == 1
+    assert worker.query("pid") != pid
+
+
+def test_crash_restarts_and_resends(worker):
+    pid = worker.query("pid")
+    with pytest.raises(PowerShellWorkerError):
+        worker.query("exit")  # 每次重发都会再次退出，最终放弃
+    assert worker.query("pid") != pid
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+registry 测试（MemoryBackend，不访问真实注册表）
+
+使用方法: python -m pytest test_registry.py
+"""
+
+import pytest
+
+import setup
+from registry import (CODEPAGE_KEY, ENVIRONMENT_KEY, HKCU, HKLM, REG_EXPAND_SZ, REG_SZ, USER_FONTS_KEY,
+                      MemoryBackend, Registry, code_page)
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend({
+        (HKCU, ENVIRONMENT_KEY): {"LANG": "en_US.UTF-8", "Path": (r"%USERPROFILE%\bin", REG_EXPAND_SZ)},
+        (HKLM, CODEPAGE_KEY): {"ACP": "936", "OEMCP": "936"},
+    })
+
+
+def test_reads_are_cached_per_key(backend):
+    reg = Registry(backend)
+    assert code_page(reg) == "936"
+    assert reg.get(HKLM, CODEPAGE_KEY.upper(), "OEMCP") == "936"     # 键名不区分大小写
+    assert reg.get(HKLM, CODEPAGE_KEY, "MACCP", "none") == "none"
+    assert backend.reads == 1
+    assert reg.get(HKCU, r"Software\Missing", "x") is None
+    assert not reg.exists(HKCU, r"Software\Missing")
+    assert reg.get(HKCU, r"Software\Missing", "y") is None
+    assert backend.reads == 2
+    reg.invalidate(HKLM, CODEPAGE_KEY)
+    code_page(reg)
+    assert backend.reads == 3
+
+
+def test_writes_are_coalesced_and_unchanged_values_skipped(backend):
+    reg = Registry(backend)
+    assert not reg.set(HKCU, ENVIRONMENT_KEY, "LANG", "en_US.UTF-8")
+    assert reg.set(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8", "1")
+    assert reg.set(HKCU, ENVIRONMENT_KEY, "PYTHONIOENCODING", "utf-8")
+    assert reg.get(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8") == "1"          # 缓冲中的值可读
+    # 类型不同也算变化；改回原值则不写
+    assert reg.set(HKCU, ENVIRONMENT_KEY, "Path", r"%USERPROFILE%\bin")
+    assert reg.set(HKCU, ENVIRONMENT_KEY, "Path", r"%USERPROFILE%\bin", REG_EXPAND_SZ)
+    assert reg.delete(HKCU, ENVIRONMENT_KEY, "LANG")
+    assert not reg.delete(HKCU, ENVIRONMENT_KEY, "NOPE")
+    assert backend.writes == []
+
+    assert reg.flush() == 3
+    assert backend.writes == [(HKCU, ENVIRONMENT_KEY, {"PYTHONUTF8": ("1", REG_SZ),
+                                                       "PYTHONIOENCODING": ("utf-8", REG_SZ),
+                                                       "LANG": None})]
+    assert set(reg.values(HKCU, ENVIRONMENT_KEY)) == {"Path", "PYTHONUTF8", "PYTHONIOENCODING"}
+    assert reg.flush() == 0
+    assert backend.reads == 1
+
+
+def test_environment_broadcast_at_most_once(backend):
+    reg = Registry(backend)
+    reg.set(HKCU, USER_FONTS_KEY, "A (TrueType)", r"C:\fonts\a.ttf")
+    reg.flush()
+    assert backend.broadcasts == 0                  # 非环境变量键不广播
+    assert backend.writes[-1][0:2] == (HKCU, USER_FONTS_KEY)
+    for value in ("1", "0"):
+        with reg:
+            reg.set(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8", value)
+    assert len(backend.writes) == 3
+    assert backend.broadcasts == 1
+
+
+def test_failed_write_keeps_pending_changes(backend):
+    class Flaky(MemoryBackend):
+        fail = True
+
+        def write_key(self, root, path, changes):
+            if self.fail:
+                raise PermissionError("denied")
+            super().write_key(root, path, changes)
+
+    flaky = Flaky()
+    reg = Registry(flaky)
+    reg.set(HKCU, ENVIRONMENT_KEY, "LANG", "C.UTF-8")
+    with pytest.raises(PermissionError):
+        reg.flush()
+    flaky.fail = False
+    assert reg.flush() == 1
+    assert flaky.keys[(HKCU, ENVIRONMENT_KEY.lower())] == {"LANG": ("C.UTF-8", REG_SZ)}
+
+
+def test_setup_utf8_env_writes_once(backend, monkeypatch):
+    reg = Registry(backend)
+    monkeypatch.setattr(setup, "get_registry", lambda: reg)
+    monkeypatch.setattr(setup.os, "environ", {})
+    assert setup.setup_utf8_env()
+    assert backend.writes == [(HKCU, ENVIRONMENT_KEY, {"PYTHONUTF8": ("1", REG_SZ),
+                                                       "PYTHONIOENCODING": ("utf-8", REG_SZ)})]
+    assert backend.broadcasts == 1
+    assert setup.setup_utf8_env()
+    assert len(backend.writes) == 1 and backend.reads == 1
+    monkeypatch.setattr(setup, "code_page", lambda: code_page(reg))
+    assert not setup.check_system_utf8()
+    assert backend.reads == 2
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+runner 测试（调用当前 Python 解释器作为外部命令，跨平台运行）
+
+使用方法: python -m pytest test_runner.py
+"""
+
+import sys
+import time
+
+import runner
+from runner import decode_output, run, run_many
+
+PY = sys.executable
+
+
+def test_run_captures_output_and_returncode():
+    result = run([PY, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"])
+    assert result.returncode == 3
+    assert not result.ok
+    assert result.stdout == "out\n"
+    assert result.stderr == "err\n"
+    assert result.duration > 0
+
+
+def test_run_passes_stdin_as_utf8():
+    code = "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())"
+    assert run([PY, "-c", code], input="中文 ✅").stdout == "中文 ✅"
+
+
+def test_missing_executable_is_reported():
+    result = run(["definitely-not-a-real-tool-xyz", "--version"])
+    assert result.not_found
+    assert result.returncode is None
+    assert not result.ok
+
+
+def test_timeout_kills_hung_command():
+    start = time.perf_counter()
+    result = run([PY, "-c", "import time; time.sleep(30)"], timeout=0.5)
+    assert result.timed_out
+    assert not result.ok
+    assert time.perf_counter() - start < 10
+
+
+def test_run_many_runs_concurrently_in_order():
+    sleep = "import time, sys; time.sleep(0.5); print(sys.argv[1])"
+    start = time.perf_counter()
+    results = run_many([[PY, "-c", sleep, str(i)] for i in range(4)])
+    elapsed = time.perf_counter() - start
+    assert [r.stdout.strip() for r in results] == ["0", "1", "2", "3"]
+    assert elapsed < 1.8  # 串行至少需要 2 秒
+
+
+def test_concurrency_cap(monkeypatch):
+    monkeypatch.setattr(runner, "MAX_CONCURRENCY", 1)
+    sleep = "import time; time.sleep(0.3)"
+    start = time.perf_counter()
+    run_many([[PY, "-c", sleep]] * 3)
+    assert time.perf_counter() - start >= 0.9
+
+
+def test_decode_output_falls_back_to_console_codepage(monkeypatch):
+    monkeypatch.setattr(runner, "CONSOLE_ENCODING", "gbk")
+    assert decode_output("活动代码页: 936\r\n".encode("gbk")) == "活动代码页: 936\n"
+    assert decode_output("UTF-8 ✅".encode("utf-8")) == "UTF-8 ✅"
+    assert decode_output(b"") == ""
+
+
+def test_explicit_encoding_does_not_fall_back_to_console_codepage():
+    code = "import sys; sys.stdout.buffer.write('中文'.encode('gbk'))"
+    stdout = run([PY, "-c", code], encoding="utf-8").stdout
+    assert stdout == "中文".encode("gbk").decode("utf-8", errors="replace") and "中文" not in stdout
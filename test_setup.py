@@ -3,16 +3,33 @@
 Windows 开发环境配置测试脚本
 验证 PowerShell、VS Code、代理、编码等配置是否正确
 
-使用方法: python test_setup.py
+使用方法:
+    python test_setup.py                   # 增量：只重新检查输入变化了的项，其余沿用上次结果
+    python test_setup.py --all             # 全部重新检查
+    python test_setup.py --failed-only     # 只重新检查上次失败的项
+    python test_setup.py --since-last-run  # 只检查并报告输入变化了的项
+    python test_setup.py --jsonl results.jsonl --junit results.xml   # 导出结构化结果
+    python test_setup.py --watch           # 输入变化时只重新检查受影响的项，输出 JSON Lines 事件
 """
 
 import os
 import sys
+import argparse
 import json
-import subprocess
-import winreg
+import time
 from pathlib import Path
 
+from no_proxy import no_proxy_value, read_proxy_override
+from proxy_probe import parse_proxy_modes, probe_endpoints
+from ps_worker import get_worker
+from registry import CODEPAGE_KEY, ENVIRONMENT_KEY, HKCU, HKLM, INTERNET_SETTINGS_KEY, code_page, get_registry
+from runner import run, run_many
+from shell_matrix import PROBE_TEXT, describe_failures, format_grid, run_matrix, summarize
+from verify_cache import (ALL, CACHED, FAILED_ONLY, INCREMENTAL, SINCE_LAST_RUN, Check, env_input, file_input,
+                          observe, record_message, registry_input, run_checks, value_input, which_input)
+from verify_report import to_json_line, write_jsonl, write_junit
+from verify_watch import DEFAULT_INTERVAL, create_watcher, watch
+
 # 强制 UTF-8 输出
 sys.stdout.reconfigure(encoding='utf-8')
 sys.stderr.reconfigure(encoding='utf-8')
@@ -38,18 +55,22 @@ def print_test(name):
 
 def print_pass(msg):
     print(f"  {Colors.GREEN}[PASS]{Colors.RESET} {msg}")
+    record_message("pass", msg)
 
 
 def print_fail(msg):
     print(f"  {Colors.RED}[FAIL]{Colors.RESET} {msg}")
+    record_message("fail", msg)
 
 
 def print_warn(msg):
     print(f"  {Colors.YELLOW}[WARN]{Colors.RESET} {msg}")
+    record_message("warn", msg)
 
 
 def print_info(msg):
     print(f"  [INFO] {msg}")
+    record_message("info", msg)
 
 
 def test_python_encoding():
@@ -60,6 +81,7 @@ def test_python_encoding():
 
     # stdout 编码
     stdout_enc = sys.stdout.encoding.lower()
+    observe(stdout_enc)
     if 'utf' in stdout_enc:
         print_pass(f"stdout 编码: {stdout_enc}")
         results.append(True)
@@ -93,19 +115,10 @@ def test_powershell_7():
     print_test("PowerShell 7 安装")
 
     try:
-        result = subprocess.run(
-            ["pwsh", "-Command", "$PSVersionTable.PSVersion.ToString()"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        if result.returncode == 0:
-            version = result.stdout.strip()
-            print_pass(f"PowerShell 版本: {version}")
-            return True
-        else:
-            print_fail(f"PowerShell 执行失败: {result.stderr}")
-            return False
+        version = get_worker("pwsh").query("$PSVersionTable.PSVersion.ToString()")
+        observe(version)
+        print_pass(f"PowerShell 版本: {version}")
+        return True
     except FileNotFoundError:
         print_fail("PowerShell 7 (pwsh) 未安装")
         return False
@@ -128,10 +141,15 @@ def test_powershell_profile():
 
     content = profile_path.read_text(encoding='utf-8')
 
+    # 非启动路径的代理命令安装为按需加载的模块（用户模块路径）
+    manifest = profile_path.parent / "Modules" / "ProxyTools" / "ProxyTools.psd1"
+
     checks = [
         ("UTF-8 编码设置", "UTF8" in content or "utf-8" in content.lower()),
         ("代理配置函数", "Set-AutoProxy" in content),
-        ("chcp 65001", "65001" in content),
+        # 代码页由 [Console]::OutputEncoding 切换，启动路径不应再运行 chcp.com（见 profile_cost.py）
+        ("启动时不调用 chcp", "chcp" not in content),
+        ("代理命令模块 ProxyTools", manifest.exists()),
     ]
 
     results = []
@@ -190,19 +208,18 @@ def test_windows_proxy_setting():
     print_test("Windows 代理设置检测")
 
     try:
-        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-            proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
-            print_pass(f"ProxyEnable 值: {proxy_enable}")
-
-            if proxy_enable:
-                try:
-                    proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
-                    print_info(f"代理服务器: {proxy_server}")
-                except Exception:
-                    pass
+        reg = get_registry()
+        proxy_enable = reg.get(HKCU, INTERNET_SETTINGS_KEY, "ProxyEnable")
+        if proxy_enable is None:
+            raise FileNotFoundError("注册表中没有 ProxyEnable")
+        print_pass(f"ProxyEnable 值: {proxy_enable}")
 
-            return True
+        proxy_server = reg.get(HKCU, INTERNET_SETTINGS_KEY, "ProxyServer")
+        observe(f"ProxyEnable={proxy_enable} ProxyServer={proxy_server or ''}")
+        if proxy_enable and proxy_server:
+            print_info(f"代理服务器: {proxy_server}")
+
+        return True
     except Exception as e:
         print_fail(f"读取代理设置失败: {e}")
         return False
@@ -236,16 +253,13 @@ def test_proxy_configuration():
 
     # 2. 检查用户级环境变量（重要：新终端会读取这个）
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command",
-             "$http = [Environment]::GetEnvironmentVariable('HTTP_PROXY', 'User'); " +
-             "$https = [Environment]::GetEnvironmentVariable('HTTPS_PROXY', 'User'); " +
-             "Write-Host \"$http|$https\""],
-            capture_output=True,
-            text=True,
+        output = get_worker("powershell").query(
+            "$http = [Environment]::GetEnvironmentVariable('HTTP_PROXY', 'User'); " +
+            "$https = [Environment]::GetEnvironmentVariable('HTTPS_PROXY', 'User'); " +
+            "\"$http|$https\"",
             timeout=5
         )
-        proxy_vars = result.stdout.strip().split('|')
+        proxy_vars = output.split('|')
         user_http_proxy = proxy_vars[0] if len(proxy_vars) > 0 else ""
 
         if user_http_proxy:
@@ -258,35 +272,30 @@ def test_proxy_configuration():
         print_warn(f"无法读取用户级环境变量: {e}")
         env_ok = False
 
-    # 3. 检查代理软件运行状态（从注册表动态读取端口，适配任意 VPN 客户端）
-    proxy_port = None
+    # 3. 检查代理软件运行状态（直接连接注册表中的代理端点并握手：socks= 项用 SOCKS5，其余用 HTTP CONNECT）
+    endpoints = []
     try:
-        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-            proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
-            # ProxyServer 格式为 "127.0.0.1:7897"
-            if proxy_server and ":" in proxy_server:
-                proxy_port = proxy_server.split(":")[-1]
+        # ProxyServer 格式为 "127.0.0.1:7897" 或 "http=...;https=...;socks=..."（与上一项共用读缓存）
+        proxy_server = get_registry().get(HKCU, INTERNET_SETTINGS_KEY, "ProxyServer")
+        endpoints = parse_proxy_modes(proxy_server) if proxy_server else []
     except Exception:
         pass
 
-    if proxy_port:
+    if endpoints:
         try:
-            result = subprocess.run(
-                ["netstat", "-ano"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            for line in result.stdout.splitlines():
-                if f":{proxy_port}" in line and "LISTENING" in line:
+            probes = []
+            for mode in ("http", "socks5"):
+                same_mode = [endpoint for endpoint, m in endpoints if m == mode]
+                if same_mode:
+                    probes += probe_endpoints(same_mode, mode=mode)
+            for probe in probes:
+                if probe.alive:
                     proxy_running = True
-                    break
-
-            if proxy_running:
-                print_pass(f"代理软件正在运行（端口 {proxy_port} 监听）")
-            else:
-                print_warn(f"代理软件未运行（端口 {proxy_port} 未监听）")
+                    print_pass(f"代理软件正在运行（{probe.endpoint} 应答，"
+                               f"连接 {probe.connect_ms:.0f}ms，握手 {probe.handshake_ms:.0f}ms）")
+                else:
+                    print_warn(f"代理软件未应答（{probe.endpoint}：{probe.error}）")
+            if not proxy_running:
                 print_info("   如需使用代理，请启动代理客户端")
         except Exception as e:
             print_warn(f"无法检测代理软件: {e}")
@@ -295,23 +304,21 @@ def test_proxy_configuration():
 
     # 4. 检查 Windows 系统代理开关
     try:
-        reg_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-            proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
-            if proxy_enable == 1:
-                print_info("Windows 系统代理开关: 开启")
-            else:
-                print_info("Windows 系统代理开关: 关闭")
-
-            # 给出配置建议
-            if is_locked and env_ok and proxy_running:
-                print_info("")
-                print_pass("✅ 配置完美：代理已锁定且软件正在运行")
-                print_info("   Claude Code 等应用可以正常使用")
-            elif is_locked and not proxy_running:
-                print_info("")
-                print_warn("⚠️ 代理已锁定但软件未运行")
-                print_info("   请启动代理软件（Clash/V2Ray）")
+        proxy_enable = get_registry().get(HKCU, INTERNET_SETTINGS_KEY, "ProxyEnable")
+        if proxy_enable == 1:
+            print_info("Windows 系统代理开关: 开启")
+        else:
+            print_info("Windows 系统代理开关: 关闭")
+
+        # 给出配置建议
+        if is_locked and env_ok and proxy_running:
+            print_info("")
+            print_pass("✅ 配置完美：代理已锁定且软件正在运行")
+            print_info("   Claude Code 等应用可以正常使用")
+        elif is_locked and not proxy_running:
+            print_info("")
+            print_warn("⚠️ 代理已锁定但软件未运行")
+            print_info("   请启动代理软件（Clash/V2Ray）")
     except Exception as e:
         print_warn(f"无法读取系统代理设置: {e}")
 
@@ -321,51 +328,100 @@ def test_proxy_configuration():
     return lock_ok and env_ok and proxy_running
 
 
-def test_git_config():
-    """测试 Git 配置"""
-    print_test("Git 代理配置")
+def test_no_proxy_consistency():
+    """
+    测试 NO_PROXY 与注册表例外列表（ProxyOverride）是否一致
+
+    用户级 HTTP_PROXY 已设置时，用户级 NO_PROXY 应等于 ProxyOverride 的转换结果；
+    未设置代理时跳过。npm 配置了代理时同时检查 npm noproxy。
+    """
+    print_test("NO_PROXY 例外列表")
+
+    override = read_proxy_override()
+    expected = no_proxy_value(override)
+    print_info(f"ProxyOverride: {override or '(未设置)'}")
 
     try:
-        result = subprocess.run(
-            ["git", "config", "--global", "--get", "http.proxy"],
-            capture_output=True,
-            text=True
+        output = get_worker("powershell").query(
+            "$http = [Environment]::GetEnvironmentVariable('HTTP_PROXY', 'User'); " +
+            "$no = [Environment]::GetEnvironmentVariable('NO_PROXY', 'User'); " +
+            "\"$http|$no\"",
+            timeout=5
         )
-        proxy = result.stdout.strip()
-        if proxy:
-            print_pass(f"Git http.proxy: {proxy}")
+    except Exception as e:
+        print_warn(f"无法读取用户级环境变量: {e}")
+        return False
+    user_http_proxy, _, user_no_proxy = output.partition('|')
+    observe(user_no_proxy, expected=expected)
+
+    if not user_http_proxy:
+        print_info("用户级代理未设置，跳过")
+        return None
+
+    ok = True
+    if user_no_proxy == expected:
+        print_pass(f"用户级 NO_PROXY: {user_no_proxy}")
+    else:
+        print_fail("用户级 NO_PROXY 与例外列表不一致")
+        print_info(f"   当前: {user_no_proxy or '(未设置)'}")
+        print_info(f"   应为: {expected}")
+        print_info("   运行 'Sync-ProxyToTools' 或重开终端更新")
+        ok = False
+
+    npm_proxy, npm_noproxy = run_many([
+        ["npm", "config", "get", "proxy"],
+        ["npm", "config", "get", "noproxy"],
+    ], timeout=20)
+    if npm_proxy.ok and npm_proxy.stdout.strip() not in ("", "null"):
+        value = npm_noproxy.stdout.strip()
+        if value == expected:
+            print_pass(f"npm noproxy: {value}")
         else:
-            print_info("Git http.proxy: (未设置)")
+            print_warn(f"npm noproxy 与例外列表不一致: {value or '(未设置)'}")
+            ok = False
 
-        return True
-    except FileNotFoundError:
+    return ok
+
+
+def test_git_config():
+    """测试 Git 配置"""
+    print_test("Git 代理配置")
+
+    result = run(["git", "config", "--global", "--get", "http.proxy"], timeout=10)
+    if result.not_found:
         print_warn("Git 未安装")
         return True
-    except Exception as e:
-        print_fail(f"测试失败: {e}")
+    if result.timed_out:
+        print_fail("测试失败: git 命令超时")
         return False
 
+    proxy = result.stdout.strip()
+    observe(proxy or "(未设置)")
+    if proxy:
+        print_pass(f"Git http.proxy: {proxy}")
+    else:
+        print_info("Git http.proxy: (未设置)")
+
+    return True
+
 
 def test_console_codepage():
     """测试控制台代码页"""
     print_test("控制台代码页")
 
-    try:
-        result = subprocess.run(
-            ["cmd", "/c", "chcp"],
-            capture_output=True,
-            text=True
-        )
-        output = result.stdout.strip()
-        if "65001" in output:
-            print_pass(f"代码页: 65001 (UTF-8)")
-            return True
-        else:
-            print_warn(f"代码页: {output}")
-            print_info("建议在 PowerShell 中运行 chcp 65001")
-            return True
-    except Exception as e:
-        print_warn(f"无法检测代码页: {e}")
+    result = run(["cmd", "/c", "chcp"], timeout=10)
+    if result.returncode is None or result.timed_out:
+        print_warn("无法检测代码页: cmd 未能执行")
+        return True
+
+    output = result.stdout.strip()
+    observe(output)
+    if "65001" in output:
+        print_pass(f"代码页: 65001 (UTF-8)")
+        return True
+    else:
+        print_warn(f"代码页: {output}")
+        print_info("建议在 PowerShell 中运行 chcp 65001")
         return True
 
 
@@ -374,15 +430,11 @@ def test_system_utf8_setting():
     print_test("系统 UTF-8 全局支持")
 
     try:
-        # 读取系统代码页设置
-        key = winreg.OpenKey(
-            winreg.HKEY_LOCAL_MACHINE,
-            r"SYSTEM\CurrentControlSet\Control\Nls\CodePage",
-            0,
-            winreg.KEY_READ
-        )
-        acp_value, _ = winreg.QueryValueEx(key, "ACP")
-        winreg.CloseKey(key)
+        # 读取系统代码页设置（与 setup.py 的 check_system_utf8 共用 registry 读缓存）
+        acp_value = code_page()
+        if acp_value is None:
+            raise FileNotFoundError("注册表中没有 ACP")
+        observe(acp_value)
 
         if acp_value == "65001":
             print_pass(f"系统代码页: {acp_value} (UTF-8)")
@@ -415,14 +467,17 @@ def test_powershell_noprofile_encoding():
 
     try:
         # 模拟 Claude Code 执行脚本的方式
-        result = subprocess.run(
+        # 注意：这里刻意单独冷启动一个进程，检查的正是全新 -NoProfile 进程的控制台编码，
+        # 不能走 ps_worker（工作进程自带 UTF-8 管道，会掩盖乱码）
+        result = run(
             ["pwsh", "-NoProfile", "-Command", "Write-Host '测试中文'; Write-Host '✅ 成功'"],
-            capture_output=True,
-            text=True,
             timeout=10
         )
+        if result.not_found:
+            raise FileNotFoundError("pwsh")
 
         output = result.stdout.strip()
+        observe(output)
 
         # 检查是否包含乱码
         if "测试中文" in output and "✅" in output:
@@ -457,49 +512,27 @@ def test_scoop_aria2():
     """
     print_test("Scoop aria2 配置")
 
-    try:
-        # 检查 scoop 是否安装（使用 shell=True 因为 scoop 是 .cmd/.ps1 脚本）
-        result = subprocess.run(
-            ["scoop", "--version"],
-            capture_output=True,
-            text=True,
-            shell=True,
-            timeout=10
-        )
-        if result.returncode != 0:
-            print_info("Scoop 未安装，跳过此测试")
-            return None  # 返回 None 表示跳过
-    except FileNotFoundError:
-        print_info("Scoop 未安装，跳过此测试")
-        return None
-    except Exception as e:
-        print_warn(f"无法检测 Scoop: {e}")
+    # 检查 scoop 是否安装（scoop.cmd 由 runner 按 PATHEXT 解析）
+    result = run(["scoop", "--version"], timeout=10)
+    if result.timed_out:
+        print_warn("无法检测 Scoop: 命令超时")
         return None
+    if not result.ok:
+        print_info("Scoop 未安装，跳过此测试")
+        return None  # 返回 None 表示跳过
 
     print_pass("Scoop 已安装")
 
-    # 检查 aria2 是否安装
-    result = subprocess.run(
-        ["scoop", "list"],
-        capture_output=True,
-        text=True,
-        shell=True
-    )
-    if "aria2" in result.stdout:
+    # 检查 aria2 是否安装、aria2 配置（两个查询互不依赖，并发执行）
+    list_result, config_result = run_many([["scoop", "list"], ["scoop", "config"]], timeout=30)
+    if "aria2" in list_result.stdout:
         print_pass("aria2 已安装")
     else:
         print_fail("aria2 未安装（建议安装以解决 SSL 问题）")
         print_info("运行: scoop install aria2")
         return False
 
-    # 检查 aria2 配置
-    result = subprocess.run(
-        ["scoop", "config"],
-        capture_output=True,
-        text=True,
-        shell=True
-    )
-    config_output = result.stdout
+    config_output = config_result.stdout
 
     checks = [
         ("aria2-enabled = True", "aria2-enabled" in config_output and "True" in config_output),
@@ -550,44 +583,32 @@ def test_ssl_mitm():
         print_info("  运行: echo 'insecure' > ~/.curlrc")
         results.append(False)
 
-    # 检查 Git SSL 配置
-    try:
-        result = subprocess.run(
-            ["git", "config", "--global", "--get", "http.sslVerify"],
-            capture_output=True,
-            text=True
-        )
-        if result.stdout.strip().lower() == 'false':
-            print_pass("Git 已配置 (http.sslVerify = false)")
-            results.append(True)
-        else:
-            print_fail("Git 未配置跳过 SSL 验证")
-            print_info("  运行: git config --global http.sslVerify false")
-            results.append(False)
-    except FileNotFoundError:
+    # 检查 Git / npm SSL 配置（互不依赖，并发执行）
+    git_result, npm_result = run_many([
+        ["git", "config", "--global", "--get", "http.sslVerify"],
+        ["npm", "config", "get", "strict-ssl"],
+    ], timeout=10)
+
+    if git_result.not_found:
         print_info("Git 未安装，跳过")
-    except Exception as e:
-        print_warn(f"Git 检测失败: {e}")
+    elif git_result.timed_out:
+        print_warn("Git 检测失败: 命令超时")
+    elif git_result.stdout.strip().lower() == 'false':
+        print_pass("Git 已配置 (http.sslVerify = false)")
+        results.append(True)
+    else:
+        print_fail("Git 未配置跳过 SSL 验证")
+        print_info("  运行: git config --global http.sslVerify false")
+        results.append(False)
 
-    # 检查 npm SSL 配置
-    try:
-        result = subprocess.run(
-            ["npm", "config", "get", "strict-ssl"],
-            capture_output=True,
-            text=True,
-            shell=True,
-            timeout=10
-        )
-        if result.stdout.strip().lower() == 'false':
-            print_pass("npm 已配置 (strict-ssl = false)")
-            results.append(True)
-        else:
-            print_warn("npm 未配置跳过 SSL 验证")
-            print_info("  运行: npm config set strict-ssl false")
-    except FileNotFoundError:
+    if npm_result.not_found:
         print_info("npm 未安装，跳过")
-    except Exception:
-        pass
+    elif npm_result.stdout.strip().lower() == 'false':
+        print_pass("npm 已配置 (strict-ssl = false)")
+        results.append(True)
+    elif not npm_result.timed_out:
+        print_warn("npm 未配置跳过 SSL 验证")
+        print_info("  运行: npm config set strict-ssl false")
 
     # 检查 Node.js 环境变量
     if os.environ.get('NODE_TLS_REJECT_UNAUTHORIZED') == '0':
@@ -604,6 +625,31 @@ def test_ssl_mitm():
         return False
 
 
+def test_shell_encoding_matrix():
+    """在 pwsh / powershell / cmd / Git Bash 中并发执行同一个 UTF-8 往返探针（stdout、stdin、写文件）"""
+    print_test("多 Shell 编码矩阵")
+
+    results = run_matrix()
+    found = [r for r in results if r.found]
+    if not found:
+        print_info("未找到任何 Shell，跳过此测试")
+        return None
+
+    observe(summarize(results))
+    print_info(f"探针文本: {PROBE_TEXT}")
+    for line in format_grid(results):
+        print_info(line)
+
+    failures = describe_failures(results)
+    if not failures:
+        print_pass(f"{len(found)} 个 Shell 的输出、输入与写文件均为 UTF-8")
+        return True
+    for failure in failures:
+        print_fail(failure)
+    print_info("修复：以管理员身份运行 .\\enable_utf8_system.ps1 并重启（系统代码页 65001 后 cmd 与 PowerShell 5 默认即为 UTF-8）")
+    return False
+
+
 def test_emoji_output():
     """测试 emoji 输出（可能失败，取决于终端）"""
     print_test("Emoji 输出测试")
@@ -623,33 +669,107 @@ def test_emoji_output():
         return True
 
 
-def main():
+HOME = Path.home()
+PROFILE_PATH = HOME / "Documents" / "PowerShell" / "Microsoft.PowerShell_profile.ps1"
+PROXY_MODULE_MANIFEST = PROFILE_PATH.parent / "Modules" / "ProxyTools" / "ProxyTools.psd1"
+VSCODE_SETTINGS = Path(os.environ.get("APPDATA", "")) / "Code" / "User" / "settings.json"
+GITCONFIG = HOME / ".gitconfig"
+NPMRC = HOME / ".npmrc"
+SCOOP_CONFIG = HOME / ".config" / "scoop" / "config.json"
+SCOOP_ARIA2 = HOME / "scoop" / "apps" / "aria2" / "current" / "manifest.json"
+STDOUT_ENCODING = value_input("stdout.encoding", lambda: sys.stdout.encoding)
+
+
+def proxy_input(name):
+    return registry_input(HKCU, INTERNET_SETTINGS_KEY, name)
+
+
+def user_env_input(name):
+    return registry_input(HKCU, ENVIRONMENT_KEY, name)
+
+
+# 检查项及其输入：输入未变化时沿用上次的结果（verify_cache.py）
+CHECKS = [
+    Check("Python 编码", test_python_encoding, [STDOUT_ENCODING, env_input("PYTHONIOENCODING")],
+          expected="utf-8", remediation="运行 python setup.py 设置 PYTHONUTF8 / PYTHONIOENCODING"),
+    Check("PowerShell 7", test_powershell_7, [which_input("pwsh")],
+          expected="7.x", remediation="python setup.py --answer powershell7=y"),
+    Check("PowerShell Profile", test_powershell_profile, [file_input(PROFILE_PATH), file_input(PROXY_MODULE_MANIFEST)],
+          remediation="运行 python setup.py 重新生成 Profile 和 ProxyTools 模块"),
+    Check("VS Code 设置", test_vscode_settings, [file_input(VSCODE_SETTINGS)],
+          remediation="运行 python setup.py 更新 VS Code settings.json"),
+    Check("Windows 代理设置", test_windows_proxy_setting, [proxy_input("ProxyEnable"), proxy_input("ProxyServer")]),
+    # 融合了环境变量和锁定状态检查；探测代理软件是否在运行，每次都执行
+    Check("代理配置状态", test_proxy_configuration, volatile=True,
+          remediation="启动代理客户端；运行 pwsh check_proxy.ps1 查看完整状态"),
+    Check("NO_PROXY 例外列表", test_no_proxy_consistency,
+          [proxy_input("ProxyOverride"), user_env_input("HTTP_PROXY"), user_env_input("NO_PROXY"),
+           file_input(NPMRC), which_input("npm")],
+          remediation="运行 Sync-ProxyToTools 或重开终端"),
+    Check("Git 配置", test_git_config, [file_input(GITCONFIG), which_input("git")]),
+    Check("Scoop aria2", test_scoop_aria2, [which_input("scoop"), file_input(SCOOP_CONFIG), file_input(SCOOP_ARIA2)],
+          expected="aria2-enabled=true, aria2-options=--check-certificate=false",
+          remediation="scoop install aria2; scoop config aria2-enabled true"),
+    Check("SSL 证书配置", test_ssl_mitm,
+          [file_input(HOME / ".curlrc"), file_input(GITCONFIG), file_input(NPMRC), which_input("git"),
+           which_input("npm"), env_input("NODE_TLS_REJECT_UNAUTHORIZED")],
+          remediation="echo insecure > ~/.curlrc; git config --global http.sslVerify false"),
+    Check("控制台代码页", test_console_codepage,
+          [registry_input(HKLM, CODEPAGE_KEY, "OEMCP"), registry_input(HKCU, "Console", "CodePage"),
+           registry_input(HKCU, r"Software\Microsoft\Command Processor", "AutoRun")],
+          expected="65001"),
+    Check("系统 UTF-8 全局支持", test_system_utf8_setting, [registry_input(HKLM, CODEPAGE_KEY, "ACP")],
+          expected="65001", remediation="以管理员身份运行 .\\enable_utf8_system.ps1 并重启"),
+    Check("PowerShell -NoProfile 中文输出", test_powershell_noprofile_encoding,
+          [which_input("pwsh"), registry_input(HKLM, CODEPAGE_KEY, "ACP"), registry_input(HKLM, CODEPAGE_KEY, "OEMCP")],
+          expected="测试中文 ✅ 成功", remediation="以管理员身份运行 .\\enable_utf8_system.ps1 并重启"),
+    Check("多 Shell 编码矩阵", test_shell_encoding_matrix,
+          [which_input("pwsh"), which_input("powershell"), which_input("cmd"), which_input("git"),
+           registry_input(HKLM, CODEPAGE_KEY, "ACP"), registry_input(HKLM, CODEPAGE_KEY, "OEMCP"),
+           registry_input(HKCU, "Console", "CodePage")],
+          expected="stdout / stdin / file 均为 UTF-8", remediation="以管理员身份运行 .\\enable_utf8_system.ps1 并重启"),
+    Check("Emoji 输出", test_emoji_output, [STDOUT_ENCODING]),
+]
+
+
+def _print_cached(check, entry):
+    print_test(check.name)
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.get("time", 0)))
+    print_info(f"输入未变化，沿用 {when} 的结果（--all 重新检查）")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Windows 开发环境配置测试（增量验证）")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--all", action="store_const", dest="mode", const=ALL, help="忽略缓存，全部重新检查")
+    group.add_argument("--failed-only", action="store_const", dest="mode", const=FAILED_ONLY,
+                       help="只重新检查上次失败的项")
+    group.add_argument("--since-last-run", action="store_const", dest="mode", const=SINCE_LAST_RUN,
+                       help="只检查并报告输入变化了的项")
+    parser.add_argument("--jsonl", metavar="FILE", help="把每项结果写为 JSON Lines")
+    parser.add_argument("--junit", metavar="FILE", help="把结果写为 JUnit XML")
+    parser.add_argument("--watch", action="store_true",
+                        help="检查完成后持续监视输入，变化时只重新检查受影响的项并输出 JSON Lines 事件")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="无法使用变更通知时的轮询间隔（秒）")
+    args = parser.parse_args(argv)
+    args.mode = args.mode or INCREMENTAL
+    return args
+
+
+def emit_event(event, outcome, **fields):
+    print(to_json_line(outcome, event=event, **fields), flush=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mode = args.mode
     print_header("Windows 开发环境配置测试")
 
-    tests = [
-        ("Python 编码", test_python_encoding),
-        ("PowerShell 7", test_powershell_7),
-        ("PowerShell Profile", test_powershell_profile),
-        ("VS Code 设置", test_vscode_settings),
-        ("Windows 代理设置", test_windows_proxy_setting),
-        ("代理配置状态", test_proxy_configuration),  # 融合了环境变量和锁定状态检查
-        ("Git 配置", test_git_config),
-        ("Scoop aria2", test_scoop_aria2),
-        ("SSL 证书配置", test_ssl_mitm),
-        ("控制台代码页", test_console_codepage),
-        ("系统 UTF-8 全局支持", test_system_utf8_setting),
-        ("PowerShell -NoProfile 中文输出", test_powershell_noprofile_encoding),
-        ("Emoji 输出", test_emoji_output),
-    ]
-
-    results = []
-    for name, test_func in tests:
-        try:
-            passed = test_func()
-            results.append((name, passed))
-        except Exception as e:
-            print_fail(f"测试异常: {e}")
-            results.append((name, False))
+    outcomes = run_checks(CHECKS, mode,
+                          on_error=lambda check, e: print_fail(f"测试异常: {e}"),
+                          on_cached=_print_cached)
+    results = [(o.name, o.passed, o.status) for o in outcomes]
 
     # 总结
     print_header("测试结果总结")
@@ -658,7 +778,7 @@ def main():
     failed_count = 0
     skipped_count = 0
 
-    for name, passed in results:
+    for name, passed, source in results:
         if passed is None:
             status = f"{Colors.YELLOW}SKIP{Colors.RESET}"
             skipped_count += 1
@@ -668,10 +788,14 @@ def main():
         else:
             status = f"{Colors.RED}FAIL{Colors.RESET}"
             failed_count += 1
-        print(f"  [{status}] {name}")
+        print(f"  [{status}] {name}" + (" (沿用上次结果)" if source == CACHED else ""))
 
     total_count = len(results)
-    print(f"\n总计: {passed_count} 通过, {failed_count} 失败, {skipped_count} 跳过 (共 {total_count} 项)")
+    cached_count = sum(1 for r in results if r[2] == CACHED)
+    print(f"\n总计: {passed_count} 通过, {failed_count} 失败, {skipped_count} 跳过 (共 {total_count} 项，"
+          f"其中 {cached_count} 项沿用上次结果)")
+    if mode == SINCE_LAST_RUN and not results:
+        print("自上次运行以来没有检查项的输入发生变化")
 
     if failed_count == 0:
         print(f"\n{Colors.GREEN}所有测试通过！{Colors.RESET}")
@@ -682,6 +806,24 @@ def main():
         print(f"这会导致 Claude Code 执行脚本时出现中文乱码。")
         print(f"请运行: {Colors.BOLD}.\\enable_utf8_system.ps1{Colors.RESET} (需管理员权限并重启)")
 
+    if args.jsonl:
+        write_jsonl(outcomes, args.jsonl)
+        print(f"\n结果已写入 {args.jsonl}")
+    if args.junit:
+        write_junit(outcomes, args.junit)
+        print(f"结果已写入 {args.junit}")
+
+    if args.watch:
+        watcher = create_watcher(CHECKS, args.interval)
+        mode_text = "变更通知" if watcher.kind == "notify" else f"每 {args.interval:g}s 轮询"
+        print(f"\n监视检查项输入（{mode_text}），Ctrl+C 退出", file=sys.stderr)
+        try:
+            watch(CHECKS, emit_event, watcher)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+shell_matrix 测试（用当前 Python 解释器模拟各种编码行为的 Shell，跨平台运行）
+
+使用方法: python -m pytest test_shell_matrix.py
+"""
+
+import shutil
+import sys
+
+import pytest
+
+from shell_matrix import (BAD, MISSING, OK, PROBE_TEXT, Shell, bash_args, describe_failures, find_git_bash,
+                          format_grid, run_matrix, summarize)
+
+PY = sys.executable
+
+
+def python_shell(name, encoding, file_encoding="utf-8"):
+    """读 stdin（按 UTF-8）、按 encoding 输出、按 file_encoding 写文件的"Shell" """
+    def build(exe, text, filename):
+        code = (f"import sys; line = sys.stdin.buffer.readline().decode('utf-8').strip(); "
+                f"sys.stdout.buffer.write(('OUT:{text}\\nIN:' + line + '\\n').encode({encoding!r}, 'replace')); "
+                f"open({filename!r}, 'w', encoding={file_encoding!r}).write({text!r})")
+        return [exe, "-c", code]
+    return Shell(name, [PY], build)
+
+
+def test_matrix_grid_and_failures():
+    shells = [python_shell("utf8", "utf-8", "utf-8-sig"), python_shell("gbk", "gbk", "utf-16"),
+              Shell("absent", ["no-such-shell-xyz"], bash_args)]
+    results = run_matrix(shells)
+    utf8, gbk, absent = results
+    assert utf8.passed and utf8.cells == {"stdout": OK, "stdin": OK, "file": OK}   # BOM 允许
+    # GBK 输出按 UTF-8 严格解码 → 乱码；UTF-16 文件不是 UTF-8
+    assert gbk.cells == {"stdout": BAD, "stdin": BAD, "file": BAD}
+    assert gbk.observed["stdout"] != PROBE_TEXT and "�" in gbk.observed["stdout"]
+    assert not absent.found and set(absent.cells.values()) == {MISSING}
+
+    grid = format_grid(results)
+    assert grid[0].split()[:4] == ["Shell", "stdout", "stdin", "file"]
+    assert grid[2].split()[:4] == ["gbk", BAD, BAD, BAD] and grid[3].endswith("未找到")
+    assert [f.split(":")[0] for f in describe_failures(results)] == ["gbk stdout", "gbk stdin", "gbk file"]
+    assert summarize(results) == "utf8=ok gbk=stdout,stdin,file absent=missing"
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="需要 bash")
+def test_bash_probe_round_trip():
+    result, = run_matrix([Shell("bash", ["bash"], bash_args)])
+    assert result.passed, result.observed
+
+
+def test_git_bash_is_located_from_git(tmp_path):
+    git = tmp_path / "Git" / "cmd" / "git.exe"
+    bash = tmp_path / "Git" / "bin" / "bash.exe"
+    for path in (git, bash):
+        path.parent.mkdir(parents=True)
+        path.write_text("")
+    assert find_git_bash(which={"git": str(git), "bash": r"C:\Windows\System32\bash.exe"}.get) == str(bash)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+snapshot 测试：内容去重、按大小和修改时间跳过重读、快照对比
+
+使用方法: python -m pytest test_snapshot.py
+"""
+
+import os
+
+from registry import ENVIRONMENT_KEY, HKCU, MemoryBackend, Registry
+from snapshot import ADDED, CHANGED, REMOVED, MANAGED_KEYS, collect, diff, format_diff, load, save
+
+
+def make_world(tmp_path):
+    files = {"pwsh.psm1": tmp_path / "a" / "ProxyTools.psm1", "powershell.psm1": tmp_path / "b" / "ProxyTools.psm1",
+             "curlrc": tmp_path / ".curlrc", "gitconfig": tmp_path / ".gitconfig"}
+    for path in files.values():
+        path.parent.mkdir(exist_ok=True)
+    files["pwsh.psm1"].write_text("function proxy {}\n", encoding="utf-8")
+    files["powershell.psm1"].write_text("function proxy {}\n", encoding="utf-8")
+    files["curlrc"].write_text("insecure\n", encoding="utf-8")
+    registry = Registry(MemoryBackend({(HKCU, ENVIRONMENT_KEY): {"PYTHONUTF8": "1", "LANG": "en_US.UTF-8"}}))
+    return files, registry
+
+
+def test_snapshot_dedupes_and_round_trips(tmp_path):
+    files, registry = make_world(tmp_path)
+    doc = collect(files, registry=registry, clock=lambda: 1.0)
+    assert doc["files"]["pwsh.psm1"]["sha256"] == doc["files"]["powershell.psm1"]["sha256"]
+    assert len(doc["blobs"]) == 2                               # 相同内容只存一份
+    assert doc["files"]["gitconfig"]["missing"]
+    assert doc["registry"]["HKCU\\Environment"] == {"LANG": "en_US.UTF-8", "PYTHONUTF8": "1"}
+    assert set(doc["registry"]) == {label for label, *_ in MANAGED_KEYS}   # 代理键不存在时为空
+    path = save(doc, tmp_path / "snaps" / "s.json")
+    assert load(path) == doc and b"\n" not in path.read_bytes()
+
+
+def test_unchanged_files_are_not_reread(tmp_path):
+    files, registry = make_world(tmp_path)
+    base = collect(files, registry=registry)
+    curlrc = files["curlrc"]
+    st = os.stat(curlrc)
+    curlrc.write_text("INSECURE\n", encoding="utf-8")           # 同样大小，恢复修改时间 → 视为未变化
+    os.utime(curlrc, ns=(st.st_atime_ns, st.st_mtime_ns))
+    live = collect(files, registry=registry, base=base)
+    assert live["files"]["curlrc"] == base["files"]["curlrc"]
+    assert live["blobs"] == base["blobs"]
+    assert diff(base, live) == []
+
+
+def test_diff_reports_files_and_registry(tmp_path):
+    files, registry = make_world(tmp_path)
+    old = collect(files, registry=registry)
+    files["curlrc"].write_text("insecure\nretry 3\n", encoding="utf-8")
+    files["gitconfig"].write_text("[http]\n", encoding="utf-8")
+    files["powershell.psm1"].unlink()
+    registry.set(HKCU, ENVIRONMENT_KEY, "LANG", "C.UTF-8")
+    registry.delete(HKCU, ENVIRONMENT_KEY, "PYTHONUTF8")
+    registry.set(HKCU, ENVIRONMENT_KEY, "NO_PROXY", "localhost")
+    registry.flush()
+    registry.invalidate()
+    new = collect(files, registry=registry, base=old)
+
+    changes = diff(old, new)
+    assert [(c.kind, c.name, c.status) for c in changes] == [
+        ("file", "curlrc", CHANGED), ("file", "gitconfig", ADDED), ("file", "powershell.psm1", REMOVED),
+        ("registry", "HKCU\\Environment\\LANG", CHANGED), ("registry", "HKCU\\Environment\\NO_PROXY", ADDED),
+        ("registry", "HKCU\\Environment\\PYTHONUTF8", REMOVED)]
+    lines = format_diff(changes, old, new)
+    assert "    +retry 3" in lines and lines[0].startswith("~ curlrc")
+    assert "~ HKCU\\Environment\\LANG: 'en_US.UTF-8' → 'C.UTF-8'" in lines
+    assert "- HKCU\\Environment\\PYTHONUTF8 = '1'" in lines
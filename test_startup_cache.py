@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+启动状态缓存与单写者锁测试（startup_cache 参考实现 + 生成的 Profile 代码）
+
+使用方法: python -m pytest test_startup_cache.py
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import setup
+from startup_cache import (BUSY, CACHED, WRITTEN, SingleWriterLock, StateCache, desired_user_env,
+                           state_key, sync_user_env)
+
+
+class FakeUserEnv:
+    """内存中的用户级环境变量，记录读写次数"""
+
+    def __init__(self, values=None, write_delay=0.0):
+        self.values = dict(values or {})
+        self.reads = 0
+        self.writes = []
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+
+    def read(self, name):
+        with self._lock:
+            self.reads += 1
+        return self.values.get(name)
+
+    def write(self, name, value):
+        time.sleep(self.write_delay)
+        with self._lock:
+            self.writes.append((name, value))
+            if value is None:
+                self.values.pop(name, None)
+            else:
+                self.values[name] = value
+
+
+def test_state_key_and_desired_env():
+    assert state_key(1, "127.0.0.1:7897", "<local>") == "1|127.0.0.1:7897|<local>"
+    assert state_key(0, None, None) == "0||"
+    env = desired_user_env(1, "127.0.0.1:7897", "10.*")
+    assert env["ALL_PROXY"] == "socks5://127.0.0.1:7897"
+    assert env["NO_PROXY"].endswith("10.0.0.0/8")
+    assert set(desired_user_env(0, "127.0.0.1:7897", "").values()) == {None}
+
+
+def test_unchanged_state_skips_all_user_env_access(tmp_path):
+    cache = StateCache(tmp_path / "state.txt")
+    env = FakeUserEnv()
+    key, desired = state_key(1, "127.0.0.1:7897", ""), desired_user_env(1, "127.0.0.1:7897", "")
+
+    assert sync_user_env(key, desired, env.read, env.write, cache) == WRITTEN
+    assert len(env.writes) == 4
+    env.reads, env.writes = 0, []
+
+    assert sync_user_env(key, desired, env.read, env.write, cache) == CACHED
+    assert env.reads == 0 and env.writes == []
+
+
+def test_changed_state_writes_only_differences(tmp_path):
+    cache = StateCache(tmp_path / "state.txt")
+    env = FakeUserEnv({"HTTP_PROXY": "http://127.0.0.1:7897", "HTTPS_PROXY": "http://127.0.0.1:7897",
+                       "ALL_PROXY": "socks5://127.0.0.1:7897", "NO_PROXY": "localhost,127.0.0.1,::1"})
+    key = state_key(1, "127.0.0.1:7897", "*.corp.com")
+    assert sync_user_env(key, desired_user_env(1, "127.0.0.1:7897", "*.corp.com"),
+                         env.read, env.write, cache) == WRITTEN
+    assert [name for name, _ in env.writes] == ["NO_PROXY"]
+
+    # 代理关闭：清除全部变量；已清除的不再写
+    key = state_key(0, "127.0.0.1:7897", "*.corp.com")
+    sync_user_env(key, desired_user_env(0, "127.0.0.1:7897", ""), env.read, env.write, cache)
+    assert env.values == {}
+    cache.clear()
+    env.writes = []
+    sync_user_env(key, desired_user_env(0, "127.0.0.1:7897", ""), env.read, env.write, cache)
+    assert env.writes == []
+
+
+def test_lock_is_exclusive_and_released(tmp_path):
+    path = tmp_path / "state.lock"
+    first, second = SingleWriterLock(path), SingleWriterLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert not path.exists()
+    with second as acquired:
+        assert acquired
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    path = tmp_path / "state.lock"
+    path.write_text("")
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    assert not SingleWriterLock(path, stale_after=120).acquire()
+    lock = SingleWriterLock(path, stale_after=10)
+    assert lock.acquire()
+    lock.release()
+
+
+def test_busy_lock_skips_writes(tmp_path):
+    cache = StateCache(tmp_path / "state.txt")
+    holder = SingleWriterLock(str(cache.path) + ".lock")
+    assert holder.acquire()
+    env = FakeUserEnv()
+    try:
+        result = sync_user_env("1|x:1|", desired_user_env(1, "x:1", ""), env.read, env.write, cache)
+    finally:
+        holder.release()
+    assert result == BUSY and env.writes == []
+
+
+def test_concurrent_launches_write_once(tmp_path):
+    """模拟 Windows Terminal 同时恢复十个标签页"""
+    cache = StateCache(tmp_path / "state.txt")
+    env = FakeUserEnv(write_delay=0.01)
+    key, desired = state_key(1, "127.0.0.1:7897", "<local>"), desired_user_env(1, "127.0.0.1:7897", "<local>")
+    barrier = threading.Barrier(10)
+
+    def launch(_):
+        barrier.wait()
+        return sync_user_env(key, desired, env.read, env.write, cache)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(launch, range(10)))
+    assert results.count(WRITTEN) == 1
+    assert set(results) <= {WRITTEN, BUSY, CACHED}
+    assert len(env.writes) == 4
+    assert cache.matches(key)
+
+
+def test_profile_uses_state_cache_and_lock():
+    profile = setup.render_powershell_profile()
+    module, _ = setup.render_proxy_module()
+    assert "[IO.FileStream]::new($lockPath, 'CreateNew', 'Write', 'None', 1, 'DeleteOnClose')" in profile
+    assert f"$PROXY_STATE_LOCK_STALE   = {setup.PROXY_STATE_LOCK_STALE}" in profile
+    auto = profile[profile.index("function Set-AutoProxy"):].split("\n}\n")[0]
+    assert '$stateKey = "$proxyEnable|$proxyServer|$($props.ProxyOverride)"' in auto
+    assert "GetEnvironmentVariable" not in auto     # 用户级变量只在 Sync-UserProxyEnv 中读写
+    for name in ("function Sync-ProxyToTools", "function Lock-Proxy"):
+        body = module[module.index(name):].split("\n}\n")[0]
+        assert "Clear-ProxyStateCache" in body
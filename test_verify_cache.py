@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+verify_cache 测试：指纹、缓存复用与各运行模式
+
+使用方法: python -m pytest test_verify_cache.py
+"""
+
+import pytest
+
+from verify_cache import (ALL, CACHE_MAX_AGE, CACHED, FAILED_ONLY, RAN, SINCE_LAST_RUN, Check, env_input,
+                          file_input, load_cache, run_checks, value_input)
+
+
+class Counter:
+    """记录调用次数的检查函数"""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    config = tmp_path / ".curlrc"
+    config.write_text("insecure\n")
+    monkeypatch.setenv("VERIFY_TEST_VAR", "1")
+    funcs = {"curl": Counter(), "env": Counter(False), "live": Counter()}
+    checks = [Check("curl", funcs["curl"], [file_input(config)]),
+              Check("env", funcs["env"], [env_input("VERIFY_TEST_VAR")]),
+              Check("live", funcs["live"], volatile=True)]
+    cache = tmp_path / "verify.json"
+
+    def run(mode="incremental", now=1000.0):
+        return {o.name: (o.passed, o.status) for o in run_checks(checks, mode, cache, clock=lambda: now)}
+    return config, funcs, run, cache
+
+
+def test_unchanged_inputs_reuse_cached_results(world):
+    config, funcs, run, cache = world
+    assert run() == {"curl": (True, RAN), "env": (False, RAN), "live": (True, RAN)}
+    assert run() == {"curl": (True, CACHED), "env": (False, CACHED), "live": (True, RAN)}
+    assert [f.calls for f in funcs.values()] == [1, 1, 2]
+    assert set(load_cache(cache)) == {"curl", "env", "live"}
+
+    config.write_text("insecure\nretry 3\n")                  # 只有依赖这个文件的检查重新执行
+    assert run()["curl"] == (True, RAN)
+    assert [f.calls for f in funcs.values()] == [2, 1, 3]
+
+    assert run(now=1000.0 + CACHE_MAX_AGE)["env"] == (False, RAN)  # 过期后重新执行
+    assert run(ALL) == {"curl": (True, RAN), "env": (False, RAN), "live": (True, RAN)}
+
+
+def test_failed_only_and_since_last_run(world, monkeypatch):
+    config, funcs, run, _ = world
+    run()
+    funcs["env"].result = True
+    assert run(FAILED_ONLY) == {"curl": (True, CACHED), "env": (True, RAN), "live": (True, CACHED)}
+    # 只报告输入变化了的项（实时检查每次都算变化）
+    assert run(SINCE_LAST_RUN) == {"live": (True, RAN)}
+    monkeypatch.setenv("VERIFY_TEST_VAR", "2")
+    assert run(SINCE_LAST_RUN) == {"env": (True, RAN), "live": (True, RAN)}
+
+
+def test_exceptions_fail_and_code_changes_invalidate(tmp_path):
+    errors = []
+    boom = Counter(RuntimeError("boom"))
+    outcome, = run_checks([Check("boom", boom)], cache_path=tmp_path / "c.json",
+                          on_error=lambda check, e: errors.append((check.name, str(e))))
+    assert (outcome.passed, errors) == (False, [("boom", "boom")])
+
+    encoding = value_input("enc", lambda: "utf-8")
+    assert Check("a", lambda: True, [encoding]).fingerprint() != Check("a", lambda: False, [encoding]).fingerprint()
+    unreadable = value_input("x", lambda: 1 / 0)
+    assert unreadable.read() == "<ZeroDivisionError>"
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+verify_report 测试：结构化结果 → JSON Lines / JUnit XML
+
+使用方法: python -m pytest test_verify_report.py
+"""
+
+import json
+import xml.etree.ElementTree as ET
+
+from verify_cache import Check, observe, record_message, run_checks
+from verify_report import build_junit, write_jsonl, write_junit
+
+
+def codepage_check():
+    record_message("fail", "系统代码页: 936 (非 UTF-8)")
+    observe("936")
+    return False
+
+
+def git_check():
+    record_message("pass", "Git http.proxy: http://127.0.0.1:7897")
+    return True
+
+
+def run(tmp_path):
+    checks = [Check("系统 UTF-8", codepage_check, expected="65001", remediation="运行 enable_utf8_system.ps1"),
+              Check("Git 配置", git_check),
+              Check("Scoop", lambda: None)]
+    return run_checks(checks, cache_path=tmp_path / "cache.json")
+
+
+def test_jsonl_has_structured_fields(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_jsonl(run(tmp_path), path)
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["name"], r["status"], r["cached"]) for r in rows] == [
+        ("系统 UTF-8", "fail", False), ("Git 配置", "pass", False), ("Scoop", "skip", False)]
+    assert rows[0]["observed"] == "936" and rows[0]["expected"] == "65001"
+    assert rows[0]["remediation"] == "运行 enable_utf8_system.ps1"
+    assert rows[1]["observed"] == "Git http.proxy: http://127.0.0.1:7897"   # 未 observe 时取最后一条结论
+    assert rows[0]["duration_ms"] >= 0
+
+    write_jsonl(run(tmp_path), path)                                     # 第二次沿用缓存，字段保留
+    cached = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+    assert cached["cached"] and cached["observed"] == "936" and cached["messages"]
+
+
+def test_junit(tmp_path):
+    root = build_junit(run(tmp_path), hostname="pc")
+    suite = root.find("testsuite")
+    assert (suite.get("tests"), suite.get("failures"), suite.get("skipped")) == ("3", "1", "1")
+    failed, passed, skipped = suite.findall("testcase")
+    assert failed.find("failure").get("message") == "观察到: 936；期望: 65001"
+    assert failed.find("failure").text == "运行 enable_utf8_system.ps1"
+    assert passed.find("failure") is None and skipped.find("skipped") is not None
+    assert "[FAIL] 系统代码页" in failed.find("system-out").text
+
+    path = tmp_path / "out" / "junit.xml"
+    write_junit(run(tmp_path), path)
+    assert ET.parse(path).getroot().tag == "testsuites"
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+verify_watch 测试：轮询回退下只重新执行输入变化了的检查
+
+使用方法: python -m pytest test_verify_watch.py
+"""
+
+from verify_cache import Check, file_input, load_cache
+from verify_watch import PollingWatcher, watch, watch_targets
+
+
+def test_watch_reruns_only_affected_checks(tmp_path, capsys):
+    curlrc, gitconfig = tmp_path / ".curlrc", tmp_path / ".gitconfig"
+    curlrc.write_text("")
+    calls = []
+
+    def curl_check():
+        calls.append("curl")
+        print("不应出现在事件流中")
+        return "insecure" in curlrc.read_text()
+
+    checks = [Check("curl", curl_check, [file_input(curlrc)]),
+              Check("git", lambda: calls.append("git") or True, [file_input(gitconfig)]),
+              Check("live", lambda: calls.append("live") or True, volatile=True)]
+    assert watch_targets(checks) == [("file", curlrc), ("file", gitconfig)]
+
+    edits = iter([lambda: curlrc.write_text("insecure\n"), lambda: None, lambda: gitconfig.write_text("[http]\n")])
+    rounds = []
+
+    def sleep(seconds):
+        rounds.append(seconds)
+        next(edits)()
+
+    events = []
+    cache = tmp_path / "cache.json"
+    count = watch(checks, lambda event, outcome, **fields: events.append((event, outcome, fields)),
+                  PollingWatcher(0.5, sleep=sleep), cache_path=cache, should_stop=lambda: len(rounds) >= 3,
+                  invalidate=lambda: None)
+    assert count == 2 and rounds == [0.5, 0.5, 0.5]
+    assert calls == ["curl", "git"]                        # 无变化的一轮不执行任何检查
+    (event, outcome, fields), second = events
+    assert (event, outcome.name, outcome.result) == ("changed", "curl", "pass")
+    assert fields == {"inputs": [f"file:{curlrc}"], "previous": "unknown"}
+    assert outcome.messages == []                          # 检查自身的 print 不进入事件流
+    assert second[1].name == "git" and capsys.readouterr().out == ""
+    assert load_cache(cache)["curl"]["passed"] is True
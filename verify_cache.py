@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+增量验证：test_setup.py 各检查项声明自己的输入，输入未变化时沿用上次的结果
+
+每个检查项（Check）声明它依赖的输入：文件内容、注册表值、环境变量、PATH 中的可执行文件等。
+运行前计算所有输入的指纹（连同检查函数自身的字节码），与上次运行记录比较：
+- 指纹相同且上次有结果 → 直接沿用，不执行检查
+- 指纹不同、没有记录、记录过期（CACHE_MAX_AGE）或检查标记为 volatile（依赖实时状态，如代理存活）→ 执行
+
+运行模式：
+- 默认（incremental）：只执行输入变化了的检查，其余沿用缓存
+- all：全部重新执行（等同于原来的行为）
+- failed-only：只重新执行上次失败的检查，其余沿用缓存
+- since-last-run：只执行并报告输入变化了的检查，未变化的不出现在结果中
+
+结果缓存：%LOCALAPPDATA%\\windows_env_setup\\verify.json
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+CACHE_PATH = Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()) / "windows_env_setup" / "verify.json"
+CACHE_MAX_AGE = 7 * 24 * 3600       # 秒；超过后即使输入未变也重新执行
+
+INCREMENTAL = "incremental"
+ALL = "all"
+FAILED_ONLY = "failed-only"
+SINCE_LAST_RUN = "since-last-run"
+MODES = (INCREMENTAL, ALL, FAILED_ONLY, SINCE_LAST_RUN)
+
+# 执行状态
+RAN = "ran"
+CACHED = "cached"
+
+
+class Input:
+    """
+    检查项的一个输入：label 用于显示，read() 返回可比较的字符串。
+    watch 为可订阅变更通知的目标（("file", Path) / ("registry", root, key)），None 表示只能轮询。
+    """
+
+    def __init__(self, label, read, watch=None):
+        self.label = label
+        self._read = read
+        self.watch = watch
+
+    def read(self):
+        try:
+            return str(self._read())
+        except Exception as e:             # 读不到也是一种状态（如键不存在、非 Windows）
+            return f"<{type(e).__name__}>"
+
+
+def file_input(path):
+    """文件内容（不存在时为 <missing>）"""
+    path = Path(path)
+
+    def read():
+        try:
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return "<missing>"
+    return Input(f"file:{path}", read, watch=("file", path))
+
+
+def registry_input(root, key, name):
+    """注册表值（经 registry 读缓存，同一次运行内与检查共用）"""
+    def read():
+        from registry import get_registry
+        return repr(get_registry().get(root, key, name))
+    return Input(f"reg:{root}\\{key}\\{name}", read, watch=("registry", root, key))
+
+
+def env_input(name):
+    """当前进程的环境变量"""
+    return Input(f"env:{name}", lambda: repr(os.environ.get(name)))
+
+
+def which_input(name):
+    """PATH 中的可执行文件：路径、大小、修改时间（升级或换位置后重新检查）"""
+    def read():
+        exe = shutil.which(name)
+        if not exe:
+            return "<not found>"
+        st = os.stat(exe)
+        return f"{exe}|{st.st_size}|{st.st_mtime_ns}"
+    return Input(f"exe:{name}", read)
+
+
+def value_input(label, func):
+    """任意可计算的值（如 sys.stdout.encoding）"""
+    return Input(label, func)
+
+
+class Check:
+    """
+    一个检查项。
+
+    参数：
+        name        : str      - 显示名，也是缓存键
+        func        : callable - 返回 True（通过）/ False（失败）/ None（跳过）
+        inputs      : list     - Input 列表
+        volatile    : bool     - 依赖实时状态（网络、进程），每次都执行
+        expected    : str      - 期望值（写入结构化结果）
+        remediation : str      - 失败时的修复方法（写入结构化结果）
+    """
+
+    def __init__(self, name, func, inputs=(), volatile=False, expected=None, remediation=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.volatile = volatile
+        self.expected = expected
+        self.remediation = remediation
+
+    def snapshot(self):
+        """各输入的当前值：{label: value}"""
+        return {item.label: item.read() for item in self.inputs}
+
+    def fingerprint(self, snapshot=None):
+        """输入指纹（含检查函数的字节码，修改检查逻辑后自动失效）"""
+        h = hashlib.sha256()
+        code = getattr(self.func, "__code__", None)
+        h.update(code.co_code + repr(code.co_consts).encode() if code else repr(self.func).encode())
+        for label, value in (self.snapshot() if snapshot is None else snapshot).items():
+            h.update(f"\0{label}={value}".encode("utf-8", "replace"))
+        return h.hexdigest()
+
+
+# ---------- 结构化结果：检查执行期间由 print_* / observe() 记录 ----------
+_current = None
+
+
+def record_message(level, text):
+    """记录当前检查输出的一条信息（level: pass / fail / warn / info）"""
+    if _current is not None:
+        _current["messages"].append([level, text])
+
+
+def observe(observed=None, expected=None, remediation=None):
+    """当前检查观察到的值、期望值与修复方法（未给出的字段保持原值）"""
+    if _current is None:
+        return
+    for key, value in (("observed", observed), ("expected", expected), ("remediation", remediation)):
+        if value is not None:
+            _current[key] = str(value)
+
+
+PASS = "pass"
+FAIL = "fail"
+SKIP = "skip"
+
+
+class Outcome:
+    """一个检查项本次的结果：status 为 RAN 或 CACHED"""
+
+    def __init__(self, name, passed, status, checked_at, duration_ms=0.0, observed=None, expected=None,
+                 remediation=None, messages=None):
+        self.name = name
+        self.passed = passed
+        self.status = status
+        self.checked_at = checked_at
+        self.duration_ms = duration_ms
+        self.observed = observed
+        self.expected = expected
+        self.remediation = remediation
+        self.messages = list(messages or [])
+
+    @property
+    def result(self):
+        """pass / fail / skip"""
+        return SKIP if self.passed is None else PASS if self.passed else FAIL
+
+    def to_dict(self):
+        return {"name": self.name, "status": self.result, "cached": self.status == CACHED,
+                "checked_at": self.checked_at, "duration_ms": round(self.duration_ms, 1),
+                "observed": self.observed, "expected": self.expected, "remediation": self.remediation,
+                "messages": self.messages}
+
+    @classmethod
+    def from_entry(cls, name, entry, status=CACHED):
+        return cls(name, entry.get("passed"), status, entry.get("time", 0), entry.get("duration_ms", 0.0),
+                   entry.get("observed"), entry.get("expected"), entry.get("remediation"), entry.get("messages"))
+
+
+def execute(check, now, on_error=None, timer=time.perf_counter):
+    """执行一个检查并收集结构化结果，返回 (Outcome, 缓存记录)"""
+    global _current
+    details = {"observed": None, "expected": check.expected, "remediation": check.remediation, "messages": []}
+    _current = details
+    error = None
+    start = timer()
+    try:
+        passed = check.func()
+    except Exception as e:
+        error, passed = e, False
+        details["messages"].append([FAIL, f"测试异常: {e}"])
+    finally:
+        _current = None
+    duration_ms = (timer() - start) * 1000
+    if error is not None and on_error:
+        on_error(check, error)
+    if details["observed"] is None:
+        # 没有显式 observe() 时，以最后一条结论性信息作为观察值
+        verdicts = [text for level, text in details["messages"] if level in (PASS, FAIL, "warn")]
+        details["observed"] = verdicts[-1] if verdicts else None
+    outcome = Outcome(check.name, passed, RAN, now, duration_ms, **details)
+    entry = {"passed": passed, "time": now, "duration_ms": duration_ms, **details}
+    return outcome, entry
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass                               # 缓存写不进去只是下次不能复用
+
+
+def plan(check, entry, fingerprint, mode, now):
+    """决定检查项本次是否执行：返回 "run" / "reuse" / "omit"（since-last-run 下未变化的不报告）"""
+    fresh = (entry is not None and entry.get("fingerprint") == fingerprint
+             and now - entry.get("time", 0) < CACHE_MAX_AGE and not check.volatile)
+    if mode == ALL or entry is None:
+        return "run"
+    if mode == FAILED_ONLY:
+        return "run" if entry.get("passed") is False else "reuse"
+    if fresh:
+        return "omit" if mode == SINCE_LAST_RUN else "reuse"
+    return "run"
+
+
+def run_checks(checks, mode=INCREMENTAL, cache_path=CACHE_PATH, on_error=None, on_cached=None, clock=time.time):
+    """
+    按模式执行检查，更新缓存，返回 Outcome 列表（顺序与 checks 一致，省略的不在其中）。
+
+    参数：
+        on_error  : callable(check, exc) - 检查抛出异常时调用（结果记为失败）
+        on_cached : callable(check, entry) - 沿用缓存结果时调用（用于输出说明）
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的模式 {mode!r}")
+    cache = load_cache(cache_path)
+    outcomes = []
+    for check in checks:
+        snapshot = check.snapshot()
+        fingerprint = check.fingerprint(snapshot)
+        entry = cache.get(check.name)
+        now = clock()
+        action = plan(check, entry, fingerprint, mode, now)
+        if action == "omit":
+            continue
+        if action == "reuse":
+            if on_cached:
+                on_cached(check, entry)
+            outcomes.append(Outcome.from_entry(check.name, entry))
+            continue
+        outcome, cache[check.name] = execute(check, now, on_error)
+        cache[check.name].update(fingerprint=fingerprint, inputs=snapshot)
+        outcomes.append(outcome)
+    save_cache(cache, cache_path)
+    return outcomes
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+验证结果导出：JSON Lines 与 JUnit XML（供批量管理工具读取，无需解析彩色控制台输出）
+
+每个检查项一条记录：
+    {"name": "系统 UTF-8 全局支持", "status": "fail", "cached": false, "checked_at": 1760000000.0,
+     "duration_ms": 3.2, "observed": "936", "expected": "65001",
+     "remediation": "以管理员身份运行 .\\enable_utf8_system.ps1 并重启", "messages": [["fail", "..."], ...]}
+
+status 为 pass / fail / skip；cached 表示沿用了上次的结果（见 verify_cache.py）。
+JUnit XML 中失败项为 <failure>，跳过项为 <skipped>，信息行写入 <system-out>。
+"""
+
+import json
+import socket
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from verify_cache import CACHED, FAIL, SKIP
+
+SUITE_NAME = "windows_env_setup"
+
+
+def to_json_line(outcome, **extra):
+    """一个结果 → 一行 JSON（extra 附加字段，如 watch 模式的 event）"""
+    return json.dumps({**extra, **outcome.to_dict()}, ensure_ascii=False)
+
+
+def write_jsonl(outcomes, path):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for outcome in outcomes:
+            f.write(to_json_line(outcome) + "\n")
+
+
+def build_junit(outcomes, suite=SUITE_NAME, hostname=None):
+    """结果列表 → JUnit XML 的 <testsuites> 元素"""
+    outcomes = list(outcomes)
+    failures = sum(1 for o in outcomes if o.result == FAIL)
+    skipped = sum(1 for o in outcomes if o.result == SKIP)
+    total_s = sum(o.duration_ms for o in outcomes) / 1000
+    root = ET.Element("testsuites", tests=str(len(outcomes)), failures=str(failures), time=f"{total_s:.3f}")
+    testsuite = ET.SubElement(root, "testsuite", name=suite, tests=str(len(outcomes)), failures=str(failures),
+                              errors="0", skipped=str(skipped), time=f"{total_s:.3f}",
+                              hostname=hostname or socket.gethostname(),
+                              timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    for o in outcomes:
+        case = ET.SubElement(testsuite, "testcase", classname=suite, name=o.name, time=f"{o.duration_ms / 1000:.3f}")
+        properties = ET.SubElement(case, "properties")
+        for key in ("observed", "expected", "remediation"):
+            if getattr(o, key) is not None:
+                ET.SubElement(properties, "property", name=key, value=getattr(o, key))
+        ET.SubElement(properties, "property", name="cached", value=str(o.status == CACHED).lower())
+        if o.result == FAIL:
+            message = f"观察到: {o.observed}" + (f"；期望: {o.expected}" if o.expected else "")
+            failure = ET.SubElement(case, "failure", message=message, type="CheckFailed")
+            failure.text = o.remediation or ""
+        elif o.result == SKIP:
+            ET.SubElement(case, "skipped", message=o.observed or "")
+        if o.messages:
+            ET.SubElement(case, "system-out").text = "\n".join(f"[{level.upper()}] {text}" for level, text in o.messages)
+    return root
+
+
+def write_junit(outcomes, path, **kwargs):
+    tree = ET.ElementTree(build_junit(outcomes, **kwargs))
+    if hasattr(ET, "indent"):              # Python 3.9+
+        ET.indent(tree)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tree.write(path, encoding="utf-8", xml_declaration=True)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+验证 watch 模式：检查项的输入文件或注册表值变化时，只重新执行受影响的检查并输出事件
+
+- Windows：目录用 FindFirstChangeNotificationW、注册表键用 RegNotifyChangeKeyValue 订阅变更，
+  WaitForMultipleObjects 等待，空闲时不占 CPU；无法订阅的输入（环境变量、PATH 中的程序、
+  不存在的注册表键）靠每 rescan_interval 秒一次的兜底重扫发现
+- 其他平台或订阅失败：按 interval 轮询，重新计算各检查的输入快照
+
+唤醒后比较每个检查的输入快照（verify_cache.Check.snapshot），只有变化了的检查重新执行，
+结果写回缓存并以事件（JSON Lines）输出：
+    {"event": "changed", "inputs": ["file:C:\\\\Users\\\\me\\\\.curlrc"], "previous": "fail", "name": "SSL 证书配置",
+     "status": "pass", ...}
+实时检查（volatile）不参与 watch。
+"""
+
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+from verify_cache import CACHE_PATH, execute, load_cache, save_cache
+
+DEFAULT_INTERVAL = 2.0           # 轮询间隔（秒）
+DEFAULT_RESCAN = 60.0            # 有变更通知时的兜底重扫间隔（秒）
+DEBOUNCE = 0.2                   # 收到通知后等待写入完成的时间（秒）
+
+
+class PollingWatcher:
+    """轮询：每 interval 秒唤醒一次，由调用方重新计算输入快照"""
+
+    kind = "polling"
+
+    def __init__(self, interval=DEFAULT_INTERVAL, sleep=time.sleep):
+        self.interval = interval
+        self.sleep = sleep
+
+    def wait(self, timeout=None):
+        """返回 True 表示可能有变化"""
+        self.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        return True
+
+    def close(self):
+        pass
+
+
+class WindowsWatcher:
+    """目录与注册表键的变更通知（最多 64 个句柄，超出部分由兜底重扫覆盖）"""
+
+    kind = "notify"
+    MAX_HANDLES = 64
+
+    def __init__(self, targets):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self.advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+        self.kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+        self.kernel32.CreateEventW.restype = wintypes.HANDLE
+        self.handles = []        # (句柄, 重新订阅函数)
+        self._keys = []
+        self._dirs = []
+        self._dir_handles = []
+        try:
+            for kind, *target in dict.fromkeys(targets):
+                if len(self.handles) >= self.MAX_HANDLES:
+                    break
+                if kind == "file":
+                    self._watch_file(Path(target[0]))
+                elif kind == "registry":
+                    self._watch_key(*target)
+        except Exception:
+            self.close()
+            raise
+        if not self.handles:
+            raise OSError("没有可订阅的输入")
+
+    def _watch_file(self, path):
+        # 文件所在目录可能还不存在：订阅最近的已存在上级目录（含子目录）
+        directory = path.parent
+        while not directory.exists() and directory.parent != directory:
+            directory = directory.parent
+        subtree = directory != path.parent
+        if (directory, subtree) in self._dirs:
+            return
+        FILE_NOTIFY = 0x1 | 0x2 | 0x8 | 0x10        # 文件名、目录名、大小、最后写入
+        handle = self.kernel32.FindFirstChangeNotificationW(str(directory), subtree, FILE_NOTIFY)
+        if not handle or handle == self.ctypes.c_void_p(-1).value:
+            return
+        self._dirs.append((directory, subtree))
+        self._dir_handles.append(handle)
+        self.handles.append((handle, lambda: self.kernel32.FindNextChangeNotification(handle)))
+
+    def _watch_key(self, root, key):
+        roots = {"HKCU": 0x80000001, "HKLM": 0x80000002}
+        ctypes = self.ctypes
+        hkey = ctypes.c_void_p()
+        KEY_NOTIFY = 0x0010
+        if self.advapi32.RegOpenKeyExW(ctypes.c_void_p(roots[root]), key, 0, KEY_NOTIFY, ctypes.byref(hkey)):
+            return                                  # 键不存在：由兜底重扫发现
+        event = self.kernel32.CreateEventW(None, False, False, None)
+        self._keys.append((hkey, event))
+        REG_NOTIFY = 0x1 | 0x4                      # 子键名、值变化
+
+        def arm():
+            self.advapi32.RegNotifyChangeKeyValue(hkey, False, REG_NOTIFY, event, True)
+        arm()
+        self.handles.append((event, arm))
+
+    def wait(self, timeout=None):
+        ctypes = self.ctypes
+        array = (ctypes.c_void_p * len(self.handles))(*[h for h, _ in self.handles])
+        INFINITE, WAIT_TIMEOUT = 0xFFFFFFFF, 0x102
+        ms = INFINITE if timeout is None else int(timeout * 1000)
+        index = self.kernel32.WaitForMultipleObjects(len(self.handles), array, False, ms)
+        if index == WAIT_TIMEOUT or index >= len(self.handles):
+            return False
+        time.sleep(DEBOUNCE)                        # 编辑器保存常触发多次通知，合并为一次
+        for i, (handle, arm) in enumerate(self.handles):
+            if i == index or self.kernel32.WaitForSingleObject(handle, 0) == 0:
+                arm()
+        return True
+
+    def close(self):
+        for handle in self._dir_handles:
+            self.kernel32.FindCloseChangeNotification(handle)
+        for hkey, event in self._keys:
+            self.advapi32.RegCloseKey(hkey)
+            self.kernel32.CloseHandle(event)
+        self.handles, self._keys, self._dirs, self._dir_handles = [], [], [], []
+
+
+def watch_targets(checks):
+    """检查项中可订阅变更通知的输入"""
+    return [item.watch for check in checks for item in check.inputs if item.watch]
+
+
+def create_watcher(checks, interval=DEFAULT_INTERVAL):
+    """Windows 上优先使用变更通知，不可用时回退到轮询"""
+    if sys.platform == "win32":
+        try:
+            return WindowsWatcher(watch_targets(checks))
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(interval)
+
+
+def invalidate_registry():
+    """丢弃注册表读缓存，重新快照时读到最新值"""
+    try:
+        from registry import get_registry
+        get_registry().invalidate()
+    except ImportError:
+        pass
+
+
+def watch(checks, emit, watcher, cache_path=CACHE_PATH, rescan_interval=DEFAULT_RESCAN,
+          invalidate=invalidate_registry, should_stop=lambda: False, clock=time.time, quiet=True):
+    """
+    持续监视检查项的输入，变化时只重新执行受影响的检查。
+
+    参数：
+        emit        : callable(event, outcome, **fields) - 输出事件
+        watcher     : PollingWatcher / WindowsWatcher
+        should_stop : callable - 每轮唤醒后调用，返回 True 时结束
+        quiet       : bool     - 不把检查自身的控制台输出打印出来（已记录在结果的 messages 中）
+    返回发出的事件数。
+    """
+    checks = [c for c in checks if not c.volatile]
+    cache = load_cache(cache_path)
+    snapshots = {c.name: c.snapshot() for c in checks}
+    emitted = 0
+    while not should_stop():
+        watcher.wait(rescan_interval)
+        invalidate()
+        changed_any = False
+        for check in checks:
+            snapshot = check.snapshot()
+            previous = snapshots[check.name]
+            if snapshot == previous:
+                continue
+            snapshots[check.name] = snapshot
+            changed = sorted(k for k in snapshot.keys() | previous.keys() if snapshot.get(k) != previous.get(k))
+            before = cache.get(check.name, {}).get("passed", "unknown")
+            with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                outcome, entry = execute(check, clock())
+            entry.update(fingerprint=check.fingerprint(snapshot), inputs=snapshot)
+            cache[check.name] = entry
+            changed_any = True
+            emit("changed", outcome, inputs=changed,
+                 previous={True: "pass", False: "fail", None: "skip"}.get(before, "unknown"))
+            emitted += 1
+        if changed_any:
+            save_cache(cache, cache_path)
+    return emitted